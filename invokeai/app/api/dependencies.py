@@ -16,20 +16,34 @@ from invokeai.app.services.events.events_fastapievents import FastAPIEventServic
 from invokeai.app.services.image_files.image_files_disk import DiskImageFileStorage
 from invokeai.app.services.image_records.image_records_sqlite import SqliteImageRecordStorage
 from invokeai.app.services.images.images_default import ImageService
+from invokeai.app.services.invocation_cache.invocation_cache_common import get_references
 from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
+from invokeai.app.services.invocation_cache.invocation_cache_sqlite import SqliteInvocationCache
 from invokeai.app.services.invocation_services import InvocationServices
 from invokeai.app.services.invocation_stats.invocation_stats_default import InvocationStatsService
 from invokeai.app.services.invoker import Invoker
 from invokeai.app.services.model_images.model_images_default import ModelImageFileStorageDisk
+from invokeai.app.services.model_install.file_hash_cache_sqlite import SqliteFileHashCache
 from invokeai.app.services.model_manager.model_manager_default import ModelManagerService
 from invokeai.app.services.model_records.model_records_sql import ModelRecordServiceSQL
 from invokeai.app.services.names.names_default import SimpleNameService
+from invokeai.app.services.object_serializer.object_serializer_base import ObjectSerializerBase
 from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
 from invokeai.app.services.object_serializer.object_serializer_forward_cache import ObjectSerializerForwardCache
+from invokeai.app.services.object_serializer.object_serializer_safetensors import ObjectSerializerSafetensors
+from invokeai.app.services.object_serializer.object_serializer_write_back_cache import ObjectSerializerWriteBackCache
+from invokeai.app.services.session_processor.session_processor_base import (
+    OnAfterRunSession,
+    SessionProcessorBase,
+    SessionRunnerBase,
+)
 from invokeai.app.services.session_processor.session_processor_default import (
+    ConcurrentSessionRunner,
     DefaultSessionProcessor,
     DefaultSessionRunner,
+    MultiWorkerSessionProcessor,
 )
+from invokeai.app.services.session_queue.session_queue_common import SessionQueueItem
 from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
 from invokeai.app.services.shared.sqlite.sqlite_util import init_db
 from invokeai.app.services.style_preset_images.style_preset_images_disk import StylePresetImageFileStorageDisk
@@ -79,7 +93,9 @@ class ApiDependencies:
         if output_folder is None:
             raise ValueError("Output folder is not set")
 
-        image_files = DiskImageFileStorage(f"{output_folder}/images")
+        image_files = DiskImageFileStorage(
+            f"{output_folder}/images", max_cache_size=int(config.image_cache_size * 2**30)
+        )
 
         model_images_folder = config.models_path
         style_presets_folder = config.style_presets_path
@@ -96,14 +112,52 @@ class ApiDependencies:
         events = FastAPIEventService(event_handler_id, loop=loop)
         bulk_download = BulkDownloadService()
         image_records = SqliteImageRecordStorage(db=db)
-        images = ImageService()
-        invocation_cache = MemoryInvocationCache(max_cache_size=config.node_cache_size)
-        tensors = ObjectSerializerForwardCache(
-            ObjectSerializerDisk[torch.Tensor](output_folder / "tensors", ephemeral=True)
+        images = ImageService(writer_threads=config.image_writer_threads)
+        invocation_cache = (
+            SqliteInvocationCache(
+                db=db, max_cache_size=config.node_cache_size, max_disk_size=config.node_cache_disk_size * 1024**2
+            )
+            if config.node_cache_disk_size > 0
+            else MemoryInvocationCache(max_cache_size=config.node_cache_size)
         )
-        conditioning = ObjectSerializerForwardCache(
-            ObjectSerializerDisk[ConditioningFieldData](output_folder / "conditioning", ephemeral=True)
+        object_serializer = (
+            ObjectSerializerSafetensors if config.object_serializer == "safetensors" else ObjectSerializerDisk
         )
+        tensors: ObjectSerializerBase[torch.Tensor]
+        conditioning: ObjectSerializerBase[ConditioningFieldData]
+        on_after_run_session_callbacks: list[OnAfterRunSession] = []
+        tensor_cache_size = int(config.tensor_cache_size * 2**30)
+        conditioning_cache_size = int(config.conditioning_cache_size * 2**30)
+        if config.write_back_intermediates:
+            write_back_caches = (
+                ObjectSerializerWriteBackCache(
+                    object_serializer[torch.Tensor](output_folder / "tensors", ephemeral=True),
+                    max_memory_size=tensor_cache_size,
+                ),
+                ObjectSerializerWriteBackCache(
+                    object_serializer[ConditioningFieldData](output_folder / "conditioning", ephemeral=True),
+                    max_memory_size=conditioning_cache_size,
+                ),
+            )
+            tensors, conditioning = write_back_caches
+
+            def release_intermediates(queue_item: SessionQueueItem) -> None:
+                # The intermediates of the session are referenced by the outputs of its nodes
+                outputs = [output.model_dump(warnings=False) for output in queue_item.session.results.values()]
+                names = get_references(outputs)
+                for write_back_cache in write_back_caches:
+                    write_back_cache.release(names)
+
+            on_after_run_session_callbacks.append(release_intermediates)
+        else:
+            tensors = ObjectSerializerForwardCache(
+                object_serializer[torch.Tensor](output_folder / "tensors", ephemeral=True),
+                max_memory_size=tensor_cache_size,
+            )
+            conditioning = ObjectSerializerForwardCache(
+                object_serializer[ConditioningFieldData](output_folder / "conditioning", ephemeral=True),
+                max_memory_size=conditioning_cache_size,
+            )
         download_queue_service = DownloadQueueService(app_config=configuration, event_bus=events)
         model_images_service = ModelImageFileStorageDisk(model_images_folder / "model_images")
         model_manager = ModelManagerService.build_model_manager(
@@ -111,10 +165,27 @@ class ApiDependencies:
             model_record_service=ModelRecordServiceSQL(db=db, logger=logger),
             download_queue=download_queue_service,
             events=events,
+            hash_cache=SqliteFileHashCache(db=db),
         )
         names = SimpleNameService()
         performance_statistics = InvocationStatsService()
-        session_processor = DefaultSessionProcessor(session_runner=DefaultSessionRunner())
+
+        def build_session_runner() -> SessionRunnerBase:
+            if config.max_concurrent_nodes > 1:
+                return ConcurrentSessionRunner(
+                    max_workers=config.max_concurrent_nodes,
+                    on_after_run_session_callbacks=on_after_run_session_callbacks,
+                )
+            return DefaultSessionRunner(on_after_run_session_callbacks=on_after_run_session_callbacks)
+
+        session_processor: SessionProcessorBase
+        if config.worker_devices:
+            session_processor = MultiWorkerSessionProcessor(
+                devices=[torch.device(d) for d in config.worker_devices],
+                session_runner_factory=build_session_runner,
+            )
+        else:
+            session_processor = DefaultSessionProcessor(session_runner=build_session_runner())
         session_queue = SqliteSessionQueue(db=db)
         urls = LocalUrlService()
         workflow_records = SqliteWorkflowRecordsStorage(db=db)
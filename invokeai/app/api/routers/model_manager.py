@@ -34,7 +34,7 @@ from invokeai.backend.model_manager.config import (
     ModelFormat,
     ModelType,
 )
-from invokeai.backend.model_manager.load.model_cache.model_cache_base import CacheStats
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import CacheStats, ModelLoadStats
 from invokeai.backend.model_manager.metadata.fetch.huggingface import HuggingFaceMetadataFetch
 from invokeai.backend.model_manager.metadata.metadata_base import ModelMetadataWithFiles, UnknownMetadataException
 from invokeai.backend.model_manager.search import ModelSearch
@@ -923,3 +923,38 @@ async def get_stats() -> Optional[CacheStats]:
     """Return performance statistics on the model manager's RAM cache. Will return null if no models have been loaded."""
 
     return ApiDependencies.invoker.services.model_manager.load.ram_cache.stats
+
+
+@model_manager_router.get(
+    "/load_stats",
+    operation_id="list_model_load_stats",
+    response_model=List[ModelLoadStats],
+    summary="Get the measured sizes and load times of all models.",
+)
+async def list_model_load_stats() -> List[ModelLoadStats]:
+    """Return the RAM size, VRAM footprint and load time measured by the model cache for each model and submodel that
+    has been loaded. Use them to plan the sizes of the RAM and VRAM caches."""
+
+    return ApiDependencies.invoker.services.model_manager.store.get_model_load_stats()
+
+
+@model_manager_router.get(
+    "/i/{key}/load_stats",
+    operation_id="get_model_load_stats",
+    responses={
+        200: {"description": "The measurements were retrieved successfully"},
+        404: {"description": "The model could not be found"},
+    },
+    response_model=List[ModelLoadStats],
+    summary="Get the measured sizes and load times of a model.",
+)
+async def get_model_load_stats(
+    key: str = Path(description="Key of the model."),
+) -> List[ModelLoadStats]:
+    """Return the RAM size, VRAM footprint and load time measured by the model cache for the model and each of its
+    submodels that has been loaded."""
+
+    store = ApiDependencies.invoker.services.model_manager.store
+    if not store.exists(key):
+        raise HTTPException(status_code=404, detail=f"The model with key {key} could not be found")
+    return store.get_model_load_stats(key)
@@ -1,6 +1,7 @@
 from typing import Optional
 
 from fastapi import Body, Path, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.routing import APIRouter
 from pydantic import BaseModel
 
@@ -46,7 +47,10 @@ async def enqueue_batch(
 ) -> EnqueueBatchResult:
     """Processes a batch and enqueues the output graphs for execution."""
 
-    return ApiDependencies.invoker.services.session_queue.enqueue_batch(queue_id=queue_id, batch=batch, prepend=prepend)
+    # Large batches take a while to enqueue, so this runs in a worker thread to keep the event loop responsive
+    return await run_in_threadpool(
+        ApiDependencies.invoker.services.session_queue.enqueue_batch, queue_id=queue_id, batch=batch, prepend=prepend
+    )
 
 
 @session_queue_router.get(
@@ -8,6 +8,7 @@ from socketio import ASGIApp, AsyncServer
 
 from invokeai.app.services.events.events_common import (
     BatchEnqueuedEvent,
+    BatchEnqueueProgressEvent,
     BulkDownloadCompleteEvent,
     BulkDownloadErrorEvent,
     BulkDownloadEventBase,
@@ -60,6 +61,7 @@ QUEUE_EVENTS = {
     InvocationErrorEvent,
     QueueItemStatusChangedEvent,
     BatchEnqueuedEvent,
+    BatchEnqueueProgressEvent,
     QueueClearedEvent,
 }
 
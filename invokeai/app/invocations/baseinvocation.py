@@ -175,12 +175,19 @@ class BaseInvocation(ABC, BaseModel):
     _invocation_classes: ClassVar[set[BaseInvocation]] = set()
     _typeadapter: ClassVar[Optional[TypeAdapter[Any]]] = None
     _typeadapter_needs_update: ClassVar[bool] = False
+    _cpu_safe: ClassVar[bool] = False
 
     @classmethod
     def get_type(cls) -> str:
         """Gets the invocation's type, as provided by the `@invocation` decorator."""
         return cls.model_fields["type"].default
 
+    @classmethod
+    def is_cpu_safe(cls) -> bool:
+        """Whether the invocation only uses the CPU and may run concurrently with other invocations, as provided by the
+        `@invocation` decorator."""
+        return cls._cpu_safe
+
     @classmethod
     def register_invocation(cls, invocation: BaseInvocation) -> None:
         """Registers an invocation."""
@@ -417,6 +424,7 @@ def invocation(
     version: Optional[str] = None,
     use_cache: Optional[bool] = True,
     classification: Classification = Classification.Stable,
+    cpu_safe: bool = False,
 ) -> Callable[[Type[TBaseInvocation]], Type[TBaseInvocation]]:
     """
     Registers an invocation.
@@ -428,6 +436,7 @@ def invocation(
     :param Optional[str] version: Adds a version to the invocation. Must be a valid semver string. Defaults to None.
     :param Optional[bool] use_cache: Whether or not to use the invocation cache. Defaults to True. The user may override this in the workflow editor.
     :param Classification classification: The classification of the invocation. Defaults to FeatureClassification.Stable. Use Beta or Prototype if the invocation is unstable.
+    :param bool cpu_safe: Whether the invocation only uses the CPU, does not load models and may run concurrently with other invocations. Defaults to False. CPU-safe invocations may be run in parallel by the concurrent session runner.
     """
 
     def wrapper(cls: Type[TBaseInvocation]) -> Type[TBaseInvocation]:
@@ -487,6 +496,7 @@ def invocation(
             type=(invocation_type_annotation, invocation_type_field),
         )
         cls.__doc__ = docstring
+        cls._cpu_safe = cpu_safe
 
         # TODO: how to type this correctly? it's typed as ModelMetaclass, a private class in pydantic
         BaseInvocation.register_invocation(cls)  # type: ignore
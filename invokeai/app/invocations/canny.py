@@ -13,6 +13,7 @@ from invokeai.backend.image_util.util import cv2_to_pil, pil_to_cv2
     tags=["controlnet", "canny"],
     category="controlnet",
     version="1.0.0",
+    cpu_safe=True,
 )
 class CannyEdgeDetectionInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Geneartes an edge map using a cv2's Canny algorithm."""
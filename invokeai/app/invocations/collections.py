@@ -12,7 +12,12 @@ from invokeai.app.util.misc import SEED_MAX
 
 
 @invocation(
-    "range", title="Integer Range", tags=["collection", "integer", "range"], category="collections", version="1.0.0"
+    "range",
+    title="Integer Range",
+    tags=["collection", "integer", "range"],
+    category="collections",
+    version="1.0.0",
+    cpu_safe=True,
 )
 class RangeInvocation(BaseInvocation):
     """Creates a range of numbers from start to stop with step"""
@@ -37,6 +42,7 @@ class RangeInvocation(BaseInvocation):
     tags=["collection", "integer", "size", "range"],
     category="collections",
     version="1.0.0",
+    cpu_safe=True,
 )
 class RangeOfSizeInvocation(BaseInvocation):
     """Creates a range from start to start + (size * step) incremented by step"""
@@ -58,6 +64,7 @@ class RangeOfSizeInvocation(BaseInvocation):
     category="collections",
     version="1.0.1",
     use_cache=False,
+    cpu_safe=True,
 )
 class RandomRangeInvocation(BaseInvocation):
     """Creates a collection of random numbers"""
@@ -13,6 +13,7 @@ from invokeai.backend.image_util.util import np_to_pil, pil_to_np
     tags=["controlnet"],
     category="controlnet",
     version="1.0.0",
+    cpu_safe=True,
 )
 class ColorMapInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Generates a color map from the provided image."""
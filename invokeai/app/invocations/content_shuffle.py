@@ -11,6 +11,7 @@ from invokeai.backend.image_util.content_shuffle import content_shuffle
     tags=["controlnet", "normal"],
     category="controlnet",
     version="1.0.0",
+    cpu_safe=True,
 )
 class ContentShuffleInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Shuffles the image, similar to a 'liquify' filter."""
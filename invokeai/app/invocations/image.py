@@ -27,7 +27,7 @@ from invokeai.backend.image_util.invisible_watermark import InvisibleWatermark
 from invokeai.backend.image_util.safety_checker import SafetyChecker
 
 
-@invocation("show_image", title="Show Image", tags=["image"], category="image", version="1.0.1")
+@invocation("show_image", title="Show Image", tags=["image"], category="image", version="1.0.1", cpu_safe=True)
 class ShowImageInvocation(BaseInvocation):
     """Displays a provided image using the OS image viewer, and passes it forward in the pipeline."""
 
@@ -52,6 +52,7 @@ class ShowImageInvocation(BaseInvocation):
     tags=["image"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class BlankImageInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Creates a blank image and forwards it to the pipeline"""
@@ -75,6 +76,7 @@ class BlankImageInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "crop"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageCropInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Crops an image to a specified box. The box can be outside of the image."""
@@ -102,6 +104,7 @@ class ImageCropInvocation(BaseInvocation, WithMetadata, WithBoard):
     category="image",
     tags=["image", "pad", "crop"],
     version="1.0.0",
+    cpu_safe=True,
 )
 class CenterPadCropInvocation(BaseInvocation):
     """Pad or crop an image's sides from the center by specified pixels. Positive values are outside of the image."""
@@ -146,6 +149,7 @@ class CenterPadCropInvocation(BaseInvocation):
     tags=["image", "paste"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImagePasteInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Pastes an image into another image."""
@@ -193,6 +197,7 @@ class ImagePasteInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "mask"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class MaskFromAlphaInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Extracts the alpha channel of an image as a mask."""
@@ -218,6 +223,7 @@ class MaskFromAlphaInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "multiply"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageMultiplyInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Multiplies two images together using `PIL.ImageChops.multiply()`."""
@@ -245,6 +251,7 @@ IMAGE_CHANNELS = Literal["A", "R", "G", "B"]
     tags=["image", "channel"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageChannelInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Gets a channel from an image."""
@@ -268,6 +275,7 @@ class ImageChannelInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "convert"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageConvertInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Converts an image to a different mode."""
@@ -291,6 +299,7 @@ class ImageConvertInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "blur"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageBlurInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Blurs an image"""
@@ -320,6 +329,7 @@ class ImageBlurInvocation(BaseInvocation, WithMetadata, WithBoard):
     category="image",
     version="1.2.2",
     classification=Classification.Beta,
+    cpu_safe=True,
 )
 class UnsharpMaskInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Applies an unsharp mask filter to an image"""
@@ -388,6 +398,7 @@ PIL_RESAMPLING_MAP = {
     tags=["image", "resize"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageResizeInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Resizes an image to specific dimensions"""
@@ -418,6 +429,7 @@ class ImageResizeInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "scale"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageScaleInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Scales an image by a factor"""
@@ -453,6 +465,7 @@ class ImageScaleInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "lerp"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageLerpInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Linear interpolation of all pixels of an image"""
@@ -480,6 +493,7 @@ class ImageLerpInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "ilerp"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageInverseLerpInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Inverse linear interpolation of all pixels of an image"""
@@ -531,6 +545,7 @@ class ImageNSFWBlurInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "watermark"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageWatermarkInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Add an invisible watermark to an image"""
@@ -552,6 +567,7 @@ class ImageWatermarkInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "mask", "inpaint"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class MaskEdgeInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Applies an edge mask to an image"""
@@ -591,6 +607,7 @@ class MaskEdgeInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "mask", "multiply"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class MaskCombineInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Combine two masks together by multiplying them using `PIL.ImageChops.multiply()`."""
@@ -615,6 +632,7 @@ class MaskCombineInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "color"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ColorCorrectInvocation(BaseInvocation, WithMetadata, WithBoard):
     """
@@ -719,6 +737,7 @@ class ColorCorrectInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "hue"],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageHueAdjustmentInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Adjusts the Hue of an image."""
@@ -808,6 +827,7 @@ CHANNEL_FORMATS = {
     ],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageChannelOffsetInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Add or subtract a value from a specific color channel of an image."""
@@ -864,6 +884,7 @@ class ImageChannelOffsetInvocation(BaseInvocation, WithMetadata, WithBoard):
     ],
     category="image",
     version="1.2.2",
+    cpu_safe=True,
 )
 class ImageChannelMultiplyInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Scale a specific color channel of an image."""
@@ -909,6 +930,7 @@ class ImageChannelMultiplyInvocation(BaseInvocation, WithMetadata, WithBoard):
     category="primitives",
     version="1.2.2",
     use_cache=False,
+    cpu_safe=True,
 )
 class SaveImageInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Saves an image. Unlike an image primitive, this invocation stores a copy of the image."""
@@ -929,6 +951,7 @@ class SaveImageInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "combine"],
     category="image",
     version="1.0.0",
+    cpu_safe=True,
 )
 class CanvasPasteBackInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Combines two images by using the mask provided. Intended for use on the Unified Canvas."""
@@ -950,7 +973,8 @@ class CanvasPasteBackInvocation(BaseInvocation, WithMetadata, WithBoard):
         return ImageOps.invert(mask.convert("L"))
 
     def invoke(self, context: InvocationContext) -> ImageOutput:
-        source_image = context.images.get_pil(self.source_image.image_name)
+        # The image is pasted onto a copy, since the loaded image is shared with the other nodes reading it
+        source_image = context.images.get_pil(self.source_image.image_name).copy()
         target_image = context.images.get_pil(self.target_image.image_name)
         mask = self._prepare_mask(context.images.get_pil(self.mask.image_name))
 
@@ -966,6 +990,7 @@ class CanvasPasteBackInvocation(BaseInvocation, WithMetadata, WithBoard):
     tags=["image", "mask", "id"],
     category="image",
     version="1.0.0",
+    cpu_safe=True,
 )
 class MaskFromIDInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Generate a mask for a particular color in an ID Map"""
@@ -1020,6 +1045,7 @@ class MaskFromIDInvocation(BaseInvocation, WithMetadata, WithBoard):
     category="image",
     version="1.0.0",
     classification=Classification.Internal,
+    cpu_safe=True,
 )
 class CanvasV2MaskAndCropInvocation(BaseInvocation, WithMetadata, WithBoard):
     """Handles Canvas V2 image output masking and cropping"""
@@ -1046,11 +1072,12 @@ class CanvasV2MaskAndCropInvocation(BaseInvocation, WithMetadata, WithBoard):
 
         if self.source_image:
             generated_image = context.images.get_pil(self.generated_image.image_name)
-            source_image = context.images.get_pil(self.source_image.image_name)
+            # The loaded images are shared with the other nodes reading them, so copies are modified
+            source_image = context.images.get_pil(self.source_image.image_name).copy()
             source_image.paste(generated_image, (0, 0), mask)
             image_dto = context.images.save(image=source_image)
         else:
-            generated_image = context.images.get_pil(self.generated_image.image_name)
+            generated_image = context.images.get_pil(self.generated_image.image_name).copy()
             generated_image.putalpha(mask)
             image_dto = context.images.save(image=generated_image)
 
@@ -11,7 +11,7 @@ from invokeai.app.invocations.primitives import FloatOutput, IntegerOutput
 from invokeai.app.services.shared.invocation_context import InvocationContext
 
 
-@invocation("add", title="Add Integers", tags=["math", "add"], category="math", version="1.0.1")
+@invocation("add", title="Add Integers", tags=["math", "add"], category="math", version="1.0.1", cpu_safe=True)
 class AddInvocation(BaseInvocation):
     """Adds two numbers"""
 
@@ -22,7 +22,9 @@ class AddInvocation(BaseInvocation):
         return IntegerOutput(value=self.a + self.b)
 
 
-@invocation("sub", title="Subtract Integers", tags=["math", "subtract"], category="math", version="1.0.1")
+@invocation(
+    "sub", title="Subtract Integers", tags=["math", "subtract"], category="math", version="1.0.1", cpu_safe=True
+)
 class SubtractInvocation(BaseInvocation):
     """Subtracts two numbers"""
 
@@ -33,7 +35,9 @@ class SubtractInvocation(BaseInvocation):
         return IntegerOutput(value=self.a - self.b)
 
 
-@invocation("mul", title="Multiply Integers", tags=["math", "multiply"], category="math", version="1.0.1")
+@invocation(
+    "mul", title="Multiply Integers", tags=["math", "multiply"], category="math", version="1.0.1", cpu_safe=True
+)
 class MultiplyInvocation(BaseInvocation):
     """Multiplies two numbers"""
 
@@ -44,7 +48,7 @@ class MultiplyInvocation(BaseInvocation):
         return IntegerOutput(value=self.a * self.b)
 
 
-@invocation("div", title="Divide Integers", tags=["math", "divide"], category="math", version="1.0.1")
+@invocation("div", title="Divide Integers", tags=["math", "divide"], category="math", version="1.0.1", cpu_safe=True)
 class DivideInvocation(BaseInvocation):
     """Divides two numbers"""
 
@@ -62,6 +66,7 @@ class DivideInvocation(BaseInvocation):
     category="math",
     version="1.0.1",
     use_cache=False,
+    cpu_safe=True,
 )
 class RandomIntInvocation(BaseInvocation):
     """Outputs a single random integer."""
@@ -80,6 +85,7 @@ class RandomIntInvocation(BaseInvocation):
     category="math",
     version="1.0.1",
     use_cache=False,
+    cpu_safe=True,
 )
 class RandomFloatInvocation(BaseInvocation):
     """Outputs a single random float"""
@@ -100,6 +106,7 @@ class RandomFloatInvocation(BaseInvocation):
     tags=["math", "round", "integer", "float", "convert"],
     category="math",
     version="1.0.1",
+    cpu_safe=True,
 )
 class FloatToIntegerInvocation(BaseInvocation):
     """Rounds a float number to (a multiple of) an integer."""
@@ -121,7 +128,7 @@ class FloatToIntegerInvocation(BaseInvocation):
             return IntegerOutput(value=int(self.value / self.multiple) * self.multiple)
 
 
-@invocation("round_float", title="Round Float", tags=["math", "round"], category="math", version="1.0.1")
+@invocation("round_float", title="Round Float", tags=["math", "round"], category="math", version="1.0.1", cpu_safe=True)
 class RoundInvocation(BaseInvocation):
     """Rounds a float to a specified number of decimal places."""
 
@@ -176,6 +183,7 @@ INTEGER_OPERATIONS_LABELS = {
     ],
     category="math",
     version="1.0.1",
+    cpu_safe=True,
 )
 class IntegerMathInvocation(BaseInvocation):
     """Performs integer math."""
@@ -250,6 +258,7 @@ FLOAT_OPERATIONS_LABELS = {
     tags=["math", "float", "add", "subtract", "multiply", "divide", "power", "root", "absolute value", "min", "max"],
     category="math",
     version="1.0.1",
+    cpu_safe=True,
 )
 class FloatMathInvocation(BaseInvocation):
     """Performs floating point math."""
@@ -83,7 +83,9 @@ class MetadataItemOutput(BaseInvocationOutput):
     item: MetadataItemField = OutputField(description="Metadata Item")
 
 
-@invocation("metadata_item", title="Metadata Item", tags=["metadata"], category="metadata", version="1.0.1")
+@invocation(
+    "metadata_item", title="Metadata Item", tags=["metadata"], category="metadata", version="1.0.1", cpu_safe=True
+)
 class MetadataItemInvocation(BaseInvocation):
     """Used to create an arbitrary metadata item. Provide "label" and make a connection to "value" to store that data as the value."""
 
@@ -99,7 +101,7 @@ class MetadataOutput(BaseInvocationOutput):
     metadata: MetadataField = OutputField(description="Metadata Dict")
 
 
-@invocation("metadata", title="Metadata", tags=["metadata"], category="metadata", version="1.0.1")
+@invocation("metadata", title="Metadata", tags=["metadata"], category="metadata", version="1.0.1", cpu_safe=True)
 class MetadataInvocation(BaseInvocation):
     """Takes a MetadataItem or collection of MetadataItems and outputs a MetadataDict."""
 
@@ -120,7 +122,9 @@ class MetadataInvocation(BaseInvocation):
         return MetadataOutput(metadata=MetadataField.model_validate(data))
 
 
-@invocation("merge_metadata", title="Metadata Merge", tags=["metadata"], category="metadata", version="1.0.1")
+@invocation(
+    "merge_metadata", title="Metadata Merge", tags=["metadata"], category="metadata", version="1.0.1", cpu_safe=True
+)
 class MergeMetadataInvocation(BaseInvocation):
     """Merged a collection of MetadataDict into a single MetadataDict."""
 
@@ -157,6 +161,7 @@ GENERATION_MODES = Literal[
     category="metadata",
     version="2.0.0",
     classification=Classification.Internal,
+    cpu_safe=True,
 )
 class CoreMetadataInvocation(BaseInvocation):
     """Used internally by Invoke to collect metadata for generations."""
@@ -22,6 +22,7 @@ class StringPosNegOutput(BaseInvocationOutput):
     tags=["string", "split", "negative"],
     category="string",
     version="1.0.1",
+    cpu_safe=True,
 )
 class StringSplitNegInvocation(BaseInvocation):
     """Splits string into two strings, inside [] goes into negative string everthing else goes into positive string. Each [ and ] character is replaced with a space"""
@@ -63,7 +64,9 @@ class String2Output(BaseInvocationOutput):
     string_2: str = OutputField(description="string 2")
 
 
-@invocation("string_split", title="String Split", tags=["string", "split"], category="string", version="1.0.1")
+@invocation(
+    "string_split", title="String Split", tags=["string", "split"], category="string", version="1.0.1", cpu_safe=True
+)
 class StringSplitInvocation(BaseInvocation):
     """Splits string into two strings, based on the first occurance of the delimiter. The delimiter will be removed from the string"""
 
@@ -83,7 +86,9 @@ class StringSplitInvocation(BaseInvocation):
         return String2Output(string_1=part1, string_2=part2)
 
 
-@invocation("string_join", title="String Join", tags=["string", "join"], category="string", version="1.0.1")
+@invocation(
+    "string_join", title="String Join", tags=["string", "join"], category="string", version="1.0.1", cpu_safe=True
+)
 class StringJoinInvocation(BaseInvocation):
     """Joins string left to string right"""
 
@@ -94,7 +99,14 @@ class StringJoinInvocation(BaseInvocation):
         return StringOutput(value=((self.string_left or "") + (self.string_right or "")))
 
 
-@invocation("string_join_three", title="String Join Three", tags=["string", "join"], category="string", version="1.0.1")
+@invocation(
+    "string_join_three",
+    title="String Join Three",
+    tags=["string", "join"],
+    category="string",
+    version="1.0.1",
+    cpu_safe=True,
+)
 class StringJoinThreeInvocation(BaseInvocation):
     """Joins string left to string middle to string right"""
 
@@ -107,7 +119,12 @@ class StringJoinThreeInvocation(BaseInvocation):
 
 
 @invocation(
-    "string_replace", title="String Replace", tags=["string", "replace", "regex"], category="string", version="1.0.1"
+    "string_replace",
+    title="String Replace",
+    tags=["string", "replace", "regex"],
+    category="string",
+    version="1.0.1",
+    cpu_safe=True,
 )
 class StringReplaceInvocation(BaseInvocation):
     """Replaces the search string with the replace string"""
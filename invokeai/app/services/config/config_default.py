@@ -32,6 +32,8 @@ ATTENTION_TYPE = Literal["auto", "normal", "xformers", "sliced", "torch-sdp"]
 ATTENTION_SLICE_SIZE = Literal["auto", "balanced", "max", 1, 2, 3, 4, 5, 6, 7, 8]
 LOG_FORMAT = Literal["plain", "color", "syslog", "legacy"]
 LOG_LEVEL = Literal["debug", "info", "warning", "error", "critical"]
+CACHE_EVICTION_POLICY = Literal["lru", "smallest_first", "cost_aware"]
+OBJECT_SERIALIZER = Literal["pickle", "safetensors"]
 CONFIG_SCHEMA_VERSION = "4.0.2"
 
 
@@ -92,6 +94,8 @@ class InvokeAIAppConfig(BaseSettings):
         outputs_dir: Path to directory for outputs.
         custom_nodes_dir: Path to directory for custom nodes.
         style_presets_dir: Path to directory for style presets.
+        converted_cache_dir: Path to the directory of the converted model state dicts cache.
+        shared_model_cache_dir: Path to the directory of the model weights shared by processes, when `shared_model_cache` is enabled. Use a directory on a RAM-backed filesystem, such as `/dev/shm`, to keep the weights in RAM rather than reading them back from disk when the OS drops them from its page cache.
         log_handlers: Log handler. Valid options are "console", "file=<path>", "syslog=path|address:host:port", "http=<url>".
         log_format: Log format. Use "plain" for text-only, "color" for colorized output, "legacy" for 2.3-style logging and "syslog" for syslog-style.<br>Valid values: `plain`, `color`, `syslog`, `legacy`
         log_level: Emit logging messages at this level or higher.<br>Valid values: `debug`, `info`, `warning`, `error`, `critical`
@@ -104,19 +108,37 @@ class InvokeAIAppConfig(BaseSettings):
         ram: Maximum memory amount used by memory model cache for rapid switching (GB).
         vram: Amount of VRAM reserved for model storage (GB).
         lazy_offload: Keep models in VRAM until their space is needed.
+        partial_load_vram: Maximum amount of VRAM used by the weights of the models in use (GB). Models that do not fit are partially loaded: as many of their layers as fit are kept in VRAM, and the remaining layers are copied to VRAM for each forward pass, which is slower. Set to 0 to always load models fully.
+        pin_memory: Keep the weights of cached models in pinned (page-locked) RAM, and copy them to VRAM with non-blocking copies, batching their small tensors. Speeds up switching between models on CUDA devices, but pinned memory cannot be swapped out by the OS.
         log_memory_usage: If True, a memory snapshot will be captured before and after every model cache operation, and the result will be logged (at debug level). There is a time cost to capturing the memory snapshots, so it is recommended to only enable this feature if you are actively inspecting the model cache's behaviour.
+        cache_eviction_policy: Policy choosing the models evicted from the model cache when it is full. `lru` evicts the least recently used models, `smallest_first` the smallest models, and `cost_aware` the models with the lowest reload cost (their measured load time) times access frequency.<br>Valid values: `lru`, `smallest_first`, `cost_aware`
+        converted_cache_size: Maximum size of the on-disk cache of converted model state dicts (GB). Some models, such as FLUX checkpoints, InstantX ControlNets and SDXL LoRAs, have their weights converted each time they are loaded. Their converted state dicts are saved to `converted_cache_dir`, and memory-mapped from there on later loads. The least recently used state dicts are deleted when the cache is full. Set to 0 to disable the cache.
+        shared_model_cache: Share the weights of cached models with the other InvokeAI processes on this host that use the same `shared_model_cache_dir`, instead of holding a copy in each process. The first process to load a model writes its weights to the directory, and all processes memory-map them from there. Shared weights are not counted against `ram`.
+        mmap_safetensors: Memory-map safetensors files when loading FLUX, LoRA and other single-file models, instead of reading them into RAM. Their weights are read from disk as they are first used and are kept in the OS page cache, so they are not counted against `ram`, and evicting them from the model cache is free.
+        prefetch_ram: Maximum memory amount used to load the models of upcoming queue items into the model cache in the background (GB). Models are only prefetched into free space of the cache, so no cached models are evicted. Set to 0 to disable prefetching.
+        prefetch_queue_items: How many of the next pending queue items to prefetch models for.
         device: Preferred execution device. `auto` will choose the device depending on the hardware platform and the installed torch capabilities.<br>Valid values: `auto`, `cpu`, `cuda`, `cuda:1`, `mps`
+        worker_devices: Devices to process the session queue on, one session worker per entry, e.g. `["cuda:0", "cuda:1"]` or `["cpu", "cpu"]`. Each worker runs its own session and has its own model cache. The `ram` and `prefetch_ram` are split evenly between the workers, and each worker has its own `vram`. Omit to process the queue with a single worker on `device`.
         precision: Floating point precision. `float16` will consume half the memory of `float32` but produce slightly lower-quality images. The `auto` setting will guess the proper precision based on your video card and operating system.<br>Valid values: `auto`, `float16`, `bfloat16`, `float32`
         sequential_guidance: Whether to calculate guidance in serial instead of in parallel, lowering memory requirements.
         attention_type: Attention type.<br>Valid values: `auto`, `normal`, `xformers`, `sliced`, `torch-sdp`
         attention_slice_size: Slice size, valid when attention_type=="sliced".<br>Valid values: `auto`, `balanced`, `max`, `1`, `2`, `3`, `4`, `5`, `6`, `7`, `8`
         force_tiled_decode: Whether to enable tiled VAE decode (reduces memory consumption with some performance penalty).
         pil_compress_level: The compress_level setting of PIL.Image.save(), used for PNG encoding. All settings are lossless. 0 = no compression, 1 = fastest with slightly larger filesize, 9 = slowest with smallest filesize. 1 is typically the best setting.
+        image_writer_threads: Number of background threads writing the images saved by nodes to disk. Nodes then return as soon as their image is in memory and its record is created, while the PNG encoding and the thumbnail are done in the background. A queue item completes once its images are written. Set to 0 to write images before nodes return.
+        image_cache_size: Maximum memory amount used to keep decoded images in memory (GB), including their conversions to the color modes requested by nodes. The least recently used images are dropped from memory when it is exceeded. Set to 0 to disable the cache.
         max_queue_size: Maximum number of items in the session queue.
         clear_queue_on_startup: Empties session queue on startup.
+        lazy_batch_expansion: Store the graph and workflow of each batch once, and create the sessions of its queue items when they are dequeued. Greatly reduces the database size and the time taken to enqueue large batches.
         allow_nodes: List of nodes to allow. Omit to allow all.
         deny_nodes: List of nodes to deny. Omit to deny none.
         node_cache_size: How many cached nodes to keep in memory.
+        node_cache_disk_size: Maximum size in MB of the persistent invocation cache. Cached node outputs that reference images are also stored in the database, so they can be reused after a restart. Set to 0 to only cache node outputs in memory.
+        max_concurrent_nodes: Maximum number of CPU-only nodes to run at the same time within a session. Values greater than 1 run independent nodes that do not use models (e.g. math, string and image processing nodes) concurrently. Nodes that use models always run one at a time.
+        object_serializer: How the tensors and conditionings passed between nodes are stored. `pickle` saves them with `torch.save`. `safetensors` saves their tensors as safetensors files and memory-maps them on load, which is faster and avoids unpickling.<br>Valid values: `pickle`, `safetensors`
+        tensor_cache_size: Maximum memory amount used to keep the tensors passed between nodes (e.g. latents) in memory (GB). The least recently used tensors are dropped from memory when it is exceeded.
+        conditioning_cache_size: Maximum memory amount used to keep the conditionings passed between nodes in memory (GB). The least recently used conditionings are dropped from memory when it is exceeded.
+        write_back_intermediates: Keep the tensors and conditionings passed between nodes in memory instead of writing each of them to disk. They are only written to disk when they exceed `tensor_cache_size` or `conditioning_cache_size`, and are freed when their session completes, unless a cached node output references them.
         hashing_algorithm: Model hashing algorthim for model installs. 'blake3_multi' is best for SSDs. 'blake3_single' is best for spinning disk HDDs. 'random' disables hashing, instead assigning a UUID to models. Useful when using a memory db to reduce model installation time, or if you don't care about storing stable hashes for models. Alternatively, any other hashlib algorithm is accepted, though these are not nearly as performant as blake3.<br>Valid values: `blake3_multi`, `blake3_single`, `random`, `md5`, `sha1`, `sha224`, `sha256`, `sha384`, `sha512`, `blake2b`, `blake2s`, `sha3_224`, `sha3_256`, `sha3_384`, `sha3_512`, `shake_128`, `shake_256`
         remote_api_tokens: List of regular expression and token pairs used when downloading models from URLs. The download URL is tested against the regex, and if it matches, the token is provided in as a Bearer token.
         scan_models_on_startup: Scan the models directory on startup, registering orphaned models. This is typically only used in conjunction with `use_memory_db` for testing purposes.
@@ -155,6 +177,8 @@ class InvokeAIAppConfig(BaseSettings):
     outputs_dir:                   Path = Field(default=Path("outputs"),    description="Path to directory for outputs.")
     custom_nodes_dir:              Path = Field(default=Path("nodes"),      description="Path to directory for custom nodes.")
     style_presets_dir:      Path = Field(default=Path("style_presets"),      description="Path to directory for style presets.")
+    converted_cache_dir:           Path = Field(default=Path("models/.converted_cache"), description="Path to the directory of the converted model state dicts cache.")
+    shared_model_cache_dir:        Path = Field(default=Path("models/.shared_cache"), description="Path to the directory of the model weights shared by processes, when `shared_model_cache` is enabled. Use a directory on a RAM-backed filesystem, such as `/dev/shm`, to keep the weights in RAM rather than reading them back from disk when the OS drops them from its page cache.")
 
     # LOGGING
     log_handlers:             list[str] = Field(default=["console"],        description='Log handler. Valid options are "console", "file=<path>", "syslog=path|address:host:port", "http=<url>".')
@@ -174,10 +198,19 @@ class InvokeAIAppConfig(BaseSettings):
     ram:                           float = Field(default_factory=get_default_ram_cache_size, gt=0, description="Maximum memory amount used by memory model cache for rapid switching (GB).")
     vram:                          float = Field(default=DEFAULT_VRAM_CACHE, ge=0, description="Amount of VRAM reserved for model storage (GB).")
     lazy_offload:                  bool = Field(default=True,               description="Keep models in VRAM until their space is needed.")
+    partial_load_vram:             float = Field(default=0, ge=0,           description="Maximum amount of VRAM used by the weights of the models in use (GB). Models that do not fit are partially loaded: as many of their layers as fit are kept in VRAM, and the remaining layers are copied to VRAM for each forward pass, which is slower. Set to 0 to always load models fully.")
+    pin_memory:                    bool = Field(default=False,              description="Keep the weights of cached models in pinned (page-locked) RAM, and copy them to VRAM with non-blocking copies, batching their small tensors. Speeds up switching between models on CUDA devices, but pinned memory cannot be swapped out by the OS.")
     log_memory_usage:              bool = Field(default=False,              description="If True, a memory snapshot will be captured before and after every model cache operation, and the result will be logged (at debug level). There is a time cost to capturing the memory snapshots, so it is recommended to only enable this feature if you are actively inspecting the model cache's behaviour.")
+    cache_eviction_policy: CACHE_EVICTION_POLICY = Field(default="lru", description="Policy choosing the models evicted from the model cache when it is full. `lru` evicts the least recently used models, `smallest_first` the smallest models, and `cost_aware` the models with the lowest reload cost (their measured load time) times access frequency.")
+    converted_cache_size:          float = Field(default=0, ge=0,           description="Maximum size of the on-disk cache of converted model state dicts (GB). Some models, such as FLUX checkpoints, InstantX ControlNets and SDXL LoRAs, have their weights converted each time they are loaded. Their converted state dicts are saved to `converted_cache_dir`, and memory-mapped from there on later loads. The least recently used state dicts are deleted when the cache is full. Set to 0 to disable the cache.")
+    shared_model_cache:            bool = Field(default=False,              description="Share the weights of cached models with the other InvokeAI processes on this host that use the same `shared_model_cache_dir`, instead of holding a copy in each process. The first process to load a model writes its weights to the directory, and all processes memory-map them from there. Shared weights are not counted against `ram`.")
+    mmap_safetensors:              bool = Field(default=False,              description="Memory-map safetensors files when loading FLUX, LoRA and other single-file models, instead of reading them into RAM. Their weights are read from disk as they are first used and are kept in the OS page cache, so they are not counted against `ram`, and evicting them from the model cache is free.")
+    prefetch_ram:                  float = Field(default=0, ge=0,           description="Maximum memory amount used to load the models of upcoming queue items into the model cache in the background (GB). Models are only prefetched into free space of the cache, so no cached models are evicted. Set to 0 to disable prefetching.")
+    prefetch_queue_items:           int = Field(default=2, ge=1,            description="How many of the next pending queue items to prefetch models for.")
 
     # DEVICE
     device:                      DEVICE = Field(default="auto",             description="Preferred execution device. `auto` will choose the device depending on the hardware platform and the installed torch capabilities.")
+    worker_devices: Optional[list[str]] = Field(default=None,               description='Devices to process the session queue on, one session worker per entry, e.g. `["cuda:0", "cuda:1"]` or `["cpu", "cpu"]`. Each worker runs its own session and has its own model cache. The `ram` and `prefetch_ram` are split evenly between the workers, and each worker has its own `vram`. Omit to process the queue with a single worker on `device`.')
     precision:                PRECISION = Field(default="auto",             description="Floating point precision. `float16` will consume half the memory of `float32` but produce slightly lower-quality images. The `auto` setting will guess the proper precision based on your video card and operating system.")
 
     # GENERATION
@@ -186,13 +219,22 @@ class InvokeAIAppConfig(BaseSettings):
     attention_slice_size: ATTENTION_SLICE_SIZE = Field(default="auto",      description='Slice size, valid when attention_type=="sliced".')
     force_tiled_decode:            bool = Field(default=False,              description="Whether to enable tiled VAE decode (reduces memory consumption with some performance penalty).")
     pil_compress_level:             int = Field(default=1,                  description="The compress_level setting of PIL.Image.save(), used for PNG encoding. All settings are lossless. 0 = no compression, 1 = fastest with slightly larger filesize, 9 = slowest with smallest filesize. 1 is typically the best setting.")
+    image_writer_threads:           int = Field(default=0, ge=0,            description="Number of background threads writing the images saved by nodes to disk. Nodes then return as soon as their image is in memory and its record is created, while the PNG encoding and the thumbnail are done in the background. A queue item completes once its images are written. Set to 0 to write images before nodes return.")
+    image_cache_size:             float = Field(default=0.25, ge=0,         description="Maximum memory amount used to keep decoded images in memory (GB), including their conversions to the color modes requested by nodes. The least recently used images are dropped from memory when it is exceeded. Set to 0 to disable the cache.")
     max_queue_size:                 int = Field(default=10000, gt=0,        description="Maximum number of items in the session queue.")
     clear_queue_on_startup:        bool = Field(default=False,              description="Empties session queue on startup.")
+    lazy_batch_expansion:          bool = Field(default=False,              description="Store the graph and workflow of each batch once, and create the sessions of its queue items when they are dequeued. Greatly reduces the database size and the time taken to enqueue large batches.")
 
     # NODES
     allow_nodes:    Optional[list[str]] = Field(default=None,               description="List of nodes to allow. Omit to allow all.")
     deny_nodes:     Optional[list[str]] = Field(default=None,               description="List of nodes to deny. Omit to deny none.")
     node_cache_size:                int = Field(default=512,                description="How many cached nodes to keep in memory.")
+    node_cache_disk_size:           int = Field(default=0, ge=0,            description="Maximum size in MB of the persistent invocation cache. Cached node outputs that reference images are also stored in the database, so they can be reused after a restart. Set to 0 to only cache node outputs in memory.")
+    max_concurrent_nodes:           int = Field(default=1, ge=1,            description="Maximum number of CPU-only nodes to run at the same time within a session. Values greater than 1 run independent nodes that do not use models (e.g. math, string and image processing nodes) concurrently. Nodes that use models always run one at a time.")
+    object_serializer: OBJECT_SERIALIZER = Field(default="pickle",       description="How the tensors and conditionings passed between nodes are stored. `pickle` saves them with `torch.save`. `safetensors` saves their tensors as safetensors files and memory-maps them on load, which is faster and avoids unpickling.")
+    tensor_cache_size:            float = Field(default=1.0, ge=0,          description="Maximum memory amount used to keep the tensors passed between nodes (e.g. latents) in memory (GB). The least recently used tensors are dropped from memory when it is exceeded.")
+    conditioning_cache_size:      float = Field(default=1.0, ge=0,          description="Maximum memory amount used to keep the conditionings passed between nodes in memory (GB). The least recently used conditionings are dropped from memory when it is exceeded.")
+    write_back_intermediates:      bool = Field(default=False,              description="Keep the tensors and conditionings passed between nodes in memory instead of writing each of them to disk. They are only written to disk when they exceed `tensor_cache_size` or `conditioning_cache_size`, and are freed when their session completes, unless a cached node output references them.")
 
     # MODEL INSTALL
     hashing_algorithm: HASHING_ALGORITHMS = Field(default="blake3_single",  description="Model hashing algorthim for model installs. 'blake3_multi' is best for SSDs. 'blake3_single' is best for spinning disk HDDs. 'random' disables hashing, instead assigning a UUID to models. Useful when using a memory db to reduce model installation time, or if you don't care about storing stable hashes for models. Alternatively, any other hashlib algorithm is accepted, though these are not nearly as performant as blake3.")
@@ -317,6 +359,16 @@ class InvokeAIAppConfig(BaseSettings):
         """Path to the downloaded models directory, resolved to an absolute path.."""
         return self._resolve(self.download_cache_dir)
 
+    @property
+    def converted_cache_path(self) -> Path:
+        """Path to the converted model state dicts cache directory, resolved to an absolute path.."""
+        return self._resolve(self.converted_cache_dir)
+
+    @property
+    def shared_model_cache_path(self) -> Path:
+        """Path to the shared model weights directory, resolved to an absolute path.."""
+        return self._resolve(self.shared_model_cache_dir)
+
     @property
     def custom_nodes_path(self) -> Path:
         """Path to the custom nodes directory, resolved to an absolute path.."""
@@ -5,6 +5,7 @@ from typing import TYPE_CHECKING, Optional
 
 from invokeai.app.services.events.events_common import (
     BatchEnqueuedEvent,
+    BatchEnqueueProgressEvent,
     BulkDownloadCompleteEvent,
     BulkDownloadErrorEvent,
     BulkDownloadStartedEvent,
@@ -37,6 +38,7 @@ if TYPE_CHECKING:
     from invokeai.app.services.model_install.model_install_common import ModelInstallJob
     from invokeai.app.services.session_processor.session_processor_common import ProgressImage
     from invokeai.app.services.session_queue.session_queue_common import (
+        Batch,
         BatchStatus,
         EnqueueBatchResult,
         SessionQueueItem,
@@ -99,6 +101,10 @@ class EventServiceBase:
         """Emitted when a batch is enqueued"""
         self.dispatch(BatchEnqueuedEvent.build(enqueue_result))
 
+    def emit_batch_enqueue_progress(self, queue_id: str, batch: "Batch", enqueued: int, total: int) -> None:
+        """Emitted after each chunk of a batch is enqueued"""
+        self.dispatch(BatchEnqueueProgressEvent.build(queue_id, batch, enqueued, total))
+
     def emit_queue_cleared(self, queue_id: str) -> None:
         """Emitted when a queue is cleared"""
         self.dispatch(QueueClearedEvent.build(queue_id))
@@ -7,6 +7,7 @@ from pydantic import BaseModel, ConfigDict, Field
 from invokeai.app.services.session_processor.session_processor_common import ProgressImage
 from invokeai.app.services.session_queue.session_queue_common import (
     QUEUE_ITEM_STATUS,
+    Batch,
     BatchStatus,
     EnqueueBatchResult,
     SessionQueueItem,
@@ -289,6 +290,22 @@ class BatchEnqueuedEvent(QueueEventBase):
         )
 
 
+@payload_schema.register
+class BatchEnqueueProgressEvent(QueueEventBase):
+    """Event model for batch_enqueue_progress"""
+
+    __event_name__ = "batch_enqueue_progress"
+
+    batch_id: str = Field(description="The ID of the batch")
+    enqueued: int = Field(description="The number of invocations enqueued so far")
+    total: int = Field(description="The number of invocations that will be enqueued")
+    origin: str | None = Field(default=None, description="The origin of the batch")
+
+    @classmethod
+    def build(cls, queue_id: str, batch: Batch, enqueued: int, total: int) -> "BatchEnqueueProgressEvent":
+        return cls(queue_id=queue_id, batch_id=batch.batch_id, origin=batch.origin, enqueued=enqueued, total=total)
+
+
 @payload_schema.register
 class QueueClearedEvent(QueueEventBase):
     """Event model for queue_cleared"""
@@ -4,13 +4,15 @@ from typing import Optional
 
 from PIL.Image import Image as PILImageType
 
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectCacheStats
+
 
 class ImageFileStorageBase(ABC):
     """Low-level service responsible for storing and retrieving image files."""
 
     @abstractmethod
-    def get(self, image_name: str) -> PILImageType:
-        """Retrieves an image as PIL Image."""
+    def get(self, image_name: str, mode: Optional[str] = None) -> PILImageType:
+        """Retrieves an image as PIL Image, converted to the given color mode if one is given."""
         pass
 
     @abstractmethod
@@ -52,3 +54,7 @@ class ImageFileStorageBase(ABC):
     def get_graph(self, image_name: str) -> Optional[str]:
         """Gets the graph of an image."""
         pass
+
+    def get_stats(self) -> Optional[ObjectCacheStats]:
+        """Gets the stats of the in-memory cache of the images, or None if images are not cached."""
+        return None
@@ -1,9 +1,11 @@
 # Copyright (c) 2022 Kyle Schouviller (https://github.com/kyle0654) and the InvokeAI Team
+from collections import OrderedDict
 from pathlib import Path
-from queue import Queue
-from typing import Optional, Union
+from threading import Lock
+from typing import Any, Optional, Union
 
-from PIL import Image, PngImagePlugin
+import numpy as np
+from PIL import Image, ImageMode, PngImagePlugin
 from PIL.Image import Image as PILImageType
 
 from invokeai.app.services.image_files.image_files_base import ImageFileStorageBase
@@ -13,16 +15,31 @@ from invokeai.app.services.image_files.image_files_common import (
     ImageFileSaveException,
 )
 from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectCacheStats
 from invokeai.app.util.thumbnails import get_thumbnail_name, make_thumbnail
 
+DEFAULT_MAX_CACHE_SIZE = 2**28  # 256MB
+
 
 class DiskImageFileStorage(ImageFileStorageBase):
-    """Stores images on disk"""
+    """
+    Stores images on disk.
+
+    The decoded images are kept in an in-memory LRU cache, along with their conversions to other color modes. Callers
+    share the decoded images, but get their own copy of the conversions, as when they converted the images themselves.
 
-    def __init__(self, output_folder: Union[str, Path]):
-        self.__cache: dict[Path, PILImageType] = {}
-        self.__cache_ids = Queue[Path]()
-        self.__max_cache_size = 10  # TODO: get this from config
+    :param output_folder: The folder where the images are stored
+    :param max_cache_size: The maximum total size in bytes of the pixels of the cached images. 0 disables the cache.
+    """
+
+    def __init__(self, output_folder: Union[str, Path], max_cache_size: int = DEFAULT_MAX_CACHE_SIZE):
+        # The cached images and their sizes, keyed by path and color mode (None for the mode of the file), least
+        # recently used first
+        self.__cache: OrderedDict[tuple[Path, Optional[str]], tuple[PILImageType, int]] = OrderedDict()
+        self.__max_cache_size = max_cache_size
+        self.__cache_stats = ObjectCacheStats(max_cache_size=max_cache_size)
+        # Invocations may read images from several threads at once
+        self.__cache_lock = Lock()
 
         self.__output_folder = output_folder if isinstance(output_folder, Path) else Path(output_folder)
         self.__thumbnails_folder = self.__output_folder / "thumbnails"
@@ -32,17 +49,34 @@ class DiskImageFileStorage(ImageFileStorageBase):
     def start(self, invoker: Invoker) -> None:
         self.__invoker = invoker
 
-    def get(self, image_name: str) -> PILImageType:
+    def get(self, image_name: str, mode: Optional[str] = None) -> PILImageType:
         try:
             image_path = self.get_path(image_name)
 
-            cache_item = self.__get_cache(image_path)
-            if cache_item:
-                return cache_item
-
-            image = Image.open(image_path)
-            self.__set_cache(image_path, image)
-            return image
+            cache_item = self.__get_cache(image_path, mode)
+            if cache_item is not None:
+                self.__record_cache_access(hit=True)
+                return cache_item if mode is None else cache_item.copy()
+
+            # The conversion is made from the decoded image, if it is cached
+            image = self.__get_cache(image_path, None) if mode is not None else None
+            if image is not None and image.mode == mode:
+                self.__record_cache_access(hit=True)
+                return image
+            self.__record_cache_access(hit=False)
+
+            if image is None:
+                image = Image.open(image_path)
+                # Cached images are shared between threads. Lazily-loaded images read from their file on first access,
+                # which is not thread-safe, so the image is loaded before it is cached.
+                image.load()
+                self.__set_cache(image_path, None, image)
+            if mode is None or mode == image.mode:
+                return image
+
+            converted_image = image.convert(mode)
+            self.__set_cache(image_path, mode, converted_image)
+            return converted_image.copy()
         except FileNotFoundError as e:
             raise ImageFileNotFoundException from e
 
@@ -86,8 +120,11 @@ class DiskImageFileStorage(ImageFileStorageBase):
             thumbnail_image = make_thumbnail(image, thumbnail_size)
             thumbnail_image.save(thumbnail_path)
 
-            self.__set_cache(image_path, image)
-            self.__set_cache(thumbnail_path, thumbnail_image)
+            # The conversions of a previous image with the same name are stale
+            self.__remove_from_cache(image_path)
+            self.__remove_from_cache(thumbnail_path)
+            self.__set_cache(image_path, None, image)
+            self.__set_cache(thumbnail_path, None, thumbnail_image)
         except Exception as e:
             raise ImageFileSaveException from e
 
@@ -97,16 +134,14 @@ class DiskImageFileStorage(ImageFileStorageBase):
 
             if image_path.exists():
                 image_path.unlink()
-            if image_path in self.__cache:
-                del self.__cache[image_path]
+            self.__remove_from_cache(image_path)
 
             thumbnail_name = get_thumbnail_name(image_name)
             thumbnail_path = self.get_path(thumbnail_name, True)
 
             if thumbnail_path.exists():
                 thumbnail_path.unlink()
-            if thumbnail_path in self.__cache:
-                del self.__cache[thumbnail_path]
+            self.__remove_from_cache(thumbnail_path)
         except Exception as e:
             raise ImageFileDeleteException from e
 
@@ -137,33 +172,74 @@ class DiskImageFileStorage(ImageFileStorageBase):
         return path.exists()
 
     def get_workflow(self, image_name: str) -> str | None:
-        image = self.get(image_name)
-        workflow = image.info.get("invokeai_workflow", None)
+        workflow = self.__get_info(image_name).get("invokeai_workflow", None)
         if isinstance(workflow, str):
             return workflow
         return None
 
     def get_graph(self, image_name: str) -> str | None:
-        image = self.get(image_name)
-        graph = image.info.get("invokeai_graph", None)
+        graph = self.__get_info(image_name).get("invokeai_graph", None)
         if isinstance(graph, str):
             return graph
         return None
 
+    def __get_info(self, image_name: str) -> dict[str, Any]:
+        """Returns the info of the image, read from its text chunks. The pixels are not decoded, nor cached."""
+        try:
+            with Image.open(self.get_path(image_name)) as image:
+                return image.info
+        except FileNotFoundError as e:
+            raise ImageFileNotFoundException from e
+
     def __validate_storage_folders(self) -> None:
         """Checks if the required output folders exist and create them if they don't"""
         folders: list[Path] = [self.__output_folder, self.__thumbnails_folder]
         for folder in folders:
             folder.mkdir(parents=True, exist_ok=True)
 
-    def __get_cache(self, image_name: Path) -> Optional[PILImageType]:
-        return None if image_name not in self.__cache else self.__cache[image_name]
-
-    def __set_cache(self, image_name: Path, image: PILImageType):
-        if image_name not in self.__cache:
-            self.__cache[image_name] = image
-            self.__cache_ids.put(image_name)  # TODO: this should refresh position for LRU cache
-            if len(self.__cache) > self.__max_cache_size:
-                cache_id = self.__cache_ids.get()
-                if cache_id in self.__cache:
-                    del self.__cache[cache_id]
+    def get_stats(self) -> ObjectCacheStats:
+        with self.__cache_lock:
+            return self.__cache_stats.copy()
+
+    def __get_cache(self, image_path: Path, mode: Optional[str]) -> Optional[PILImageType]:
+        with self.__cache_lock:
+            cache_item = self.__cache.get((image_path, mode))
+            if cache_item is None:
+                return None
+            self.__cache.move_to_end((image_path, mode))
+            return cache_item[0]
+
+    def __record_cache_access(self, hit: bool) -> None:
+        with self.__cache_lock:
+            if hit:
+                self.__cache_stats.hits += 1
+            else:
+                self.__cache_stats.misses += 1
+
+    def __set_cache(self, image_path: Path, mode: Optional[str], image: PILImageType) -> None:
+        size = _calc_image_size(image)
+        if size > self.__max_cache_size:
+            return
+        with self.__cache_lock:
+            previous_item = self.__cache.pop((image_path, mode), None)
+            if previous_item is not None:
+                self.__cache_stats.cache_size -= previous_item[1]
+            self.__cache[(image_path, mode)] = (image, size)
+            self.__cache_stats.cache_size += size
+            while self.__cache_stats.cache_size > self.__max_cache_size:
+                _, (_, evicted_size) = self.__cache.popitem(last=False)
+                self.__cache_stats.cache_size -= evicted_size
+                self.__cache_stats.evictions += 1
+            self.__cache_stats.high_watermark = max(self.__cache_stats.high_watermark, self.__cache_stats.cache_size)
+
+    def __remove_from_cache(self, image_path: Path) -> None:
+        """Removes the image and its conversions to other modes from the cache."""
+        with self.__cache_lock:
+            for key in [key for key in self.__cache if key[0] == image_path]:
+                self.__cache_stats.cache_size -= self.__cache.pop(key)[1]
+
+
+def _calc_image_size(image: PILImageType) -> int:
+    """Returns the size in bytes of the pixels of the image."""
+    mode = ImageMode.getmode(image.mode)
+    return image.width * image.height * len(mode.bands) * np.dtype(mode.typestr).itemsize
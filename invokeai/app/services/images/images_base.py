@@ -10,7 +10,7 @@ from invokeai.app.services.image_records.image_records_common import (
     ImageRecordChanges,
     ResourceOrigin,
 )
-from invokeai.app.services.images.images_common import ImageDTO
+from invokeai.app.services.images.images_common import ImageDTO, ImageWriteError
 from invokeai.app.services.shared.pagination import OffsetPaginatedResults
 from invokeai.app.services.shared.sqlite.sqlite_common import SQLiteDirection
 
@@ -20,10 +20,12 @@ class ImageServiceABC(ABC):
 
     _on_changed_callbacks: list[Callable[[ImageDTO], None]]
     _on_deleted_callbacks: list[Callable[[str], None]]
+    _on_deleted_many_callbacks: list[Callable[[list[str]], None]]
 
     def __init__(self) -> None:
         self._on_changed_callbacks = []
         self._on_deleted_callbacks = []
+        self._on_deleted_many_callbacks = []
 
     def on_changed(self, on_changed: Callable[[ImageDTO], None]) -> None:
         """Register a callback for when an image is changed"""
@@ -33,13 +35,23 @@ class ImageServiceABC(ABC):
         """Register a callback for when an image is deleted"""
         self._on_deleted_callbacks.append(on_deleted)
 
+    def on_deleted_many(self, on_deleted_many: Callable[[list[str]], None]) -> None:
+        """Register a callback for when images are deleted. Images deleted together are passed in a single call."""
+        self._on_deleted_many_callbacks.append(on_deleted_many)
+
     def _on_changed(self, item: ImageDTO) -> None:
         for callback in self._on_changed_callbacks:
             callback(item)
 
     def _on_deleted(self, item_id: str) -> None:
+        self._on_deleted_many([item_id])
+
+    def _on_deleted_many(self, item_ids: list[str]) -> None:
         for callback in self._on_deleted_callbacks:
-            callback(item_id)
+            for item_id in item_ids:
+                callback(item_id)
+        for many_callback in self._on_deleted_many_callbacks:
+            many_callback(item_ids)
 
     @abstractmethod
     def create(
@@ -68,8 +80,8 @@ class ImageServiceABC(ABC):
         pass
 
     @abstractmethod
-    def get_pil_image(self, image_name: str) -> PILImageType:
-        """Gets an image as a PIL image."""
+    def get_pil_image(self, image_name: str, mode: Optional[str] = None) -> PILImageType:
+        """Gets an image as a PIL image, converted to the given color mode if one is given."""
         pass
 
     @abstractmethod
@@ -147,3 +159,8 @@ class ImageServiceABC(ABC):
     def delete_images_on_board(self, board_id: str):
         """Deletes all images on a board."""
         pass
+
+    @abstractmethod
+    def wait_for_writes(self, session_id: str) -> list[ImageWriteError]:
+        """Waits until the images of a session are written to disk, returning the images that could not be written."""
+        pass
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Optional
 
 from pydantic import Field
@@ -39,3 +40,12 @@ def image_record_to_dto(
         thumbnail_url=thumbnail_url,
         board_id=board_id,
     )
+
+
+@dataclass
+class ImageWriteError:
+    """An image file that could not be written to disk in the background."""
+
+    image_name: str
+    node_id: Optional[str]
+    error: Exception
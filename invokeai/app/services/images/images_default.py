@@ -1,3 +1,6 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from typing import Optional
 
 from PIL.Image import Image as PILImageType
@@ -20,18 +23,54 @@ from invokeai.app.services.image_records.image_records_common import (
     ResourceOrigin,
 )
 from invokeai.app.services.images.images_base import ImageServiceABC
-from invokeai.app.services.images.images_common import ImageDTO, image_record_to_dto
+from invokeai.app.services.images.images_common import ImageDTO, ImageWriteError, image_record_to_dto
 from invokeai.app.services.invoker import Invoker
 from invokeai.app.services.shared.pagination import OffsetPaginatedResults
 from invokeai.app.services.shared.sqlite.sqlite_common import SQLiteDirection
 
 
+@dataclass
+class _PendingWrite:
+    """An image file being written to disk in the background."""
+
+    image_name: str
+    image: PILImageType
+    session_id: Optional[str]
+    node_id: Optional[str]
+    future: Optional[Future[None]] = None
+
+
 class ImageService(ImageServiceABC):
+    """
+    Image service.
+
+    :param writer_threads: Number of background threads writing image files. With 0, image files are written by
+        `create()`. Otherwise `create()` returns once the image record is created, and the image file is written in the
+        background. Until then, `get_pil_image()` returns the image from memory, and the methods that read the file wait
+        for it to be written.
+    """
+
     __invoker: Invoker
 
+    def __init__(self, writer_threads: int = 0) -> None:
+        super().__init__()
+        self._writer = (
+            ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix="image_writer")
+            if writer_threads > 0
+            else None
+        )
+        self._pending_writes: dict[str, _PendingWrite] = {}
+        # Maps session ids to the images of the session that could not be written
+        self._write_errors: dict[str, list[ImageWriteError]] = {}
+        self._writes_lock = threading.Lock()
+
     def start(self, invoker: Invoker) -> None:
         self.__invoker = invoker
 
+    def stop(self, invoker: Invoker) -> None:
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+
     def create(
         self,
         image: PILImageType,
@@ -79,8 +118,14 @@ class ImageService(ImageServiceABC):
                     )
                 except Exception as e:
                     self.__invoker.services.logger.warn(f"Failed to add image to board {board_id}: {str(e)}")
-            self.__invoker.services.image_files.save(
-                image_name=image_name, image=image, metadata=metadata, workflow=workflow, graph=graph
+            self._save_file(
+                image_name=image_name,
+                image=image,
+                metadata=metadata,
+                workflow=workflow,
+                graph=graph,
+                session_id=session_id,
+                node_id=node_id,
             )
             image_dto = self.get_dto(image_name)
 
@@ -113,9 +158,16 @@ class ImageService(ImageServiceABC):
             self.__invoker.services.logger.error("Problem updating image record")
             raise e
 
-    def get_pil_image(self, image_name: str) -> PILImageType:
+    def get_pil_image(self, image_name: str, mode: Optional[str] = None) -> PILImageType:
+        with self._writes_lock:
+            pending_write = self._pending_writes.get(image_name)
+        if pending_write is not None:
+            # The writer may be encoding the pending image, so callers get their own copy of it
+            if mode is None or mode == pending_write.image.mode:
+                return pending_write.image.copy()
+            return pending_write.image.convert(mode)
         try:
-            return self.__invoker.services.image_files.get(image_name)
+            return self.__invoker.services.image_files.get(image_name, mode)
         except ImageFileNotFoundException:
             self.__invoker.services.logger.error("Failed to get image file")
             raise
@@ -163,6 +215,7 @@ class ImageService(ImageServiceABC):
             raise e
 
     def get_workflow(self, image_name: str) -> Optional[str]:
+        self._wait_for_write(image_name)
         try:
             return self.__invoker.services.image_files.get_workflow(image_name)
         except ImageFileNotFoundException:
@@ -173,6 +226,7 @@ class ImageService(ImageServiceABC):
             raise
 
     def get_graph(self, image_name: str) -> Optional[str]:
+        self._wait_for_write(image_name)
         try:
             return self.__invoker.services.image_files.get_graph(image_name)
         except ImageFileNotFoundException:
@@ -183,6 +237,7 @@ class ImageService(ImageServiceABC):
             raise
 
     def get_path(self, image_name: str, thumbnail: bool = False) -> str:
+        self._wait_for_write(image_name)
         try:
             return str(self.__invoker.services.image_files.get_path(image_name, thumbnail))
         except Exception as e:
@@ -249,6 +304,7 @@ class ImageService(ImageServiceABC):
             raise e
 
     def delete(self, image_name: str):
+        self._wait_for_write(image_name)
         try:
             self.__invoker.services.image_files.delete(image_name)
             self.__invoker.services.image_records.delete(image_name)
@@ -267,10 +323,10 @@ class ImageService(ImageServiceABC):
         try:
             image_names = self.__invoker.services.board_image_records.get_all_board_image_names_for_board(board_id)
             for image_name in image_names:
+                self._wait_for_write(image_name)
                 self.__invoker.services.image_files.delete(image_name)
             self.__invoker.services.image_records.delete_many(image_names)
-            for image_name in image_names:
-                self._on_deleted(image_name)
+            self._on_deleted_many(image_names)
         except ImageRecordDeleteException:
             self.__invoker.services.logger.error("Failed to delete image records")
             raise
@@ -286,8 +342,9 @@ class ImageService(ImageServiceABC):
             image_names = self.__invoker.services.image_records.delete_intermediates()
             count = len(image_names)
             for image_name in image_names:
+                self._wait_for_write(image_name)
                 self.__invoker.services.image_files.delete(image_name)
-                self._on_deleted(image_name)
+            self._on_deleted_many(image_names)
             return count
         except ImageRecordDeleteException:
             self.__invoker.services.logger.error("Failed to delete image records")
@@ -305,3 +362,67 @@ class ImageService(ImageServiceABC):
         except Exception as e:
             self.__invoker.services.logger.error("Problem getting intermediates count")
             raise e
+
+    def wait_for_writes(self, session_id: str) -> list[ImageWriteError]:
+        with self._writes_lock:
+            futures = [
+                pending_write.future
+                for pending_write in self._pending_writes.values()
+                if pending_write.session_id == session_id and pending_write.future is not None
+            ]
+        wait(futures)
+        with self._writes_lock:
+            return self._write_errors.pop(session_id, [])
+
+    def _save_file(
+        self,
+        image_name: str,
+        image: PILImageType,
+        metadata: Optional[str],
+        workflow: Optional[str],
+        graph: Optional[str],
+        session_id: Optional[str],
+        node_id: Optional[str],
+    ) -> None:
+        if self._writer is None:
+            self.__invoker.services.image_files.save(
+                image_name=image_name, image=image, metadata=metadata, workflow=workflow, graph=graph
+            )
+            return
+        # The node may keep modifying its image after saving it
+        pending_write = _PendingWrite(image_name=image_name, image=image.copy(), session_id=session_id, node_id=node_id)
+        with self._writes_lock:
+            # The write removes itself from the pending writes once done, which it cannot do before it is added
+            self._pending_writes[image_name] = pending_write
+            pending_write.future = self._writer.submit(self._write_file, pending_write, metadata, workflow, graph)
+
+    def _write_file(
+        self, pending_write: _PendingWrite, metadata: Optional[str], workflow: Optional[str], graph: Optional[str]
+    ) -> None:
+        """Writes an image file in the background. Errors are recorded for `wait_for_writes()`."""
+        try:
+            self.__invoker.services.image_files.save(
+                image_name=pending_write.image_name,
+                image=pending_write.image,
+                metadata=metadata,
+                workflow=workflow,
+                graph=graph,
+            )
+        except Exception as e:
+            self.__invoker.services.logger.error(f"Failed to save image file {pending_write.image_name}: {str(e)}")
+            if pending_write.session_id is not None:
+                write_error = ImageWriteError(
+                    image_name=pending_write.image_name, node_id=pending_write.node_id, error=e
+                )
+                with self._writes_lock:
+                    self._write_errors.setdefault(pending_write.session_id, []).append(write_error)
+        finally:
+            with self._writes_lock:
+                self._pending_writes.pop(pending_write.image_name, None)
+
+    def _wait_for_write(self, image_name: str) -> None:
+        """Waits until the image file is written, if it is being written in the background."""
+        with self._writes_lock:
+            pending_write = self._pending_writes.get(image_name)
+        if pending_write is not None and pending_write.future is not None:
+            pending_write.future.result()
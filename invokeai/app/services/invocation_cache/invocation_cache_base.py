@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Union
+from typing import Callable, Iterable, Optional, Union
 
 from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
 from invokeai.app.services.invocation_cache.invocation_cache_common import InvocationCacheStatus
@@ -36,6 +36,22 @@ class InvocationCacheBase(ABC):
         """Deletes an invocation output from the cache"""
         pass
 
+    @abstractmethod
+    def delete_by_references(self, names: Iterable[str]) -> None:
+        """Deletes all invocation outputs that reference any of the given images, tensors or conditioning"""
+        pass
+
+    @abstractmethod
+    def is_referenced(self, name: str) -> bool:
+        """Checks if any cached invocation output references the given image, tensor or conditioning"""
+        pass
+
+    @abstractmethod
+    def on_references_released(self, callback: Callable[[list[str]], None]) -> None:
+        """Registers a callback for when cached outputs are evicted or deleted, called with the names of the images,
+        tensors and conditioning that no cached output references anymore"""
+        pass
+
     @abstractmethod
     def clear(self) -> None:
         """Clears the cache"""
@@ -43,7 +59,7 @@ class InvocationCacheBase(ABC):
 
     @staticmethod
     @abstractmethod
-    def create_key(invocation: BaseInvocation) -> int:
+    def create_key(invocation: BaseInvocation) -> Union[int, str]:
         """Gets the key for the invocation's cache item"""
         pass
 
@@ -1,5 +1,18 @@
+from typing import Any, Iterable
+
 from pydantic import BaseModel, Field
 
+# Fields of invocation outputs that hold the name of an image, tensor or conditioning. Cached outputs referencing an
+# object are deleted when the object is deleted.
+REFERENCE_FIELDS = (
+    "image_name",
+    "latents_name",
+    "mask_name",
+    "masked_latents_name",
+    "tensor_name",
+    "conditioning_name",
+)
+
 
 class InvocationCacheStatus(BaseModel):
     size: int = Field(description="The current size of the invocation cache")
@@ -7,3 +20,21 @@ class InvocationCacheStatus(BaseModel):
     misses: int = Field(description="The number of cache misses")
     enabled: bool = Field(description="Whether the invocation cache is enabled")
     max_size: int = Field(description="The maximum size of the invocation cache")
+
+
+def get_references(data: Any, fields: Iterable[str] = REFERENCE_FIELDS) -> set[str]:
+    """Gets the names of the objects referenced by the given fields, anywhere in a dumped invocation output."""
+    fields = set(fields)
+    references: set[str] = set()
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if key in fields and isinstance(value, str):
+                    references.add(value)
+                else:
+                    stack.append(value)
+        elif isinstance(item, list):
+            stack.extend(item)
+    return references
@@ -1,42 +1,47 @@
 from collections import OrderedDict
 from dataclasses import dataclass, field
 from threading import Lock
-from typing import Optional, Union
+from typing import Callable, Iterable, Optional, Union
 
 from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
 from invokeai.app.services.invocation_cache.invocation_cache_base import InvocationCacheBase
-from invokeai.app.services.invocation_cache.invocation_cache_common import InvocationCacheStatus
+from invokeai.app.services.invocation_cache.invocation_cache_common import InvocationCacheStatus, get_references
 from invokeai.app.services.invoker import Invoker
 
 
 @dataclass(order=True)
 class CachedItem:
     invocation_output: BaseInvocationOutput = field(compare=False)
-    invocation_output_json: str = field(compare=False)
+    references: frozenset[str] = field(compare=False)
 
 
 class MemoryInvocationCache(InvocationCacheBase):
     _cache: OrderedDict[Union[int, str], CachedItem]
+    # Maps the names of referenced images, tensors and conditioning to the keys of the outputs that reference them
+    _references: dict[str, set[Union[int, str]]]
     _max_cache_size: int
     _disabled: bool
     _hits: int
     _misses: int
     _invoker: Invoker
     _lock: Lock
+    _on_references_released_callbacks: list[Callable[[list[str]], None]]
 
     def __init__(self, max_cache_size: int = 0) -> None:
         self._cache = OrderedDict()
+        self._references = {}
         self._max_cache_size = max_cache_size
         self._disabled = False
         self._hits = 0
         self._misses = 0
         self._lock = Lock()
+        self._on_references_released_callbacks = []
 
     def start(self, invoker: Invoker) -> None:
         self._invoker = invoker
         if self._max_cache_size == 0:
             return
-        self._invoker.services.images.on_deleted(self._delete_by_match)
+        self._invoker.services.images.on_deleted_many(self.delete_by_references)
         self._invoker.services.tensors.on_deleted(self._delete_by_match)
         self._invoker.services.conditioning.on_deleted(self._delete_by_match)
 
@@ -58,34 +63,68 @@ class MemoryInvocationCache(InvocationCacheBase):
                 return
             # If the cache is full, we need to remove the least used
             number_to_delete = len(self._cache) + 1 - self._max_cache_size
-            self._delete_oldest_access(number_to_delete)
-            self._cache[key] = CachedItem(
-                invocation_output,
-                invocation_output.model_dump_json(warnings=False, exclude_defaults=True, exclude_unset=True),
-            )
-
-    def _delete_oldest_access(self, number_to_delete: int) -> None:
+            released = self._delete_oldest_access(number_to_delete)
+            references = frozenset(get_references(invocation_output.model_dump(warnings=False)))
+            self._cache[key] = CachedItem(invocation_output, references)
+            for name in references:
+                self._references.setdefault(name, set()).add(key)
+            released = [name for name in released if name not in self._references]
+        self._on_references_released(released)
+
+    def _delete_oldest_access(self, number_to_delete: int) -> list[str]:
         number_to_delete = min(number_to_delete, len(self._cache))
+        released: list[str] = []
         for _ in range(number_to_delete):
-            self._cache.popitem(last=False)
+            key, cached_item = self._cache.popitem(last=False)
+            released.extend(self._delete_references(key, cached_item))
+        return released
 
-    def _delete(self, key: Union[int, str]) -> None:
+    def _delete(self, key: Union[int, str]) -> list[str]:
         if self._max_cache_size == 0:
-            return
-        if key in self._cache:
-            del self._cache[key]
+            return []
+        cached_item = self._cache.pop(key, None)
+        if cached_item is None:
+            return []
+        return self._delete_references(key, cached_item)
+
+    def _delete_references(self, key: Union[int, str], cached_item: CachedItem) -> list[str]:
+        """Deletes the references of the cached item, returning the names no cached output references anymore."""
+        released: list[str] = []
+        for name in cached_item.references:
+            keys = self._references.get(name)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._references[name]
+                released.append(name)
+        return released
 
     def delete(self, key: Union[int, str]) -> None:
         with self._lock:
-            return self._delete(key)
+            released = self._delete(key)
+        self._on_references_released(released)
 
     def clear(self) -> None:
         with self._lock:
             if self._max_cache_size == 0:
                 return
+            released = list(self._references)
             self._cache.clear()
+            self._references.clear()
             self._misses = 0
             self._hits = 0
+        self._on_references_released(released)
+
+    def on_references_released(self, callback: Callable[[list[str]], None]) -> None:
+        self._on_references_released_callbacks.append(callback)
+
+    def _on_references_released(self, names: list[str]) -> None:
+        """Calls the callbacks with the released names. Must not hold the lock, since callbacks may use the cache."""
+        if not names:
+            return
+        for callback in self._on_references_released_callbacks:
+            callback(names)
 
     @staticmethod
     def create_key(invocation: BaseInvocation) -> int:
@@ -113,18 +152,24 @@ class MemoryInvocationCache(InvocationCacheBase):
                 max_size=self._max_cache_size,
             )
 
-    def _delete_by_match(self, to_match: str) -> None:
+    def delete_by_references(self, names: Iterable[str]) -> None:
         with self._lock:
             if self._max_cache_size == 0:
                 return
-            keys_to_delete = set()
-            for key, cached_item in self._cache.items():
-                if to_match in cached_item.invocation_output_json:
-                    keys_to_delete.add(key)
+            keys_to_delete: set[Union[int, str]] = set()
+            for name in names:
+                keys_to_delete.update(self._references.get(name, ()))
             if not keys_to_delete:
                 return
+            released: list[str] = []
             for key in keys_to_delete:
-                self._delete(key)
-            self._invoker.services.logger.debug(
-                f"Deleted {len(keys_to_delete)} cached invocation outputs for {to_match}"
-            )
+                released.extend(self._delete(key))
+            self._invoker.services.logger.debug(f"Deleted {len(keys_to_delete)} cached invocation outputs")
+        self._on_references_released(released)
+
+    def is_referenced(self, name: str) -> bool:
+        with self._lock:
+            return name in self._references
+
+    def _delete_by_match(self, to_match: str) -> None:
+        self.delete_by_references([to_match])
@@ -0,0 +1,221 @@
+import json
+import sqlite3
+import threading
+from itertools import islice
+from typing import Iterable, Optional, Union, cast
+
+from blake3 import blake3
+
+from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
+from invokeai.app.services.invocation_cache.invocation_cache_common import get_references
+from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+
+# Fields of invocation outputs that reference tensors and conditioning. These are stored in ephemeral folders that are
+# deleted on shutdown, so outputs referencing them are only cached in memory.
+EPHEMERAL_REFERENCE_FIELDS = ("latents_name", "mask_name", "masked_latents_name", "tensor_name", "conditioning_name")
+
+# The number of names per query when deleting outputs by their references, below SQLite's limit of bound parameters
+DELETE_BY_REFERENCES_CHUNK_SIZE = 500
+
+
+class SqliteInvocationCache(MemoryInvocationCache):
+    """
+    A two-tier invocation cache. Recently used outputs are kept in memory, and all outputs are also stored in the
+    database, up to `max_disk_size` bytes, so they can be reused after a restart.
+
+    Keys are stable digests of the invocation's type, version and inputs.
+    """
+
+    _max_disk_size: int
+    _disk_size: int
+    _db_lock: threading.RLock
+    _conn: sqlite3.Connection
+
+    def __init__(self, db: SqliteDatabase, max_cache_size: int = 0, max_disk_size: int = 0) -> None:
+        super().__init__(max_cache_size=max_cache_size)
+        self._max_disk_size = max_disk_size
+        self._disk_size = 0
+        self._db_lock = db.lock
+        self._conn = db.conn
+
+    def start(self, invoker: Invoker) -> None:
+        super().start(invoker)
+        if self._max_cache_size == 0 or self._max_disk_size == 0:
+            return
+        with self._db_lock:
+            self._disk_size = self._get_disk_size()
+        # The maximum size may have been lowered since the last run
+        self._evict_from_disk()
+
+    def get(self, key: Union[int, str]) -> Optional[BaseInvocationOutput]:
+        output = super().get(key)
+        if output is not None or self._max_disk_size == 0 or self._max_cache_size == 0 or self._disabled:
+            return output
+        with self._db_lock:
+            cursor = self._conn.cursor()
+            cursor.execute("SELECT output FROM invocation_cache WHERE key = ?;", (str(key),))
+            result = cast(Optional[sqlite3.Row], cursor.fetchone())
+            if result is not None:
+                cursor.execute(
+                    """--sql
+                    UPDATE invocation_cache
+                    SET accessed_at = STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')
+                    WHERE key = ?;
+                    """,
+                    (str(key),),
+                )
+                self._conn.commit()
+        if result is None:
+            return None
+        output = BaseInvocationOutput.get_typeadapter().validate_json(result[0])
+        with self._lock:
+            # The memory tier counted a miss, but the output was found on disk
+            self._misses -= 1
+            self._hits += 1
+        super().save(key, output)
+        return output
+
+    def save(self, key: Union[int, str], invocation_output: BaseInvocationOutput) -> None:
+        super().save(key, invocation_output)
+        if self._max_disk_size == 0 or self._max_cache_size == 0 or self._disabled:
+            return
+        output_dict = invocation_output.model_dump(warnings=False)
+        if get_references(output_dict, EPHEMERAL_REFERENCE_FIELDS):
+            return
+        references = get_references(output_dict)
+        output_json = invocation_output.model_dump_json(warnings=False)
+        size = len(output_json.encode("utf-8"))
+        with self._db_lock:
+            try:
+                cursor = self._conn.cursor()
+                cursor.execute(
+                    """--sql
+                    INSERT INTO invocation_cache (key, output, size)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO NOTHING;
+                    """,
+                    (str(key), output_json, size),
+                )
+                if cursor.rowcount > 0:
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO invocation_cache_references (name, key) VALUES (?, ?);",
+                        [(name, str(key)) for name in references],
+                    )
+                    self._disk_size += size
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        if self._disk_size > self._max_disk_size:
+            self._evict_from_disk()
+
+    def delete(self, key: Union[int, str]) -> None:
+        super().delete(key)
+        if self._max_cache_size == 0 or self._max_disk_size == 0:
+            return
+        with self._db_lock:
+            try:
+                cursor = self._conn.cursor()
+                # The size of the deleted output is subtracted, rather than summing the sizes of all outputs again
+                cursor.execute("SELECT size FROM invocation_cache WHERE key = ?;", (str(key),))
+                result = cursor.fetchone()
+                if result is None:
+                    return
+                cursor.execute("DELETE FROM invocation_cache WHERE key = ?;", (str(key),))
+                self._conn.commit()
+                self._disk_size -= result[0]
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def clear(self) -> None:
+        super().clear()
+        if self._max_cache_size == 0:
+            return
+        with self._db_lock:
+            self._conn.execute("DELETE FROM invocation_cache;")
+            self._conn.commit()
+            self._disk_size = 0
+
+    @staticmethod
+    def create_key(invocation: BaseInvocation) -> str:
+        # Python's `hash()` is randomized per process, so the key is a digest of the invocation's canonical JSON. The
+        # node's version is included so outputs are not reused across node updates.
+        invocation_json = json.dumps(
+            invocation.model_dump(mode="json", exclude={"id"}, warnings=False), sort_keys=True, separators=(",", ":")
+        )
+        digest = blake3(f"{invocation.get_type()}:{invocation.UIConfig.version}:{invocation_json}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def delete_by_references(self, names: Iterable[str]) -> None:
+        names = list(names)
+        super().delete_by_references(names)
+        if self._max_cache_size == 0 or self._max_disk_size == 0:
+            return
+        deleted = 0
+        with self._db_lock:
+            cursor = self._conn.cursor()
+            names_iter = iter(names)
+            # The references are deleted with their outputs by the foreign key
+            while chunk := list(islice(names_iter, DELETE_BY_REFERENCES_CHUNK_SIZE)):
+                cursor.execute(
+                    f"""--sql
+                    DELETE FROM invocation_cache
+                    WHERE key IN (
+                        SELECT key
+                        FROM invocation_cache_references
+                        WHERE name IN ({", ".join("?" * len(chunk))})
+                    );
+                    """,
+                    chunk,
+                )
+                deleted += cursor.rowcount
+            # Most sessions' intermediates are not referenced by any cached output, so there is usually nothing to commit.
+            # The transaction opened by the statements is then ended without writing to the database.
+            if deleted > 0:
+                self._conn.commit()
+                self._disk_size = self._get_disk_size()
+            else:
+                self._conn.rollback()
+
+    def is_referenced(self, name: str) -> bool:
+        if super().is_referenced(name):
+            return True
+        if self._max_cache_size == 0 or self._max_disk_size == 0:
+            return False
+        with self._db_lock:
+            cursor = self._conn.cursor()
+            cursor.execute("SELECT 1 FROM invocation_cache_references WHERE name = ? LIMIT 1;", (name,))
+            return cursor.fetchone() is not None
+
+    def _get_disk_size(self) -> int:
+        """Gets the total size of the outputs stored in the database. Must hold the database lock."""
+        cursor = self._conn.cursor()
+        cursor.execute("SELECT SUM(size) FROM invocation_cache;")
+        return cast(Optional[int], cursor.fetchone()[0]) or 0
+
+    def _evict_from_disk(self) -> None:
+        """Deletes the least recently used outputs from the database until it fits in the maximum size."""
+        with self._db_lock:
+            cursor = self._conn.cursor()
+            cursor.execute(
+                """--sql
+                DELETE FROM invocation_cache
+                WHERE key IN (
+                    SELECT key
+                    FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, rowid DESC) AS total_size
+                        FROM invocation_cache
+                    )
+                    WHERE total_size > ?
+                );
+                """,
+                (self._max_disk_size,),
+            )
+            deleted = cursor.rowcount
+            self._conn.commit()
+            self._disk_size = self._get_disk_size()
+        if deleted > 0:
+            self._invoker.services.logger.debug(f"Evicted {deleted} cached invocation outputs from the database")
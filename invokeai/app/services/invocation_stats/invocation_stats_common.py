@@ -1,5 +1,5 @@
 from collections import defaultdict
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 from typing import Any, Optional
 
 
@@ -23,11 +23,28 @@ class ModelCacheStatsSummary:
 
     high_water_mark_gb: float
     cache_size_gb: float
+    mapped_size_gb: float
     total_usage_gb: float
     cache_hits: int
     cache_misses: int
     models_cached: int
     models_cleared: int
+    transferred_gb: float
+    transfer_bandwidth_gb_per_s: float
+    # The models stored in and retrieved from the cache, in order. See `replay_cache_trace()`.
+    accesses: list[dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class ObjectCacheStatsSummary:
+    """The stats for the in-memory cache of the tensors or conditioning passed between nodes, or of the images."""
+
+    cache_hits: int
+    cache_misses: int
+    cache_evictions: int
+    cache_size_mb: float
+    high_water_mark_mb: float
+    max_cache_size_mb: float
 
 
 @dataclass
@@ -54,6 +71,10 @@ class InvocationStatsSummary:
     graph_stats: GraphExecutionStatsSummary
     model_cache_stats: ModelCacheStatsSummary
     node_stats: list[NodeExecutionStatsSummary]
+    # The stats of the tensors, conditioning and images caches, if they have an in-memory cache
+    tensor_cache_stats: Optional[ObjectCacheStatsSummary] = None
+    conditioning_cache_stats: Optional[ObjectCacheStatsSummary] = None
+    image_cache_stats: Optional[ObjectCacheStatsSummary] = None
 
     def __str__(self) -> str:
         _str = ""
@@ -80,6 +101,23 @@ class InvocationStatsSummary:
         _str += f"   Models cached: {self.model_cache_stats.models_cached}\n"
         _str += f"   Models cleared from cache: {self.model_cache_stats.models_cleared}\n"
         _str += f"   Cache high water mark: {self.model_cache_stats.high_water_mark_gb:4.2f}/{self.model_cache_stats.cache_size_gb:4.2f}G\n"
+        if self.model_cache_stats.mapped_size_gb > 0:
+            _str += f"   Memory-mapped model weights: {self.model_cache_stats.mapped_size_gb:4.2f}G\n"
+        if self.model_cache_stats.transferred_gb > 0:
+            _str += f"   Model weights copied to VRAM: {self.model_cache_stats.transferred_gb:4.2f}G at {self.model_cache_stats.transfer_bandwidth_gb_per_s:4.2f}G/s\n"
+
+        for name, object_cache_stats in [
+            ("Tensor", self.tensor_cache_stats),
+            ("Conditioning", self.conditioning_cache_stats),
+            ("Image", self.image_cache_stats),
+        ]:
+            if object_cache_stats is None:
+                continue
+            _str += f"{name} cache statistics:\n"
+            _str += f"   Cache hits: {object_cache_stats.cache_hits}\n"
+            _str += f"   Cache misses: {object_cache_stats.cache_misses}\n"
+            _str += f"   Cache evictions: {object_cache_stats.cache_evictions}\n"
+            _str += f"   Cache size: {object_cache_stats.cache_size_mb:4.1f}M (high water mark {object_cache_stats.high_water_mark_mb:4.1f}/{object_cache_stats.max_cache_size_mb:4.1f}M)\n"
 
         return _str
 
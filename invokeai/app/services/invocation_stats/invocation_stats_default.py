@@ -1,14 +1,17 @@
 import json
+import threading
 import time
 from contextlib import contextmanager
+from dataclasses import asdict
 from pathlib import Path
-from typing import Generator
+from typing import Generator, Optional, Union
 
 import psutil
 import torch
 
 import invokeai.backend.util.logging as logger
 from invokeai.app.invocations.baseinvocation import BaseInvocation
+from invokeai.app.services.image_files.image_files_base import ImageFileStorageBase
 from invokeai.app.services.invocation_stats.invocation_stats_base import InvocationStatsServiceBase
 from invokeai.app.services.invocation_stats.invocation_stats_common import (
     GESStatsNotFoundError,
@@ -18,12 +21,17 @@ from invokeai.app.services.invocation_stats.invocation_stats_common import (
     ModelCacheStatsSummary,
     NodeExecutionStats,
     NodeExecutionStatsSummary,
+    ObjectCacheStatsSummary,
 )
 from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.object_serializer.object_serializer_base import ObjectSerializerBase
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectCacheStats
 from invokeai.backend.model_manager.load.model_cache import CacheStats
 
 # Size of 1GB in bytes.
 GB = 2**30
+# Size of 1MB in bytes.
+MB = 2**20
 
 
 class InvocationStatsService(InvocationStatsServiceBase):
@@ -35,6 +43,11 @@ class InvocationStatsService(InvocationStatsServiceBase):
         self._stats: dict[str, GraphExecutionStats] = {}
         # Maps graph_execution_state_id to model manager CacheStats.
         self._cache_stats: dict[str, CacheStats] = {}
+        # Maps graph_execution_state_id to the stats of the tensors, conditioning and images caches when the graph started.
+        # The caches are shared by all graphs, so the stats of a graph are the difference with their current stats.
+        self._object_cache_stats: dict[str, dict[str, Optional[ObjectCacheStats]]] = {}
+        # The invocations of a session may run on several threads at once
+        self._lock = threading.RLock()
 
     def start(self, invoker: Invoker) -> None:
         self._invoker = invoker
@@ -44,10 +57,19 @@ class InvocationStatsService(InvocationStatsServiceBase):
         # This is to handle case of the model manager not being initialized, which happens
         # during some tests.
         services = self._invoker.services
-        if not self._stats.get(graph_execution_state_id):
-            # First time we're seeing this graph_execution_state_id.
-            self._stats[graph_execution_state_id] = GraphExecutionStats()
-            self._cache_stats[graph_execution_state_id] = CacheStats()
+        with self._lock:
+            if not self._stats.get(graph_execution_state_id):
+                # First time we're seeing this graph_execution_state_id.
+                self._stats[graph_execution_state_id] = GraphExecutionStats()
+                self._cache_stats[graph_execution_state_id] = CacheStats()
+                self._object_cache_stats[graph_execution_state_id] = {
+                    "tensors": self._get_object_cache_stats(services.tensors),
+                    "conditioning": self._get_object_cache_stats(services.conditioning),
+                    "images": self._get_object_cache_stats(services.image_files),
+                }
+
+            assert services.model_manager.load is not None
+            services.model_manager.load.ram_cache.stats = self._cache_stats[graph_execution_state_id]
 
         # Record state before the invocation.
         start_time = time.time()
@@ -55,9 +77,6 @@ class InvocationStatsService(InvocationStatsServiceBase):
         if torch.cuda.is_available():
             torch.cuda.reset_peak_memory_stats()
 
-        assert services.model_manager.load is not None
-        services.model_manager.load.ram_cache.stats = self._cache_stats[graph_execution_state_id]
-
         try:
             # Let the invocation run.
             yield None
@@ -71,23 +90,33 @@ class InvocationStatsService(InvocationStatsServiceBase):
                 end_ram_gb=psutil.Process().memory_info().rss / GB,
                 peak_vram_gb=torch.cuda.max_memory_allocated() / GB if torch.cuda.is_available() else 0.0,
             )
-            self._stats[graph_execution_state_id].add_node_execution_stats(node_stats)
+            with self._lock:
+                self._stats[graph_execution_state_id].add_node_execution_stats(node_stats)
 
     def reset_stats(self):
-        self._stats = {}
-        self._cache_stats = {}
+        with self._lock:
+            self._stats = {}
+            self._cache_stats = {}
+            self._object_cache_stats = {}
 
     def get_stats(self, graph_execution_state_id: str) -> InvocationStatsSummary:
-        graph_stats_summary = self._get_graph_summary(graph_execution_state_id)
-        node_stats_summaries = self._get_node_summaries(graph_execution_state_id)
-        model_cache_stats_summary = self._get_model_cache_summary(graph_execution_state_id)
+        with self._lock:
+            graph_stats_summary = self._get_graph_summary(graph_execution_state_id)
+            node_stats_summaries = self._get_node_summaries(graph_execution_state_id)
+            model_cache_stats_summary = self._get_model_cache_summary(graph_execution_state_id)
         vram_usage_gb = torch.cuda.memory_allocated() / GB if torch.cuda.is_available() else None
+        services = self._invoker.services
 
         return InvocationStatsSummary(
             graph_stats=graph_stats_summary,
             model_cache_stats=model_cache_stats_summary,
             node_stats=node_stats_summaries,
             vram_usage_gb=vram_usage_gb,
+            tensor_cache_stats=self._get_object_cache_summary(graph_execution_state_id, "tensors", services.tensors),
+            conditioning_cache_stats=self._get_object_cache_summary(
+                graph_execution_state_id, "conditioning", services.conditioning
+            ),
+            image_cache_stats=self._get_object_cache_summary(graph_execution_state_id, "images", services.image_files),
         )
 
     def log_stats(self, graph_execution_state_id: str) -> None:
@@ -112,9 +141,40 @@ class InvocationStatsService(InvocationStatsServiceBase):
             cache_misses=cache_stats.misses,
             high_water_mark_gb=cache_stats.high_watermark / GB,
             cache_size_gb=cache_stats.cache_size / GB,
+            mapped_size_gb=cache_stats.mapped_size / GB,
             total_usage_gb=sum(list(cache_stats.loaded_model_sizes.values())) / GB,
             models_cached=cache_stats.in_cache,
             models_cleared=cache_stats.cleared,
+            transferred_gb=cache_stats.transferred_size / GB,
+            transfer_bandwidth_gb_per_s=cache_stats.transfer_bandwidth / GB,
+            accesses=[asdict(access) for access in cache_stats.accesses],
+        )
+
+    @staticmethod
+    def _get_object_cache_stats(
+        storage: Optional[Union[ObjectSerializerBase, ImageFileStorageBase]],
+    ) -> Optional[ObjectCacheStats]:
+        # The storages are not initialized in some tests
+        return storage.get_stats() if storage is not None else None
+
+    def _get_object_cache_summary(
+        self,
+        graph_execution_state_id: str,
+        name: str,
+        storage: Optional[Union[ObjectSerializerBase, ImageFileStorageBase]],
+    ) -> Optional[ObjectCacheStatsSummary]:
+        start_stats = self._object_cache_stats.get(graph_execution_state_id, {}).get(name)
+        stats = self._get_object_cache_stats(storage)
+        if start_stats is None or stats is None:
+            return None
+
+        return ObjectCacheStatsSummary(
+            cache_hits=stats.hits - start_stats.hits,
+            cache_misses=stats.misses - start_stats.misses,
+            cache_evictions=stats.evictions - start_stats.evictions,
+            cache_size_mb=stats.cache_size / MB,
+            high_water_mark_mb=stats.high_watermark / MB,
+            max_cache_size_mb=stats.max_cache_size / MB,
         )
 
     def _get_graph_summary(self, graph_execution_state_id: str) -> GraphExecutionStatsSummary:
@@ -0,0 +1,49 @@
+import sqlite3
+from typing import Optional, cast
+
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+from invokeai.backend.model_hash.file_hash_cache import FileHashCache, FileHashKey
+
+
+class SqliteFileHashCache(FileHashCache):
+    """Caches the hashes of model files in the database, so that reinstalling or rescanning models only hashes the
+    files that changed."""
+
+    def __init__(self, db: SqliteDatabase) -> None:
+        self._db = db
+
+    def get_hash(self, key: FileHashKey, algorithm: str) -> Optional[str]:
+        with self._db.lock:
+            cursor = self._db.conn.cursor()
+            cursor.execute(
+                """--sql
+                SELECT hash FROM file_hashes
+                WHERE path = ? AND algorithm = ? AND size = ? AND mtime_ns = ? AND inode = ?;
+                """,
+                (key.path, algorithm, key.size, key.mtime_ns, key.inode),
+            )
+            result = cast(Optional[sqlite3.Row], cursor.fetchone())
+        return None if result is None else result[0]
+
+    def set_hash(self, key: FileHashKey, algorithm: str, hash_: str) -> None:
+        with self._db.lock:
+            try:
+                cursor = self._db.conn.cursor()
+                cursor.execute(
+                    """--sql
+                    INSERT INTO file_hashes (path, algorithm, size, mtime_ns, inode, hash)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (path, algorithm) DO UPDATE
+                    SET
+                        size = excluded.size,
+                        mtime_ns = excluded.mtime_ns,
+                        inode = excluded.inode,
+                        hash = excluded.hash,
+                        updated_at = STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW');
+                    """,
+                    (key.path, algorithm, key.size, key.mtime_ns, key.inode, hash_),
+                )
+                self._db.conn.commit()
+            except sqlite3.Error as e:
+                self._db.conn.rollback()
+                raise e
@@ -35,6 +35,7 @@ from invokeai.app.services.model_install.model_install_common import (
 )
 from invokeai.app.services.model_records import DuplicateModelException, ModelRecordServiceBase
 from invokeai.app.services.model_records.model_records_base import ModelRecordChanges
+from invokeai.backend.model_hash.file_hash_cache import FileHashCache
 from invokeai.backend.model_manager.config import (
     AnyModelConfig,
     CheckpointConfigBase,
@@ -70,6 +71,7 @@ class ModelInstallService(ModelInstallServiceBase):
         download_queue: DownloadQueueServiceBase,
         event_bus: Optional["EventServiceBase"] = None,
         session: Optional[Session] = None,
+        hash_cache: Optional[FileHashCache] = None,
     ):
         """
         Initialize the installer object.
@@ -77,8 +79,10 @@ class ModelInstallService(ModelInstallServiceBase):
         :param app_config: InvokeAIAppConfig object
         :param record_store: Previously-opened ModelRecordService database
         :param event_bus: Optional EventService object
+        :param hash_cache: Optional cache of the hashes of model files, so that unchanged files are not hashed again
         """
         self._app_config = app_config
+        self._hash_cache = hash_cache
         self._record_store = record_store
         self._event_bus = event_bus
         self._logger = InvokeAILogger.get_logger(name=self.__class__.__name__)
@@ -180,7 +184,10 @@ class ModelInstallService(ModelInstallServiceBase):
         model_path = Path(model_path)
         config = config or ModelRecordChanges()
         info: AnyModelConfig = ModelProbe.probe(
-            Path(model_path), config.model_dump(), hash_algo=self._app_config.hashing_algorithm
+            Path(model_path),
+            config.model_dump(),
+            hash_algo=self._app_config.hashing_algorithm,
+            hash_cache=self._hash_cache,
         )  # type: ignore
 
         if preferred_name := config.name:
@@ -645,7 +652,12 @@ class ModelInstallService(ModelInstallServiceBase):
     ) -> str:
         config = config or ModelRecordChanges()
 
-        info = info or ModelProbe.probe(model_path, config.model_dump(), hash_algo=self._app_config.hashing_algorithm)  # type: ignore
+        info = info or ModelProbe.probe(
+            model_path,
+            config.model_dump(),
+            hash_algo=self._app_config.hashing_algorithm,
+            hash_cache=self._hash_cache,
+        )  # type: ignore
 
         model_path = model_path.resolve()
 
@@ -22,6 +22,17 @@ class ModelLoadServiceBase(ABC):
         :param submodel: For main (pipeline models), the submodel to fetch.
         """
 
+    @abstractmethod
+    def prefetch_model(self, model_config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> bool:
+        """
+        Load a model into the free space of the RAM cache ahead of its use, without evicting other models.
+
+        :param model_config: Model configuration record (as returned by ModelRecordBase.get_model())
+        :param submodel: For main (pipeline models), the submodel to fetch.
+        :return: Whether the model was loaded into the cache. False if it is already cached or being loaded, or if it
+            does not fit in the free space of the cache.
+        """
+
     @property
     @abstractmethod
     def ram_cache(self) -> ModelCacheBase[AnyModel]:
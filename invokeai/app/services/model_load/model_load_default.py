@@ -1,6 +1,7 @@
 # Copyright (c) 2024 Lincoln D. Stein and the InvokeAI Team
 """Implementation of model loader service."""
 
+import time
 from pathlib import Path
 from typing import Callable, Optional, Type
 
@@ -11,6 +12,7 @@ from torch import load as torch_load
 from invokeai.app.services.config import InvokeAIAppConfig
 from invokeai.app.services.invoker import Invoker
 from invokeai.app.services.model_load.model_load_base import ModelLoadServiceBase
+from invokeai.app.services.model_records import UnknownModelException
 from invokeai.backend.model_manager import AnyModel, AnyModelConfig, SubModelType
 from invokeai.backend.model_manager.load import (
     LoadedModel,
@@ -18,7 +20,7 @@ from invokeai.backend.model_manager.load import (
     ModelLoaderRegistry,
     ModelLoaderRegistryBase,
 )
-from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelCacheBase
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelCacheBase, ModelLoadStats
 from invokeai.backend.model_manager.load.model_loaders.generic_diffusers import GenericDiffusersLoader
 from invokeai.backend.util.devices import TorchDevice
 from invokeai.backend.util.logging import InvokeAILogger
@@ -43,6 +45,17 @@ class ModelLoadService(ModelLoadServiceBase):
 
     def start(self, invoker: Invoker) -> None:
         self._invoker = invoker
+        # The measurements of the models are persisted, so that the cache does not rely on estimates after a restart
+        for stats in invoker.services.model_manager.store.get_model_load_stats():
+            self._ram_cache.set_load_stats(stats)
+        self._ram_cache.load_stats_listener = self._save_load_stats
+
+    def _save_load_stats(self, stats: ModelLoadStats) -> None:
+        try:
+            self._invoker.services.model_manager.store.set_model_load_stats(stats)
+        except UnknownModelException:
+            # Models loaded by path are not in the model records
+            pass
 
     @property
     def ram_cache(self) -> ModelCacheBase[AnyModel]:
@@ -74,6 +87,21 @@ class ModelLoadService(ModelLoadServiceBase):
 
         return loaded_model
 
+    def prefetch_model(self, model_config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> bool:
+        """
+        Load a model into the free space of the RAM cache ahead of its use, without evicting other models.
+
+        :param model_config: Model configuration record (as returned by ModelRecordBase.get_model())
+        :param submodel: For main (pipeline models), the submodel to fetch.
+        """
+        # No load events are emitted, as no session waits for the model
+        implementation, model_config, submodel_type = self._registry.get_implementation(model_config, submodel_type)  # type: ignore
+        return implementation(
+            app_config=self._app_config,
+            logger=self._logger,
+            ram_cache=self._ram_cache,
+        ).prefetch_model(model_config, submodel_type)
+
     def load_model_from_path(
         self, model_path: Path, loader: Optional[Callable[[Path], AnyModel]] = None
     ) -> LoadedModelWithoutConfig:
@@ -108,6 +136,7 @@ class ModelLoadService(ModelLoadServiceBase):
             else lambda path: safetensors_load_file(path, device="cpu")
         )
         assert loader is not None
+        start_load_time = time.time()
         raw_model = loader(model_path)
-        ram_cache.put(key=cache_key, model=raw_model)
+        ram_cache.put(key=cache_key, model=raw_model, load_time=time.time() - start_load_time)
         return LoadedModelWithoutConfig(_locker=ram_cache.get(key=cache_key))
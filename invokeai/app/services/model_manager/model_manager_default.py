@@ -16,7 +16,10 @@ from invokeai.app.services.model_load.model_load_base import ModelLoadServiceBas
 from invokeai.app.services.model_load.model_load_default import ModelLoadService
 from invokeai.app.services.model_manager.model_manager_base import ModelManagerServiceBase
 from invokeai.app.services.model_records.model_records_base import ModelRecordServiceBase
+from invokeai.backend.model_hash.file_hash_cache import FileHashCache
 from invokeai.backend.model_manager.load import ModelCache, ModelLoaderRegistry
+from invokeai.backend.model_manager.load.model_cache.eviction_policy import get_eviction_policy
+from invokeai.backend.model_manager.load.model_cache.shared_state_dicts import SharedStateDictStore
 from invokeai.backend.util.devices import TorchDevice
 from invokeai.backend.util.logging import InvokeAILogger
 
@@ -71,31 +74,57 @@ class ModelManagerService(ModelManagerServiceBase):
         download_queue: DownloadQueueServiceBase,
         events: EventServiceBase,
         execution_device: Optional[torch.device] = None,
+        hash_cache: Optional[FileHashCache] = None,
     ) -> Self:
         """
         Construct the model manager service instance.
 
         For simplicity, use this class method rather than the __init__ constructor.
         """
+        loader = cls.build_model_loader(app_config=app_config, execution_device=execution_device)
+        installer = ModelInstallService(
+            app_config=app_config,
+            record_store=model_record_service,
+            download_queue=download_queue,
+            event_bus=events,
+            hash_cache=hash_cache,
+        )
+        return cls(store=model_record_service, install=installer, load=loader)
+
+    @classmethod
+    def build_model_loader(
+        cls,
+        app_config: InvokeAIAppConfig,
+        execution_device: Optional[torch.device] = None,
+        max_cache_size: Optional[float] = None,
+    ) -> ModelLoadService:
+        """
+        Construct a model load service with its own model cache.
+
+        Each session worker uses its own loader, so that models are cached on the worker's execution device.
+
+        :param max_cache_size: The size of the model cache in GB. Defaults to the configured `ram`.
+        """
         logger = InvokeAILogger.get_logger(cls.__name__)
         logger.setLevel(app_config.log_level.upper())
 
         ram_cache = ModelCache(
-            max_cache_size=app_config.ram,
+            max_cache_size=app_config.ram if max_cache_size is None else max_cache_size,
             max_vram_cache_size=app_config.vram,
             lazy_offloading=app_config.lazy_offload,
             logger=logger,
             execution_device=execution_device or TorchDevice.choose_torch_device(),
+            eviction_policy=get_eviction_policy(app_config.cache_eviction_policy),
+            partial_load_vram=app_config.partial_load_vram,
+            pin_memory=app_config.pin_memory,
+            shared_state_dicts=(
+                SharedStateDictStore(app_config.shared_model_cache_path, logger=logger)
+                if app_config.shared_model_cache
+                else None
+            ),
         )
-        loader = ModelLoadService(
+        return ModelLoadService(
             app_config=app_config,
             ram_cache=ram_cache,
             registry=ModelLoaderRegistry,
         )
-        installer = ModelInstallService(
-            app_config=app_config,
-            record_store=model_record_service,
-            download_queue=download_queue,
-            event_bus=events,
-        )
-        return cls(store=model_record_service, install=installer, load=loader)
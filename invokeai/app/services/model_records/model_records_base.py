@@ -23,6 +23,7 @@ from invokeai.backend.model_manager.config import (
     ModelVariantType,
     SchedulerPredictionType,
 )
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelLoadStats
 
 
 class DuplicateModelException(Exception):
@@ -205,6 +206,26 @@ class ModelRecordServiceBase(ABC):
         """
         pass
 
+    @abstractmethod
+    def set_model_load_stats(self, stats: ModelLoadStats) -> None:
+        """
+        Record the measurements of a model taken by the model cache, replacing earlier ones.
+
+        :param stats: The measurements of the model or of one of its submodels
+
+        Can raise an UnknownModelException
+        """
+        pass
+
+    @abstractmethod
+    def get_model_load_stats(self, key: Optional[str] = None) -> List[ModelLoadStats]:
+        """
+        Return the recorded measurements of the model with the indicated key, or of all models.
+
+        :param key: Unique key for the model (optional)
+        """
+        pass
+
     def all_models(self) -> List[AnyModelConfig]:
         """Return all the model configs in the database."""
         return self.search_by_attr()
@@ -64,7 +64,9 @@ from invokeai.backend.model_manager.config import (
     ModelConfigFactory,
     ModelFormat,
     ModelType,
+    SubModelType,
 )
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelLoadStats
 
 
 class ModelRecordServiceSQL(ModelRecordServiceBase):
@@ -386,3 +388,69 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
             return PaginatedResults(
                 page=page, pages=ceil(total / per_page), per_page=per_page, total=total, items=items
             )
+
+    def set_model_load_stats(self, stats: ModelLoadStats) -> None:
+        """
+        Record the measurements of a model taken by the model cache, replacing earlier ones.
+
+        :param stats: The measurements of the model or of one of its submodels
+
+        Can raise an UnknownModelException
+        """
+        with self._db.lock:
+            try:
+                self._cursor.execute(
+                    """--sql
+                    INSERT INTO model_load_stats (model_key, submodel_type, size, vram_size, load_time)
+                    SELECT ?, ?, ?, ?, ?
+                    WHERE EXISTS (SELECT 1 FROM models WHERE id = ?)
+                    ON CONFLICT (model_key, submodel_type) DO UPDATE
+                    SET
+                        size = excluded.size,
+                        vram_size = excluded.vram_size,
+                        load_time = excluded.load_time,
+                        updated_at = STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW');
+                    """,
+                    (
+                        stats.key,
+                        stats.submodel_type.value if stats.submodel_type else "",
+                        stats.size,
+                        stats.vram_size,
+                        stats.load_time,
+                        stats.key,
+                    ),
+                )
+                if self._cursor.rowcount == 0:
+                    raise UnknownModelException("model not found")
+                self._db.conn.commit()
+            except sqlite3.Error as e:
+                self._db.conn.rollback()
+                raise e
+
+    def get_model_load_stats(self, key: Optional[str] = None) -> List[ModelLoadStats]:
+        """
+        Return the recorded measurements of the model with the indicated key, or of all models.
+
+        :param key: Unique key for the model (optional)
+        """
+        with self._db.lock:
+            self._cursor.execute(
+                f"""--sql
+                SELECT model_key, submodel_type, size, vram_size, load_time
+                FROM model_load_stats
+                {"WHERE model_key = ?" if key is not None else ""}
+                ORDER BY model_key, submodel_type;
+                """,
+                (key,) if key is not None else (),
+            )
+            rows = self._cursor.fetchall()
+        return [
+            ModelLoadStats(
+                key=row[0],
+                submodel_type=SubModelType(row[1]) if row[1] else None,
+                size=row[2],
+                vram_size=row[3],
+                load_time=row[4],
+            )
+            for row in rows
+        ]
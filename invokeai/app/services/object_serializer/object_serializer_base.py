@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, TypeVar
+from typing import Callable, Generic, Optional, TypeVar
+
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectCacheStats
 
 T = TypeVar("T")
 
@@ -35,6 +37,10 @@ class ObjectSerializerBase(ABC, Generic[T]):
         """
         pass
 
+    def get_stats(self) -> Optional[ObjectCacheStats]:
+        """Returns the statistics of the in-memory cache of the serializer, if it has one"""
+        return None
+
     def on_deleted(self, on_deleted: Callable[[str], None]) -> None:
         """Register a callback for when an object is deleted"""
         self._on_deleted_callbacks.append(on_deleted)
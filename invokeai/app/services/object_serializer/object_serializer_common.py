@@ -1,5 +1,54 @@
+import dataclasses
+from dataclasses import dataclass, replace
+from typing import Any
+
+import torch
+
+from invokeai.backend.util.calc_tensor_size import calc_tensor_size
+
+
 class ObjectNotFoundError(KeyError):
     """Raised when an object is not found while loading"""
 
     def __init__(self, name: str) -> None:
         super().__init__(f"Object with name {name} not found")
+
+
+def calc_object_size(obj: Any) -> int:
+    """Calculates the size in bytes of the tensors of an object, e.g. a tensor or a conditioning dataclass.
+
+    Tensors are found in the fields of dataclasses, and in lists, tuples and dicts. Tensors that appear several times
+    are counted once. Other objects are not counted.
+    """
+    size = 0
+    seen: set[int] = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, torch.Tensor):
+            if id(item) not in seen:
+                seen.add(id(item))
+                size += calc_tensor_size(item)
+        elif dataclasses.is_dataclass(item) and not isinstance(item, type):
+            stack.extend(getattr(item, field.name) for field in dataclasses.fields(item))
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+    return size
+
+
+@dataclass
+class ObjectCacheStats:
+    """Statistics of an in-memory cache of objects, e.g. the tensors passed between nodes."""
+
+    hits: int = 0
+    misses: int = 0
+    # Sizes in bytes of the tensors of the objects in the cache
+    cache_size: int = 0
+    max_cache_size: int = 0
+    high_watermark: int = 0
+    evictions: int = 0
+
+    def copy(self) -> "ObjectCacheStats":
+        return replace(self)
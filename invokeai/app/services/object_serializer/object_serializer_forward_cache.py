@@ -1,26 +1,38 @@
-from queue import Queue
+import threading
+from collections import OrderedDict
 from typing import TYPE_CHECKING, Optional, TypeVar
 
 from invokeai.app.services.object_serializer.object_serializer_base import ObjectSerializerBase
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectCacheStats, calc_object_size
 
 T = TypeVar("T")
 
 if TYPE_CHECKING:
     from invokeai.app.services.invoker import Invoker
 
+# Default maximum total size of the tensors of the cached objects, in bytes
+DEFAULT_MAX_MEMORY_SIZE = 2**30
+
 
 class ObjectSerializerForwardCache(ObjectSerializerBase[T]):
     """
     Provides a LRU cache for an instance of `ObjectSerializerBase`.
     Saving an object to the cache always writes through to the underlying storage.
+
+    The cache is limited by the total size of the tensors of the cached objects, as measured by `calc_object_size()`.
+
+    :param underlying_storage: The storage that objects are written to
+    :param max_memory_size: The maximum total size in bytes of the tensors of the cached objects
     """
 
-    def __init__(self, underlying_storage: ObjectSerializerBase[T], max_cache_size: int = 20):
+    def __init__(self, underlying_storage: ObjectSerializerBase[T], max_memory_size: int = DEFAULT_MAX_MEMORY_SIZE):
         super().__init__()
         self._underlying_storage = underlying_storage
-        self._cache: dict[str, T] = {}
-        self._cache_ids = Queue[str]()
-        self._max_cache_size = max_cache_size
+        # The cached objects and their sizes, least recently used first
+        self._cache: OrderedDict[str, tuple[T, int]] = OrderedDict()
+        self._max_memory_size = max_memory_size
+        self._stats = ObjectCacheStats(max_cache_size=max_memory_size)
+        self._lock = threading.Lock()
 
     def start(self, invoker: "Invoker") -> None:
         self._invoker = invoker
@@ -50,16 +62,39 @@ class ObjectSerializerForwardCache(ObjectSerializerBase[T]):
 
     def delete(self, name: str) -> None:
         self._underlying_storage.delete(name)
-        if name in self._cache:
-            del self._cache[name]
+        with self._lock:
+            entry = self._cache.pop(name, None)
+            if entry is not None:
+                self._stats.cache_size -= entry[1]
         self._on_deleted(name)
 
+    def get_stats(self) -> ObjectCacheStats:
+        with self._lock:
+            return self._stats.copy()
+
     def _get_cache(self, name: str) -> Optional[T]:
-        return None if name not in self._cache else self._cache[name]
+        with self._lock:
+            entry = self._cache.get(name)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            self._stats.hits += 1
+            self._cache.move_to_end(name)
+            return entry[0]
 
     def _set_cache(self, name: str, data: T):
-        if name not in self._cache:
-            self._cache[name] = data
-            self._cache_ids.put(name)
-            if self._cache_ids.qsize() > self._max_cache_size:
-                self._cache.pop(self._cache_ids.get())
+        size = calc_object_size(data)
+        with self._lock:
+            if name in self._cache:
+                # Another thread loaded the object in the meantime
+                self._cache.move_to_end(name)
+                return
+            if size > self._max_memory_size:
+                return
+            self._cache[name] = (data, size)
+            self._stats.cache_size += size
+            while self._stats.cache_size > self._max_memory_size:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self._stats.cache_size -= evicted_size
+                self._stats.evictions += 1
+            self._stats.high_watermark = max(self._stats.high_watermark, self._stats.cache_size)
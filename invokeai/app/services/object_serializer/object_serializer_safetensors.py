@@ -0,0 +1,129 @@
+import dataclasses
+import json
+from pathlib import Path
+from typing import Any, Dict, TypeVar
+
+import torch
+
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectNotFoundError
+from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
+from invokeai.backend.model_manager.load.mmap_safetensors import (
+    SAFETENSORS_DTYPES,
+    load_mmap_safetensors,
+    save_safetensors,
+)
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
+    BasicConditioningInfo,
+    ConditioningFieldData,
+    FLUXConditioningInfo,
+    SDXLConditioningInfo,
+)
+
+T = TypeVar("T")
+
+# The dataclasses whose instances are stored as safetensors. Others are pickled.
+_DATACLASSES: Dict[str, type] = {
+    cls.__name__: cls
+    for cls in (BasicConditioningInfo, SDXLConditioningInfo, FLUXConditioningInfo, ConditioningFieldData)
+}
+
+_FORMAT_VERSION = 1
+
+
+class _UnsupportedObjectError(TypeError):
+    pass
+
+
+class ObjectSerializerSafetensors(ObjectSerializerDisk[T]):
+    """Disk-backed storage for tensors and conditioning objects, stored as safetensors files.
+
+    The tensors of an object are saved to `<name>.safetensors`, and the structure of the object (the classes of the
+    conditioning dataclasses, and which tensor goes in which field) to a JSON sidecar, `<name>.json`. Objects are loaded
+    without unpickling, and their tensors are views into a copy-on-write memory map of the file, whose pages are only
+    read when the tensors are used. Tensors are always loaded on the CPU.
+
+    Objects of other types are serialized with `torch.save`, like `ObjectSerializerDisk` does.
+
+    :param output_dir: The folder where the serialized objects will be stored
+    :param ephemeral: If True, objects will be stored in a temporary directory inside the given output_dir and cleaned up on exit
+    """
+
+    def load(self, name: str) -> T:
+        sidecar_path = self._get_sidecar_path(name)
+        try:
+            sidecar = json.loads(sidecar_path.read_text())
+        except FileNotFoundError:
+            # The object was pickled
+            return super().load(name)
+        try:
+            tensors = load_mmap_safetensors(self._get_tensors_path(name))
+        except FileNotFoundError as e:
+            raise ObjectNotFoundError(name) from e
+        return _decode(sidecar["object"], tensors)
+
+    def save(self, obj: T) -> str:
+        tensors: Dict[str, torch.Tensor] = {}
+        try:
+            structure = _encode(obj, tensors, {})
+        except _UnsupportedObjectError:
+            return super().save(obj)
+        name = self._new_name()
+        save_safetensors(self._get_tensors_path(name), tensors)
+        # The sidecar is written last, so that an object is only loaded once it is complete
+        self._get_sidecar_path(name).write_text(json.dumps({"version": _FORMAT_VERSION, "object": structure}))
+        return name
+
+    def delete(self, name: str) -> None:
+        sidecar_path = self._get_sidecar_path(name)
+        if not sidecar_path.exists():
+            super().delete(name)
+            return
+        sidecar_path.unlink()
+        try:
+            self._get_tensors_path(name).unlink(missing_ok=True)
+        except OSError:
+            # The file is mapped by tensors in use (on Windows). The object is gone without its sidecar, and the file is
+            # removed with the temporary directory of ephemeral serializers.
+            pass
+
+    def _get_sidecar_path(self, name: str) -> Path:
+        return self._output_dir / f"{name}.json"
+
+    def _get_tensors_path(self, name: str) -> Path:
+        return self._output_dir / f"{name}.safetensors"
+
+
+def _encode(obj: Any, tensors: Dict[str, torch.Tensor], keys: Dict[int, str]) -> Any:
+    """Return the JSON structure of the object, adding its tensors to `tensors`.
+
+    Tensors that appear several times in the object are saved once. `keys` maps the ids of the saved tensors to their keys.
+    """
+    if isinstance(obj, torch.Tensor):
+        if obj.dtype not in SAFETENSORS_DTYPES.values():
+            raise _UnsupportedObjectError(str(obj.dtype))
+        key = keys.get(id(obj))
+        if key is None:
+            key = keys[id(obj)] = str(len(tensors))
+            tensors[key] = obj.detach().cpu()
+        return {"tensor": key}
+    if dataclasses.is_dataclass(obj) and _DATACLASSES.get(type(obj).__name__) is type(obj):
+        return {
+            "dataclass": type(obj).__name__,
+            "fields": {f.name: _encode(getattr(obj, f.name), tensors, keys) for f in dataclasses.fields(obj)},
+        }
+    if isinstance(obj, list):
+        return {"list": [_encode(item, tensors, keys) for item in obj]}
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return {"value": obj}
+    raise _UnsupportedObjectError(type(obj).__name__)
+
+
+def _decode(structure: Any, tensors: Dict[str, torch.Tensor]) -> Any:
+    if "tensor" in structure:
+        return tensors[structure["tensor"]]
+    if "dataclass" in structure:
+        cls = _DATACLASSES[structure["dataclass"]]
+        return cls(**{name: _decode(value, tensors) for name, value in structure["fields"].items()})
+    if "list" in structure:
+        return [_decode(item, tensors) for item in structure["list"]]
+    return structure["value"]
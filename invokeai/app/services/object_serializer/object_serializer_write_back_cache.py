@@ -0,0 +1,188 @@
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Optional, TypeVar
+
+from invokeai.app.services.object_serializer.object_serializer_base import ObjectSerializerBase
+from invokeai.app.services.object_serializer.object_serializer_common import (
+    ObjectCacheStats,
+    ObjectNotFoundError,
+    calc_object_size,
+)
+from invokeai.app.util.misc import uuid_string
+
+T = TypeVar("T")
+
+if TYPE_CHECKING:
+    from invokeai.app.services.invoker import Invoker
+
+
+class ObjectSerializerWriteBackCache(ObjectSerializerBase[T]):
+    """
+    Keeps objects in memory, and only writes them to an instance of `ObjectSerializerBase` when needed.
+
+    Objects are written to the underlying storage when they no longer fit in the memory budget, least recently used
+    first. Objects read back from the underlying storage are
+    kept in memory again, and are simply dropped from memory when evicted a second time.
+
+    Objects are freed by `release()` once they are no longer needed, e.g. when the session that produced them completes.
+    Objects referenced by cached invocation outputs are kept, since the outputs may be reused by later sessions, and
+    freed once the invocation cache no longer references them.
+
+    :param underlying_storage: The storage that objects are written to
+    :param max_memory_size: The maximum total size in bytes of the tensors of the objects kept in memory
+    """
+
+    def __init__(self, underlying_storage: ObjectSerializerBase[T], max_memory_size: int):
+        super().__init__()
+        self._underlying_storage = underlying_storage
+        self._max_memory_size = max_memory_size
+        # The objects in memory and their sizes, least recently used first
+        self._memory: OrderedDict[str, tuple[T, int]] = OrderedDict()
+        self._stats = ObjectCacheStats(max_cache_size=max_memory_size)
+        # Maps the names of the objects written to the underlying storage to their names in that storage
+        self._stored_names: dict[str, str] = {}
+        # The objects being written to the underlying storage outside of the lock
+        self._writing: dict[str, T] = {}
+        # The names of the released objects that were kept for the cached invocation outputs referencing them
+        self._retained: set[str] = set()
+        self._lock = threading.RLock()
+        self._invoker: Optional["Invoker"] = None
+
+    def start(self, invoker: "Invoker") -> None:
+        self._invoker = invoker
+        invoker.services.invocation_cache.on_references_released(self._release_retained)
+        start_op = getattr(self._underlying_storage, "start", None)
+        if callable(start_op):
+            start_op(invoker)
+
+    def stop(self, invoker: "Invoker") -> None:
+        with self._lock:
+            self._memory.clear()
+            self._stats.cache_size = 0
+        stop_op = getattr(self._underlying_storage, "stop", None)
+        if callable(stop_op):
+            stop_op(invoker)
+
+    def load(self, name: str) -> T:
+        with self._lock:
+            if name in self._memory:
+                self._stats.hits += 1
+                self._memory.move_to_end(name)
+                return self._memory[name][0]
+            if name in self._writing:
+                self._stats.hits += 1
+                return self._writing[name]
+            stored_name = self._stored_names.get(name)
+            if stored_name is not None:
+                self._stats.misses += 1
+        if stored_name is None:
+            raise ObjectNotFoundError(name)
+        obj = self._underlying_storage.load(stored_name)
+        with self._lock:
+            # The object may have been deleted or loaded by another thread in the meantime
+            evicted = []
+            if name in self._stored_names and name not in self._memory:
+                evicted = self._add_to_memory(name, obj)
+        self._write_evicted(evicted)
+        return obj
+
+    def save(self, obj: T) -> str:
+        name = f"{type(obj).__name__}_{uuid_string()}"
+        with self._lock:
+            evicted = self._add_to_memory(name, obj)
+        self._write_evicted(evicted)
+        return name
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            entry = self._memory.pop(name, None)
+            if entry is not None:
+                self._stats.cache_size -= entry[1]
+            # An object being written is deleted from the underlying storage by its writer once written
+            self._writing.pop(name, None)
+            stored_name = self._stored_names.pop(name, None)
+            self._retained.discard(name)
+        if stored_name is not None:
+            self._underlying_storage.delete(stored_name)
+        self._on_deleted(name)
+
+    def release(self, names: Iterable[str]) -> None:
+        """
+        Frees the given objects, except those referenced by cached invocation outputs. Unknown names are ignored.
+        :param names: The names of the objects that are no longer needed.
+        """
+        invocation_cache = self._invoker.services.invocation_cache if self._invoker is not None else None
+        for name in names:
+            with self._lock:
+                if name not in self._memory and name not in self._writing and name not in self._stored_names:
+                    continue
+            if invocation_cache is not None and invocation_cache.is_referenced(name):
+                with self._lock:
+                    self._retained.add(name)
+                continue
+            self.delete(name)
+
+    def _release_retained(self, names: list[str]) -> None:
+        """Frees the retained objects among the given names, which cached invocation outputs no longer reference."""
+        with self._lock:
+            names = [name for name in names if name in self._retained]
+        self.release(names)
+
+    def get_stats(self) -> ObjectCacheStats:
+        with self._lock:
+            return self._stats.copy()
+
+    def _add_to_memory(self, name: str, obj: T) -> list[tuple[str, T]]:
+        """
+        Adds the object to memory, evicting the least recently used objects to fit the budget. Must hold the lock.
+        :return: The evicted objects that must be written to the underlying storage with `_write_evicted()`, once the
+            lock is released.
+        """
+        size = calc_object_size(obj)
+        self._memory[name] = (obj, size)
+        self._stats.cache_size += size
+        evicted: list[tuple[str, T]] = []
+        while self._stats.cache_size > self._max_memory_size and self._memory:
+            evicted_name, (evicted_obj, evicted_size) = self._memory.popitem(last=False)
+            self._stats.cache_size -= evicted_size
+            self._stats.evictions += 1
+            if evicted_name not in self._stored_names and evicted_name not in self._writing:
+                self._writing[evicted_name] = evicted_obj
+                evicted.append((evicted_name, evicted_obj))
+        self._stats.high_watermark = max(self._stats.high_watermark, self._stats.cache_size)
+        return evicted
+
+    def _write_evicted(self, evicted: list[tuple[str, T]]) -> None:
+        """
+        Writes the objects evicted by `_add_to_memory()` to the underlying storage. Must not hold the lock.
+        Objects that fail to be written are kept in memory, and written again when evicted next.
+        """
+        for name, obj in evicted:
+            try:
+                self._write(name, obj)
+            except Exception as e:
+                if self._invoker is not None:
+                    self._invoker.services.logger.warning(f"Failed to write object {name}, keeping it in memory: {e}")
+
+    def _write(self, name: str, obj: T) -> None:
+        """
+        Writes an object of `_writing` to the underlying storage, and records its name in that storage.
+        :raises Exception: if the write fails, in which case the object is kept in memory
+        """
+        try:
+            stored_name = self._underlying_storage.save(obj)
+        except Exception:
+            with self._lock:
+                # Unless it was deleted meanwhile, the object is put back in memory as the first to be evicted again
+                if self._writing.pop(name, None) is not None and name not in self._memory:
+                    size = calc_object_size(obj)
+                    self._memory[name] = (obj, size)
+                    self._memory.move_to_end(name, last=False)
+                    self._stats.cache_size += size
+            raise
+        with self._lock:
+            deleted = self._writing.pop(name, None) is None
+            if not deleted:
+                self._stored_names[name] = stored_name
+        if deleted:
+            self._underlying_storage.delete(stored_name)
@@ -1,8 +1,13 @@
+import copy
 import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import suppress
 from threading import BoundedSemaphore, Thread
 from threading import Event as ThreadEvent
-from typing import Optional
+from typing import Callable, Optional
+
+import torch
 
 from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
 from invokeai.app.services.events.events_common import (
@@ -12,8 +17,11 @@ from invokeai.app.services.events.events_common import (
     QueueItemStatusChangedEvent,
     register_events,
 )
+from invokeai.app.services.images.images_common import ImageWriteError
 from invokeai.app.services.invocation_stats.invocation_stats_common import GESStatsNotFoundError
+from invokeai.app.services.invocation_stats.invocation_stats_default import InvocationStatsService
 from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.model_manager.model_manager_default import ModelManagerService
 from invokeai.app.services.session_processor.session_processor_base import (
     InvocationServices,
     OnAfterRunNode,
@@ -26,10 +34,13 @@ from invokeai.app.services.session_processor.session_processor_base import (
     SessionRunnerBase,
 )
 from invokeai.app.services.session_processor.session_processor_common import CanceledException, SessionProcessorStatus
+from invokeai.app.services.session_processor.session_processor_prefetch import ModelPrefetcher
 from invokeai.app.services.session_queue.session_queue_common import SessionQueueItem, SessionQueueItemNotFoundError
 from invokeai.app.services.shared.graph import NodeInputError
 from invokeai.app.services.shared.invocation_context import InvocationContextData, build_invocation_context
 from invokeai.app.util.profiler import Profiler
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB
+from invokeai.backend.util.devices import TorchDevice
 
 
 class DefaultSessionRunner(SessionRunnerBase):
@@ -114,19 +125,8 @@ class DefaultSessionRunner(SessionRunnerBase):
             with self._services.performance_statistics.collect_stats(invocation, queue_item.session_id):
                 self._on_before_run_node(invocation, queue_item)
 
-                data = InvocationContextData(
-                    invocation=invocation,
-                    source_invocation_id=queue_item.session.prepared_source_mapping[invocation.id],
-                    queue_item=queue_item,
-                )
-                context = build_invocation_context(
-                    data=data,
-                    services=self._services,
-                    is_canceled=self._is_canceled,
-                )
-
                 # Invoke the node
-                output = invocation.invoke_internal(context=context, services=self._services)
+                output = self._invoke_node(invocation, queue_item)
                 # Save output and history
                 queue_item.session.complete(invocation.id, output)
 
@@ -155,6 +155,20 @@ class DefaultSessionRunner(SessionRunnerBase):
                 error_traceback=error_traceback,
             )
 
+    def _invoke_node(self, invocation: BaseInvocation, queue_item: SessionQueueItem) -> BaseInvocationOutput:
+        """Builds the invocation context for a node and invokes it, returning its output."""
+        data = InvocationContextData(
+            invocation=invocation,
+            source_invocation_id=queue_item.session.prepared_source_mapping[invocation.id],
+            queue_item=queue_item,
+        )
+        context = build_invocation_context(
+            data=data,
+            services=self._services,
+            is_canceled=self._is_canceled,
+        )
+        return invocation.invoke_internal(context=context, services=self._services)
+
     def _on_before_run_session(self, queue_item: SessionQueueItem) -> None:
         """Called before a session is run.
 
@@ -196,6 +210,12 @@ class DefaultSessionRunner(SessionRunnerBase):
             )
 
         try:
+            # Images may be written to disk in the background. The queue item is only completed once the images of its
+            # session are written, and fails if one of them could not be.
+            write_errors = list(self._services.images.wait_for_writes(queue_item.session_id))
+            if write_errors:
+                self._on_image_write_error(queue_item=queue_item, write_error=write_errors[0])
+
             # Update the queue item with the completed session. If the queue item has been removed from the queue,
             # we'll get a SessionQueueItemNotFoundError and we can ignore it. This can happen if the queue is cleared
             # while the session is running.
@@ -217,6 +237,36 @@ class DefaultSessionRunner(SessionRunnerBase):
         except SessionQueueItemNotFoundError:
             pass
 
+    def _on_image_write_error(self, queue_item: SessionQueueItem, write_error: ImageWriteError) -> None:
+        """Called when an image of the session could not be written to disk in the background.
+
+        - Handle the error as an error of the node that saved the image, if it is known.
+        - Otherwise, fail the queue item.
+        """
+
+        error_type = write_error.error.__class__.__name__
+        error_message = (
+            f"Failed to save image {write_error.image_name}: {write_error.error.__cause__ or write_error.error}"
+        )
+        error_traceback = "".join(traceback.format_exception(write_error.error))
+        invocation = (
+            queue_item.session.execution_graph.nodes.get(write_error.node_id)
+            if write_error.node_id is not None
+            else None
+        )
+        if invocation is not None:
+            self._on_node_error(
+                invocation=invocation,
+                queue_item=queue_item,
+                error_type=error_type,
+                error_message=error_message,
+                error_traceback=error_traceback,
+            )
+            return
+        self._services.logger.error(f"Error while invoking session {queue_item.session_id}: {error_message}")
+        queue_item = self._services.session_queue.set_queue_item_session(queue_item.item_id, queue_item.session)
+        self._services.session_queue.fail_queue_item(queue_item.item_id, error_type, error_message, error_traceback)
+
     def _on_before_run_node(self, invocation: BaseInvocation, queue_item: SessionQueueItem):
         """Called before a node is run.
 
@@ -260,12 +310,13 @@ class DefaultSessionRunner(SessionRunnerBase):
         error_type: str,
         error_message: str,
         error_traceback: str,
+        fail_queue_item: bool = True,
     ):
         """Called when a node errors. Node errors may occur when running or preparing the node..
 
         - Set the node error on the session object.
         - Log the error.
-        - Fail the queue item.
+        - Fail the queue item, unless `fail_queue_item` is False.
         - Emits an invocation error event.
         - Run any callbacks registered for this event.
         """
@@ -283,10 +334,11 @@ class DefaultSessionRunner(SessionRunnerBase):
         self._services.logger.error(error_traceback)
 
         # Fail the queue item
-        queue_item = self._services.session_queue.set_queue_item_session(queue_item.item_id, queue_item.session)
-        queue_item = self._services.session_queue.fail_queue_item(
-            queue_item.item_id, error_type, error_message, error_traceback
-        )
+        if fail_queue_item:
+            queue_item = self._services.session_queue.set_queue_item_session(queue_item.item_id, queue_item.session)
+            queue_item = self._services.session_queue.fail_queue_item(
+                queue_item.item_id, error_type, error_message, error_traceback
+            )
 
         # Send error event
         self._services.events.emit_invocation_error(
@@ -307,6 +359,160 @@ class DefaultSessionRunner(SessionRunnerBase):
             )
 
 
+class ConcurrentSessionRunner(DefaultSessionRunner):
+    """Processes a single session's invocations, running independent CPU-safe invocations concurrently.
+
+    Invocations are dispatched in the order the session provides them. Invocations marked as CPU-safe are run on a
+    thread pool while the runner keeps dispatching other ready invocations. All other invocations run on the runner
+    thread, so at most one invocation that uses models runs at a time.
+
+    Results are committed to the session, and the invocation complete events are emitted, in dispatch order on the
+    runner thread. The runner always waits on the oldest in-flight invocation, never on whichever finishes first, so the
+    order in which invocations are dispatched and completed does not depend on timing.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        on_before_run_session_callbacks: Optional[list[OnBeforeRunSession]] = None,
+        on_before_run_node_callbacks: Optional[list[OnBeforeRunNode]] = None,
+        on_after_run_node_callbacks: Optional[list[OnAfterRunNode]] = None,
+        on_node_error_callbacks: Optional[list[OnNodeError]] = None,
+        on_after_run_session_callbacks: Optional[list[OnAfterRunSession]] = None,
+    ):
+        """
+        Args:
+            max_workers: The maximum number of invocations in flight at the same time.
+            on_before_run_session_callbacks: Callbacks to run before the session starts.
+            on_before_run_node_callbacks: Callbacks to run before each node starts.
+            on_after_run_node_callbacks: Callbacks to run after each node completes.
+            on_node_error_callbacks: Callbacks to run when a node errors.
+            on_after_run_session_callbacks: Callbacks to run after the session completes.
+        """
+        super().__init__(
+            on_before_run_session_callbacks=on_before_run_session_callbacks,
+            on_before_run_node_callbacks=on_before_run_node_callbacks,
+            on_after_run_node_callbacks=on_after_run_node_callbacks,
+            on_node_error_callbacks=on_node_error_callbacks,
+            on_after_run_session_callbacks=on_after_run_session_callbacks,
+        )
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self._max_workers = max_workers
+
+    def run(self, queue_item: SessionQueueItem):
+        # Exceptions raised outside `run_node` are handled by the processor. There is no need to catch them here.
+
+        self._on_before_run_session(queue_item=queue_item)
+
+        session = queue_item.session
+        in_flight: deque[tuple[BaseInvocation, Future[BaseInvocationOutput]]] = deque()
+        input_error: Optional[NodeInputError] = None
+        stop = False
+
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="invocation") as executor:
+            while not stop:
+                # Dispatch ready invocations until the pool is full or nothing else is ready
+                while input_error is None and len(in_flight) < self._max_workers and not self._is_canceled():
+                    try:
+                        invocation = session.next()
+                    except NodeInputError as e:
+                        # Earlier invocations are committed before the error is handled
+                        input_error = e
+                        break
+                    if invocation is None:
+                        break
+                    session.set_node_in_flight(invocation.id)
+                    in_flight.append((invocation, self._dispatch_node(invocation, queue_item, executor)))
+
+                if not in_flight:
+                    if input_error is not None:
+                        self._on_node_error(
+                            invocation=input_error.node,
+                            queue_item=queue_item,
+                            error_type=input_error.__class__.__name__,
+                            error_message=str(input_error),
+                            error_traceback="".join(traceback.format_exception(input_error)),
+                        )
+                    break
+
+                invocation, future = in_flight.popleft()
+                stop = not self._commit_node(invocation, queue_item, future)
+
+                # See `DefaultSessionRunner.run()` for why the cancel event is checked here.
+                if (
+                    session.is_complete()
+                    or self._is_canceled()
+                    or queue_item.status in ["failed", "canceled", "completed"]
+                ):
+                    stop = True
+
+            # Invocations that have not started when the session stops are discarded. Those that are running are
+            # waited for, so that each invocation started event is followed by a complete or error event before the
+            # session ends. The queue item has already been stopped, so their errors do not fail it again.
+            for invocation, future in in_flight:
+                if not future.cancel():
+                    self._commit_node(invocation, queue_item, future, fail_queue_item=False)
+
+        self._on_after_run_session(queue_item=queue_item)
+
+    def _dispatch_node(
+        self, invocation: BaseInvocation, queue_item: SessionQueueItem, executor: ThreadPoolExecutor
+    ) -> Future[BaseInvocationOutput]:
+        """Starts running a node, on the thread pool if it is CPU-safe or else on the runner thread."""
+        self._on_before_run_node(invocation, queue_item)
+        if invocation.is_cpu_safe():
+            # The pool threads use the device the runner thread is bound to, e.g. by a multi-worker processor
+            return executor.submit(
+                self._execute_node_on_device, TorchDevice.choose_torch_device(), invocation, queue_item
+            )
+
+        future: Future[BaseInvocationOutput] = Future()
+        try:
+            future.set_result(self._execute_node(invocation, queue_item))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _execute_node_on_device(
+        self, device: torch.device, invocation: BaseInvocation, queue_item: SessionQueueItem
+    ) -> BaseInvocationOutput:
+        with TorchDevice.use_device(device):
+            return self._execute_node(invocation, queue_item)
+
+    def _execute_node(self, invocation: BaseInvocation, queue_item: SessionQueueItem) -> BaseInvocationOutput:
+        with self._services.performance_statistics.collect_stats(invocation, queue_item.session_id):
+            return self._invoke_node(invocation, queue_item)
+
+    def _commit_node(
+        self,
+        invocation: BaseInvocation,
+        queue_item: SessionQueueItem,
+        future: Future[BaseInvocationOutput],
+        fail_queue_item: bool = True,
+    ) -> bool:
+        """Waits for a dispatched node and saves its output to the session. Returns False if the session must stop."""
+        try:
+            # Any unhandled exception in this scope is an invocation error & will fail the graph
+            output = future.result()
+            queue_item.session.complete(invocation.id, output)
+            self._on_after_run_node(invocation, queue_item, output)
+        except CanceledException:
+            # The cancellation is handled by the session runner loop, no error should be set.
+            return False
+        except Exception as e:
+            self._on_node_error(
+                invocation=invocation,
+                queue_item=queue_item,
+                error_type=e.__class__.__name__,
+                error_message=str(e),
+                error_traceback=traceback.format_exc(),
+                fail_queue_item=fail_queue_item,
+            )
+            return False
+        return True
+
+
 class DefaultSessionProcessor(SessionProcessorBase):
     def __init__(
         self,
@@ -314,13 +520,32 @@ class DefaultSessionProcessor(SessionProcessorBase):
         on_non_fatal_processor_error_callbacks: Optional[list[OnNonFatalProcessorError]] = None,
         thread_limit: int = 1,
         polling_interval: int = 1,
+        device: Optional[torch.device] = None,
+        prefetch_ram_share: float = 1,
     ) -> None:
+        """
+        Args:
+            session_runner: The session runner to use. Defaults to a `DefaultSessionRunner`.
+            on_non_fatal_processor_error_callbacks: Callbacks to run when a non-fatal processor error occurs.
+            thread_limit: The maximum number of processing threads.
+            polling_interval: The interval in seconds between polls of the session queue.
+            device: The device to bind the processing thread to. Omit to use the configured device.
+            prefetch_ram_share: The share of the configured `prefetch_ram` used by this processor to prefetch models.
+        """
         super().__init__()
 
         self.session_runner = session_runner if session_runner else DefaultSessionRunner()
         self._on_non_fatal_processor_error_callbacks = on_non_fatal_processor_error_callbacks or []
         self._thread_limit = thread_limit
         self._polling_interval = polling_interval
+        self._device = device
+        self._prefetch_ram_share = prefetch_ram_share
+        self._model_prefetcher: Optional[ModelPrefetcher] = None
+
+    @property
+    def device(self) -> Optional[torch.device]:
+        """The device the processing thread is bound to, if any."""
+        return self._device
 
     def start(self, invoker: Invoker) -> None:
         self._invoker: Invoker = invoker
@@ -351,9 +576,28 @@ class DefaultSessionProcessor(SessionProcessorBase):
         )
 
         self.session_runner.start(services=invoker.services, cancel_event=self._cancel_event, profiler=self._profiler)
+
+        # If prefetching is enabled, the models of the upcoming queue items are loaded into this worker's model cache
+        # in the background.
+        config = self._invoker.services.configuration
+        prefetch_ram = config.prefetch_ram * self._prefetch_ram_share
+        self._model_prefetcher = (
+            ModelPrefetcher(
+                ram_budget=int(prefetch_ram * GB),
+                queue_items=config.prefetch_queue_items,
+                polling_interval=self._polling_interval,
+            )
+            if prefetch_ram > 0
+            else None
+        )
+        if self._model_prefetcher is not None:
+            self._model_prefetcher.start(
+                invoker, name="model_prefetcher" if self._device is None else f"model_prefetcher_{self._device}"
+            )
+
         self._thread = Thread(
-            name="session_processor",
-            target=self._process,
+            name="session_processor" if self._device is None else f"session_processor_{self._device}",
+            target=self._process_on_device,
             kwargs={
                 "stop_event": self._stop_event,
                 "poll_now_event": self._poll_now_event,
@@ -365,9 +609,13 @@ class DefaultSessionProcessor(SessionProcessorBase):
 
     def stop(self, *args, **kwargs) -> None:
         self._stop_event.set()
+        if self._model_prefetcher is not None:
+            self._model_prefetcher.stop()
 
     def _poll_now(self) -> None:
         self._poll_now_event.set()
+        if self._model_prefetcher is not None:
+            self._model_prefetcher.poll_now()
 
     async def _on_queue_cleared(self, event: FastAPIEvent[QueueClearedEvent]) -> None:
         if self._queue_item and self._queue_item.queue_id == event[1].queue_id:
@@ -378,6 +626,9 @@ class DefaultSessionProcessor(SessionProcessorBase):
         self._poll_now()
 
     async def _on_queue_item_status_changed(self, event: FastAPIEvent[QueueItemStatusChangedEvent]) -> None:
+        if self._model_prefetcher is not None and event[1].status == "in_progress":
+            # The queue item is no longer pending, so the models of the next queue item can be prefetched
+            self._model_prefetcher.poll_now()
         if self._queue_item and event[1].status in ["completed", "failed", "canceled"]:
             # When the queue item is canceled via HTTP, the queue item status is set to `"canceled"` and this event is
             # emitted. We need to respond to this event and stop graph execution. This is done by setting the cancel
@@ -386,7 +637,9 @@ class DefaultSessionProcessor(SessionProcessorBase):
             # Long-running nodes that cannot be interrupted easily present a challenge. `denoise_latents` is one such
             # node, but it gets a step callback, called on each step of denoising. This callback checks if the queue item
             # is canceled, and if it is, raises a `CanceledException` to stop execution immediately.
-            if event[1].status == "canceled":
+            #
+            # Several session workers may be running, so only the worker running the canceled queue item is canceled.
+            if event[1].status == "canceled" and event[1].item_id == self._queue_item.item_id:
                 self._cancel_event.set()
             self._poll_now()
 
@@ -406,6 +659,13 @@ class DefaultSessionProcessor(SessionProcessorBase):
             is_processing=self._queue_item is not None,
         )
 
+    def _process_on_device(self, **kwargs) -> None:
+        if self._device is None:
+            self._process(**kwargs)
+            return
+        with TorchDevice.use_device(self._device):
+            self._process(**kwargs)
+
     def _process(
         self,
         stop_event: ThreadEvent,
@@ -505,3 +765,104 @@ class DefaultSessionProcessor(SessionProcessorBase):
                 error_message=error_message,
                 error_traceback=error_traceback,
             )
+
+
+class MultiWorkerSessionProcessor(SessionProcessorBase):
+    """Processes the session queue with several workers at once, each bound to its own device.
+
+    Each worker is a `DefaultSessionProcessor` with its own processing thread, session runner, model cache, model
+    prefetcher and performance statistics. All other services are shared. The configured `ram` and `prefetch_ram` are
+    split evenly between the workers, so that together they use no more memory than a single worker. Workers claim
+    queue items atomically, so each queue item is run by exactly one worker.
+
+    For example, the devices `["cuda:0", "cuda:1"]` run one worker per GPU, and `["cpu", "cpu"]` run two CPU workers.
+    """
+
+    def __init__(
+        self,
+        devices: list[torch.device],
+        session_runner_factory: Optional[Callable[[], SessionRunnerBase]] = None,
+        on_non_fatal_processor_error_callbacks: Optional[list[OnNonFatalProcessorError]] = None,
+        polling_interval: int = 1,
+    ) -> None:
+        """
+        Args:
+            devices: The devices to run workers on, one worker per device.
+            session_runner_factory: Creates the session runner for each worker. Defaults to `DefaultSessionRunner`.
+            on_non_fatal_processor_error_callbacks: Callbacks to run when a non-fatal processor error occurs.
+            polling_interval: The interval in seconds between polls of the session queue.
+        """
+        super().__init__()
+
+        if len(devices) == 0:
+            raise ValueError("At least one device is required")
+
+        session_runner_factory = session_runner_factory or DefaultSessionRunner
+        self._workers = [
+            DefaultSessionProcessor(
+                session_runner=session_runner_factory(),
+                on_non_fatal_processor_error_callbacks=on_non_fatal_processor_error_callbacks,
+                polling_interval=polling_interval,
+                device=device,
+                prefetch_ram_share=1 / len(devices),
+            )
+            for device in devices
+        ]
+
+    @property
+    def workers(self) -> list[DefaultSessionProcessor]:
+        """The session workers."""
+        return self._workers
+
+    def start(self, invoker: Invoker) -> None:
+        # The workers share the configured memory, so that together they use no more than a single worker
+        ram = invoker.services.configuration.ram / len(self._workers)
+        for worker in self._workers:
+            assert worker.device is not None
+            worker.start(self._build_worker_invoker(invoker, worker.device, ram))
+
+    def stop(self, *args, **kwargs) -> None:
+        for worker in self._workers:
+            worker.stop()
+
+    def resume(self) -> SessionProcessorStatus:
+        for worker in self._workers:
+            worker.resume()
+        return self.get_status()
+
+    def pause(self) -> SessionProcessorStatus:
+        for worker in self._workers:
+            worker.pause()
+        return self.get_status()
+
+    def get_status(self) -> SessionProcessorStatus:
+        statuses = [worker.get_status() for worker in self._workers]
+        return SessionProcessorStatus(
+            is_started=any(status.is_started for status in statuses),
+            is_processing=any(status.is_processing for status in statuses),
+        )
+
+    @staticmethod
+    def _build_worker_invoker(invoker: Invoker, device: torch.device, ram: float) -> Invoker:
+        """Builds an invoker for a worker. Its services share everything with the given invoker's services, except for
+        a model loader with its own model cache of `ram` GB on the worker's device and its own performance
+        statistics."""
+        load = ModelManagerService.build_model_loader(
+            app_config=invoker.services.configuration, execution_device=device, max_cache_size=ram
+        )
+        performance_statistics = InvocationStatsService()
+
+        services = copy.copy(invoker.services)
+        services.model_manager = ModelManagerService(
+            store=invoker.services.model_manager.store,
+            install=invoker.services.model_manager.install,
+            load=load,
+        )
+        services.performance_statistics = performance_statistics
+
+        # Creating a new invoker would start all of the shared services again, so the invoker is copied instead
+        worker_invoker = copy.copy(invoker)
+        worker_invoker.services = services
+        load.start(worker_invoker)
+        performance_statistics.start(worker_invoker)
+        return worker_invoker
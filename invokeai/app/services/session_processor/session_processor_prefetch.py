@@ -0,0 +1,193 @@
+from threading import Event as ThreadEvent
+from threading import Thread
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from invokeai.app.invocations.model import ModelIdentifierField
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.model_records import UnknownModelException
+from invokeai.app.services.session_queue.session_queue_common import DEFAULT_QUEUE_ID
+from invokeai.app.services.shared.graph import Graph
+from invokeai.backend.model_manager import AnyModelConfig, ModelType, SubModelType
+from invokeai.backend.model_manager.config import CheckpointConfigBase, DiffusersConfigBase
+from invokeai.backend.model_manager.load.mmap_safetensors import read_safetensors_tensor_sizes
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB
+from invokeai.backend.model_manager.load.model_util import calc_model_size_by_fs
+
+# Main models are referenced as a whole and split into their submodels by the model loader nodes. These are the
+# submodels holding most of the weights, which are worth prefetching.
+MAIN_MODEL_SUBMODEL_TYPES = (
+    SubModelType.UNet,
+    SubModelType.Transformer,
+    SubModelType.TextEncoder,
+    SubModelType.TextEncoder2,
+    SubModelType.VAE,
+)
+
+# The prefixes of the keys of the submodels' weights in single-file main checkpoints. The weights of the submodels that
+# are not listed, such as the transformer of FLUX checkpoints, are the whole checkpoint.
+CHECKPOINT_SUBMODEL_KEY_PREFIXES = {
+    SubModelType.UNet: ("model.diffusion_model.",),
+    SubModelType.TextEncoder: ("cond_stage_model.", "conditioner.embedders.0."),
+    SubModelType.TextEncoder2: ("conditioner.embedders.1.",),
+    SubModelType.VAE: ("first_stage_model.",),
+}
+
+
+def get_model_identifiers(graph: Graph) -> list[ModelIdentifierField]:
+    """Gets the models referenced by the inputs of the graph's nodes, in the order of the nodes. Models that are passed
+    between nodes by connections are found on the loader nodes that output them."""
+    identifiers: list[ModelIdentifierField] = []
+
+    def find_identifiers(value: Any) -> None:
+        if isinstance(value, ModelIdentifierField):
+            if value not in identifiers:
+                identifiers.append(value)
+        elif isinstance(value, BaseModel):
+            for field_name in value.model_fields:
+                find_identifiers(getattr(value, field_name))
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                find_identifiers(item)
+        elif isinstance(value, dict):
+            for item in value.values():
+                find_identifiers(item)
+
+    for node in graph.nodes.values():
+        find_identifiers(node)
+    return identifiers
+
+
+class ModelPrefetcher:
+    """Loads the models used by the next pending queue items into the model cache on a background thread, so that
+    sessions do not wait for models to be read from disk.
+
+    Models are only prefetched into the free space of the model cache, so prefetching never evicts cached models. Models
+    that turn out not to fit once loaded are not cached. The models prefetched for the upcoming queue items take up at
+    most `ram_budget` bytes. The prefetcher checks the queue every polling interval, and whenever `poll_now` is called.
+    """
+
+    def __init__(
+        self,
+        ram_budget: int,
+        queue_items: int = 2,
+        polling_interval: int = 1,
+        queue_id: str = DEFAULT_QUEUE_ID,
+    ) -> None:
+        """
+        Args:
+            ram_budget: The maximum total size of the models prefetched for the upcoming queue items, in bytes.
+            queue_items: How many of the next pending queue items to prefetch models for.
+            polling_interval: The interval in seconds between checks of the session queue.
+            queue_id: The queue to prefetch models for.
+        """
+        self._ram_budget = ram_budget
+        self._queue_items = queue_items
+        self._polling_interval = polling_interval
+        self._queue_id = queue_id
+        self._prefetched: dict[tuple[str, Optional[SubModelType]], int] = {}
+        self._stop_event = ThreadEvent()
+        self._poll_now_event = ThreadEvent()
+
+    def start(self, invoker: Invoker, name: str = "model_prefetcher") -> None:
+        self._invoker = invoker
+        self._thread = Thread(name=name, target=self._process, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._poll_now_event.set()
+
+    def poll_now(self) -> None:
+        self._poll_now_event.set()
+
+    def prefetch(self) -> list[tuple[str, Optional[SubModelType]]]:
+        """Loads the models used by the next pending queue items that fit in the budget and the model cache's free space.
+
+        Returns:
+            The key and submodel type of each newly prefetched model.
+        """
+        services = self._invoker.services
+        ram_cache = services.model_manager.load.ram_cache
+
+        upcoming: dict[tuple[str, Optional[SubModelType]], AnyModelConfig] = {}
+        for queue_item in services.session_queue.get_next_items(self._queue_id, self._queue_items):
+            for identifier in get_model_identifiers(queue_item.session.graph):
+                try:
+                    config = services.model_manager.store.get_model(identifier.key)
+                except UnknownModelException:
+                    continue
+                for submodel_type in self._get_submodel_types(config, identifier.submodel_type):
+                    upcoming.setdefault((config.key, submodel_type), config)
+
+        # Models prefetched for queue items that have since started, or that were evicted, no longer count against the
+        # budget. They are now ordinary entries of the model cache.
+        self._prefetched = {
+            model: size for model, size in self._prefetched.items() if model in upcoming and ram_cache.exists(*model)
+        }
+        budget = self._ram_budget - sum(self._prefetched.values())
+
+        prefetched: list[tuple[str, Optional[SubModelType]]] = []
+        for (key, submodel_type), config in upcoming.items():
+            if self._stop_event.is_set():
+                break
+            if ram_cache.exists(key, submodel_type):
+                continue
+            size = self._get_size(config, submodel_type)
+            free_space = int(ram_cache.max_cache_size * GB) - ram_cache.cache_size()
+            if size == 0 or size > budget or size > free_space:
+                continue
+            try:
+                if not services.model_manager.load.prefetch_model(config, submodel_type):
+                    # The model is being loaded by a session, or turned out not to fit once loaded
+                    continue
+            except Exception as e:
+                services.logger.debug(f"Could not prefetch model {config.name} ({submodel_type}): {e}")
+                continue
+            services.logger.debug(f"Prefetched model {config.name} ({submodel_type}) for the session queue")
+            self._prefetched[(key, submodel_type)] = size
+            prefetched.append((key, submodel_type))
+            budget -= size
+        return prefetched
+
+    def _process(self) -> None:
+        while not self._stop_event.is_set():
+            self._poll_now_event.clear()
+            try:
+                self.prefetch()
+            except Exception as e:
+                # The queue's sessions may fail to load, or the models may be changed while they are prefetched. The
+                # models are then loaded by the sessions as usual.
+                self._invoker.services.logger.debug(f"Error while prefetching models: {e}")
+            self._poll_now_event.wait(self._polling_interval)
+
+    def _get_submodel_types(
+        self, config: AnyModelConfig, submodel_type: Optional[SubModelType]
+    ) -> list[Optional[SubModelType]]:
+        if submodel_type is not None or config.type != ModelType.Main:
+            return [submodel_type]
+        return list(MAIN_MODEL_SUBMODEL_TYPES)
+
+    def _get_size(self, config: AnyModelConfig, submodel_type: Optional[SubModelType]) -> int:
+        """Gets the size of a model measured when it was last loaded, or estimates it from its files, as the model loader
+        does before loading it."""
+        load_stats = self._invoker.services.model_manager.load.ram_cache.get_load_stats(config.key, submodel_type)
+        if load_stats is not None:
+            return load_stats.size
+        model_path = (self._invoker.services.configuration.models_path / config.path).resolve()
+        if (
+            isinstance(config, CheckpointConfigBase)
+            and submodel_type in CHECKPOINT_SUBMODEL_KEY_PREFIXES
+            and model_path.suffix == ".safetensors"
+        ):
+            # The submodels of a single-file checkpoint share its file, so each is only estimated from its own weights
+            prefixes = CHECKPOINT_SUBMODEL_KEY_PREFIXES[submodel_type]
+            return sum(
+                size for key, size in read_safetensors_tensor_sizes(model_path).items() if key.startswith(prefixes)
+            )
+        return calc_model_size_by_fs(
+            model_path=model_path,
+            subfolder=submodel_type.value if submodel_type else None,
+            variant=config.repo_variant if isinstance(config, DiffusersConfigBase) else None,
+        )
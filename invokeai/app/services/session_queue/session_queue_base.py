@@ -45,6 +45,11 @@ class SessionQueueBase(ABC):
         """Gets the next session queue item (does not dequeue it)"""
         pass
 
+    @abstractmethod
+    def get_next_items(self, queue_id: str, limit: int) -> list[SessionQueueItem]:
+        """Gets up to `limit` pending session queue items, in the order they will be dequeued (does not dequeue them)"""
+        pass
+
     @abstractmethod
     def clear(self, queue_id: str) -> ClearResult:
         """Deletes all session queue items"""
@@ -1,5 +1,6 @@
 import datetime
 import json
+import math
 from itertools import chain, product
 from typing import Generator, Iterable, Literal, NamedTuple, Optional, TypeAlias, Union, cast
 
@@ -401,6 +402,18 @@ def populate_graph(graph: Graph, node_field_values: Iterable[NodeFieldValue]) ->
     return graph_clone
 
 
+def create_session_from_field_values(
+    graph: Graph, node_field_values: Iterable[NodeFieldValue], session_id: Optional[str] = None
+) -> GraphExecutionState:
+    """
+    Creates a session for the given graph, populated with the given batch data items.
+    """
+    populated_graph = populate_graph(graph, node_field_values)
+    if session_id is None:
+        return GraphExecutionState(graph=populated_graph)
+    return GraphExecutionState(id=session_id, graph=populated_graph)
+
+
 def create_session_nfv_tuples(
     batch: Batch, maximum: int
 ) -> Generator[tuple[GraphExecutionState, list[NodeFieldValue], Optional[WorkflowWithoutID]], None, None]:
@@ -409,6 +422,18 @@ def create_session_nfv_tuples(
     of the form (graph, batch_data_items) where batch_data_items is the list of BatchDataItems
     that was applied to the graph.
     """
+    for flat_node_field_values in create_field_values(batch, maximum):
+        yield (
+            create_session_from_field_values(batch.graph, flat_node_field_values),
+            flat_node_field_values,
+            batch.workflow,
+        )
+
+
+def create_field_values(batch: Batch, maximum: int) -> Generator[list[NodeFieldValue], None, None]:
+    """
+    Create the batch data items for each graph permutation of the given batch, without creating the graphs.
+    """
 
     # TODO: Should this be a class method on Batch?
 
@@ -426,15 +451,13 @@ def create_session_nfv_tuples(
             node_field_values_to_zip.append(node_field_values)
         data.append(list(zip(*node_field_values_to_zip, strict=True)))  # type: ignore [arg-type]
 
-    # create generator to yield session,nfv tuples
+    # create generator to yield nfv lists
     count = 0
     for _ in range(batch.runs):
         for d in product(*data):
             if count >= maximum:
                 return
-            flat_node_field_values = list(chain.from_iterable(d))
-            graph = populate_graph(batch.graph, flat_node_field_values)
-            yield (GraphExecutionState(graph=graph), flat_node_field_values, batch.workflow)
+            yield list(chain.from_iterable(d))
             count += 1
 
 
@@ -446,15 +469,15 @@ def calc_session_count(batch: Batch) -> int:
     # TODO: Should this be a class method on Batch?
     if not batch.data:
         return batch.runs
-    data = []
+    # The batch data in each list is zipped together, so each list contributes as many items as its data has. The lists
+    # are combined as a cartesian product, so the count is the product of the zipped lengths.
+    zipped_lengths: list[int] = []
     for batch_datum_list in batch.data:
-        to_zip = []
-        for batch_datum in batch_datum_list:
-            batch_data_items = range(len(batch_datum.items))
-            to_zip.append(batch_data_items)
-        data.append(list(zip(*to_zip, strict=True)))
-    data_product = list(product(*data))
-    return len(data_product) * batch.runs
+        lengths = {len(batch_datum.items) for batch_datum in batch_datum_list}
+        if len(lengths) > 1:
+            raise BatchZippedLengthError("Zipped batch items must all have the same length")
+        zipped_lengths.append(lengths.pop() if lengths else 0)
+    return math.prod(zipped_lengths) * batch.runs
 
 
 class SessionQueueValueToInsert(NamedTuple):
@@ -462,7 +485,7 @@ class SessionQueueValueToInsert(NamedTuple):
 
     # Careful with the ordering of this - it must match the insert statement
     queue_id: str  # queue_id
-    session: str  # session json
+    session: Optional[str]  # session json, None if the session is created from the batch when dequeued
     session_id: str  # session_id
     batch_id: str  # batch_id
     field_values: Optional[str]  # field_values json
@@ -475,26 +498,46 @@ class SessionQueueValueToInsert(NamedTuple):
 ValuesToInsert: TypeAlias = list[SessionQueueValueToInsert]
 
 
-def prepare_values_to_insert(queue_id: str, batch: Batch, priority: int, max_new_queue_items: int) -> ValuesToInsert:
-    values_to_insert: ValuesToInsert = []
-    for session, field_values, workflow in create_session_nfv_tuples(batch, max_new_queue_items):
+def iterate_values_to_insert(
+    queue_id: str, batch: Batch, priority: int, max_new_queue_items: int, lazy: bool = False
+) -> Generator[SessionQueueValueToInsert, None, None]:
+    """
+    Lazily creates the values to insert for each session of the batch. Sessions are only created and serialized as the
+    values are consumed, so a large batch can be inserted in chunks without holding all of its sessions in memory.
+
+    If `lazy` is set, sessions are not created at all. The values only hold the session id and field values, and the
+    session is created from the batch's graph when the queue item is dequeued. The workflow is stored with the batch.
+    """
+    # all sessions of the batch share the workflow, so it is only serialized once
+    workflow_json = json.dumps(batch.workflow, default=to_jsonable_python) if batch.workflow and not lazy else None
+    for field_values in create_field_values(batch, max_new_queue_items):
         # sessions must have unique id
-        session.id = uuid_string()
-        values_to_insert.append(
-            SessionQueueValueToInsert(
-                queue_id,  # queue_id
-                session.model_dump_json(warnings=False, exclude_none=True),  # session (json)
-                session.id,  # session_id
-                batch.batch_id,  # batch_id
-                # must use pydantic_encoder bc field_values is a list of models
-                json.dumps(field_values, default=to_jsonable_python) if field_values else None,  # field_values (json)
-                priority,  # priority
-                json.dumps(workflow, default=to_jsonable_python) if workflow else None,  # workflow (json)
-                batch.origin,  # origin
-                batch.destination,  # destination
+        session_id = uuid_string()
+        session_json = (
+            None
+            if lazy
+            else create_session_from_field_values(batch.graph, field_values, session_id).model_dump_json(
+                warnings=False, exclude_none=True
             )
         )
-    return values_to_insert
+        yield SessionQueueValueToInsert(
+            queue_id,  # queue_id
+            session_json,  # session (json)
+            session_id,  # session_id
+            batch.batch_id,  # batch_id
+            # must use pydantic_encoder bc field_values is a list of models
+            json.dumps(field_values, default=to_jsonable_python) if field_values else None,  # field_values (json)
+            priority,  # priority
+            workflow_json,  # workflow (json)
+            batch.origin,  # origin
+            batch.destination,  # destination
+        )
+
+
+def prepare_values_to_insert(
+    queue_id: str, batch: Batch, priority: int, max_new_queue_items: int, lazy: bool = False
+) -> ValuesToInsert:
+    return list(iterate_values_to_insert(queue_id, batch, priority, max_new_queue_items, lazy))
 
 
 # endregion Util
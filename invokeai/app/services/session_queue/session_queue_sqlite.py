@@ -1,5 +1,7 @@
 import sqlite3
 import threading
+from collections import OrderedDict
+from itertools import islice
 from typing import Optional, Union, cast
 
 from invokeai.app.services.invoker import Invoker
@@ -23,18 +25,60 @@ from invokeai.app.services.session_queue.session_queue_common import (
     SessionQueueItemNotFoundError,
     SessionQueueStatus,
     calc_session_count,
-    prepare_values_to_insert,
+    create_session_from_field_values,
+    get_field_values,
+    get_workflow,
+    iterate_values_to_insert,
 )
-from invokeai.app.services.shared.graph import GraphExecutionState
+from invokeai.app.services.shared.graph import Graph, GraphExecutionState
 from invokeai.app.services.shared.pagination import CursorPaginatedResults
 from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
 
+# The number of queue items inserted per transaction when enqueuing a batch
+ENQUEUE_CHUNK_SIZE = 100
+
+# The number of batch graphs kept in memory to create the sessions of lazily expanded batches
+BATCH_TEMPLATE_CACHE_SIZE = 8
+
+# `UPDATE ... RETURNING` requires SQLite 3.35.0. Older versions fall back to updating and then selecting the row.
+SQLITE_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Selects the id of the next pending item across all queues. The counts table gives the queues with pending items, and
+# the next item of each queue is found with the `(queue_id, status, priority DESC, item_id)` index.
+NEXT_PENDING_ITEM_ID_QUERY = """--sql
+    SELECT q.item_id
+    FROM session_queue_status_counts AS c
+    JOIN session_queue AS q ON q.item_id = (
+        SELECT item_id
+        FROM session_queue
+        WHERE queue_id = c.queue_id AND status = 'pending'
+        ORDER BY priority DESC, item_id ASC
+        LIMIT 1
+    )
+    WHERE c.status = 'pending' AND c.count > 0
+    ORDER BY q.priority DESC, q.item_id ASC
+    LIMIT 1
+    """
+
+# The timestamps are also set by triggers, but values set by triggers are not returned by `RETURNING`. `STRFTIME` has
+# the same value for the whole statement, including its triggers, so the returned values match the stored ones. The new
+# status is bound to the `:status` parameter.
+SET_STATUS_TIMESTAMPS = """--sql
+    updated_at = STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW'),
+    started_at = CASE WHEN :status = 'in_progress' THEN STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW') ELSE started_at END,
+    completed_at = CASE
+      WHEN :status IN ('completed', 'failed', 'canceled') THEN STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')
+      ELSE completed_at
+    END
+    """
+
 
 class SqliteSessionQueue(SessionQueueBase):
     __invoker: Invoker
     __conn: sqlite3.Connection
     __cursor: sqlite3.Cursor
     __lock: threading.RLock
+    __batch_templates: OrderedDict[str, tuple[Graph, Optional[str]]]
 
     def start(self, invoker: Invoker) -> None:
         self.__invoker = invoker
@@ -53,6 +97,7 @@ class SqliteSessionQueue(SessionQueueBase):
         self.__lock = db.lock
         self.__conn = db.conn
         self.__cursor = self.__conn.cursor()
+        self.__batch_templates = OrderedDict()
 
     def _set_in_progress_to_canceled(self) -> None:
         """
@@ -78,15 +123,28 @@ class SqliteSessionQueue(SessionQueueBase):
         """Gets the current number of pending queue items"""
         self.__cursor.execute(
             """--sql
-            SELECT count(*)
-            FROM session_queue
+            SELECT count
+            FROM session_queue_status_counts
             WHERE
               queue_id = ?
               AND status = 'pending'
             """,
             (queue_id,),
         )
-        return cast(int, self.__cursor.fetchone()[0])
+        result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+        return cast(int, result[0]) if result else 0
+
+    def _get_queue_size(self, queue_id: str) -> int:
+        """Gets the total number of queue items"""
+        self.__cursor.execute(
+            """--sql
+            SELECT SUM(count)
+            FROM session_queue_status_counts
+            WHERE queue_id = ?
+            """,
+            (queue_id,),
+        )
+        return cast(Union[int, None], self.__cursor.fetchone()[0]) or 0
 
     def _get_highest_priority(self, queue_id: str) -> int:
         """Gets the highest priority value in the queue"""
@@ -114,57 +172,184 @@ class SqliteSessionQueue(SessionQueueBase):
             priority = 0
             if prepend:
                 priority = self._get_highest_priority(queue_id) + 1
+        finally:
+            self.__lock.release()
 
-            requested_count = calc_session_count(batch)
-            values_to_insert = prepare_values_to_insert(
-                queue_id=queue_id,
-                batch=batch,
-                priority=priority,
-                max_new_queue_items=max_new_queue_items,
-            )
-            enqueued_count = len(values_to_insert)
-
-            if requested_count > enqueued_count:
-                values_to_insert = values_to_insert[:max_new_queue_items]
+        # When expanding batches lazily, the graph and workflow are stored once with the batch, and each queue item only
+        # stores its field values
+        lazy = self.__invoker.services.configuration.lazy_batch_expansion
+        requested_count = calc_session_count(batch)
+        enqueued_count = max(0, min(requested_count, max_new_queue_items))
+        values_to_insert = iterate_values_to_insert(
+            queue_id=queue_id,
+            batch=batch,
+            priority=priority,
+            max_new_queue_items=max_new_queue_items,
+            lazy=lazy,
+        )
 
-            self.__cursor.executemany(
-                """--sql
-                INSERT INTO session_queue (queue_id, session, session_id, batch_id, field_values, priority, workflow, origin, destination)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                values_to_insert,
-            )
-            self.__conn.commit()
+        # Sessions are created and inserted in chunks, so that large batches are never held in memory all at once.
+        # The lock is released between chunks, so the queue can be dequeued from while the batch is being enqueued.
+        # Other batches may be enqueued at the same time too, so the room left in the queue is checked again before
+        # each chunk is inserted.
+        inserted_count = 0
+        try:
+            while chunk := list(islice(values_to_insert, ENQUEUE_CHUNK_SIZE)):
+                try:
+                    self.__lock.acquire()
+                    room = max_queue_size - self._get_current_queue_size(queue_id)
+                    if room < len(chunk):
+                        chunk = chunk[: max(0, room)]
+                        enqueued_count = inserted_count + len(chunk)
+                    if not chunk:
+                        break
+                    if lazy and inserted_count == 0:
+                        self._insert_batch_template(queue_id, batch)
+                    self.__cursor.executemany(
+                        """--sql
+                        INSERT INTO session_queue (queue_id, session, session_id, batch_id, field_values, priority, workflow, origin, destination)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        chunk,
+                    )
+                    self.__conn.commit()
+                except Exception:
+                    self.__conn.rollback()
+                    raise
+                finally:
+                    self.__lock.release()
+                inserted_count += len(chunk)
+                self.__invoker.services.events.emit_batch_enqueue_progress(
+                    queue_id=queue_id, batch=batch, enqueued=inserted_count, total=enqueued_count
+                )
+                if inserted_count == enqueued_count:
+                    break
         except Exception:
-            self.__conn.rollback()
+            # Don't leave a partially enqueued batch behind. The queue items of earlier chunks may already have been
+            # dequeued, so the pending ones are deleted and the ones in progress are canceled. Finished ones are kept.
+            if inserted_count > 0:
+                self._delete_pending_batch_items(queue_id=queue_id, batch_id=batch.batch_id)
+                self.cancel_by_batch_ids(queue_id=queue_id, batch_ids=[batch.batch_id])
             raise
-        finally:
-            self.__lock.release()
+
         enqueue_result = EnqueueBatchResult(
             queue_id=queue_id,
             requested=requested_count,
-            enqueued=enqueued_count,
+            enqueued=inserted_count,
             batch=batch,
             priority=priority,
         )
         self.__invoker.services.events.emit_batch_enqueued(enqueue_result)
         return enqueue_result
 
-    def dequeue(self) -> Optional[SessionQueueItem]:
+    def _insert_batch_template(self, queue_id: str, batch: Batch) -> None:
+        """Stores the graph and workflow shared by the queue items of a lazily expanded batch. Must hold the lock."""
+        self.__cursor.execute(
+            """--sql
+            INSERT INTO session_queue_batches (batch_id, queue_id, graph, workflow)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (batch_id) DO NOTHING
+            """,
+            (
+                batch.batch_id,
+                queue_id,
+                batch.graph.model_dump_json(warnings=False, exclude_none=True),
+                batch.workflow.model_dump_json() if batch.workflow else None,
+            ),
+        )
+
+    def _get_batch_template(self, batch_id: str) -> tuple[Graph, Optional[str]]:
+        """Gets the graph and workflow json of a lazily expanded batch. The most recently used graphs are cached."""
         try:
             self.__lock.acquire()
+            template = self.__batch_templates.get(batch_id)
+            if template is not None:
+                self.__batch_templates.move_to_end(batch_id)
+                return template
             self.__cursor.execute(
                 """--sql
-                SELECT *
-                FROM session_queue
-                WHERE status = 'pending'
-                ORDER BY
-                  priority DESC,
-                  item_id ASC
-                LIMIT 1
-                """
+                SELECT graph, workflow
+                FROM session_queue_batches
+                WHERE batch_id = ?
+                """,
+                (batch_id,),
             )
             result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+            if result is None:
+                raise SessionQueueItemNotFoundError(f"No batch with id {batch_id}")
+            template = (Graph.model_validate_json(result["graph"]), result["workflow"])
+            self.__batch_templates[batch_id] = template
+            if len(self.__batch_templates) > BATCH_TEMPLATE_CACHE_SIZE:
+                self.__batch_templates.popitem(last=False)
+            return template
+        finally:
+            self.__lock.release()
+
+    def _queue_item_from_row(self, row: sqlite3.Row) -> SessionQueueItem:
+        """Creates a queue item from its row. The sessions of lazily expanded batches are created from their batch."""
+        queue_item_dict = dict(row)
+        if queue_item_dict["session"] is not None:
+            return SessionQueueItem.queue_item_from_dict(queue_item_dict)
+        graph, workflow = self._get_batch_template(queue_item_dict["batch_id"])
+        queue_item_dict["workflow"] = workflow
+        queue_item_dict["field_values"] = get_field_values(queue_item_dict)
+        queue_item_dict["workflow"] = get_workflow(queue_item_dict)
+        queue_item_dict["session"] = create_session_from_field_values(
+            graph, queue_item_dict["field_values"] or [], queue_item_dict["session_id"]
+        )
+        return SessionQueueItem(**queue_item_dict)
+
+    def _delete_pending_batch_items(self, queue_id: str, batch_id: str) -> None:
+        try:
+            self.__lock.acquire()
+            self.__cursor.execute(
+                """--sql
+                DELETE
+                FROM session_queue
+                WHERE
+                  queue_id = ?
+                  AND batch_id = ?
+                  AND status = 'pending'
+                """,
+                (queue_id, batch_id),
+            )
+            self.__conn.commit()
+        except Exception:
+            self.__conn.rollback()
+            raise
+        finally:
+            self.__lock.release()
+
+    def dequeue(self) -> Optional[SessionQueueItem]:
+        # The next item is claimed in a single statement while holding the lock, so that concurrent session workers
+        # never claim the same item. The claim only succeeds if the item is still pending, which also guards against
+        # other connections to the database.
+        try:
+            self.__lock.acquire()
+            if SQLITE_SUPPORTS_RETURNING:
+                self.__cursor.execute(
+                    f"""--sql
+                    UPDATE session_queue
+                    SET status = :status, {SET_STATUS_TIMESTAMPS}
+                    WHERE item_id = ({NEXT_PENDING_ITEM_ID_QUERY}) AND status = 'pending'
+                    RETURNING *
+                    """,
+                    {"status": "in_progress"},
+                )
+                result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+            else:
+                result = None
+                self.__cursor.execute(NEXT_PENDING_ITEM_ID_QUERY)
+                next_item = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+                if next_item is not None:
+                    self.__cursor.execute(
+                        "UPDATE session_queue SET status = 'in_progress' WHERE item_id = ? AND status = 'pending'",
+                        (next_item[0],),
+                    )
+                    if self.__cursor.rowcount == 1:
+                        self.__cursor.execute("SELECT * FROM session_queue WHERE item_id = ?", (next_item[0],))
+                        result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+            self.__conn.commit()
         except Exception:
             self.__conn.rollback()
             raise
@@ -172,8 +357,8 @@ class SqliteSessionQueue(SessionQueueBase):
             self.__lock.release()
         if result is None:
             return None
-        queue_item = SessionQueueItem.queue_item_from_dict(dict(result))
-        queue_item = self._set_queue_item_status(item_id=queue_item.item_id, status="in_progress")
+        queue_item = self._queue_item_from_row(result)
+        self._emit_queue_item_status_changed(queue_item)
         return queue_item
 
     def get_next(self, queue_id: str) -> Optional[SessionQueueItem]:
@@ -201,7 +386,32 @@ class SqliteSessionQueue(SessionQueueBase):
             self.__lock.release()
         if result is None:
             return None
-        return SessionQueueItem.queue_item_from_dict(dict(result))
+        return self._queue_item_from_row(result)
+
+    def get_next_items(self, queue_id: str, limit: int) -> list[SessionQueueItem]:
+        try:
+            self.__lock.acquire()
+            self.__cursor.execute(
+                """--sql
+                SELECT *
+                FROM session_queue
+                WHERE
+                  queue_id = ?
+                  AND status = 'pending'
+                ORDER BY
+                  priority DESC,
+                  item_id ASC
+                LIMIT ?
+                """,
+                (queue_id, limit),
+            )
+            results = cast(list[sqlite3.Row], self.__cursor.fetchall())
+        except Exception:
+            self.__conn.rollback()
+            raise
+        finally:
+            self.__lock.release()
+        return [self._queue_item_from_row(result) for result in results]
 
     def get_current(self, queue_id: str) -> Optional[SessionQueueItem]:
         try:
@@ -225,7 +435,30 @@ class SqliteSessionQueue(SessionQueueBase):
             self.__lock.release()
         if result is None:
             return None
-        return SessionQueueItem.queue_item_from_dict(dict(result))
+        return self._queue_item_from_row(result)
+
+    def _get_in_progress_items(self, queue_id: str) -> list[SessionQueueItem]:
+        """Gets all in-progress queue items. There is more than one when several session workers are running."""
+        try:
+            self.__lock.acquire()
+            self.__cursor.execute(
+                """--sql
+                SELECT *
+                FROM session_queue
+                WHERE
+                  queue_id = ?
+                  AND status = 'in_progress'
+                ORDER BY item_id ASC
+                """,
+                (queue_id,),
+            )
+            results = cast(list[sqlite3.Row], self.__cursor.fetchall())
+        except Exception:
+            self.__conn.rollback()
+            raise
+        finally:
+            self.__lock.release()
+        return [self._queue_item_from_row(result) for result in results]
 
     def _set_queue_item_status(
         self,
@@ -237,38 +470,64 @@ class SqliteSessionQueue(SessionQueueBase):
     ) -> SessionQueueItem:
         try:
             self.__lock.acquire()
-            self.__cursor.execute(
-                """--sql
-                UPDATE session_queue
-                SET status = ?, error_type = ?, error_message = ?, error_traceback = ?
-                WHERE item_id = ?
-                """,
-                (status, error_type, error_message, error_traceback, item_id),
-            )
+            params = {
+                "status": status,
+                "error_type": error_type,
+                "error_message": error_message,
+                "error_traceback": error_traceback,
+                "item_id": item_id,
+            }
+            if SQLITE_SUPPORTS_RETURNING:
+                self.__cursor.execute(
+                    f"""--sql
+                    UPDATE session_queue
+                    SET
+                      status = :status,
+                      error_type = :error_type,
+                      error_message = :error_message,
+                      error_traceback = :error_traceback,
+                      {SET_STATUS_TIMESTAMPS}
+                    WHERE item_id = :item_id
+                    RETURNING *
+                    """,
+                    params,
+                )
+            else:
+                self.__cursor.execute(
+                    """--sql
+                    UPDATE session_queue
+                    SET
+                      status = :status,
+                      error_type = :error_type,
+                      error_message = :error_message,
+                      error_traceback = :error_traceback
+                    WHERE item_id = :item_id
+                    """,
+                    params,
+                )
+                self.__cursor.execute("SELECT * FROM session_queue WHERE item_id = ?", (item_id,))
+            result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
             self.__conn.commit()
         except Exception:
             self.__conn.rollback()
             raise
         finally:
             self.__lock.release()
-        queue_item = self.get_queue_item(item_id)
+        if result is None:
+            raise SessionQueueItemNotFoundError(f"No queue item with id {item_id}")
+        queue_item = self._queue_item_from_row(result)
+        self._emit_queue_item_status_changed(queue_item)
+        return queue_item
+
+    def _emit_queue_item_status_changed(self, queue_item: SessionQueueItem) -> None:
         batch_status = self.get_batch_status(queue_id=queue_item.queue_id, batch_id=queue_item.batch_id)
         queue_status = self.get_queue_status(queue_id=queue_item.queue_id)
         self.__invoker.services.events.emit_queue_item_status_changed(queue_item, batch_status, queue_status)
-        return queue_item
 
     def is_empty(self, queue_id: str) -> IsEmptyResult:
         try:
             self.__lock.acquire()
-            self.__cursor.execute(
-                """--sql
-                SELECT count(*)
-                FROM session_queue
-                WHERE queue_id = ?
-                """,
-                (queue_id,),
-            )
-            is_empty = cast(int, self.__cursor.fetchone()[0]) == 0
+            is_empty = self._get_queue_size(queue_id) == 0
         except Exception:
             self.__conn.rollback()
             raise
@@ -279,16 +538,8 @@ class SqliteSessionQueue(SessionQueueBase):
     def is_full(self, queue_id: str) -> IsFullResult:
         try:
             self.__lock.acquire()
-            self.__cursor.execute(
-                """--sql
-                SELECT count(*)
-                FROM session_queue
-                WHERE queue_id = ?
-                """,
-                (queue_id,),
-            )
             max_queue_size = self.__invoker.services.configuration.max_queue_size
-            is_full = cast(int, self.__cursor.fetchone()[0]) >= max_queue_size
+            is_full = self._get_queue_size(queue_id) >= max_queue_size
         except Exception:
             self.__conn.rollback()
             raise
@@ -299,15 +550,7 @@ class SqliteSessionQueue(SessionQueueBase):
     def clear(self, queue_id: str) -> ClearResult:
         try:
             self.__lock.acquire()
-            self.__cursor.execute(
-                """--sql
-                SELECT COUNT(*)
-                FROM session_queue
-                WHERE queue_id = ?
-                """,
-                (queue_id,),
-            )
-            count = self.__cursor.fetchone()[0]
+            count = self._get_queue_size(queue_id)
             self.__cursor.execute(
                 """--sql
                 DELETE
@@ -388,7 +631,7 @@ class SqliteSessionQueue(SessionQueueBase):
 
     def cancel_by_batch_ids(self, queue_id: str, batch_ids: list[str]) -> CancelByBatchIDsResult:
         try:
-            current_queue_item = self.get_current(queue_id)
+            in_progress_items = self._get_in_progress_items(queue_id)
             self.__lock.acquire()
             placeholders = ", ".join(["?" for _ in batch_ids])
             where = f"""--sql
@@ -418,8 +661,9 @@ class SqliteSessionQueue(SessionQueueBase):
                 tuple(params),
             )
             self.__conn.commit()
-            if current_queue_item is not None and current_queue_item.batch_id in batch_ids:
-                self._set_queue_item_status(current_queue_item.item_id, "canceled")
+            for current_queue_item in in_progress_items:
+                if current_queue_item.batch_id in batch_ids:
+                    self._set_queue_item_status(current_queue_item.item_id, "canceled")
         except Exception:
             self.__conn.rollback()
             raise
@@ -429,7 +673,7 @@ class SqliteSessionQueue(SessionQueueBase):
 
     def cancel_by_destination(self, queue_id: str, destination: str) -> CancelByDestinationResult:
         try:
-            current_queue_item = self.get_current(queue_id)
+            in_progress_items = self._get_in_progress_items(queue_id)
             self.__lock.acquire()
             where = """--sql
                 WHERE
@@ -458,8 +702,9 @@ class SqliteSessionQueue(SessionQueueBase):
                 params,
             )
             self.__conn.commit()
-            if current_queue_item is not None and current_queue_item.destination == destination:
-                self._set_queue_item_status(current_queue_item.item_id, "canceled")
+            for current_queue_item in in_progress_items:
+                if current_queue_item.destination == destination:
+                    self._set_queue_item_status(current_queue_item.item_id, "canceled")
         except Exception:
             self.__conn.rollback()
             raise
@@ -469,7 +714,7 @@ class SqliteSessionQueue(SessionQueueBase):
 
     def cancel_by_queue_id(self, queue_id: str) -> CancelByQueueIDResult:
         try:
-            current_queue_item = self.get_current(queue_id)
+            in_progress_items = self._get_in_progress_items(queue_id)
             self.__lock.acquire()
             where = """--sql
                 WHERE
@@ -497,7 +742,7 @@ class SqliteSessionQueue(SessionQueueBase):
                 tuple(params),
             )
             self.__conn.commit()
-            if current_queue_item is not None and current_queue_item.queue_id == queue_id:
+            for current_queue_item in in_progress_items:
                 batch_status = self.get_batch_status(queue_id=queue_id, batch_id=current_queue_item.batch_id)
                 queue_status = self.get_queue_status(queue_id=queue_id)
                 self.__invoker.services.events.emit_queue_item_status_changed(
@@ -529,7 +774,7 @@ class SqliteSessionQueue(SessionQueueBase):
             self.__lock.release()
         if result is None:
             raise SessionQueueItemNotFoundError(f"No queue item with id {item_id}")
-        return SessionQueueItem.queue_item_from_dict(dict(result))
+        return self._queue_item_from_row(result)
 
     def set_queue_item_session(self, item_id: int, session: GraphExecutionState) -> SessionQueueItem:
         try:
@@ -626,10 +871,9 @@ class SqliteSessionQueue(SessionQueueBase):
             self.__lock.acquire()
             self.__cursor.execute(
                 """--sql
-                SELECT status, count(*)
-                FROM session_queue
+                SELECT status, count
+                FROM session_queue_status_counts
                 WHERE queue_id = ?
-                GROUP BY status
                 """,
                 (queue_id,),
             )
@@ -661,20 +905,32 @@ class SqliteSessionQueue(SessionQueueBase):
             self.__lock.acquire()
             self.__cursor.execute(
                 """--sql
-                SELECT status, count(*), origin, destination
-                FROM session_queue
+                SELECT status, count
+                FROM session_queue_batch_status_counts
                 WHERE
                   queue_id = ?
                   AND batch_id = ?
-                GROUP BY status
                 """,
                 (queue_id, batch_id),
             )
             result = cast(list[sqlite3.Row], self.__cursor.fetchall())
             total = sum(row[1] for row in result)
             counts: dict[str, int] = {row[0]: row[1] for row in result}
-            origin = result[0]["origin"] if result else None
-            destination = result[0]["destination"] if result else None
+            # All items of a batch share the same origin and destination
+            self.__cursor.execute(
+                """--sql
+                SELECT origin, destination
+                FROM session_queue
+                WHERE
+                  batch_id = ?
+                  AND queue_id = ?
+                LIMIT 1
+                """,
+                (batch_id, queue_id),
+            )
+            batch_item = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+            origin = batch_item["origin"] if batch_item else None
+            destination = batch_item["destination"] if batch_item else None
         except Exception:
             self.__conn.rollback()
             raise
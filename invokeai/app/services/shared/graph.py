@@ -1,14 +1,16 @@
 # Copyright (c) 2022 Kyle Schouviller (https://github.com/kyle0654)
 
 import copy
+import heapq
 import itertools
-from typing import Any, Optional, TypeVar, Union, get_args, get_origin, get_type_hints
+from typing import Any, Iterable, Optional, TypeVar, Union, get_args, get_origin, get_type_hints
 
 import networkx as nx
 from pydantic import (
     BaseModel,
     GetCoreSchemaHandler,
     GetJsonSchemaHandler,
+    PrivateAttr,
     ValidationError,
     field_validator,
 )
@@ -330,6 +332,22 @@ class Graph(BaseModel):
         default_factory=list,
     )
 
+    # Memoized views of the graph layout, derived from `nodes` and `edges`. They are cleared by the mutation methods
+    # and are never serialized. Code that modifies `nodes` or `edges` directly must call `_invalidate_cache()`.
+    _nx_graph_cache: Optional[nx.DiGraph] = PrivateAttr(default=None)
+    _nx_graph_with_data_cache: Optional[nx.DiGraph] = PrivateAttr(default=None)
+    _nx_graph_flat_cache: Optional[nx.DiGraph] = PrivateAttr(default=None)
+    _iterator_graph_cache: Optional[nx.DiGraph] = PrivateAttr(default=None)
+    _topological_order_cache: Optional[list[str]] = PrivateAttr(default=None)
+    _ancestors_cache: dict[str, set[str]] = PrivateAttr(default_factory=dict)
+    _node_iterators_cache: dict[str, list[str]] = PrivateAttr(default_factory=dict)
+
+    # Indexes of edges by node id and field, in edge order. They are built lazily and then maintained by the edge
+    # mutation methods, and are never serialized. Code that modifies `edges` directly must call
+    # `_invalidate_edge_index()`.
+    _input_edges_index: Optional[dict[str, dict[str, list[Edge]]]] = PrivateAttr(default=None)
+    _output_edges_index: Optional[dict[str, dict[str, list[Edge]]]] = PrivateAttr(default=None)
+
     def add_node(self, node: BaseInvocation) -> None:
         """Adds a node to a graph
 
@@ -340,6 +358,7 @@ class Graph(BaseModel):
             raise NodeAlreadyInGraphError()
 
         self.nodes[node.id] = node
+        self._invalidate_cache()
 
     def delete_node(self, node_id: str) -> None:
         """Deletes a node from a graph"""
@@ -356,21 +375,26 @@ class Graph(BaseModel):
                 self.delete_edge(edge)
 
             del self.nodes[node_id]
+            self._invalidate_cache()
 
         except NodeNotFoundError:
             pass  # Ignore, not doesn't exist (should this throw?)
 
-    def add_edge(self, edge: Edge) -> None:
+    def add_edge(self, edge: Edge, validate: bool = True) -> None:
         """Adds an edge to a graph
 
+        :param validate: whether to validate the edge. Only skip validation for edges that are known to be valid, such
+            as copies of edges from an already-validated graph.
         :raises InvalidEdgeError: the provided edge is invalid.
         """
 
-        self._validate_edge(edge)
-        if edge not in self.edges:
-            self.edges.append(edge)
-        else:
-            raise InvalidEdgeError()
+        if validate:
+            self._validate_edge(edge)
+            if edge in self._get_input_edges(edge.destination.node_id, edge.destination.field):
+                raise InvalidEdgeError()
+        self.edges.append(edge)
+        self._index_edge(edge)
+        self._invalidate_cache()
 
     def delete_edge(self, edge: Edge) -> None:
         """Deletes an edge from a graph"""
@@ -379,6 +403,8 @@ class Graph(BaseModel):
             self.edges.remove(edge)
         except KeyError:
             pass
+        self._unindex_edge(edge)
+        self._invalidate_cache()
 
     def validate_self(self) -> None:
         """
@@ -394,6 +420,10 @@ class Graph(BaseModel):
         - `InvalidEdgeError`
         """
 
+        # The nodes and edges may have been modified directly, so don't trust any memoized views or indexes
+        self._invalidate_cache()
+        self._invalidate_edge_index()
+
         # Validate that all node ids are unique
         node_ids = [n.id for n in self.nodes.values()]
         duplicate_node_ids = {node_id for node_id in node_ids if node_ids.count(node_id) >= 2}
@@ -500,10 +530,13 @@ class Graph(BaseModel):
                 f"Edge to node {edge.destination.node_id} field {edge.destination.field} already exists"
             )
 
-        # Validate that no cycles would be created
+        # Validate that no cycles would be created, i.e. that the source is not reachable from the destination
         g = self.nx_graph_flat()
-        g.add_edge(edge.source.node_id, edge.destination.node_id)
-        if not nx.is_directed_acyclic_graph(g):
+        if edge.source.node_id == edge.destination.node_id or (
+            edge.source.node_id in g
+            and edge.destination.node_id in g
+            and nx.has_path(g, edge.destination.node_id, edge.source.node_id)
+        ):
             raise InvalidEdgeError(
                 f"Edge creates a cycle in the graph: {edge.source.node_id} -> {edge.destination.node_id}"
             )
@@ -582,6 +615,7 @@ class Graph(BaseModel):
 
         # Set the new node in the graph
         self.nodes[new_node.id] = new_node
+        self._invalidate_cache()
         if new_node.id != node.id:
             input_edges = self._get_input_edges(node_id)
             output_edges = self._get_output_edges(node_id)
@@ -608,26 +642,54 @@ class Graph(BaseModel):
 
     def _get_input_edges(self, node_id: str, field: Optional[str] = None) -> list[Edge]:
         """Gets all input edges for a node. If field is provided, only edges to that field are returned."""
-
-        edges = [e for e in self.edges if e.destination.node_id == node_id]
-
-        if field is None:
-            return edges
-
-        filtered_edges = [e for e in edges if e.destination.field == field]
-
-        return filtered_edges
+        input_edges_index, _ = self._get_edge_indexes()
+        return self._get_indexed_edges(input_edges_index, node_id, field)
 
     def _get_output_edges(self, node_id: str, field: Optional[str] = None) -> list[Edge]:
         """Gets all output edges for a node. If field is provided, only edges from that field are returned."""
-        edges = [e for e in self.edges if e.source.node_id == node_id]
+        _, output_edges_index = self._get_edge_indexes()
+        return self._get_indexed_edges(output_edges_index, node_id, field)
+
+    @staticmethod
+    def _get_indexed_edges(index: dict[str, dict[str, list[Edge]]], node_id: str, field: Optional[str]) -> list[Edge]:
+        edges_by_field = index.get(node_id)
+        if edges_by_field is None:
+            return []
 
         if field is None:
-            return edges
+            return list(itertools.chain.from_iterable(edges_by_field.values()))
+
+        return list(edges_by_field.get(field, []))
+
+    def _get_edge_indexes(self) -> tuple[dict[str, dict[str, list[Edge]]], dict[str, dict[str, list[Edge]]]]:
+        """Gets the input and output edge indexes, building them from the edge list if needed"""
+        if self._input_edges_index is None or self._output_edges_index is None:
+            self._input_edges_index = {}
+            self._output_edges_index = {}
+            for edge in self.edges:
+                self._index_edge(edge)
+        return self._input_edges_index, self._output_edges_index
+
+    def _index_edge(self, edge: Edge) -> None:
+        if self._input_edges_index is None or self._output_edges_index is None:
+            return  # The indexes will include the edge when they are built
+        self._input_edges_index.setdefault(edge.destination.node_id, {}).setdefault(edge.destination.field, []).append(
+            edge
+        )
+        self._output_edges_index.setdefault(edge.source.node_id, {}).setdefault(edge.source.field, []).append(edge)
 
-        filtered_edges = [e for e in edges if e.source.field == field]
+    def _unindex_edge(self, edge: Edge) -> None:
+        if self._input_edges_index is None or self._output_edges_index is None:
+            return
+        for index, conn in ((self._input_edges_index, edge.destination), (self._output_edges_index, edge.source)):
+            edges = index.get(conn.node_id, {}).get(conn.field)
+            if edges is not None and edge in edges:
+                edges.remove(edge)
 
-        return filtered_edges
+    def _invalidate_edge_index(self) -> None:
+        """Clears the edge indexes. Must be called whenever the edges are changed directly."""
+        self._input_edges_index = None
+        self._output_edges_index = None
 
     def _is_iterator_connection_valid(
         self,
@@ -711,22 +773,38 @@ class Graph(BaseModel):
         return True
 
     def nx_graph(self) -> nx.DiGraph:
-        """Returns a NetworkX DiGraph representing the layout of this graph"""
-        # TODO: Cache this?
-        g = nx.DiGraph()
-        g.add_nodes_from(list(self.nodes.keys()))
-        g.add_edges_from({(e.source.node_id, e.destination.node_id) for e in self.edges})
-        return g
+        """Returns a NetworkX DiGraph representing the layout of this graph.
+
+        The DiGraph is cached until the graph is next mutated, and is frozen. Copy it before modifying it.
+        """
+        if self._nx_graph_cache is None:
+            g = nx.DiGraph()
+            g.add_nodes_from(list(self.nodes.keys()))
+            g.add_edges_from({(e.source.node_id, e.destination.node_id) for e in self.edges})
+            self._nx_graph_cache = nx.freeze(g)
+        return self._nx_graph_cache
 
     def nx_graph_with_data(self) -> nx.DiGraph:
-        """Returns a NetworkX DiGraph representing the data and layout of this graph"""
-        g = nx.DiGraph()
-        g.add_nodes_from(list(self.nodes.items()))
-        g.add_edges_from({(e.source.node_id, e.destination.node_id) for e in self.edges})
-        return g
+        """Returns a NetworkX DiGraph representing the data and layout of this graph.
+
+        The DiGraph is cached until the graph is next mutated, and is frozen. Copy it before modifying it.
+        """
+        if self._nx_graph_with_data_cache is None:
+            g = nx.DiGraph()
+            g.add_nodes_from(list(self.nodes.items()))
+            g.add_edges_from({(e.source.node_id, e.destination.node_id) for e in self.edges})
+            self._nx_graph_with_data_cache = nx.freeze(g)
+        return self._nx_graph_with_data_cache
 
     def nx_graph_flat(self, nx_graph: Optional[nx.DiGraph] = None) -> nx.DiGraph:
-        """Returns a flattened NetworkX DiGraph, including all subgraphs (but not with iterations expanded)"""
+        """Returns a flattened NetworkX DiGraph, including all subgraphs (but not with iterations expanded).
+
+        If `nx_graph` is provided, the nodes and edges are added to it. Otherwise, the DiGraph is cached until the
+        graph is next mutated, and is frozen. Copy it before modifying it.
+        """
+        if nx_graph is None and self._nx_graph_flat_cache is not None:
+            return self._nx_graph_flat_cache
+
         g = nx_graph or nx.DiGraph()
 
         # Add all nodes from this graph except graph/iteration nodes
@@ -736,8 +814,161 @@ class Graph(BaseModel):
 
         unique_edges = {(e.source.node_id, e.destination.node_id) for e in self.edges}
         g.add_edges_from([(e[0], e[1]) for e in unique_edges])
+
+        if nx_graph is None:
+            self._nx_graph_flat_cache = nx.freeze(g)
         return g
 
+    def _iterator_graph(self) -> nx.DiGraph:
+        """Gets a DiGraph with edges to collectors removed so an ancestor search produces all active iterators for any node"""
+        if self._iterator_graph_cache is None:
+            g = self.nx_graph_flat().copy()
+            collectors = (n for n in self.nodes if isinstance(self.get_node(n), CollectInvocation))
+            for c in collectors:
+                g.remove_edges_from(list(g.in_edges(c)))
+            self._iterator_graph_cache = nx.freeze(g)
+        return self._iterator_graph_cache
+
+    def _get_topological_order(self) -> list[str]:
+        """Gets the nodes of the flattened graph in topological order"""
+        if self._topological_order_cache is None:
+            self._topological_order_cache = list(nx.topological_sort(self.nx_graph_flat()))
+        return self._topological_order_cache
+
+    def _get_ancestors(self, node_id: str) -> set[str]:
+        """Gets the ancestors of a node in the flattened graph"""
+        if node_id not in self._ancestors_cache:
+            self._ancestors_cache[node_id] = nx.ancestors(self.nx_graph_flat(), node_id)
+        return self._ancestors_cache[node_id]
+
+    def _get_node_iterators(self, node_id: str) -> list[str]:
+        """Gets the iterators for a node - its iterate ancestors that are not behind a collector"""
+        if node_id not in self._node_iterators_cache:
+            self._node_iterators_cache[node_id] = [
+                n
+                for n in nx.ancestors(self._iterator_graph(), node_id)
+                if isinstance(self.get_node(n), IterateInvocation)
+            ]
+        return self._node_iterators_cache[node_id]
+
+    def _invalidate_cache(self) -> None:
+        """Clears the memoized views of this graph. Must be called whenever the nodes or edges change."""
+        self._nx_graph_cache = None
+        self._nx_graph_with_data_cache = None
+        self._nx_graph_flat_cache = None
+        self._iterator_graph_cache = None
+        self._topological_order_cache = None
+        self._ancestors_cache = {}
+        self._node_iterators_cache = {}
+
+
+# Priority of a ready node: (has no iterate ancestor, iteration index, iterate node sequence, -depth, node sequence)
+SchedulePriority = tuple[int, int, int, int, int]
+
+
+class ExecutionScheduler:
+    """Incrementally tracks which prepared nodes of an execution graph are ready to execute.
+
+    Instead of re-sorting the whole execution graph every time the next node is requested, the scheduler keeps a count
+    of unexecuted parents for each pending node and a priority queue of the nodes whose parents have all executed.
+
+    A node is only ready once all of its parents have executed, so nodes always run after their dependencies. Among
+    the ready nodes, the order is deterministic, but is not the same as that of a full depth-first sort of the
+    execution graph when several nodes are ready at once:
+    - Nodes that are (or descend from) an iterate node run first, ordered by the lowest iteration index among their
+      iterate ancestors, so collection items are processed in order.
+    - Deeper nodes run before shallower ones, so a branch is executed as far as possible before the next one starts.
+    - Remaining ties are broken by the order in which the nodes were prepared.
+
+    Nodes that have been handed out for execution may be marked as in flight, so that other ready nodes can be
+    dispatched while they run.
+    """
+
+    def __init__(self) -> None:
+        self._sequence = 0
+        self._children: dict[str, list[str]] = {}
+        self._depths: dict[str, int] = {}
+        self._priorities: dict[str, SchedulePriority] = {}
+        # The lowest (iteration index, sequence) of the iterate nodes that are this node or its ancestors
+        self._iteration_ranks: dict[str, Optional[tuple[int, int]]] = {}
+        # The prepared iterate nodes that are this node or its ancestors
+        self._iterators: dict[str, frozenset[str]] = {}
+        # Number of unexecuted parents for each node that has not been executed yet
+        self._pending: dict[str, int] = {}
+        # Heap of ready nodes. Entries for nodes that have since executed or started executing are discarded lazily.
+        self._ready: list[tuple[SchedulePriority, str]] = []
+        # Nodes that are executing but have not completed yet
+        self._in_flight: set[str] = set()
+
+    def add_node(self, node: BaseInvocation, parent_ids: Iterable[str], executed: bool = False) -> None:
+        """Adds a prepared node. All of its parents must have been added already."""
+        if node.id in self._depths:
+            return
+
+        parents = list(dict.fromkeys(parent_ids))
+        sequence = self._sequence
+        self._sequence += 1
+
+        ranks = [r for r in (self._iteration_ranks[p] for p in parents) if r is not None]
+        iterators = frozenset().union(*(self._iterators[p] for p in parents))
+        if isinstance(node, IterateInvocation):
+            ranks.append((node.index, sequence))
+            iterators = iterators | {node.id}
+
+        depth = max((self._depths[p] + 1 for p in parents), default=0)
+        rank = min(ranks, default=None)
+        self._depths[node.id] = depth
+        self._iteration_ranks[node.id] = rank
+        self._iterators[node.id] = iterators
+        self._priorities[node.id] = (
+            0 if rank is not None else 1,
+            rank[0] if rank is not None else 0,
+            rank[1] if rank is not None else 0,
+            -depth,
+            sequence,
+        )
+        self._children[node.id] = []
+        for p in parents:
+            self._children[p].append(node.id)
+
+        if executed:
+            return
+
+        self._pending[node.id] = sum(1 for p in parents if p in self._pending)
+        if self._pending[node.id] == 0:
+            self._push(node.id)
+
+    def complete(self, node_id: str) -> None:
+        """Marks a node as executed, readying any children that no longer wait on other parents."""
+        self._in_flight.discard(node_id)
+        if self._pending.pop(node_id, None) is None:
+            return
+
+        for child_id in self._children[node_id]:
+            if child_id not in self._pending:
+                continue
+            self._pending[child_id] -= 1
+            if self._pending[child_id] == 0:
+                self._push(child_id)
+
+    def start(self, node_id: str) -> None:
+        """Marks a ready node as in flight, so that it is no longer returned by `peek()` while it executes."""
+        if node_id in self._pending:
+            self._in_flight.add(node_id)
+
+    def peek(self) -> Optional[str]:
+        """Gets the highest-priority node that is ready to execute, without removing it from the queue."""
+        while self._ready and (self._ready[0][1] not in self._pending or self._ready[0][1] in self._in_flight):
+            heapq.heappop(self._ready)
+        return self._ready[0][1] if self._ready else None
+
+    def has_iterator(self, node_id: str, iterator_id: str) -> bool:
+        """Checks if the prepared iterate node is the given node or one of its ancestors."""
+        return iterator_id in self._iterators[node_id]
+
+    def _push(self, node_id: str) -> None:
+        heapq.heappush(self._ready, (self._priorities[node_id], node_id))
+
 
 class GraphExecutionState(BaseModel):
     """Tracks the state of a graph execution"""
@@ -777,6 +1008,9 @@ class GraphExecutionState(BaseModel):
         default_factory=dict,
     )
 
+    # Scheduler for the execution graph, derived from the fields above. It is rebuilt lazily and is never serialized.
+    _scheduler: Optional[ExecutionScheduler] = PrivateAttr(default=None)
+
     @field_validator("graph")
     def graph_is_valid(cls, v: Graph):
         """Validates that the graph is valid"""
@@ -784,10 +1018,11 @@ class GraphExecutionState(BaseModel):
         return v
 
     def next(self) -> Optional[BaseInvocation]:
-        """Gets the next node ready to execute."""
+        """Gets the next node ready to execute.
 
-        # TODO: enable multiple nodes to execute simultaneously by tracking currently executing nodes
-        #       possibly with a timeout?
+        Nodes marked as in flight with `set_node_in_flight()` are not returned again, which allows several independent
+        nodes to be executed at the same time.
+        """
 
         # If there are no prepared nodes, prepare some nodes
         next_node = self._get_next_node()
@@ -818,6 +1053,7 @@ class GraphExecutionState(BaseModel):
         # Mark node as executed
         self.executed.add(node_id)
         self.results[node_id] = output
+        self._get_scheduler().complete(node_id)
 
         # Check if source node is complete (all prepared nodes are complete)
         source_node = self.prepared_source_mapping[node_id]
@@ -827,13 +1063,20 @@ class GraphExecutionState(BaseModel):
             self.executed.add(source_node)
             self.executed_history.append(source_node)
 
+    def set_node_in_flight(self, node_id: str) -> None:
+        """Marks a node returned by `next()` as executing. It stays in flight until it is completed.
+
+        In-flight nodes are not serialized; a deserialized execution state will return them from `next()` again.
+        """
+        self._get_scheduler().start(node_id)
+
     def set_node_error(self, node_id: str, error: str):
         """Marks a node as errored"""
         self.errors[node_id] = error
 
     def is_complete(self) -> bool:
         """Returns true if the graph is complete"""
-        node_ids = set(self.graph.nx_graph_flat().nodes)
+        node_ids = self.graph.nx_graph_flat().nodes
         return self.has_error() or all((k in self.executed for k in node_ids))
 
     def has_error(self) -> bool:
@@ -902,25 +1145,27 @@ class GraphExecutionState(BaseModel):
                     source=edge.source,
                     destination=EdgeConnection(node_id=new_node.id, field=edge.destination.field),
                 )
-                self.execution_graph.add_edge(new_edge)
+                # The edge mirrors an edge of the validated source graph, so it does not need to be validated again
+                self.execution_graph.add_edge(new_edge, validate=False)
 
+            self._get_scheduler().add_node(new_node, (e.source.node_id for e in new_edges))
             new_nodes.append(new_node.id)
 
         return new_nodes
 
-    def _iterator_graph(self) -> nx.DiGraph:
-        """Gets a DiGraph with edges to collectors removed so an ancestor search produces all active iterators for any node"""
-        g = self.graph.nx_graph_flat()
-        collectors = (n for n in self.graph.nodes if isinstance(self.graph.get_node(n), CollectInvocation))
-        for c in collectors:
-            g.remove_edges_from(list(g.in_edges(c)))
-        return g
+    def _get_scheduler(self) -> ExecutionScheduler:
+        """Gets the scheduler for the execution graph, rebuilding it from the execution state if needed"""
+        if self._scheduler is None:
+            parents: dict[str, list[str]] = {}
+            for e in self.execution_graph.edges:
+                parents.setdefault(e.destination.node_id, []).append(e.source.node_id)
 
-    def _get_node_iterators(self, node_id: str) -> list[str]:
-        """Gets iterators for a node"""
-        g = self._iterator_graph()
-        iterators = [n for n in nx.ancestors(g, node_id) if isinstance(self.graph.get_node(n), IterateInvocation)]
-        return iterators
+            # Execution nodes are always created after their parents, so insertion order is a topological order
+            scheduler = ExecutionScheduler()
+            for node_id, node in self.execution_graph.nodes.items():
+                scheduler.add_node(node, parents.get(node_id, []), executed=node_id in self.executed)
+            self._scheduler = scheduler
+        return self._scheduler
 
     def _prepare(self) -> Optional[str]:
         # Get flattened source graph
@@ -930,11 +1175,10 @@ class GraphExecutionState(BaseModel):
         # - was not already prepared
         # - is not an iterate node whose inputs have not been executed
         # - does not have an unexecuted iterate ancestor
-        sorted_nodes = nx.topological_sort(g)
         next_node_id = next(
             (
                 n
-                for n in sorted_nodes
+                for n in self.graph._get_topological_order()
                 # exclude nodes that have already been prepared
                 if n not in self.source_prepared_mapping
                 # exclude iterate nodes whose inputs have not been executed
@@ -947,7 +1191,7 @@ class GraphExecutionState(BaseModel):
                     (
                         isinstance(self.graph.get_node(a), IterateInvocation)  # `a` is an iterate ancestor of `n`...
                         and a not in self.executed  # ...that is not executed
-                        for a in nx.ancestors(g, n)  # for all ancestors `a` of node `n`
+                        for a in self.graph._get_ancestors(n)  # for all ancestors `a` of node `n`
                     )
                 )
             ),
@@ -975,16 +1219,15 @@ class GraphExecutionState(BaseModel):
         else:  # Iterators or normal nodes
             # Get all iterator combinations for this node
             # Will produce a list of lists of prepared iterator nodes, from which results can be iterated
-            iterator_nodes = self._get_node_iterators(next_node_id)
+            iterator_nodes = self.graph._get_node_iterators(next_node_id)
             iterator_nodes_prepared = [list(self.source_prepared_mapping[n]) for n in iterator_nodes]
             iterator_node_prepared_combinations = list(itertools.product(*iterator_nodes_prepared))
 
             # Select the correct prepared parents for each iteration
             # For every iterator, the parent must either not be a child of that iterator, or must match the prepared iteration for that iterator
             # TODO: Handle a node mapping to none
-            eg = self.execution_graph.nx_graph_flat()
             prepared_parent_mappings = [
-                [(n, self._get_iteration_node(n, g, eg, it)) for n in next_node_parents]
+                [(n, self._get_iteration_node(n, it)) for n in next_node_parents]
                 for it in iterator_node_prepared_combinations
             ]  # type: ignore
 
@@ -999,8 +1242,6 @@ class GraphExecutionState(BaseModel):
     def _get_iteration_node(
         self,
         source_node_id: str,
-        graph: nx.DiGraph,
-        execution_graph: nx.DiGraph,
         prepared_iterator_nodes: list[str],
     ) -> Optional[str]:
         """Gets the prepared version of the specified source node that matches every iteration specified"""
@@ -1013,48 +1254,30 @@ class GraphExecutionState(BaseModel):
         if prepared_iterator is not None:
             return prepared_iterator
 
-        # Filter to only iterator nodes that are a parent of the specified node, in tuple format (prepared, source)
-        iterator_source_node_mapping = [(n, self.prepared_source_mapping[n]) for n in prepared_iterator_nodes]
-        parent_iterators = [itn for itn in iterator_source_node_mapping if nx.has_path(graph, itn[1], source_node_id)]
+        # Filter to only iterator nodes that are a parent of the specified node
+        source_node_ancestors = self.graph._get_ancestors(source_node_id)
+        parent_iterators = [
+            n
+            for n in prepared_iterator_nodes
+            if self.prepared_source_mapping[n] == source_node_id
+            or self.prepared_source_mapping[n] in source_node_ancestors
+        ]
 
+        scheduler = self._get_scheduler()
         return next(
-            (n for n in prepared_nodes if all(nx.has_path(execution_graph, pit[0], n) for pit in parent_iterators)),
+            (n for n in prepared_nodes if all(scheduler.has_iterator(n, pit) for pit in parent_iterators)),
             None,
         )
 
     def _get_next_node(self) -> Optional[BaseInvocation]:
         """Gets the deepest node that is ready to be executed"""
-        g = self.execution_graph.nx_graph()
-
-        # Perform a topological sort using depth-first search
-        topo_order = list(nx.dfs_postorder_nodes(g))
-
-        # Get all IterateInvocation nodes
-        iterate_nodes = [n for n in topo_order if isinstance(self.execution_graph.nodes[n], IterateInvocation)]
-
-        # Sort the IterateInvocation nodes based on their index attribute
-        iterate_nodes.sort(key=lambda x: self.execution_graph.nodes[x].index)
-
-        # Prioritize IterateInvocation nodes and their children
-        for iterate_node in iterate_nodes:
-            if iterate_node not in self.executed and all((e[0] in self.executed for e in g.in_edges(iterate_node))):
-                return self.execution_graph.nodes[iterate_node]
-
-            # Check the children of the IterateInvocation node
-            for child_node in nx.dfs_postorder_nodes(g, iterate_node):
-                if child_node not in self.executed and all((e[0] in self.executed for e in g.in_edges(child_node))):
-                    return self.execution_graph.nodes[child_node]
-
-        # If no IterateInvocation node or its children are ready, return the first ready node in the topological order
-        for node in topo_order:
-            if node not in self.executed and all((e[0] in self.executed for e in g.in_edges(node))):
-                return self.execution_graph.nodes[node]
-
-        # If no node is found, return None
-        return None
+        next_node_id = self._get_scheduler().peek()
+        if next_node_id is None:
+            return None
+        return self.execution_graph.nodes[next_node_id]
 
     def _prepare_inputs(self, node: BaseInvocation):
-        input_edges = [e for e in self.execution_graph.edges if e.destination.node_id == node.id]
+        input_edges = self.execution_graph._get_input_edges(node.id)
         # Inputs must be deep-copied, else if a node mutates the object, other nodes that get the same input
         # will see the mutation.
         if isinstance(node, CollectInvocation):
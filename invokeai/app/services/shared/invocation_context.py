@@ -230,15 +230,17 @@ class ImagesInterface(InvocationContextInterface):
         Returns:
             The image as a PIL Image object.
         """
-        image = self._services.images.get_pil_image(image_name)
-        if mode and mode != image.mode:
-            try:
-                image = image.convert(mode)
-            except ValueError:
-                self._services.logger.warning(
-                    f"Could not convert image from {image.mode} to {mode}. Using original mode instead."
-                )
-        return image
+        if not mode:
+            return self._services.images.get_pil_image(image_name)
+        try:
+            # The image storage caches the converted images
+            return self._services.images.get_pil_image(image_name, mode)
+        except ValueError:
+            image = self._services.images.get_pil_image(image_name)
+            self._services.logger.warning(
+                f"Could not convert image from {image.mode} to {mode}. Using original mode instead."
+            )
+            return image
 
     def get_metadata(self, image_name: str) -> Optional[MetadataField]:
         """Gets an image's metadata, if it has any.
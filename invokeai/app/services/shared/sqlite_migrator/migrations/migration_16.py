@@ -0,0 +1,135 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration16Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._add_session_queue_dequeue_index(cursor)
+        self._add_session_queue_status_counts(cursor)
+
+    def _add_session_queue_dequeue_index(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds a composite index matching the order in which pending items are dequeued, so the next item of a queue (and
+        the in-progress items) can be found without scanning the table.
+        """
+
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_queue_queue_id_status_priority_item_id ON session_queue(queue_id, status, priority DESC, item_id);"
+        )
+
+    def _add_session_queue_status_counts(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds tables holding the number of queue items per status, for each queue and for each batch. The counts are
+        maintained by triggers, so queue and batch statuses do not need to aggregate the whole session queue.
+        """
+
+        tables = [
+            """--sql
+            CREATE TABLE IF NOT EXISTS session_queue_status_counts (
+                queue_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (queue_id, status)
+            );
+            """,
+            """--sql
+            CREATE TABLE IF NOT EXISTS session_queue_batch_status_counts (
+                queue_id TEXT NOT NULL,
+                batch_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (queue_id, batch_id, status)
+            );
+            """,
+        ]
+
+        triggers = [
+            """--sql
+            CREATE TRIGGER IF NOT EXISTS tg_session_queue_status_counts_insert
+            AFTER INSERT ON session_queue
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO session_queue_status_counts (queue_id, status, count)
+                VALUES (NEW.queue_id, NEW.status, 1)
+                ON CONFLICT (queue_id, status) DO UPDATE SET count = count + 1;
+                INSERT INTO session_queue_batch_status_counts (queue_id, batch_id, status, count)
+                VALUES (NEW.queue_id, NEW.batch_id, NEW.status, 1)
+                ON CONFLICT (queue_id, batch_id, status) DO UPDATE SET count = count + 1;
+            END;
+            """,
+            """--sql
+            CREATE TRIGGER IF NOT EXISTS tg_session_queue_status_counts_delete
+            AFTER DELETE ON session_queue
+            FOR EACH ROW
+            BEGIN
+                UPDATE session_queue_status_counts
+                SET count = count - 1
+                WHERE queue_id = OLD.queue_id AND status = OLD.status;
+                UPDATE session_queue_batch_status_counts
+                SET count = count - 1
+                WHERE queue_id = OLD.queue_id AND batch_id = OLD.batch_id AND status = OLD.status;
+                DELETE FROM session_queue_batch_status_counts
+                WHERE queue_id = OLD.queue_id AND batch_id = OLD.batch_id AND status = OLD.status AND count <= 0;
+            END;
+            """,
+            """--sql
+            CREATE TRIGGER IF NOT EXISTS tg_session_queue_status_counts_update
+            AFTER UPDATE OF status ON session_queue
+            FOR EACH ROW
+            WHEN OLD.status != NEW.status
+            BEGIN
+                UPDATE session_queue_status_counts
+                SET count = count - 1
+                WHERE queue_id = OLD.queue_id AND status = OLD.status;
+                UPDATE session_queue_batch_status_counts
+                SET count = count - 1
+                WHERE queue_id = OLD.queue_id AND batch_id = OLD.batch_id AND status = OLD.status;
+                DELETE FROM session_queue_batch_status_counts
+                WHERE queue_id = OLD.queue_id AND batch_id = OLD.batch_id AND status = OLD.status AND count <= 0;
+                INSERT INTO session_queue_status_counts (queue_id, status, count)
+                VALUES (NEW.queue_id, NEW.status, 1)
+                ON CONFLICT (queue_id, status) DO UPDATE SET count = count + 1;
+                INSERT INTO session_queue_batch_status_counts (queue_id, batch_id, status, count)
+                VALUES (NEW.queue_id, NEW.batch_id, NEW.status, 1)
+                ON CONFLICT (queue_id, batch_id, status) DO UPDATE SET count = count + 1;
+            END;
+            """,
+        ]
+
+        # Populate the counts from the existing queue items
+        backfill = [
+            """--sql
+            INSERT INTO session_queue_status_counts (queue_id, status, count)
+            SELECT queue_id, status, COUNT(*)
+            FROM session_queue
+            GROUP BY queue_id, status;
+            """,
+            """--sql
+            INSERT INTO session_queue_batch_status_counts (queue_id, batch_id, status, count)
+            SELECT queue_id, batch_id, status, COUNT(*)
+            FROM session_queue
+            GROUP BY queue_id, batch_id, status;
+            """,
+        ]
+
+        for stmt in tables + triggers + backfill:
+            cursor.execute(stmt)
+
+
+def build_migration_16() -> Migration:
+    """
+    Build the migration from database version 15 to 16.
+
+    This migration does the following:
+        - Adds a composite index on the session queue's `queue_id`, `status`, `priority` and `item_id` columns.
+        - Adds the `session_queue_status_counts` and `session_queue_batch_status_counts` tables, maintained by
+          triggers on the session queue.
+    """
+    migration_16 = Migration(
+        from_version=15,
+        to_version=16,
+        callback=Migration16Callback(),
+    )
+
+    return migration_16
@@ -0,0 +1,107 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration17Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._make_session_queue_session_nullable(cursor)
+        self._add_session_queue_batches(cursor)
+
+    def _make_session_queue_session_nullable(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Allows the `session` column of the session queue to be NULL, for queue items whose session is created from their
+        batch when they are dequeued.
+
+        SQLite cannot drop a NOT NULL constraint, so the table is rebuilt. Its existing indices and triggers are
+        recreated as they are.
+        """
+
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'session_queue' AND type IN ('index', 'trigger') AND sql IS NOT NULL;"
+        )
+        indices_and_triggers = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'session_queue';")
+        sequence = cursor.fetchone()
+
+        columns = "item_id, batch_id, queue_id, session_id, field_values, session, status, priority, error_traceback, created_at, updated_at, started_at, completed_at, workflow, error_type, error_message, origin, destination"
+
+        cursor.execute(
+            """--sql
+            CREATE TABLE session_queue_new (
+                item_id INTEGER PRIMARY KEY AUTOINCREMENT, -- used for ordering, cursor pagination
+                batch_id TEXT NOT NULL, -- identifier of the batch this queue item belongs to
+                queue_id TEXT NOT NULL, -- identifier of the queue this queue item belongs to
+                session_id TEXT NOT NULL UNIQUE, -- duplicated data from the session column, for ease of access
+                field_values TEXT, -- NULL if no values are associated with this queue item
+                session TEXT, -- the session to be executed, NULL if it is created from the batch when dequeued
+                status TEXT NOT NULL DEFAULT 'pending', -- the status of the queue item, one of 'pending', 'in_progress', 'completed', 'failed', 'canceled'
+                priority INTEGER NOT NULL DEFAULT 0, -- the priority, higher is more important
+                error_traceback TEXT, -- any errors associated with this queue item
+                created_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')),
+                updated_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')), -- updated via trigger
+                started_at DATETIME, -- updated via trigger
+                completed_at DATETIME, -- updated via trigger, completed items are cleaned up on application startup
+                workflow TEXT, -- NULL if the item has no workflow, or if its workflow is stored with its batch
+                error_type TEXT,
+                error_message TEXT,
+                origin TEXT,
+                destination TEXT
+            );
+            """
+        )
+        cursor.execute(f"INSERT INTO session_queue_new ({columns}) SELECT {columns} FROM session_queue;")
+        # Dropping the table drops its indices and triggers before deleting its rows, so no triggers fire here
+        cursor.execute("DROP TABLE session_queue;")
+        cursor.execute("ALTER TABLE session_queue_new RENAME TO session_queue;")
+        for stmt in indices_and_triggers:
+            cursor.execute(stmt)
+        if sequence is not None:
+            # Keep handing out increasing item ids, even if the items with the highest ids were deleted
+            cursor.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'session_queue';", (sequence[0],))
+
+    def _add_session_queue_batches(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds the `session_queue_batches` table, which stores the graph and workflow shared by the items of a batch. A
+        batch is deleted with its last queue item.
+        """
+
+        cursor.execute(
+            """--sql
+            CREATE TABLE IF NOT EXISTS session_queue_batches (
+                batch_id TEXT NOT NULL PRIMARY KEY,
+                queue_id TEXT NOT NULL,
+                graph TEXT NOT NULL,
+                workflow TEXT,
+                created_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW'))
+            );
+            """
+        )
+        cursor.execute(
+            """--sql
+            CREATE TRIGGER IF NOT EXISTS tg_session_queue_batches_delete
+            AFTER DELETE ON session_queue
+            FOR EACH ROW
+            WHEN NOT EXISTS (SELECT 1 FROM session_queue WHERE batch_id = OLD.batch_id)
+            BEGIN
+                DELETE FROM session_queue_batches WHERE batch_id = OLD.batch_id;
+            END;
+            """
+        )
+
+
+def build_migration_17() -> Migration:
+    """
+    Build the migration from database version 16 to 17.
+
+    This migration does the following:
+        - Allows the `session` column of the `session_queue` table to be NULL.
+        - Adds the `session_queue_batches` table, which stores the graph and workflow of a batch once for all its items.
+    """
+    migration_17 = Migration(
+        from_version=16,
+        to_version=17,
+        callback=Migration17Callback(),
+    )
+
+    return migration_17
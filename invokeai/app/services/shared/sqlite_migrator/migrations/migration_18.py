@@ -0,0 +1,49 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration18Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._add_invocation_cache(cursor)
+
+    def _add_invocation_cache(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds the `invocation_cache` table, the persistent tier of the invocation cache. Outputs are keyed by a stable
+        digest of their invocation, so they can be reused after a restart.
+        """
+
+        tables = [
+            """--sql
+            CREATE TABLE IF NOT EXISTS invocation_cache (
+                key TEXT NOT NULL PRIMARY KEY, -- digest of the invocation
+                output TEXT NOT NULL, -- the serialized invocation output
+                size INTEGER NOT NULL, -- the size of the serialized output, in bytes
+                created_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')),
+                accessed_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW'))
+            );
+            """
+        ]
+
+        indices = [
+            "CREATE INDEX IF NOT EXISTS idx_invocation_cache_accessed_at ON invocation_cache(accessed_at);",
+        ]
+
+        for stmt in tables + indices:
+            cursor.execute(stmt)
+
+
+def build_migration_18() -> Migration:
+    """
+    Build the migration from database version 17 to 18.
+
+    This migration does the following:
+        - Adds the `invocation_cache` table.
+    """
+    migration_18 = Migration(
+        from_version=17,
+        to_version=18,
+        callback=Migration18Callback(),
+    )
+
+    return migration_18
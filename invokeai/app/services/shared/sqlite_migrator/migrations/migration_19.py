@@ -0,0 +1,54 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration19Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._add_invocation_cache_references(cursor)
+
+    def _add_invocation_cache_references(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds the `invocation_cache_references` table, which maps the names of the images, tensors and conditioning
+        referenced by cached invocation outputs to their keys. Outputs are invalidated through this table when an object
+        is deleted, instead of searching every output for the object's name.
+
+        The existing cached outputs have no references, so they are deleted.
+        """
+
+        tables = [
+            """--sql
+            CREATE TABLE IF NOT EXISTS invocation_cache_references (
+                name TEXT NOT NULL, -- the name of the referenced image, tensor or conditioning
+                key TEXT NOT NULL, -- the key of the cached output
+                PRIMARY KEY (name, key),
+                FOREIGN KEY (key) REFERENCES invocation_cache (key) ON DELETE CASCADE
+            );
+            """
+        ]
+
+        indices = [
+            "CREATE INDEX IF NOT EXISTS idx_invocation_cache_references_key ON invocation_cache_references(key);",
+        ]
+
+        for stmt in tables + indices:
+            cursor.execute(stmt)
+
+        cursor.execute("DELETE FROM invocation_cache;")
+
+
+def build_migration_19() -> Migration:
+    """
+    Build the migration from database version 18 to 19.
+
+    This migration does the following:
+        - Adds the `invocation_cache_references` table.
+        - Empties the `invocation_cache` table.
+    """
+    migration_19 = Migration(
+        from_version=18,
+        to_version=19,
+        callback=Migration19Callback(),
+    )
+
+    return migration_19
@@ -0,0 +1,48 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration20Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._add_model_load_stats(cursor)
+
+    def _add_model_load_stats(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds the `model_load_stats` table, which holds the size, VRAM footprint and load time measured by the model
+        cache for each model and submodel. The model cache uses them in place of estimates from the models' files.
+        """
+
+        tables = [
+            """--sql
+            CREATE TABLE IF NOT EXISTS model_load_stats (
+                model_key TEXT NOT NULL,
+                submodel_type TEXT NOT NULL, -- empty for models loaded as a whole
+                size INTEGER NOT NULL,
+                vram_size INTEGER,
+                load_time REAL,
+                updated_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')),
+                PRIMARY KEY (model_key, submodel_type),
+                FOREIGN KEY (model_key) REFERENCES models (id) ON DELETE CASCADE
+            );
+            """
+        ]
+
+        for stmt in tables:
+            cursor.execute(stmt)
+
+
+def build_migration_20() -> Migration:
+    """
+    Build the migration from database version 19 to 20.
+
+    This migration does the following:
+        - Adds the `model_load_stats` table.
+    """
+    migration_20 = Migration(
+        from_version=19,
+        to_version=20,
+        callback=Migration20Callback(),
+    )
+
+    return migration_20
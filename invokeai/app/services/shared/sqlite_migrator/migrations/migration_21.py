@@ -0,0 +1,48 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration21Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._add_file_hashes(cursor)
+
+    def _add_file_hashes(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds the `file_hashes` table, which caches the hashes of model files. A file is only hashed again when its size,
+        modification time or inode changes.
+        """
+
+        tables = [
+            """--sql
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT NOT NULL,
+                algorithm TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                updated_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')),
+                PRIMARY KEY (path, algorithm)
+            );
+            """
+        ]
+
+        for stmt in tables:
+            cursor.execute(stmt)
+
+
+def build_migration_21() -> Migration:
+    """
+    Build the migration from database version 20 to 21.
+
+    This migration does the following:
+        - Adds the `file_hashes` table.
+    """
+    migration_21 = Migration(
+        from_version=20,
+        to_version=21,
+        callback=Migration21Callback(),
+    )
+
+    return migration_21
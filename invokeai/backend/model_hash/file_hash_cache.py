@@ -0,0 +1,40 @@
+# Copyright (c) 2024 The InvokeAI Development Team
+"""Persistent caches of the hashes of model files, so that unchanged files are not hashed again."""
+
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class FileHashKey:
+    """Identifies the contents of a file by its path, size, modification time and inode.
+
+    A file is assumed to be unchanged as long as all of them are the same.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+    @classmethod
+    def from_path(cls, path: Path) -> "FileHashKey":
+        stat = os.stat(path)
+        return cls(path=str(path.resolve()), size=stat.st_size, mtime_ns=stat.st_mtime_ns, inode=stat.st_ino)
+
+
+class FileHashCache(ABC):
+    """Abstract base class for the persistent caches of file hashes used by `ModelHash`."""
+
+    @abstractmethod
+    def get_hash(self, key: FileHashKey, algorithm: str) -> Optional[str]:
+        """Return the hexdigest of the file computed with the algorithm, if it was cached and the file is unchanged."""
+        pass
+
+    @abstractmethod
+    def set_hash(self, key: FileHashKey, algorithm: str, hash_: str) -> None:
+        """Record the hexdigest of the file computed with the algorithm, replacing the hash of earlier versions."""
+        pass
@@ -2,6 +2,7 @@
 
 import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Callable, Literal, Optional, Union
 
@@ -9,6 +10,7 @@ from blake3 import blake3
 from tqdm import tqdm
 
 from invokeai.app.util.misc import uuid_string
+from invokeai.backend.model_hash.file_hash_cache import FileHashCache, FileHashKey
 
 HASHING_ALGORITHMS = Literal[
     "blake3_multi",
@@ -39,6 +41,10 @@ class ModelHash:
     Args:
         algorithm: Hashing algorithm to use. Defaults to BLAKE3.
         file_filter: A function that takes a file name and returns True if the file should be included in the hash.
+        hash_cache: A persistent cache of file hashes. Files that are unchanged since they were last hashed with the
+            same algorithm are not hashed again.
+        max_workers: Number of files of a directory hashed concurrently. Defaults to 1 for "blake3_single", which is
+            meant for spinning disks, and to the number of CPUs (up to 8) for the other algorithms.
 
     If the model is a single file, it is hashed directly using the provided algorithm.
 
@@ -47,7 +53,8 @@ class ModelHash:
     Only files with the following extensions are hashed: .ckpt, .safetensors, .bin, .pt, .pth
 
     The final hash is computed by hashing the hashes of all model files in the directory using BLAKE3, ensuring
-    that directory hashes are never weaker than the file hashes.
+    that directory hashes are never weaker than the file hashes. The files are hashed concurrently, but their hashes
+    are always combined in the order of their paths.
 
     A convenience algorithm choice of "random" is also available, which returns a random string. This is not a hash.
 
@@ -61,7 +68,11 @@ class ModelHash:
     """
 
     def __init__(
-        self, algorithm: HASHING_ALGORITHMS = "blake3_single", file_filter: Optional[Callable[[str], bool]] = None
+        self,
+        algorithm: HASHING_ALGORITHMS = "blake3_single",
+        file_filter: Optional[Callable[[str], bool]] = None,
+        hash_cache: Optional[FileHashCache] = None,
+        max_workers: Optional[int] = None,
     ) -> None:
         self.algorithm: HASHING_ALGORITHMS = algorithm
         if algorithm == "blake3_multi":
@@ -76,6 +87,11 @@ class ModelHash:
             raise ValueError(f"Algorithm {algorithm} not available")
 
         self._file_filter = file_filter or self._default_file_filter
+        # Random "hashes" must not be reused
+        self._hash_cache = hash_cache if algorithm != "random" else None
+        if max_workers is None:
+            max_workers = 1 if algorithm == "blake3_single" else min(8, os.cpu_count() or 1)
+        self._max_workers = max_workers
 
     def hash(self, model_path: Union[str, Path]) -> str:
         """
@@ -100,7 +116,7 @@ class ModelHash:
             pbar = tqdm([model_path], desc=f"Hashing {model_path.name}", unit="file")
             for component in pbar:
                 pbar.set_description(f"Hashing {component.name}")
-                hash_ = prefix + self._hash_file(model_path)
+                hash_ = prefix + self._hash_file_cached(model_path)
             assert hash_ is not None
             return hash_
         elif model_path.is_dir():
@@ -117,13 +133,19 @@ class ModelHash:
         Returns:
             str: Hexdigest of the hash of the directory
         """
-        model_component_paths = self._get_file_paths(dir, self._file_filter)
+        component_paths = sorted(self._get_file_paths(dir, self._file_filter))
+        pbar = tqdm(total=len(component_paths), desc=f"Hashing {dir.name}", unit="file")
 
-        component_hashes: list[str] = []
-        pbar = tqdm(sorted(model_component_paths), desc=f"Hashing {dir.name}", unit="file")
-        for component in pbar:
+        def hash_component(component: Path) -> str:
+            hash_ = self._hash_file_cached(component)
             pbar.set_description(f"Hashing {component.name}")
-            component_hashes.append(self._hash_file(component))
+            pbar.update()
+            return hash_
+
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="ModelHash") as executor:
+            # map() returns the hashes in the order of the paths, whatever order the files are hashed in
+            component_hashes = list(executor.map(hash_component, component_paths))
+        pbar.close()
 
         # BLAKE3 is cryptographically secure. We may as well fall back on a secure algorithm
         # for the composite hash
@@ -133,6 +155,17 @@ class ModelHash:
 
         return composite_hasher.hexdigest()
 
+    def _hash_file_cached(self, file_path: Path) -> str:
+        """Return the hexdigest of the file, from the hash cache if the file is unchanged since it was last hashed."""
+        if self._hash_cache is None:
+            return self._hash_file(file_path)
+        key = FileHashKey.from_path(file_path)
+        hash_ = self._hash_cache.get_hash(key, self.algorithm)
+        if hash_ is None:
+            hash_ = self._hash_file(file_path)
+            self._hash_cache.set_hash(key, self.algorithm, hash_)
+        return hash_
+
     @staticmethod
     def _get_file_paths(model_path: Path, file_filter: Callable[[str], bool]) -> list[Path]:
         """Return a list of all model files in the directory.
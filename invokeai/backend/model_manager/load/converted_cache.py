@@ -0,0 +1,100 @@
+# Copyright (c) 2024 The InvokeAI Development Team
+"""On-disk cache of the state dicts of models after their conversion on load.
+
+Some loaders convert the state dict of a model each time it is loaded from disk, e.g. by renaming its keys to those
+of InvokeAI's implementation of the model, or by casting its weights to the inference dtype. `ConvertedStateDictCache`
+saves the converted state dicts as safetensors files, named after the hash of the model and the name and version of
+the conversion, and later loads of the model memory-map them instead of converting the model again. Converters bump
+their version when their output changes, which invalidates their cached results.
+
+The size of the cache is limited. The least recently used state dicts are deleted when it is exceeded.
+"""
+
+import hashlib
+import os
+import uuid
+from logging import Logger
+from pathlib import Path
+from typing import Dict, Optional
+
+import torch
+
+from invokeai.backend.model_manager.load.mmap_safetensors import load_mmap_safetensors, save_safetensors
+
+
+class ConvertedStateDictCache:
+    """A directory of converted state dicts, keyed by model hash and converter version."""
+
+    def __init__(self, path: Path, max_size: int, logger: Logger):
+        """
+        Initialize the cache.
+
+        :param path: The directory of the cache. It is created when the first state dict is saved.
+        :param max_size: Maximum total size of the cached state dicts, in bytes
+        :param logger: Logger to use
+        """
+        self._path = path
+        self._max_size = max_size
+        self._logger = logger
+
+    def get(self, model_hash: str, converter: str, version: int) -> Optional[Dict[str, torch.Tensor]]:
+        """Return the memory-mapped state dict converted from the model by the converter, or None if it is not cached."""
+        path = self._get_path(model_hash, converter, version)
+        try:
+            state_dict = load_mmap_safetensors(path)
+            # The modification time orders the state dicts for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self._logger.debug(f"Loaded {converter} v{version} conversion of model {model_hash} from {path}")
+        return state_dict
+
+    def put(self, model_hash: str, converter: str, version: int, state_dict: Dict[str, torch.Tensor]) -> None:
+        """Save the state dict converted from the model by the converter, evicting older state dicts to make room."""
+        size = sum(tensor.nelement() * tensor.element_size() for tensor in state_dict.values())
+        if size > self._max_size:
+            return
+        self._path.mkdir(parents=True, exist_ok=True)
+        path = self._get_path(model_hash, converter, version)
+        temp_path = self._path / f"{uuid.uuid4().hex}.tmp"
+        try:
+            save_safetensors(
+                temp_path,
+                state_dict,
+                metadata={"model_hash": model_hash, "converter": converter, "version": str(version)},
+            )
+            size = temp_path.stat().st_size
+            if size > self._max_size:
+                return
+            self.make_room(size)
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        self._logger.debug(f"Saved {converter} v{version} conversion of model {model_hash} to {path}")
+
+    def make_room(self, size: int) -> None:
+        """Delete the least recently used state dicts until one of the given size fits in the cache."""
+        if not self._path.exists():
+            return
+        entries = []
+        for path in self._path.glob("*.safetensors"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if total_size + size <= self._max_size:
+                break
+            self._logger.debug(f"Removing converted state dict {path} from the cache")
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                # The file is mapped by a model in use (on Windows)
+                continue
+            total_size -= entry_size
+
+    def _get_path(self, model_hash: str, converter: str, version: int) -> Path:
+        key = hashlib.sha256(f"{model_hash}:{converter}:{version}".encode("utf-8")).hexdigest()
+        return self._path / f"{key}.safetensors"
@@ -129,6 +129,18 @@ class ModelLoaderBase(ABC):
         """
         pass
 
+    @abstractmethod
+    def prefetch_model(self, model_config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> bool:
+        """
+        Load a model into the free space of the RAM cache ahead of its use, without evicting other models.
+
+        :param model_config: Model configuration, as returned by ModelConfigRecordStore
+        :param submodel_type: an ModelType enum indicating the portion of
+               the model to retrieve (e.g. ModelType.Vae)
+        :return: Whether the model was loaded into the cache.
+        """
+        pass
+
     @abstractmethod
     def get_size_fs(
         self, config: AnyModelConfig, model_path: Path, submodel_type: Optional[SubModelType] = None
@@ -1,9 +1,14 @@
 # Copyright (c) 2024, Lincoln D. Stein and the InvokeAI Development Team
 """Default implementation of model loading in InvokeAI."""
 
+import threading
+import time
 from logging import Logger
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
+
+import torch
+from safetensors.torch import load_file
 
 from invokeai.app.services.config import InvokeAIAppConfig
 from invokeai.backend.model_manager import (
@@ -13,17 +18,24 @@ from invokeai.backend.model_manager import (
     SubModelType,
 )
 from invokeai.backend.model_manager.config import DiffusersConfigBase
+from invokeai.backend.model_manager.load.converted_cache import ConvertedStateDictCache
 from invokeai.backend.model_manager.load.load_base import LoadedModel, ModelLoaderBase
+from invokeai.backend.model_manager.load.mmap_safetensors import load_mmap_safetensors
 from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelCacheBase, ModelLockerBase
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB
 from invokeai.backend.model_manager.load.model_util import calc_model_size_by_fs
 from invokeai.backend.model_manager.load.optimizations import skip_torch_weight_init
 from invokeai.backend.util.devices import TorchDevice
 
 
-# TO DO: The loader is not thread safe!
 class ModelLoader(ModelLoaderBase):
     """Default implementation of ModelLoaderBase."""
 
+    # Loaders are created for each request, so the loads in progress are tracked for all loaders sharing a cache. Only
+    # one thread loads a given model into a given cache at a time, and the others wait for its load to finish.
+    _loads_lock = threading.Lock()
+    _loads_in_progress: Dict[Tuple[ModelCacheBase[AnyModel], str], threading.Event] = {}
+
     def __init__(
         self,
         app_config: InvokeAIAppConfig,
@@ -35,6 +47,13 @@ class ModelLoader(ModelLoaderBase):
         self._logger = logger
         self._ram_cache = ram_cache
         self._torch_dtype = TorchDevice.choose_torch_dtype()
+        self._converted_cache = (
+            ConvertedStateDictCache(
+                app_config.converted_cache_path, max_size=int(app_config.converted_cache_size * GB), logger=logger
+            )
+            if app_config.converted_cache_size > 0
+            else None
+        )
 
     def load_model(self, model_config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> LoadedModel:
         """
@@ -56,6 +75,33 @@ class ModelLoader(ModelLoaderBase):
             locker = self._load_and_cache(model_config, submodel_type)
         return LoadedModel(config=model_config, _locker=locker)
 
+    def prefetch_model(self, model_config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> bool:
+        """
+        Load a model into the free space of the RAM cache, without evicting other models.
+
+        Sessions do not wait for prefetches: a model that is being loaded is not prefetched, and a session loading a
+        model that is being prefetched loads it itself.
+
+        :param model config: Configuration record for this model
+        :param submodel_type: an ModelType enum indicating the portion of
+               the model to retrieve (e.g. ModelType.Vae)
+        :return: Whether the model was loaded into the cache. False if it is already cached or being loaded, or if it
+            does not fit in the free space of the cache.
+        """
+        model_path = self._get_model_path(model_config)
+
+        if not model_path.exists():
+            raise InvalidModelConfigException(f"Files for model '{model_config.name}' not found at {model_path}")
+
+        load_key = (self._ram_cache, f"{model_config.key}:{submodel_type or ''}")
+        with self._loads_lock:
+            if load_key in self._loads_in_progress:
+                return False
+        if self._ram_cache.exists(model_config.key, submodel_type):
+            return False
+        with skip_torch_weight_init(), self._ram_cache.without_eviction():
+            return self._load_and_put(model_config, submodel_type)
+
     @property
     def ram_cache(self) -> ModelCacheBase[AnyModel]:
         """Return the ram cache associated with this loader."""
@@ -67,25 +113,52 @@ class ModelLoader(ModelLoaderBase):
 
     def _load_and_cache(self, config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> ModelLockerBase:
         stats_name = ":".join([config.base, config.type, config.name, (submodel_type or "")])
-        try:
-            return self._ram_cache.get(config.key, submodel_type, stats_name=stats_name)
-        except IndexError:
-            pass
+        load_key = (self._ram_cache, f"{config.key}:{submodel_type or ''}")
+        while True:
+            with self._loads_lock:
+                load_finished = self._loads_in_progress.get(load_key)
+                if load_finished is None:
+                    load_finished = self._loads_in_progress[load_key] = threading.Event()
+                    break
+            # Another thread is loading this model. Once it is done, the model is retrieved from the cache, or loaded
+            # again here if that thread's load failed.
+            load_finished.wait()
 
+        try:
+            try:
+                return self._ram_cache.get(config.key, submodel_type, stats_name=stats_name)
+            except IndexError:
+                pass
+
+            self._load_and_put(config, submodel_type)
+            return self._ram_cache.get(
+                key=config.key,
+                submodel_type=submodel_type,
+                stats_name=stats_name,
+            )
+        finally:
+            with self._loads_lock:
+                del self._loads_in_progress[load_key]
+            load_finished.set()
+
+    def _load_and_put(self, config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> bool:
+        """Load a model from disk and put it in the RAM cache. Returns whether the cache kept the model."""
         config.path = str(self._get_model_path(config))
-        self._ram_cache.make_room(self.get_size_fs(config, Path(config.path), submodel_type))
+        # The size measured when the model was last loaded is more accurate than the estimate from its files
+        load_stats = self._ram_cache.get_load_stats(config.key, submodel_type)
+        if load_stats is not None:
+            self._ram_cache.make_room(load_stats.size)
+        else:
+            self._ram_cache.make_room(self.get_size_fs(config, Path(config.path), submodel_type))
+        start_load_time = time.time()
         loaded_model = self._load_model(config, submodel_type)
 
-        self._ram_cache.put(
+        return self._ram_cache.put(
             config.key,
             submodel_type=submodel_type,
             model=loaded_model,
-        )
-
-        return self._ram_cache.get(
-            key=config.key,
-            submodel_type=submodel_type,
-            stats_name=stats_name,
+            load_time=time.time() - start_load_time,
+            shared_key=config.hash,
         )
 
     def get_size_fs(
@@ -98,6 +171,47 @@ class ModelLoader(ModelLoaderBase):
             variant=config.repo_variant if isinstance(config, DiffusersConfigBase) else None,
         )
 
+    def _load_safetensors(self, model_path: Path) -> Dict[str, torch.Tensor]:
+        """Load the state dict of a safetensors file into CPU tensors, memory-mapping the file if configured to."""
+        if self._app_config.mmap_safetensors:
+            return load_mmap_safetensors(model_path)
+        return load_file(model_path, device="cpu")
+
+    def _load_converted_state_dict(
+        self, config: AnyModelConfig, converter: str, version: int, convert: Callable[[], Dict[str, torch.Tensor]]
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Return the state dict of the model converted by convert(), memory-mapped from the converted cache if it is there.
+
+        :param converter: Name of the conversion
+        :param version: Version of the conversion. Increment it when the converted state dicts change.
+        :param convert: Loads and converts the state dict of the model. Only called if it is not cached.
+        """
+        state_dict = self._get_converted_state_dict(config, converter, version)
+        if state_dict is None:
+            state_dict = convert()
+            self._save_converted_state_dict(config, converter, version, state_dict)
+        return state_dict
+
+    def _get_converted_state_dict(
+        self, config: AnyModelConfig, converter: str, version: int
+    ) -> Optional[Dict[str, torch.Tensor]]:
+        """Return the state dict of the model converted by converter from the converted cache, if it is there."""
+        if self._converted_cache is None:
+            return None
+        return self._converted_cache.get(config.hash, converter, version)
+
+    def _save_converted_state_dict(
+        self, config: AnyModelConfig, converter: str, version: int, state_dict: Dict[str, torch.Tensor]
+    ) -> None:
+        """Save the state dict of the model converted by converter to the converted cache, if it is enabled."""
+        if self._converted_cache is None:
+            return
+        try:
+            self._converted_cache.put(config.hash, converter, version, state_dict)
+        except Exception as e:
+            self._logger.warning(f"Failed to cache the converted state dict of model '{config.name}': {e}")
+
     # This needs to be implemented in the subclass
     def _load_model(
         self,
@@ -0,0 +1,145 @@
+# Copyright (c) 2024 The InvokeAI Development Team
+"""Zero-copy loading of safetensors files through memory maps.
+
+`safetensors.torch.load_file()` reads every tensor of a file into newly allocated CPU memory. The tensors returned by
+`load_mmap_safetensors()` are instead views into a private, copy-on-write memory map of the file. Their pages are read
+from disk when the tensors are first used, are shared with the OS page cache, and can be dropped by the OS under memory
+pressure. Writing to a tensor copies the pages it touches into anonymous memory, so the file is never modified.
+
+`save_safetensors()` writes state dicts whose tensors share memory, such as memory-mapped state dicts, which
+`safetensors.torch.save_file()` rejects. The tensors are laid out so that they can all be mapped in place.
+"""
+
+import json
+import mmap
+import struct
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import torch
+
+# See https://github.com/huggingface/safetensors#format
+SAFETENSORS_DTYPES: Dict[str, torch.dtype] = {
+    "BOOL": torch.bool,
+    "U8": torch.uint8,
+    "I8": torch.int8,
+    "I16": torch.int16,
+    "I32": torch.int32,
+    "I64": torch.int64,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "F32": torch.float32,
+    "F64": torch.float64,
+    "F8_E4M3": torch.float8_e4m3fn,
+    "F8_E5M2": torch.float8_e5m2,
+}
+
+_SAFETENSORS_DTYPE_NAMES: Dict[torch.dtype, str] = {dtype: name for name, dtype in SAFETENSORS_DTYPES.items()}
+
+# The address ranges of the memory maps that are still referenced by tensors, keyed by the id of their map
+_mapped_regions: Dict[int, tuple[int, int]] = {}
+_mapped_regions_lock = threading.Lock()
+
+
+def load_mmap_safetensors(path: Union[str, Path]) -> Dict[str, torch.Tensor]:
+    """Load the tensors of a safetensors file as views into a memory map of the file.
+
+    :param path: Path to the safetensors file
+    :returns: The file's state dict. Its tensors are on the CPU.
+    """
+    with open(path, "rb") as file:
+        (header_size,) = struct.unpack("<Q", file.read(8))
+        header = json.loads(file.read(header_size))
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    # The tensors keep the memory map alive through this buffer. The map is unmapped once they are all deleted.
+    buffer = torch.frombuffer(mapping, dtype=torch.uint8)
+    start = buffer.untyped_storage().data_ptr()
+    with _mapped_regions_lock:
+        _mapped_regions[id(mapping)] = (start, start + len(mapping))
+    weakref.finalize(mapping, _unregister_region, id(mapping))
+
+    data_offset = 8 + header_size
+    state_dict: Dict[str, torch.Tensor] = {}
+    for key, info in header.items():
+        if key == "__metadata__":
+            continue
+        begin, end = info["data_offsets"]
+        data = buffer[data_offset + begin : data_offset + end]
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        if (data_offset + begin) % dtype.itemsize != 0:
+            # Tensors are normally aligned in the file. A misaligned tensor cannot be viewed in place, so it is copied.
+            data = data.clone()
+        state_dict[key] = data.view(dtype).reshape(info["shape"])
+    return state_dict
+
+
+def save_safetensors(
+    path: Union[str, Path], state_dict: Dict[str, torch.Tensor], metadata: Optional[Dict[str, str]] = None
+) -> None:
+    """Save the tensors of a state dict to a safetensors file, aligned so that `load_mmap_safetensors()` maps them all.
+
+    :param path: Path to the safetensors file
+    :param state_dict: The state dict. Its tensors are on the CPU, and may share memory.
+    :param metadata: Strings stored in the `__metadata__` of the file header
+    """
+    header: Dict[str, object] = {}
+    if metadata:
+        header["__metadata__"] = metadata
+    # Each tensor starts at a multiple of its item size when the tensors are sorted by decreasing item size
+    keys = sorted(state_dict, key=lambda key: -state_dict[key].element_size())
+    offset = 0
+    for key in keys:
+        tensor = state_dict[key]
+        size = tensor.nelement() * tensor.element_size()
+        header[key] = {
+            "dtype": _SAFETENSORS_DTYPE_NAMES[tensor.dtype],
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + size],
+        }
+        offset += size
+
+    encoded_header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # The data is aligned to 8 bytes by padding the header with spaces
+    encoded_header += b" " * (-len(encoded_header) % 8)
+    with open(path, "wb") as file:
+        file.write(struct.pack("<Q", len(encoded_header)))
+        file.write(encoded_header)
+        for key in keys:
+            tensor = state_dict[key]
+            if tensor.nelement() > 0:
+                file.write(tensor.detach().contiguous().reshape(-1).view(torch.uint8).numpy().data)
+
+
+def read_safetensors_metadata(path: Union[str, Path]) -> Dict[str, str]:
+    """Return the `__metadata__` of the header of a safetensors file."""
+    return _read_header(path).get("__metadata__", {})
+
+
+def read_safetensors_tensor_sizes(path: Union[str, Path]) -> Dict[str, int]:
+    """Return the sizes in bytes of the tensors of a safetensors file, by key, without reading the tensors."""
+    header = _read_header(path)
+    header.pop("__metadata__", None)
+    return {key: info["data_offsets"][1] - info["data_offsets"][0] for key, info in header.items()}
+
+
+def _read_header(path: Union[str, Path]) -> Dict[str, Any]:
+    with open(path, "rb") as file:
+        (header_size,) = struct.unpack("<Q", file.read(8))
+        return json.loads(file.read(header_size))
+
+
+def is_memory_mapped(tensor: torch.Tensor) -> bool:
+    """Return true if the tensor is a view into a memory-mapped safetensors file."""
+    if tensor.device.type != "cpu":
+        return False
+    data_ptr = tensor.untyped_storage().data_ptr()
+    with _mapped_regions_lock:
+        return any(start <= data_ptr < end for start, end in _mapped_regions.values())
+
+
+def _unregister_region(mapping_id: int) -> None:
+    with _mapped_regions_lock:
+        _mapped_regions.pop(mapping_id, None)
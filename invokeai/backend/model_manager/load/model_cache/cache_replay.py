@@ -0,0 +1,115 @@
+"""Offline replay of recorded model cache access traces against eviction policies.
+
+The model cache records each model it stores and retrieves in the `accesses` trace of its `CacheStats`. Replaying a
+trace against several eviction policies shows which policy would have served the same requests with the fewest loads
+from disk. The replay only simulates the bookkeeping of the cache, so it runs on the CPU without loading any models.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Sequence
+
+from invokeai.backend.model_manager.load.model_cache.eviction_policy import EvictionPolicy
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import CacheAccess, CacheRecord
+
+
+@dataclass
+class ReplayResult:
+    """The outcome of replaying an access trace.
+
+    hits: Number of requests served from the cache
+    misses: Number of requests that loaded the model from disk
+    bytes_loaded: Total size of the models loaded from disk into the cache
+    load_time: Total seconds spent loading models, for the models whose load time was recorded
+    """
+
+    hits: int = 0
+    misses: int = 0
+    bytes_loaded: int = 0
+    load_time: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of requests served from the cache."""
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+def get_requests(accesses: Sequence[CacheAccess]) -> List[CacheAccess]:
+    """
+    Return the model requests of an access trace.
+
+    The model loader retrieves each model right after storing it in the cache. Such a store and retrieval are recorded as
+    a miss followed by a hit of the same key, but are a single request.
+    """
+    requests: List[CacheAccess] = []
+    for i, access in enumerate(accesses):
+        previous = accesses[i - 1] if i > 0 else None
+        if access.hit and previous is not None and not previous.hit and previous.key == access.key:
+            continue
+        requests.append(access)
+    return requests
+
+
+def replay_cache_trace(
+    accesses: Sequence[CacheAccess],
+    policy: EvictionPolicy,
+    max_cache_size: int,
+) -> ReplayResult:
+    """
+    Replay an access trace against an eviction policy.
+
+    :param accesses: The trace to replay, as recorded in `CacheStats.accesses`
+    :param policy: The eviction policy to evaluate
+    :param max_cache_size: Size of the simulated cache in bytes
+    """
+    result = ReplayResult()
+    records: Dict[str, CacheRecord[None]] = {}
+    # Models that were hits in the recorded trace may be misses in the replay. They take as long to load as when the
+    # trace recorded their loads.
+    load_times: Dict[str, float] = {a.key: a.load_time for a in accesses if a.load_time is not None}
+    clock = 0
+
+    for request in get_requests(accesses):
+        record = records.get(request.key)
+        if record is not None:
+            result.hits += 1
+        else:
+            result.misses += 1
+            result.bytes_loaded += request.size
+            load_time = load_times.get(request.key)
+            result.load_time += load_time or 0.0
+            _make_room(records, policy, clock, request.size, max_cache_size)
+            record = CacheRecord(
+                key=request.key,
+                model=None,
+                device=None,  # type: ignore
+                state_dict=None,
+                size=request.size,
+                load_time=load_time,
+                inserted_at=clock,
+            )
+            records[request.key] = record
+        clock += 1
+        record.accesses += 1
+        record.last_accessed = clock
+    return result
+
+
+def parse_cache_trace(accesses: Iterable[Dict[str, Any]]) -> List[CacheAccess]:
+    """Parse an access trace from its JSON representation, as dumped with the invocation stats."""
+    return [CacheAccess(**access) for access in accesses]
+
+
+def _make_room(
+    records: Dict[str, CacheRecord[None]],
+    policy: EvictionPolicy,
+    clock: int,
+    size: int,
+    max_cache_size: int,
+) -> None:
+    current_size = sum(r.size for r in records.values())
+    for record in policy.order(list(records.values()), clock):
+        if current_size + size <= max_cache_size:
+            break
+        current_size -= record.size
+        del records[record.key]
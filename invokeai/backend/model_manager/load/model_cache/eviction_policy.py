@@ -0,0 +1,83 @@
+"""Policies that choose which models the model cache evicts from RAM or offloads from VRAM first."""
+
+from abc import ABC, abstractmethod
+from typing import Any, Literal, Sequence
+
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import CacheRecord
+
+# Size of a GB in bytes.
+GB = 2**30
+
+EvictionPolicyName = Literal["lru", "smallest_first", "cost_aware"]
+
+
+class EvictionPolicy(ABC):
+    """Orders the models of the cache by how early they should be evicted."""
+
+    @abstractmethod
+    def order(self, records: Sequence[CacheRecord[Any]], clock: int) -> list[CacheRecord[Any]]:
+        """
+        Return the records in the order in which they should be evicted, first to be evicted first.
+
+        :param records: The records of the models that may be evicted
+        :param clock: The current value of the cache's access clock, which is incremented for each model retrieved
+        """
+        pass
+
+
+class LRUEvictionPolicy(EvictionPolicy):
+    """Evicts the least recently used models first."""
+
+    def order(self, records: Sequence[CacheRecord[Any]], clock: int) -> list[CacheRecord[Any]]:
+        return sorted(records, key=lambda r: r.last_accessed)
+
+
+class SmallestFirstEvictionPolicy(EvictionPolicy):
+    """Evicts the smallest models first."""
+
+    def order(self, records: Sequence[CacheRecord[Any]], clock: int) -> list[CacheRecord[Any]]:
+        return sorted(records, key=lambda r: r.size)
+
+
+class CostAwareEvictionPolicy(EvictionPolicy):
+    """Evicts the models that are cheapest to do without first.
+
+    Each model is scored by its reload cost, the seconds it takes to load it from disk again, times its access frequency,
+    the number of times it was retrieved per tick of the cache's access clock since it was added. Models that were
+    never timed are assumed to load at the bandwidth measured for the other models, or at `default_bandwidth` if no
+    model was timed. Ties are broken by evicting the least recently used model first.
+    """
+
+    def __init__(self, default_bandwidth: float = GB):
+        """
+        :param default_bandwidth: The assumed load bandwidth in bytes per second, used until load times are measured.
+        """
+        self._default_bandwidth = default_bandwidth
+
+    def order(self, records: Sequence[CacheRecord[Any]], clock: int) -> list[CacheRecord[Any]]:
+        bandwidth = self._measure_bandwidth(records)
+
+        def score(record: CacheRecord[Any]) -> float:
+            reload_cost = record.load_time if record.load_time is not None else record.size / bandwidth
+            frequency = record.accesses / max(1, clock - record.inserted_at)
+            return reload_cost * frequency
+
+        return sorted(records, key=lambda r: (score(r), r.last_accessed))
+
+    def _measure_bandwidth(self, records: Sequence[CacheRecord[Any]]) -> float:
+        timed = [r for r in records if r.load_time]
+        load_time = sum(r.load_time or 0 for r in timed)
+        if load_time == 0:
+            return self._default_bandwidth
+        return sum(r.size for r in timed) / load_time
+
+
+def get_eviction_policy(name: EvictionPolicyName) -> EvictionPolicy:
+    """Create the eviction policy with the given name."""
+    if name == "lru":
+        return LRUEvictionPolicy()
+    elif name == "smallest_first":
+        return SmallestFirstEvictionPolicy()
+    elif name == "cost_aware":
+        return CostAwareEvictionPolicy()
+    raise ValueError(f"Unknown eviction policy: {name}")
@@ -7,14 +7,18 @@ grows larger than a preset maximum, then the least recently used
 model will be cleared and (re)loaded from disk when next needed.
 """
 
+import threading
 from abc import ABC, abstractmethod
+from collections import deque
 from dataclasses import dataclass, field
 from logging import Logger
-from typing import Dict, Generic, Optional, TypeVar
+from typing import Callable, ContextManager, Deque, Dict, Generic, Optional, TypeVar
 
 import torch
 
 from invokeai.backend.model_manager.config import AnyModel, SubModelType
+from invokeai.backend.model_manager.load.model_cache.partial_load import PartialLoad
+from invokeai.backend.model_manager.load.model_cache.shared_state_dicts import SharedStateDict
 
 
 class ModelLockerBase(ABC):
@@ -55,7 +59,20 @@ class CacheRecord(Generic[T]):
     state_dict: A read-only copy of the model's state dict in RAM. It will be
                 used as a template for creating a copy in the VRAM.
     size: Size of the model
+    mapped_size: Size of the model's weights that are memory-mapped from its files,
+                 included in `size`. They do not take up RAM of the cache.
     loaded: True if the model's state dict is currently in VRAM
+    partial_load: The modules of the model that are in VRAM, if only some of them fit in
+                  the VRAM budget. The others are moved to VRAM for each forward pass.
+    shared_state_dict: The segment shared with other processes that the model's weights
+                       are mapped from, if any. It is released when the model is evicted.
+    load_time: Seconds taken to load the model from disk, if known
+    vram_footprint: Increase in allocated VRAM when the model was last fully moved to the
+                    execution device, if known
+    accesses: Number of times the model was retrieved from the cache
+    inserted_at: Value of the cache's access clock when the model was added
+    last_accessed: Value of the cache's access clock when the model was last retrieved
+    move_lock: Held while the model is moved between devices, so that its moves do not overlap
 
     Before a model is executed, the state_dict template is copied into VRAM,
     and then injected into the model. When the model is finished, the VRAM
@@ -73,7 +90,16 @@ class CacheRecord(Generic[T]):
     device: torch.device
     state_dict: Optional[Dict[str, torch.Tensor]]
     size: int
+    mapped_size: int = 0
     loaded: bool = False
+    partial_load: Optional[PartialLoad] = None
+    shared_state_dict: Optional[SharedStateDict] = None
+    load_time: Optional[float] = None
+    vram_footprint: Optional[int] = None
+    accesses: int = 0
+    inserted_at: int = 0
+    last_accessed: int = 0
+    move_lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
     _locks: int = 0
 
     def lock(self) -> None:
@@ -90,6 +116,58 @@ class CacheRecord(Generic[T]):
         """Return true if record is locked."""
         return self._locks > 0
 
+    @property
+    def resident_size(self) -> int:
+        """Return the size of the model's weights that are held in RAM."""
+        return self.size - self.mapped_size
+
+    @property
+    def vram_size(self) -> int:
+        """Return the size of the model's weights that are held in VRAM."""
+        if not self.loaded:
+            return 0
+        if self.partial_load is not None:
+            return self.partial_load.loaded_size
+        return self.size
+
+
+@dataclass
+class ModelLoadStats:
+    """Measurements of a model, taken by the cache when the model was loaded and moved to the execution device.
+
+    key: Key of the model
+    submodel_type: Type of the submodel, if the model was loaded in parts
+    size: Size of the model in RAM, excluding its memory-mapped weights
+    vram_size: Increase in allocated VRAM when the model was moved to the execution device, if measured
+    load_time: Seconds taken to load the model from disk, if measured
+    """
+
+    key: str
+    submodel_type: Optional[SubModelType]
+    size: int
+    vram_size: Optional[int] = None
+    load_time: Optional[float] = None
+
+
+@dataclass
+class CacheAccess:
+    """A request for a model, recorded in the cache's access trace.
+
+    key: Cache key of the model
+    size: Size of the model, excluding its memory-mapped weights
+    hit: True if the model was in the cache
+    load_time: Seconds taken to load the model from disk, if it was loaded
+    """
+
+    key: str
+    size: int
+    hit: bool
+    load_time: Optional[float] = None
+
+
+# The number of most recent accesses kept in the access trace of `CacheStats`
+MAX_CACHE_ACCESSES = 10_000
+
 
 @dataclass
 class CacheStats(object):
@@ -101,7 +179,17 @@ class CacheStats(object):
     in_cache: int = 0  # number of models in cache
     cleared: int = 0  # number of models cleared to make space
     cache_size: int = 0  # total size of cache
+    mapped_size: int = 0  # size of the memory-mapped weights of the cached models, not counted against the cache size
     loaded_model_sizes: Dict[str, int] = field(default_factory=dict)
+    # trace of the most recent models stored and retrieved
+    accesses: Deque[CacheAccess] = field(default_factory=lambda: deque(maxlen=MAX_CACHE_ACCESSES))
+    transferred_size: int = 0  # total size of the state dicts copied to the execution device
+    transfer_time: float = 0.0  # seconds spent copying state dicts to the execution device
+
+    @property
+    def transfer_bandwidth(self) -> float:
+        """Return the measured bandwidth of the copies to the execution device, in bytes per second."""
+        return self.transferred_size / self.transfer_time if self.transfer_time > 0 else 0.0
 
 
 class ModelCacheBase(ABC, Generic[T]):
@@ -170,6 +258,28 @@ class ModelCacheBase(ABC, Generic[T]):
         """Set the CacheStats object for collectin cache statistics."""
         pass
 
+    @property
+    @abstractmethod
+    def load_stats_listener(self) -> Optional[Callable[[ModelLoadStats], None]]:
+        """Return the function called with the updated stats whenever a model is measured."""
+        pass
+
+    @load_stats_listener.setter
+    @abstractmethod
+    def load_stats_listener(self, listener: Optional[Callable[[ModelLoadStats], None]]) -> None:
+        """Set the function called with the updated stats whenever a model is measured, e.g. to persist them."""
+        pass
+
+    @abstractmethod
+    def get_load_stats(self, key: str, submodel_type: Optional[SubModelType] = None) -> Optional[ModelLoadStats]:
+        """Return the measurements of the model with key and optional submodel_type, if it was measured."""
+        pass
+
+    @abstractmethod
+    def set_load_stats(self, stats: ModelLoadStats) -> None:
+        """Provide measurements of a model taken earlier, to be used in place of estimates until it is measured."""
+        pass
+
     @property
     @abstractmethod
     def logger(self) -> Logger:
@@ -181,14 +291,32 @@ class ModelCacheBase(ABC, Generic[T]):
         """Make enough room in the cache to accommodate a new model of indicated size."""
         pass
 
+    @abstractmethod
+    def without_eviction(self) -> ContextManager[None]:
+        """
+        Return a context in which the current thread puts models in the free space of the cache only.
+
+        No model is evicted to make room for them, and the models that do not fit are not cached.
+        """
+        pass
+
     @abstractmethod
     def put(
         self,
         key: str,
         model: T,
         submodel_type: Optional[SubModelType] = None,
-    ) -> None:
-        """Store model under key and optional submodel_type."""
+        load_time: Optional[float] = None,
+        shared_key: Optional[str] = None,
+    ) -> bool:
+        """
+        Store model under key and optional submodel_type.
+
+        :param load_time: Seconds taken to load the model from disk, if known. Used by cost-aware eviction policies.
+        :param shared_key: Key identifying the model's weights across processes, e.g. its hash. If given, and the cache
+            shares weights between processes, the model's weights are mapped from their shared segment.
+        :return: Whether the model is in the cache. Models that do not fit are not cached under `without_eviction()`.
+        """
         pass
 
     @abstractmethod
@@ -210,6 +338,15 @@ class ModelCacheBase(ABC, Generic[T]):
         """
         pass
 
+    @abstractmethod
+    def exists(
+        self,
+        key: str,
+        submodel_type: Optional[SubModelType] = None,
+    ) -> bool:
+        """Return true if the model with key and optional submodel_type is in the cache."""
+        pass
+
     @abstractmethod
     def cache_size(self) -> int:
         """Get the total size of the models currently cached."""
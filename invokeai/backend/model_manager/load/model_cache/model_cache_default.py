@@ -4,23 +4,38 @@
 
 import gc
 import math
+import threading
 import time
-from contextlib import suppress
+from contextlib import contextmanager
+from dataclasses import replace
 from logging import Logger
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Generator, List, Optional
 
 import torch
 
 from invokeai.backend.model_manager import AnyModel, SubModelType
 from invokeai.backend.model_manager.load.memory_snapshot import MemorySnapshot, get_pretty_snapshot_diff
+from invokeai.backend.model_manager.load.model_cache.eviction_policy import (
+    EvictionPolicy,
+    LRUEvictionPolicy,
+    SmallestFirstEvictionPolicy,
+)
 from invokeai.backend.model_manager.load.model_cache.model_cache_base import (
+    CacheAccess,
     CacheRecord,
     CacheStats,
     ModelCacheBase,
+    ModelLoadStats,
     ModelLockerBase,
 )
 from invokeai.backend.model_manager.load.model_cache.model_locker import ModelLocker
-from invokeai.backend.model_manager.load.model_util import calc_model_size_by_data
+from invokeai.backend.model_manager.load.model_cache.partial_load import PartialLoad
+from invokeai.backend.model_manager.load.model_cache.shared_state_dicts import SharedStateDict, SharedStateDictStore
+from invokeai.backend.model_manager.load.model_cache.state_dict_transfer import (
+    copy_state_dict_to_device,
+    pack_state_dict,
+)
+from invokeai.backend.model_manager.load.model_util import calc_model_mapped_size_by_data, calc_model_size_by_data
 from invokeai.backend.util.devices import TorchDevice
 from invokeai.backend.util.logging import InvokeAILogger
 
@@ -46,12 +61,13 @@ class ModelCache(ModelCacheBase[AnyModel]):
     the execution_device.
 
     Models are moved between the storage_device and the execution_device as necessary. Cache size limits are enforced
-    on both the storage_device and the execution_device. The execution_device cache uses a smallest-first offload
-    policy. The storage_device cache uses a least-recently-used (LRU) offload policy.
+    on both the storage_device and the execution_device. The policies deciding which models are offloaded from the
+    execution_device and evicted from the storage_device are pluggable. By default, the execution_device cache uses a
+    smallest-first offload policy, and the storage_device cache uses a least-recently-used (LRU) eviction policy.
 
-    Note: Neither of these offload policies has really been compared against alternatives. It's likely that different
-    policies would be better, although the optimal policies are likely heavily dependent on usage patterns and HW
-    configuration.
+    Note: The optimal policies are likely heavily dependent on usage patterns and HW configuration. Each model retrieved
+    from the cache is recorded in the access trace of its `CacheStats`. Recorded traces can be replayed against the
+    available policies with `replay_cache_trace()`, to compare their hit rates and the bytes they load from disk.
 
     The cache returns context manager generators designed to load the model into the execution device (often GPU) within
     the context, and unload outside the context.
@@ -74,6 +90,11 @@ class ModelCache(ModelCacheBase[AnyModel]):
         lazy_offloading: bool = True,
         log_memory_usage: bool = False,
         logger: Optional[Logger] = None,
+        eviction_policy: Optional[EvictionPolicy] = None,
+        offload_policy: Optional[EvictionPolicy] = None,
+        partial_load_vram: float = 0,
+        pin_memory: bool = False,
+        shared_state_dicts: Optional[SharedStateDictStore] = None,
     ):
         """
         Initialize the model RAM cache.
@@ -89,19 +110,48 @@ class ModelCache(ModelCacheBase[AnyModel]):
             snapshots, so it is recommended to disable this feature unless you are actively inspecting the model cache's
             behaviour.
         :param logger: InvokeAILogger to use (otherwise creates one)
+        :param eviction_policy: Policy choosing the models evicted from the storage_device [LRUEvictionPolicy()]
+        :param offload_policy: Policy choosing the models offloaded from the execution_device
+            [SmallestFirstEvictionPolicy()]
+        :param partial_load_vram: Maximum size of the model weights in the execution_device in GBs. Models that do not
+            fit are partially loaded, with their remaining modules moved to the execution_device for each forward pass.
+            Set to 0 to always load models fully.
+        :param pin_memory: Keep the state dicts of the cached models in pinned memory, with their small tensors packed
+            into contiguous buffers, and copy them to a CUDA execution_device with non-blocking copies on a dedicated
+            stream.
+        :param shared_state_dicts: Store sharing the weights of the cached models with other processes. The weights of
+            models that are put with a shared_key are mapped from their shared segment, instead of being held in RAM by
+            each process.
         """
         # allow lazy offloading only when vram cache enabled
         self._lazy_offloading = lazy_offloading and max_vram_cache_size > 0
         self._max_cache_size: float = max_cache_size
         self._max_vram_cache_size: float = max_vram_cache_size
+        self._partial_load_vram: float = partial_load_vram
+        self._pin_memory = pin_memory
+        self._shared_state_dicts = shared_state_dicts
+        self._transfer_stream: Optional[torch.cuda.Stream] = None
         self._execution_device: torch.device = execution_device
         self._storage_device: torch.device = storage_device
         self._logger = logger or InvokeAILogger.get_logger(self.__class__.__name__)
         self._log_memory_usage = log_memory_usage
         self._stats: Optional[CacheStats] = None
 
+        self._eviction_policy = eviction_policy or LRUEvictionPolicy()
+        self._offload_policy = offload_policy or SmallestFirstEvictionPolicy()
+
         self._cached_models: Dict[str, CacheRecord[AnyModel]] = {}
-        self._cache_stack: List[str] = []
+        # The measurements of the models that were cached, or that were provided with set_load_stats(), by cache key
+        self._load_stats: Dict[str, ModelLoadStats] = {}
+        self._load_stats_listener: Optional[Callable[[ModelLoadStats], None]] = None
+        # The updated measurements not yet passed to the listener, which is called once the lock is released
+        self._unreported_load_stats: List[ModelLoadStats] = []
+        # Incremented each time a model is retrieved, to order the accesses for the eviction policies
+        self._clock = 0
+        # Guards the cached models and the access clock, which may be used by several session workers at once
+        self._lock = threading.RLock()
+        # Whether the current thread must not evict models, see `without_eviction()`
+        self._no_eviction = threading.local()
 
     @property
     def logger(self) -> Logger:
@@ -153,31 +203,112 @@ class ModelCache(ModelCacheBase[AnyModel]):
         """Set the CacheStats object for collectin cache statistics."""
         self._stats = stats
 
+    @property
+    def load_stats_listener(self) -> Optional[Callable[[ModelLoadStats], None]]:
+        """Return the function called with the updated stats whenever a model is measured."""
+        return self._load_stats_listener
+
+    @load_stats_listener.setter
+    def load_stats_listener(self, listener: Optional[Callable[[ModelLoadStats], None]]) -> None:
+        """Set the function called with the updated stats whenever a model is measured, e.g. to persist them."""
+        self._load_stats_listener = listener
+
+    def get_load_stats(self, key: str, submodel_type: Optional[SubModelType] = None) -> Optional[ModelLoadStats]:
+        """Return the measurements of the model with key and optional submodel_type, if it was measured."""
+        with self._lock:
+            return self._load_stats.get(self._make_cache_key(key, submodel_type))
+
+    def set_load_stats(self, stats: ModelLoadStats) -> None:
+        """Provide measurements of a model taken earlier, to be used in place of estimates until it is measured."""
+        with self._lock:
+            self._load_stats.setdefault(self._make_cache_key(stats.key, stats.submodel_type), stats)
+
     def cache_size(self) -> int:
-        """Get the total size of the models currently cached."""
-        total = 0
-        for cache_record in self._cached_models.values():
-            total += cache_record.size
-        return total
+        """Get the total size of the models currently cached, excluding their memory-mapped weights."""
+        with self._lock:
+            total = 0
+            for cache_record in self._cached_models.values():
+                total += cache_record.resident_size
+            return total
 
     def put(
         self,
         key: str,
         model: AnyModel,
         submodel_type: Optional[SubModelType] = None,
-    ) -> None:
-        """Store model under key and optional submodel_type."""
+        load_time: Optional[float] = None,
+        shared_key: Optional[str] = None,
+    ) -> bool:
+        """
+        Store model under key and optional submodel_type.
+
+        :param load_time: Seconds taken to load the model from disk, if known. Used by cost-aware eviction policies.
+        :param shared_key: Key identifying the model's weights across processes, e.g. its hash. If given, and the cache
+            shares weights between processes, the model's weights are mapped from their shared segment.
+        :return: Whether the model is in the cache. Models that do not fit are not cached under `without_eviction()`.
+        """
+        model_key = key
         key = self._make_cache_key(key, submodel_type)
-        if key in self._cached_models:
-            return
+        if self.exists(model_key, submodel_type):
+            return True
+        shared_state_dict = None
+        if self._shared_state_dicts is not None and shared_key is not None:
+            # Writing the segment takes a while, so other threads may use the cache meanwhile
+            shared_state_dict = self._share_state_dict(model, self._make_cache_key(shared_key, submodel_type))
         size = calc_model_size_by_data(self.logger, model)
-        self.make_room(size)
-
+        # Memory-mapped weights are backed by the OS page cache, so only the resident weights need room
+        mapped_size = calc_model_mapped_size_by_data(model)
         running_on_cpu = self.execution_device == torch.device("cpu")
         state_dict = model.state_dict() if isinstance(model, torch.nn.Module) and not running_on_cpu else None
-        cache_record = CacheRecord(key=key, model=model, device=self.storage_device, state_dict=state_dict, size=size)
-        self._cached_models[key] = cache_record
-        self._cache_stack.append(key)
+        if state_dict is not None and self._pin_memory:
+            assert isinstance(model, torch.nn.Module)
+            # Packing copies all the weights, so it is done before taking the lock
+            state_dict = pack_state_dict(state_dict, pin_memory=self.execution_device.type == "cuda")
+            # The model uses the packed tensors, so that its weights are not held in RAM twice
+            model.load_state_dict(state_dict, assign=True)
+        with self._lock:
+            if key in self._cached_models:
+                # Another thread cached the model in the meantime
+                if shared_state_dict is not None:
+                    shared_state_dict.release()
+                return True
+            if not self._is_eviction_allowed() and self.cache_size() + size - mapped_size > self.max_cache_size * GB:
+                self.logger.debug(f"Not caching model {key}: it does not fit in the free space of the cache")
+                if shared_state_dict is not None:
+                    shared_state_dict.release()
+                return False
+            self.make_room(size - mapped_size)
+
+            known_stats = self._load_stats.get(key)
+            cache_record = CacheRecord(
+                key=key,
+                model=model,
+                device=self.storage_device,
+                state_dict=state_dict,
+                size=size,
+                mapped_size=mapped_size,
+                shared_state_dict=shared_state_dict,
+                load_time=load_time,
+                vram_footprint=known_stats.vram_size if known_stats else None,
+                inserted_at=self._clock,
+                last_accessed=self._clock,
+            )
+            self._cached_models[key] = cache_record
+            self._update_load_stats(
+                ModelLoadStats(
+                    key=model_key,
+                    submodel_type=submodel_type,
+                    size=cache_record.resident_size,
+                    vram_size=cache_record.vram_footprint,
+                    load_time=load_time if load_time is not None or known_stats is None else known_stats.load_time,
+                )
+            )
+            if self.stats:
+                self.stats.accesses.append(
+                    CacheAccess(key=key, size=cache_record.resident_size, hit=False, load_time=load_time)
+                )
+        self._report_load_stats()
+        return True
 
     def get(
         self,
@@ -195,35 +326,47 @@ class ModelCache(ModelCacheBase[AnyModel]):
 
         This may raise an IndexError if the model is not in the cache.
         """
-        key = self._make_cache_key(key, submodel_type)
-        if key in self._cached_models:
-            if self.stats:
-                self.stats.hits += 1
-        else:
+        with self._lock:
+            key = self._make_cache_key(key, submodel_type)
+            if key in self._cached_models:
+                if self.stats:
+                    self.stats.hits += 1
+            else:
+                if self.stats:
+                    self.stats.misses += 1
+                raise IndexError(f"The model with key {key} is not in the cache.")
+
+            cache_entry = self._cached_models[key]
+
+            # more stats
             if self.stats:
-                self.stats.misses += 1
-            raise IndexError(f"The model with key {key} is not in the cache.")
-
-        cache_entry = self._cached_models[key]
-
-        # more stats
-        if self.stats:
-            stats_name = stats_name or key
-            self.stats.cache_size = int(self._max_cache_size * GB)
-            self.stats.high_watermark = max(self.stats.high_watermark, self.cache_size())
-            self.stats.in_cache = len(self._cached_models)
-            self.stats.loaded_model_sizes[stats_name] = max(
-                self.stats.loaded_model_sizes.get(stats_name, 0), cache_entry.size
+                stats_name = stats_name or key
+                self.stats.cache_size = int(self._max_cache_size * GB)
+                self.stats.high_watermark = max(self.stats.high_watermark, self.cache_size())
+                self.stats.in_cache = len(self._cached_models)
+                self.stats.mapped_size = sum(record.mapped_size for record in self._cached_models.values())
+                self.stats.loaded_model_sizes[stats_name] = max(
+                    self.stats.loaded_model_sizes.get(stats_name, 0), cache_entry.size
+                )
+
+                self.stats.accesses.append(CacheAccess(key=key, size=cache_entry.resident_size, hit=True))
+
+            self._clock += 1
+            cache_entry.accesses += 1
+            cache_entry.last_accessed = self._clock
+            return ModelLocker(
+                cache=self,
+                cache_entry=cache_entry,
             )
 
-        # this moves the entry to the top (right end) of the stack
-        with suppress(Exception):
-            self._cache_stack.remove(key)
-        self._cache_stack.append(key)
-        return ModelLocker(
-            cache=self,
-            cache_entry=cache_entry,
-        )
+    def exists(
+        self,
+        key: str,
+        submodel_type: Optional[SubModelType] = None,
+    ) -> bool:
+        """Return true if the model with key and optional submodel_type is in the cache."""
+        with self._lock:
+            return self._make_cache_key(key, submodel_type) in self._cached_models
 
     def _capture_memory_snapshot(self) -> Optional[MemorySnapshot]:
         if self._log_memory_usage:
@@ -241,21 +384,41 @@ class ModelCache(ModelCacheBase[AnyModel]):
 
         :param size_required: The amount of space to clear in the execution_device cache, in bytes.
         """
-        reserved = self._max_vram_cache_size * GB
-        vram_in_use = torch.cuda.memory_allocated() + size_required
-        self.logger.debug(f"{(vram_in_use/GB):.2f}GB VRAM needed for models; max allowed={(reserved/GB):.2f}GB")
-        for _, cache_entry in sorted(self._cached_models.items(), key=lambda x: x[1].size):
-            if vram_in_use <= reserved:
-                break
-            if not cache_entry.loaded:
-                continue
-            if not cache_entry.locked:
-                self.move_model_to_device(cache_entry, self.storage_device)
-                cache_entry.loaded = False
-                vram_in_use = torch.cuda.memory_allocated() + size_required
-                self.logger.debug(
-                    f"Removing {cache_entry.key} from VRAM to free {(cache_entry.size/GB):.2f}GB; vram free = {(torch.cuda.memory_allocated()/GB):.2f}GB"
-                )
+        offloaded: list[CacheRecord[AnyModel]] = []
+        with self._lock:
+            reserved = self._max_vram_cache_size * GB
+            vram_in_use = torch.cuda.memory_allocated() + size_required
+            self.logger.debug(f"{(vram_in_use/GB):.2f}GB VRAM needed for models; max allowed={(reserved/GB):.2f}GB")
+            # With partial loading, the weights of the loaded models are also kept within the partial load budget, so
+            # that as much of the required model as possible can be loaded.
+            weights_budget = self._partial_load_vram * GB
+            weights_in_vram = self._get_vram_weights_size() + size_required
+            for cache_entry in self._offload_policy.order(list(self._cached_models.values()), self._clock):
+                if vram_in_use <= reserved and (weights_budget == 0 or weights_in_vram <= weights_budget):
+                    break
+                if not cache_entry.loaded:
+                    continue
+                if not cache_entry.locked:
+                    # The models are moved once the lock is released. Locking them keeps other threads from evicting
+                    # or offloading them meanwhile.
+                    cache_entry.lock()
+                    offloaded.append(cache_entry)
+                    vram_size = cache_entry.vram_size
+                    vram_in_use -= vram_size
+                    weights_in_vram -= vram_size
+
+        for cache_entry in offloaded:
+            vram_size = cache_entry.vram_size
+            try:
+                with cache_entry.move_lock:
+                    self._move_model_to_device(cache_entry, self.storage_device)
+                    cache_entry.loaded = False
+            finally:
+                with self._lock:
+                    cache_entry.unlock()
+            self.logger.debug(
+                f"Removing {cache_entry.key} from VRAM to free {(vram_size/GB):.2f}GB; vram free = {(torch.cuda.memory_allocated()/GB):.2f}GB"
+            )
 
         TorchDevice.empty_cache()
 
@@ -267,99 +430,234 @@ class ModelCache(ModelCacheBase[AnyModel]):
 
         May raise a torch.cuda.OutOfMemoryError
         """
-        self.logger.debug(f"Called to move {cache_entry.key} to {target_device}")
-        source_device = cache_entry.device
+        try:
+            self._move_model_to_device(cache_entry, target_device)
+        finally:
+            self._report_load_stats()
+
+    def _move_model_to_device(self, cache_entry: CacheRecord[AnyModel], target_device: torch.device) -> None:
+        # The moves of a model are serialized by its move lock. The cache lock is only held for the bookkeeping, so that
+        # other threads can use the cache while the weights are copied.
+        with cache_entry.move_lock:
+            with self._lock:
+                self.logger.debug(f"Called to move {cache_entry.key} to {target_device}")
+                source_device = cache_entry.device
+
+                # Note: We compare device types only so that 'cuda' == 'cuda:0'.
+                # This would need to be revised to support multi-GPU.
+                if torch.device(source_device).type == torch.device(target_device).type:
+                    return
+
+                # Some models don't have a `to` method, in which case they run in RAM/CPU.
+                if not hasattr(cache_entry.model, "to"):
+                    return
+
+                partial_load_budget: Optional[int] = None
+                if (
+                    cache_entry.partial_load is None
+                    and self._partial_load_vram > 0
+                    and isinstance(cache_entry.model, torch.nn.Module)
+                ):
+                    available = int(self._partial_load_vram * GB) - self._get_vram_weights_size(exclude=cache_entry)
+                    if cache_entry.size > available:
+                        partial_load_budget = max(0, available)
+
+            # This roundabout method for moving the model around is done to avoid
+            # the cost of moving the model from RAM to VRAM and then back from VRAM to RAM.
+            # When moving to VRAM, we copy (not move) each element of the state dict from
+            # RAM to a new state dict in VRAM, and then inject it into the model.
+            # This operation is slightly faster than running `to()` on the whole model.
+            #
+            # When the model needs to be removed from VRAM we simply delete the copy
+            # of the state dict in VRAM, and reinject the state dict that is cached
+            # in RAM into the model. So this operation is very fast.
+            start_model_to_time = time.time()
+            snapshot_before = self._capture_memory_snapshot()
+
+            try:
+                if cache_entry.partial_load is not None:
+                    # Only moving a partially loaded model back to the storage device is supported
+                    assert target_device == self.storage_device
+                    cache_entry.partial_load.unload()
+                    with self._lock:
+                        cache_entry.partial_load = None
+                        cache_entry.device = target_device
+                    return
+                if partial_load_budget is not None:
+                    assert isinstance(cache_entry.model, torch.nn.Module)
+                    partial_load = PartialLoad(cache_entry.model, target_device, partial_load_budget)
+                    with self._lock:
+                        cache_entry.partial_load = partial_load
+                        cache_entry.device = target_device
+                    self.logger.debug(
+                        f"Partially loaded model '{cache_entry.key}' into {target_device}:"
+                        f" {(partial_load.loaded_size/GB):.3f} GB loaded,"
+                        f" {(partial_load.streamed_size/GB):.3f} GB moved for each forward pass."
+                    )
+                    return
+                vram_before = torch.cuda.memory_allocated(target_device) if target_device.type == "cuda" else None
+                if cache_entry.state_dict is not None:
+                    assert hasattr(cache_entry.model, "load_state_dict")
+                    if target_device == self.storage_device:
+                        cache_entry.model.load_state_dict(cache_entry.state_dict, assign=True)
+                    else:
+                        start_transfer_time = time.time()
+                        new_dict = copy_state_dict_to_device(
+                            cache_entry.state_dict, target_device, stream=self._get_transfer_stream(target_device)
+                        )
+                        with self._lock:
+                            if self.stats:
+                                self.stats.transferred_size += sum(
+                                    v.nelement() * v.element_size() for v in new_dict.values()
+                                )
+                                self.stats.transfer_time += time.time() - start_transfer_time
+                        cache_entry.model.load_state_dict(new_dict, assign=True)
+                cache_entry.model.to(target_device)
+                with self._lock:
+                    cache_entry.device = target_device
+                    if vram_before is not None:
+                        self._update_vram_footprint(
+                            cache_entry, torch.cuda.memory_allocated(target_device) - vram_before
+                        )
+            except Exception as e:  # blow away cache entry
+                self._delete_cache_entry(cache_entry)
+                raise e
 
-        # Note: We compare device types only so that 'cuda' == 'cuda:0'.
-        # This would need to be revised to support multi-GPU.
-        if torch.device(source_device).type == torch.device(target_device).type:
-            return
+            snapshot_after = self._capture_memory_snapshot()
+            end_model_to_time = time.time()
+            self.logger.debug(
+                f"Moved model '{cache_entry.key}' from {source_device} to"
+                f" {target_device} in {(end_model_to_time-start_model_to_time):.2f}s."
+                f"Estimated model size: {(cache_entry.size/GB):.3f} GB."
+                f"{get_pretty_snapshot_diff(snapshot_before, snapshot_after)}"
+            )
 
-        # Some models don't have a `to` method, in which case they run in RAM/CPU.
-        if not hasattr(cache_entry.model, "to"):
+            if (
+                snapshot_before is not None
+                and snapshot_after is not None
+                and snapshot_before.vram is not None
+                and snapshot_after.vram is not None
+            ):
+                vram_change = abs(snapshot_before.vram - snapshot_after.vram)
+
+                # If the estimated model size does not match the change in VRAM, log a warning.
+                if not math.isclose(
+                    vram_change,
+                    cache_entry.size,
+                    rel_tol=0.1,
+                    abs_tol=10 * MB,
+                ):
+                    self.logger.debug(
+                        f"Moving model '{cache_entry.key}' from {source_device} to"
+                        f" {target_device} caused an unexpected change in VRAM usage. The model's"
+                        " estimated size may be incorrect. Estimated model size:"
+                        f" {(cache_entry.size/GB):.3f} GB.\n"
+                        f"{get_pretty_snapshot_diff(snapshot_before, snapshot_after)}"
+                    )
+
+    def _share_state_dict(self, model: AnyModel, name: str) -> Optional[SharedStateDict]:
+        """Map the weights of the model from their shared segment, writing the segment if no process has yet."""
+        assert self._shared_state_dicts is not None
+        if not isinstance(model, torch.nn.Module):
+            return None
+        state_dict = model.state_dict()
+        if any(tensor.device.type != "cpu" for tensor in state_dict.values()):
+            return None
+        try:
+            shared_state_dict = self._shared_state_dicts.share(name, state_dict)
+        except Exception as e:
+            self.logger.warning(f"Failed to share the weights of model {name} with other processes: {e}")
+            return None
+        # The model's own copies of its weights are freed, unless they are referenced elsewhere
+        model.load_state_dict(shared_state_dict.state_dict, assign=True)
+        return shared_state_dict
+
+    def _update_load_stats(self, stats: ModelLoadStats) -> None:
+        """Record the measurements of a model. Must hold the lock; the listener is called by `_report_load_stats()`."""
+        key = self._make_cache_key(stats.key, stats.submodel_type)
+        if self._load_stats.get(key) == stats:
+            return
+        self._load_stats[key] = stats
+        if self._load_stats_listener is not None:
+            self._unreported_load_stats.append(stats)
+
+    def _report_load_stats(self) -> None:
+        """Pass the updated measurements to the listener. Must not hold the lock, since the listener may be slow, e.g.
+        write to the database."""
+        with self._lock:
+            unreported_load_stats, self._unreported_load_stats = self._unreported_load_stats, []
+            listener = self._load_stats_listener
+        if listener is None:
+            return
+        for stats in unreported_load_stats:
+            try:
+                listener(stats)
+            except Exception as e:
+                key = self._make_cache_key(stats.key, stats.submodel_type)
+                self.logger.warning(f"Failed to record the measurements of model {key}: {e}")
+
+    def _update_vram_footprint(self, cache_entry: CacheRecord[AnyModel], vram_footprint: int) -> None:
+        cache_entry.vram_footprint = vram_footprint
+        stats = self._load_stats.get(cache_entry.key)
+        # The footprint varies slightly between moves, so it is only updated when it differs significantly
+        if stats is None or (
+            stats.vram_size is not None and math.isclose(stats.vram_size, vram_footprint, rel_tol=0.1, abs_tol=MB)
+        ):
             return
+        self._update_load_stats(replace(stats, vram_size=vram_footprint))
 
-        # This roundabout method for moving the model around is done to avoid
-        # the cost of moving the model from RAM to VRAM and then back from VRAM to RAM.
-        # When moving to VRAM, we copy (not move) each element of the state dict from
-        # RAM to a new state dict in VRAM, and then inject it into the model.
-        # This operation is slightly faster than running `to()` on the whole model.
-        #
-        # When the model needs to be removed from VRAM we simply delete the copy
-        # of the state dict in VRAM, and reinject the state dict that is cached
-        # in RAM into the model. So this operation is very fast.
-        start_model_to_time = time.time()
-        snapshot_before = self._capture_memory_snapshot()
+    def _get_transfer_stream(self, device: torch.device) -> Optional[torch.cuda.Stream]:
+        """Return the stream to copy state dicts to the device on, if they are copied on a dedicated stream."""
+        if not self._pin_memory or device.type != "cuda":
+            return None
+        if self._transfer_stream is None:
+            self._transfer_stream = torch.cuda.Stream(device=device)
+        return self._transfer_stream
 
-        try:
-            if cache_entry.state_dict is not None:
-                assert hasattr(cache_entry.model, "load_state_dict")
-                if target_device == self.storage_device:
-                    cache_entry.model.load_state_dict(cache_entry.state_dict, assign=True)
-                else:
-                    new_dict: Dict[str, torch.Tensor] = {}
-                    for k, v in cache_entry.state_dict.items():
-                        new_dict[k] = v.to(target_device, copy=True)
-                    cache_entry.model.load_state_dict(new_dict, assign=True)
-            cache_entry.model.to(target_device)
-            cache_entry.device = target_device
-        except Exception as e:  # blow away cache entry
-            self._delete_cache_entry(cache_entry)
-            raise e
-
-        snapshot_after = self._capture_memory_snapshot()
-        end_model_to_time = time.time()
-        self.logger.debug(
-            f"Moved model '{cache_entry.key}' from {source_device} to"
-            f" {target_device} in {(end_model_to_time-start_model_to_time):.2f}s."
-            f"Estimated model size: {(cache_entry.size/GB):.3f} GB."
-            f"{get_pretty_snapshot_diff(snapshot_before, snapshot_after)}"
-        )
-
-        if (
-            snapshot_before is not None
-            and snapshot_after is not None
-            and snapshot_before.vram is not None
-            and snapshot_after.vram is not None
-        ):
-            vram_change = abs(snapshot_before.vram - snapshot_after.vram)
-
-            # If the estimated model size does not match the change in VRAM, log a warning.
-            if not math.isclose(
-                vram_change,
-                cache_entry.size,
-                rel_tol=0.1,
-                abs_tol=10 * MB,
-            ):
-                self.logger.debug(
-                    f"Moving model '{cache_entry.key}' from {source_device} to"
-                    f" {target_device} caused an unexpected change in VRAM usage. The model's"
-                    " estimated size may be incorrect. Estimated model size:"
-                    f" {(cache_entry.size/GB):.3f} GB.\n"
-                    f"{get_pretty_snapshot_diff(snapshot_before, snapshot_after)}"
-                )
+    def _get_vram_weights_size(self, exclude: Optional[CacheRecord[AnyModel]] = None) -> int:
+        """Return the size of the model weights in the execution_device."""
+        return sum(record.vram_size for record in self._cached_models.values() if record is not exclude)
 
     def print_cuda_stats(self) -> None:
         """Log CUDA diagnostics."""
-        vram = "%4.2fG" % (torch.cuda.memory_allocated() / GB)
-        ram = "%4.2fG" % (self.cache_size() / GB)
-
-        in_ram_models = 0
-        in_vram_models = 0
-        locked_in_vram_models = 0
-        for cache_record in self._cached_models.values():
-            if hasattr(cache_record.model, "device"):
-                if cache_record.model.device == self.storage_device:
-                    in_ram_models += 1
-                else:
-                    in_vram_models += 1
-                if cache_record.locked:
-                    locked_in_vram_models += 1
+        with self._lock:
+            vram = "%4.2fG" % (torch.cuda.memory_allocated() / GB)
+            ram = "%4.2fG" % (self.cache_size() / GB)
+
+            in_ram_models = 0
+            in_vram_models = 0
+            locked_in_vram_models = 0
+            for cache_record in self._cached_models.values():
+                if hasattr(cache_record.model, "device"):
+                    if cache_record.model.device == self.storage_device:
+                        in_ram_models += 1
+                    else:
+                        in_vram_models += 1
+                    if cache_record.locked:
+                        locked_in_vram_models += 1
+
+                    self.logger.debug(
+                        f"Current VRAM/RAM usage: {vram}/{ram}; models_in_ram/models_in_vram(locked) ="
+                        f" {in_ram_models}/{in_vram_models}({locked_in_vram_models})"
+                    )
+
+    @contextmanager
+    def without_eviction(self) -> Generator[None, None, None]:
+        """
+        Return a context in which the current thread puts models in the free space of the cache only.
 
-                self.logger.debug(
-                    f"Current VRAM/RAM usage: {vram}/{ram}; models_in_ram/models_in_vram(locked) ="
-                    f" {in_ram_models}/{in_vram_models}({locked_in_vram_models})"
-                )
+        No model is evicted to make room for them, and the models that do not fit are not cached. Other threads are not
+        affected.
+        """
+        previous = getattr(self._no_eviction, "active", False)
+        self._no_eviction.active = True
+        try:
+            yield
+        finally:
+            self._no_eviction.active = previous
+
+    def _is_eviction_allowed(self) -> bool:
+        return not getattr(self._no_eviction, "active", False)
 
     def make_room(self, size: int) -> None:
         """Make enough room in the cache to accommodate a new model of indicated size.
@@ -368,59 +666,61 @@ class ModelCache(ModelCacheBase[AnyModel]):
         external references to the model, there's nothing that the cache can do about it, and those models will not be
         garbage-collected.
         """
-        bytes_needed = size
-        maximum_size = self.max_cache_size * GB  # stored in GB, convert to bytes
-        current_size = self.cache_size()
-
-        if current_size + bytes_needed > maximum_size:
-            self.logger.debug(
-                f"Max cache size exceeded: {(current_size/GB):.2f}/{self.max_cache_size:.2f} GB, need an additional"
-                f" {(bytes_needed/GB):.2f} GB"
-            )
-
-        self.logger.debug(f"Before making_room: cached_models={len(self._cached_models)}")
-
-        pos = 0
-        models_cleared = 0
-        while current_size + bytes_needed > maximum_size and pos < len(self._cache_stack):
-            model_key = self._cache_stack[pos]
-            cache_entry = self._cached_models[model_key]
-            device = cache_entry.model.device if hasattr(cache_entry.model, "device") else None
-            self.logger.debug(
-                f"Model: {model_key}, locks: {cache_entry._locks}, device: {device}, loaded: {cache_entry.loaded}"
-            )
+        if not self._is_eviction_allowed():
+            return
+        with self._lock:
+            bytes_needed = size
+            maximum_size = self.max_cache_size * GB  # stored in GB, convert to bytes
+            current_size = self.cache_size()
 
-            if not cache_entry.locked:
+            if current_size + bytes_needed > maximum_size:
                 self.logger.debug(
-                    f"Removing {model_key} from RAM cache to free at least {(size/GB):.2f} GB (-{(cache_entry.size/GB):.2f} GB)"
+                    f"Max cache size exceeded: {(current_size/GB):.2f}/{self.max_cache_size:.2f} GB, need an additional"
+                    f" {(bytes_needed/GB):.2f} GB"
                 )
-                current_size -= cache_entry.size
-                models_cleared += 1
-                self._delete_cache_entry(cache_entry)
-                del cache_entry
 
-            else:
-                pos += 1
+            self.logger.debug(f"Before making_room: cached_models={len(self._cached_models)}")
 
-        if models_cleared > 0:
-            # There would likely be some 'garbage' to be collected regardless of whether a model was cleared or not, but
-            # there is a significant time cost to calling `gc.collect()`, so we want to use it sparingly. (The time cost
-            # is high even if no garbage gets collected.)
-            #
-            # Calling gc.collect(...) when a model is cleared seems like a good middle-ground:
-            # - If models had to be cleared, it's a signal that we are close to our memory limit.
-            # - If models were cleared, there's a good chance that there's a significant amount of garbage to be
-            #   collected.
-            #
-            # Keep in mind that gc is only responsible for handling reference cycles. Most objects should be cleaned up
-            # immediately when their reference count hits 0.
-            if self.stats:
-                self.stats.cleared = models_cleared
-            gc.collect()
+            models_cleared = 0
+            for cache_entry in self._eviction_policy.order(list(self._cached_models.values()), self._clock):
+                if current_size + bytes_needed <= maximum_size:
+                    break
+                model_key = cache_entry.key
+                device = cache_entry.model.device if hasattr(cache_entry.model, "device") else None
+                self.logger.debug(
+                    f"Model: {model_key}, locks: {cache_entry._locks}, device: {device}, loaded: {cache_entry.loaded}"
+                )
 
-        TorchDevice.empty_cache()
-        self.logger.debug(f"After making room: cached_models={len(self._cached_models)}")
+                if not cache_entry.locked:
+                    self.logger.debug(
+                        f"Removing {model_key} from RAM cache to free at least {(size/GB):.2f} GB (-{(cache_entry.resident_size/GB):.2f} GB)"
+                    )
+                    current_size -= cache_entry.resident_size
+                    models_cleared += 1
+                    self._delete_cache_entry(cache_entry)
+                    del cache_entry
+
+            if models_cleared > 0:
+                # There would likely be some 'garbage' to be collected regardless of whether a model was cleared or not, but
+                # there is a significant time cost to calling `gc.collect()`, so we want to use it sparingly. (The time cost
+                # is high even if no garbage gets collected.)
+                #
+                # Calling gc.collect(...) when a model is cleared seems like a good middle-ground:
+                # - If models had to be cleared, it's a signal that we are close to our memory limit.
+                # - If models were cleared, there's a good chance that there's a significant amount of garbage to be
+                #   collected.
+                #
+                # Keep in mind that gc is only responsible for handling reference cycles. Most objects should be cleaned up
+                # immediately when their reference count hits 0.
+                if self.stats:
+                    self.stats.cleared = models_cleared
+                gc.collect()
+
+            TorchDevice.empty_cache()
+            self.logger.debug(f"After making room: cached_models={len(self._cached_models)}")
 
     def _delete_cache_entry(self, cache_entry: CacheRecord[AnyModel]) -> None:
-        self._cache_stack.remove(cache_entry.key)
-        del self._cached_models[cache_entry.key]
+        with self._lock:
+            del self._cached_models[cache_entry.key]
+            if cache_entry.shared_state_dict is not None:
+                cache_entry.shared_state_dict.release()
@@ -41,7 +41,8 @@ class ModelLocker(ModelLockerBase):
         self._cache_entry.lock()
         try:
             if self._cache.lazy_offloading:
-                self._cache.offload_unlocked_models(self._cache_entry.size)
+                # The measured VRAM footprint of the model is more accurate than its size in RAM, if it is known
+                self._cache.offload_unlocked_models(self._cache_entry.vram_footprint or self._cache_entry.size)
             self._cache.move_model_to_device(self._cache_entry, self._cache.execution_device)
             self._cache_entry.loaded = True
             self._cache.logger.debug(f"Locking {self._cache_entry.key} in {self._cache.execution_device}")
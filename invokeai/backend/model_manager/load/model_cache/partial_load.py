@@ -0,0 +1,81 @@
+"""Partial loading of models that do not fit in the VRAM budget of the model cache.
+
+A partially loaded model keeps the weights of as many of its modules as fit in the budget on the execution device. The
+weights of its other modules stay on the storage device, and are copied to the execution device for each forward pass
+of their module by forward hooks. Models whose modules use the weights of other modules outside of their forward pass
+are not supported.
+"""
+
+from typing import Dict, List, Tuple
+
+import torch
+from torch.utils.hooks import RemovableHandle
+
+
+def _get_own_tensors(module: torch.nn.Module) -> Dict[str, torch.Tensor]:
+    """Return the parameters and buffers of the module, excluding those of its submodules."""
+    tensors: Dict[str, torch.Tensor] = dict(module.named_parameters(recurse=False))
+    tensors.update(module.named_buffers(recurse=False))
+    return tensors
+
+
+def _set_tensor(module: torch.nn.Module, name: str, tensor: torch.Tensor, original: torch.Tensor) -> None:
+    if isinstance(original, torch.nn.Parameter):
+        if tensor is not original:
+            tensor = torch.nn.Parameter(tensor, requires_grad=original.requires_grad)
+        module._parameters[name] = tensor  # pyright: ignore[reportArgumentType]
+    else:
+        module._buffers[name] = tensor
+
+
+class PartialLoad:
+    """The modules of a model that are loaded onto the execution device, and the hooks streaming the others."""
+
+    def __init__(self, model: torch.nn.Module, device: torch.device, budget: int):
+        """
+        Load the modules of the model onto the device, in order, while their weights fit in the budget.
+
+        :param model: The model, with all of its weights on the storage device
+        :param device: The execution device
+        :param budget: The maximum size of the weights to load onto the device, in bytes
+        """
+        self.loaded_size = 0
+        self.streamed_size = 0
+        self._originals: List[Tuple[torch.nn.Module, Dict[str, torch.Tensor]]] = []
+        self._hooks: List[RemovableHandle] = []
+
+        for module in model.modules():
+            tensors = _get_own_tensors(module)
+            if not tensors:
+                continue
+            self._originals.append((module, tensors))
+            size = sum(t.nelement() * t.element_size() for t in tensors.values())
+            if self.loaded_size + size <= budget:
+                for name, tensor in tensors.items():
+                    _set_tensor(module, name, tensor.to(device, copy=True), tensor)
+                self.loaded_size += size
+            else:
+                self._stream(module, tensors, device)
+                self.streamed_size += size
+
+    def unload(self) -> None:
+        """Remove the hooks and restore the weights that were on the storage device."""
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks.clear()
+        for module, tensors in self._originals:
+            for name, tensor in tensors.items():
+                _set_tensor(module, name, tensor, tensor)
+        self._originals.clear()
+
+    def _stream(self, module: torch.nn.Module, tensors: Dict[str, torch.Tensor], device: torch.device) -> None:
+        def load_weights(module: torch.nn.Module, args: object) -> None:
+            for name, tensor in tensors.items():
+                _set_tensor(module, name, tensor.to(device, non_blocking=True), tensor)
+
+        def unload_weights(module: torch.nn.Module, args: object, output: object) -> None:
+            for name, tensor in tensors.items():
+                _set_tensor(module, name, tensor, tensor)
+
+        self._hooks.append(module.register_forward_pre_hook(load_weights))
+        self._hooks.append(module.register_forward_hook(unload_weights, always_call=True))
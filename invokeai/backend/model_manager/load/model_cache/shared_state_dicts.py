@@ -0,0 +1,216 @@
+"""Sharing the weights of cached models between processes.
+
+Each process running InvokeAI has its own model cache, so several processes on one host would each hold a copy of the
+weights of the models they use. A `SharedStateDictStore` instead keeps the state dict of each cached model in a
+segment: a safetensors file in a directory shared by the processes, named after the model's hash. The process that
+caches a model first writes its segment, and every process, including that one, replaces the model's weights with
+views into a memory map of the segment. The pages of the segment are then shared by all processes through the OS page
+cache. Pages that are written to, e.g. when a model is patched on the CPU, are copied, so the segment is never modified.
+
+Each cache entry using a segment holds a reference to it: a file in the segment's reference directory, named after the
+holder's process. A segment is deleted when its last reference is released. References of processes that exited
+without releasing them are ignored.
+
+Segments are replaced and deleted without locks. A process may map a segment just before it is deleted, or replace a
+segment that another process has mapped. Its mapping stays valid (on POSIX systems, a deleted file is only removed once
+it is unmapped), and the segment is simply not shared with the processes that load the model afterwards.
+"""
+
+import json
+import os
+import re
+import uuid
+from logging import Logger
+from pathlib import Path
+from typing import Dict, Optional
+
+import psutil
+import torch
+
+from invokeai.backend.model_manager.load.mmap_safetensors import (
+    load_mmap_safetensors,
+    read_safetensors_metadata,
+    save_safetensors,
+)
+from invokeai.backend.util.logging import InvokeAILogger
+
+# Identifies the tensors of a state dict that are the same tensor, such as tied weights
+_TensorId = tuple[int, torch.dtype, tuple[int, ...], tuple[int, ...]]
+
+
+def _get_tensor_id(tensor: torch.Tensor) -> _TensorId:
+    return (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape), tuple(tensor.stride()))
+
+
+class SharedStateDict:
+    """A state dict mapped from a shared segment, and the reference holding the segment."""
+
+    def __init__(self, store: "SharedStateDictStore", name: str, ref_path: Path, state_dict: Dict[str, torch.Tensor]):
+        self.name = name
+        self.state_dict = state_dict
+        self._store = store
+        self._ref_path: Optional[Path] = ref_path
+
+    def release(self) -> None:
+        """Release the reference to the segment, deleting the segment if it was the last one."""
+        if self._ref_path is not None:
+            self._store.release(self.name, self._ref_path)
+            self._ref_path = None
+
+
+class SharedStateDictStore:
+    """The segments holding the state dicts of the models cached by the processes sharing a directory."""
+
+    def __init__(self, path: Path, logger: Optional[Logger] = None):
+        """
+        Initialize the store, deleting the segments that are no longer referenced by any process.
+
+        :param path: The directory of the segments. Segments in a directory on disk are read back from disk when their
+            pages are dropped by the OS. Segments in a RAM-backed directory, such as /dev/shm, always take up RAM.
+        :param logger: InvokeAILogger to use (otherwise creates one)
+        """
+        self._path = path
+        self._logger = logger or InvokeAILogger.get_logger(self.__class__.__name__)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self.remove_unused_segments()
+
+    def share(self, name: str, state_dict: Dict[str, torch.Tensor]) -> SharedStateDict:
+        """
+        Return the state dict of the segment with the given name, writing the segment from state_dict if needed.
+
+        The segment is written again if it holds a different state dict, e.g. one converted to another dtype.
+
+        :param name: The name of the segment, e.g. the hash of the model
+        :param state_dict: The state dict of the model, on the CPU
+        """
+        shared = self.attach(name)
+        if shared is not None:
+            if _is_compatible(shared.state_dict, state_dict):
+                return shared
+            shared.release()
+        return self.publish(name, state_dict)
+
+    def attach(self, name: str) -> Optional[SharedStateDict]:
+        """Return the state dict of the segment with the given name, or None if there is no such segment."""
+        ref_path = self._add_ref(name)
+        segment_path = self._get_segment_path(name)
+        try:
+            state_dict = _load_segment(segment_path)
+        except FileNotFoundError:
+            self.release(name, ref_path)
+            return None
+        return SharedStateDict(self, name, ref_path, state_dict)
+
+    def publish(self, name: str, state_dict: Dict[str, torch.Tensor]) -> SharedStateDict:
+        """Write the state dict to the segment with the given name, and return the state dict mapped from it."""
+        segment_path = self._get_segment_path(name)
+        temp_path = self._path / f"{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        tensors: Dict[str, torch.Tensor] = {}
+        aliases: Dict[str, str] = {}
+        saved_keys: Dict[_TensorId, str] = {}
+        for key, tensor in state_dict.items():
+            tensor_id = _get_tensor_id(tensor)
+            if tensor_id in saved_keys:
+                aliases[key] = saved_keys[tensor_id]
+            else:
+                saved_keys[tensor_id] = key
+                tensors[key] = tensor
+        ref_path = self._add_ref(name)
+        try:
+            save_safetensors(temp_path, tensors, metadata={"aliases": json.dumps(aliases)})
+            # Readers see either the previous segment or the complete new one
+            os.replace(temp_path, segment_path)
+            shared_state_dict = _load_segment(segment_path)
+        except Exception:
+            temp_path.unlink(missing_ok=True)
+            self.release(name, ref_path)
+            raise
+        self._logger.debug(f"Shared the weights of {name} in {segment_path}")
+        return SharedStateDict(self, name, ref_path, shared_state_dict)
+
+    def release(self, name: str, ref_path: Path) -> None:
+        """Release a reference to the segment with the given name, deleting the segment if it was the last one."""
+        ref_path.unlink(missing_ok=True)
+        if self.get_ref_count(name) > 0:
+            return
+        try:
+            self._get_segment_path(name).unlink(missing_ok=True)
+            self._get_refs_path(name).rmdir()
+        except OSError:
+            # The segment is still mapped (on Windows), or a process has just added a reference to it
+            pass
+
+    def get_ref_count(self, name: str) -> int:
+        """Return the number of references to the segment with the given name held by running processes."""
+        try:
+            return sum(1 for ref_path in self._get_refs_path(name).iterdir() if _is_live_ref(ref_path))
+        except FileNotFoundError:
+            return 0
+
+    def remove_unused_segments(self) -> None:
+        """Delete the segments that are not referenced by any running process, and the files of exited processes."""
+        for path in self._path.glob("*.refs/*"):
+            if not _is_live_ref(path):
+                path.unlink(missing_ok=True)
+        for path in self._path.glob("*.tmp"):
+            if not _is_live_ref(path):
+                path.unlink(missing_ok=True)
+        for segment_path in self._path.glob("*.safetensors"):
+            name = segment_path.name.removesuffix(".safetensors")
+            if self.get_ref_count(name) > 0:
+                continue
+            self._logger.debug(f"Removing unused shared weights {segment_path}")
+            try:
+                segment_path.unlink(missing_ok=True)
+            except OSError:
+                # The segment has just been mapped by a process (on Windows)
+                pass
+        for refs_path in self._path.glob("*.refs"):
+            try:
+                refs_path.rmdir()
+            except OSError:
+                # The segment is still referenced
+                pass
+
+    def _get_segment_path(self, name: str) -> Path:
+        return self._path / f"{_sanitize(name)}.safetensors"
+
+    def _get_refs_path(self, name: str) -> Path:
+        return self._path / f"{_sanitize(name)}.refs"
+
+    def _add_ref(self, name: str) -> Path:
+        ref_path = self._get_refs_path(name) / f"{os.getpid()}.{uuid.uuid4().hex}"
+        while True:
+            ref_path.parent.mkdir(exist_ok=True)
+            try:
+                ref_path.touch()
+                return ref_path
+            except FileNotFoundError:
+                # The directory was removed by a process releasing the last reference to the segment
+                continue
+
+
+def _sanitize(name: str) -> str:
+    """Return the name with the characters that are not allowed in file names replaced, e.g. `blake3:...`."""
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def _is_live_ref(path: Path) -> bool:
+    """Return true if the reference or temporary file at the path belongs to a running process."""
+    pid = path.name.split(".", 1)[0]
+    return pid.isdigit() and psutil.pid_exists(int(pid))
+
+
+def _load_segment(path: Path) -> Dict[str, torch.Tensor]:
+    state_dict = load_mmap_safetensors(path)
+    aliases: Dict[str, str] = json.loads(read_safetensors_metadata(path).get("aliases", "{}"))
+    for key, saved_key in aliases.items():
+        state_dict[key] = state_dict[saved_key]
+    return state_dict
+
+
+def _is_compatible(shared: Dict[str, torch.Tensor], state_dict: Dict[str, torch.Tensor]) -> bool:
+    """Return true if the shared state dict can replace the state dict of a model."""
+    return shared.keys() == state_dict.keys() and all(
+        shared[key].dtype == tensor.dtype and shared[key].shape == tensor.shape for key, tensor in state_dict.items()
+    )
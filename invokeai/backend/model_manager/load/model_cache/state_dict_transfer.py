@@ -0,0 +1,117 @@
+"""Faster copies of the state dicts of cached models from RAM to VRAM.
+
+Copying a state dict tensor by tensor from pageable memory is slow: each copy is staged through a pinned buffer by the
+driver and blocks the host, and the many small tensors of a model (biases, norms) are each a separate transfer.
+`pack_state_dict()` moves a state dict into pinned memory once, when the model is cached, and packs its small tensors
+into a contiguous buffer per dtype. `copy_state_dict_to_device()` then copies each buffer with a single non-blocking
+copy, and rebuilds the tensors as views of the copy.
+"""
+
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+from invokeai.backend.model_manager.load.mmap_safetensors import is_memory_mapped
+
+# Tensors smaller than this are packed into a shared buffer, in bytes
+SMALL_TENSOR_SIZE = 2**20
+
+# Identifies the tensors of a state dict that are views of the same data, such as tied weights
+_TensorId = Tuple[int, torch.dtype, Tuple[int, ...], Tuple[int, ...]]
+
+
+def _get_tensor_id(tensor: torch.Tensor) -> _TensorId:
+    return (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape), tuple(tensor.stride()))
+
+
+def pack_state_dict(
+    state_dict: Dict[str, torch.Tensor], pin_memory: bool, small_tensor_size: int = SMALL_TENSOR_SIZE
+) -> Dict[str, torch.Tensor]:
+    """
+    Return the state dict with its small tensors packed into a contiguous buffer per dtype.
+
+    Memory-mapped tensors are left as they are, so that they are still read from their files as needed.
+
+    :param state_dict: The state dict, on the CPU
+    :param pin_memory: Copy the tensors into pinned memory. Requires CUDA.
+    :param small_tensor_size: Tensors smaller than this size in bytes are packed
+    """
+    packed: Dict[str, torch.Tensor] = {}
+    copies: Dict[_TensorId, torch.Tensor] = {}
+    small_tensors: Dict[torch.dtype, List[str]] = {}
+
+    for key, tensor in state_dict.items():
+        tensor_id = _get_tensor_id(tensor)
+        if tensor_id in copies:
+            packed[key] = copies[tensor_id]
+        elif is_memory_mapped(tensor):
+            packed[key] = tensor
+        elif tensor.nelement() * tensor.element_size() < small_tensor_size:
+            small_tensors.setdefault(tensor.dtype, []).append(key)
+            # Reserve the tensor's place in the state dict. It is replaced by its view of the buffer below.
+            packed[key] = tensor
+        else:
+            packed[key] = copies[tensor_id] = tensor.pin_memory() if pin_memory else tensor
+
+    for dtype, keys in small_tensors.items():
+        unique_keys = list({_get_tensor_id(state_dict[key]): key for key in keys}.values())
+        buffer = torch.empty(sum(state_dict[key].nelement() for key in unique_keys), dtype=dtype, pin_memory=pin_memory)
+        offset = 0
+        for key in unique_keys:
+            tensor = state_dict[key]
+            view = buffer[offset : offset + tensor.nelement()].view(tensor.shape)
+            view.copy_(tensor)
+            copies[_get_tensor_id(tensor)] = view
+            offset += tensor.nelement()
+        for key in keys:
+            packed[key] = copies[_get_tensor_id(state_dict[key])]
+
+    return packed
+
+
+def copy_state_dict_to_device(
+    state_dict: Dict[str, torch.Tensor],
+    device: torch.device,
+    stream: Optional[torch.cuda.Stream] = None,
+) -> Dict[str, torch.Tensor]:
+    """
+    Copy the state dict to the device.
+
+    Tensors that share their storage with other tensors of the state dict, such as the packed small tensors, are copied
+    with a single copy of their storage if the tensors cover all of it. Copies from pinned memory are non-blocking.
+
+    :param state_dict: The state dict, on the CPU
+    :param device: The device to copy the state dict to
+    :param stream: The CUDA stream to copy on. The copies are complete when this function returns.
+    """
+    groups: Dict[int, List[str]] = {}
+    for key, tensor in state_dict.items():
+        groups.setdefault(tensor.untyped_storage().data_ptr(), []).append(key)
+
+    copies: Dict[str, torch.Tensor] = {}
+    with torch.cuda.stream(stream) if stream is not None else nullcontext():
+        for keys in groups.values():
+            tensors = [state_dict[key] for key in keys]
+            storage = tensors[0].untyped_storage()
+            unique_tensors = {_get_tensor_id(tensor): tensor for tensor in tensors}.values()
+            covered_size = sum(tensor.nelement() * tensor.element_size() for tensor in unique_tensors)
+            if len(keys) == 1 or covered_size < storage.nbytes():
+                for key, tensor in zip(keys, tensors, strict=True):
+                    copies[key] = tensor.to(device, copy=True, non_blocking=tensor.is_pinned())
+                continue
+
+            source = torch.empty(0, dtype=torch.uint8).set_(storage)
+            copied_storage = source.to(device, copy=True, non_blocking=source.is_pinned()).untyped_storage()
+            for key, tensor in zip(keys, tensors, strict=True):
+                copies[key] = torch.empty(0, dtype=tensor.dtype, device=device).set_(
+                    copied_storage, tensor.storage_offset(), tensor.shape, tensor.stride()
+                )
+
+    if stream is not None:
+        stream.synchronize()
+        # The copies were allocated on the transfer stream, but are used on the current stream
+        current_stream = torch.cuda.current_stream(device)
+        for tensor in copies.values():
+            tensor.record_stream(current_stream)
+    return copies
@@ -6,7 +6,6 @@ from typing import Optional
 
 import accelerate
 import torch
-from safetensors.torch import load_file
 from transformers import AutoConfig, AutoModelForTextEncoding, CLIPTextModel, CLIPTokenizer, T5EncoderModel, T5Tokenizer
 
 from invokeai.app.services.config.config_default import get_config
@@ -48,6 +47,7 @@ from invokeai.backend.model_manager.config import (
     VAECheckpointConfig,
 )
 from invokeai.backend.model_manager.load.load_default import ModelLoader
+from invokeai.backend.model_manager.load.mmap_safetensors import is_memory_mapped
 from invokeai.backend.model_manager.load.model_loader_registry import ModelLoaderRegistry
 from invokeai.backend.model_manager.util.model_util import (
     convert_bundle_to_flux_transformer_checkpoint,
@@ -82,7 +82,7 @@ class FluxVAELoader(ModelLoader):
 
         with SilenceWarnings():
             model = AutoEncoder(ae_params[config.config_path])
-            sd = load_file(model_path)
+            sd = self._load_safetensors(model_path)
             model.load_state_dict(sd, assign=True)
             model.to(dtype=self._torch_dtype)
 
@@ -138,7 +138,7 @@ class BnbQuantizedLlmInt8bCheckpointModel(ModelLoader):
                     model = quantize_model_llm_int8(model, modules_to_not_convert=set())
 
                 state_dict_path = te2_model_path / "bnb_llm_int8_model.safetensors"
-                state_dict = load_file(state_dict_path)
+                state_dict = self._load_safetensors(state_dict_path)
                 self._load_state_dict_into_t5(model, state_dict)
 
                 return model
@@ -211,17 +211,30 @@ class FluxCheckpointModel(ModelLoader):
 
         with SilenceWarnings():
             model = Flux(params[config.config_path])
-            sd = load_file(model_path)
-            if "model.diffusion_model.double_blocks.0.img_attn.norm.key_norm.scale" in sd:
-                sd = convert_bundle_to_flux_transformer_checkpoint(sd)
-            new_sd_size = sum([ten.nelement() * torch.bfloat16.itemsize for ten in sd.values()])
-            self._ram_cache.make_room(new_sd_size)
-            for k in sd.keys():
-                # We need to cast to bfloat16 due to it being the only currently supported dtype for inference
-                sd[k] = sd[k].to(torch.bfloat16)
+            sd = self._load_converted_state_dict(
+                config, "flux_transformer_bf16", 1, lambda: self._load_bf16_state_dict(model_path)
+            )
             model.load_state_dict(sd, assign=True)
         return model
 
+    def _load_bf16_state_dict(self, model_path: Path) -> dict[str, torch.Tensor]:
+        sd = self._load_safetensors(model_path)
+        if "model.diffusion_model.double_blocks.0.img_attn.norm.key_norm.scale" in sd:
+            sd = convert_bundle_to_flux_transformer_checkpoint(sd)
+        # Memory-mapped tensors that are already in bfloat16 are not copied
+        new_sd_size = sum(
+            [
+                ten.nelement() * torch.bfloat16.itemsize
+                for ten in sd.values()
+                if ten.dtype != torch.bfloat16 or not is_memory_mapped(ten)
+            ]
+        )
+        self._ram_cache.make_room(new_sd_size)
+        for k in sd.keys():
+            # We need to cast to bfloat16 due to it being the only currently supported dtype for inference
+            sd[k] = sd[k].to(torch.bfloat16)
+        return sd
+
 
 @ModelLoaderRegistry.register(base=BaseModelType.Flux, type=ModelType.Main, format=ModelFormat.GGUFQuantized)
 class FluxGGUFCheckpointModel(ModelLoader):
@@ -304,7 +317,7 @@ class FluxBnbQuantizednf4bCheckpointModel(ModelLoader):
             with accelerate.init_empty_weights():
                 model = Flux(params[config.config_path])
                 model = quantize_model_nf4(model, modules_to_not_convert=set(), compute_dtype=torch.bfloat16)
-            sd = load_file(model_path)
+            sd = self._load_safetensors(model_path)
             if "model.diffusion_model.double_blocks.0.img_attn.norm.key_norm.scale" in sd:
                 sd = convert_bundle_to_flux_transformer_checkpoint(sd)
             model.load_state_dict(sd, assign=True)
@@ -329,13 +342,20 @@ class FluxControlnetModel(ModelLoader):
         else:
             raise ValueError(f"Unexpected ControlNet model config type: {type(config)}")
 
-        sd = load_file(model_path)
+        # InstantX ControlNets are converted on load. A cached conversion is loaded without reading the model file.
+        converted_sd = self._get_converted_state_dict(config, "flux_instantx_controlnet", 1)
+        if converted_sd is not None:
+            return self._load_instantx_controlnet(converted_sd)
+
+        sd = self._load_safetensors(model_path)
 
         # Detect the FLUX ControlNet model type from the state dict.
         if is_state_dict_xlabs_controlnet(sd):
             return self._load_xlabs_controlnet(sd)
         elif is_state_dict_instantx_controlnet(sd):
-            return self._load_instantx_controlnet(sd)
+            converted_sd = convert_diffusers_instantx_state_dict_to_bfl_format(sd)
+            self._save_converted_state_dict(config, "flux_instantx_controlnet", 1, converted_sd)
+            return self._load_instantx_controlnet(converted_sd)
         else:
             raise ValueError("Do not recognize the state dict as an XLabs or InstantX ControlNet model.")
 
@@ -348,7 +368,7 @@ class FluxControlnetModel(ModelLoader):
         return model
 
     def _load_instantx_controlnet(self, sd: dict[str, torch.Tensor]) -> AnyModel:
-        sd = convert_diffusers_instantx_state_dict_to_bfl_format(sd)
+        """Load an InstantX ControlNet from its state dict, converted to the BFL format."""
         flux_params = infer_flux_params_from_state_dict(sd)
         num_control_modes = infer_instantx_num_control_modes_from_state_dict(sd)
 
@@ -371,7 +391,7 @@ class FluxIpAdapterModel(ModelLoader):
         if not isinstance(config, IPAdapterCheckpointConfig):
             raise ValueError(f"Unexpected model config type: {type(config)}.")
 
-        sd = load_file(Path(config.path))
+        sd = self._load_safetensors(Path(config.path))
 
         params = infer_xlabs_ip_adapter_params_from_state_dict(sd)
 
@@ -6,7 +6,6 @@ from pathlib import Path
 from typing import Optional
 
 import torch
-from safetensors.torch import load_file
 
 from invokeai.app.services.config import InvokeAIAppConfig
 from invokeai.backend.lora.conversions.flux_diffusers_lora_conversion_utils import (
@@ -56,15 +55,18 @@ class LoRALoader(ModelLoader):
         model_path = Path(config.path)
         assert self._model_base is not None
 
-        # Load the state dict from the model file.
-        if model_path.suffix == ".safetensors":
-            state_dict = load_file(model_path.absolute().as_posix(), device="cpu")
+        # Load the state dict from the model file. The keys of SDXL LoRAs are converted, and the result is cached.
+        if self._model_base == BaseModelType.StableDiffusionXL:
+            state_dict = self._load_converted_state_dict(
+                config,
+                "sdxl_lora_diffusers_keys",
+                1,
+                lambda: convert_sdxl_keys_to_diffusers_format(self._load_state_dict(model_path)),
+            )
         else:
-            state_dict = torch.load(model_path, map_location="cpu")
+            state_dict = self._load_state_dict(model_path)
 
-        # Apply state_dict key conversions, if necessary.
         if self._model_base == BaseModelType.StableDiffusionXL:
-            state_dict = convert_sdxl_keys_to_diffusers_format(state_dict)
             model = lora_model_from_sd_state_dict(state_dict=state_dict)
         elif self._model_base == BaseModelType.Flux:
             if config.format == ModelFormat.Diffusers:
@@ -87,6 +89,11 @@ class LoRALoader(ModelLoader):
         model.to(dtype=self._torch_dtype)
         return model
 
+    def _load_state_dict(self, model_path: Path) -> dict[str, torch.Tensor]:
+        if model_path.suffix == ".safetensors":
+            return self._load_safetensors(model_path.absolute())
+        return torch.load(model_path, map_location="cpu")
+
     def _get_model_path(self, config: AnyModelConfig) -> Path:
         # cheating a little - we remember this variable for using in the subsequent call to _load_model()
         self._model_base = config.base
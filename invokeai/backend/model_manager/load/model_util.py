@@ -4,7 +4,7 @@
 import json
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Any, Iterator, Optional
 
 import torch
 from diffusers.pipelines.pipeline_utils import DiffusionPipeline
@@ -17,6 +17,7 @@ from invokeai.backend.image_util.segment_anything.segment_anything_pipeline impo
 from invokeai.backend.ip_adapter.ip_adapter import IPAdapter
 from invokeai.backend.lora.lora_model_raw import LoRAModelRaw
 from invokeai.backend.model_manager.config import AnyModel
+from invokeai.backend.model_manager.load.mmap_safetensors import is_memory_mapped
 from invokeai.backend.onnx.onnx_runtime import IAIOnnxRuntimeModel
 from invokeai.backend.spandrel_image_to_image_model import SpandrelImageToImageModel
 from invokeai.backend.textual_inversion import TextualInversionModelRaw
@@ -24,7 +25,10 @@ from invokeai.backend.util.calc_tensor_size import calc_tensor_size
 
 
 def calc_model_size_by_data(logger: logging.Logger, model: AnyModel) -> int:
-    """Get size of a model in memory in bytes."""
+    """Get size of a model in memory in bytes.
+
+    This includes the weights that are memory-mapped from the model's files, see `calc_model_mapped_size_by_data()`.
+    """
     # TODO(ryand): We should create a CacheableModel interface for all models, and move the size calculations down to
     # the models themselves.
     if isinstance(model, DiffusionPipeline):
@@ -72,6 +76,45 @@ def calc_model_size_by_data(logger: logging.Logger, model: AnyModel) -> int:
         return 0
 
 
+def calc_model_mapped_size_by_data(model: AnyModel) -> int:
+    """Get the size in bytes of the weights of a model that are memory-mapped from its files.
+
+    Mapped weights are backed by the OS page cache, which reads them from disk when they are first used and may drop
+    them again under memory pressure. They do not take up memory allocated for the model, so evicting the model from
+    the RAM cache frees nothing but its resident weights.
+    """
+    return sum(calc_tensor_size(t) for t in _iter_model_tensors(model) if is_memory_mapped(t))
+
+
+def _iter_model_tensors(model: Any) -> Iterator[torch.Tensor]:
+    """Iterate over the tensors held by a model, its submodels and, for InvokeAI's own model classes, its attributes."""
+    seen: set[int] = set()
+
+    def iter_tensors(value: Any) -> Iterator[torch.Tensor]:
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        if isinstance(value, torch.Tensor):
+            yield value
+        elif isinstance(value, DiffusionPipeline):
+            for submodel_key in value.components.keys():
+                yield from iter_tensors(getattr(value, submodel_key))
+        elif isinstance(value, torch.nn.Module):
+            yield from value.parameters()
+            yield from value.buffers()
+        elif isinstance(value, dict):
+            for item in value.values():
+                yield from iter_tensors(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                yield from iter_tensors(item)
+        elif type(value).__module__.startswith("invokeai.") and hasattr(value, "__dict__"):
+            for item in vars(value).values():
+                yield from iter_tensors(item)
+
+    yield from iter_tensors(model)
+
+
 def _calc_pipeline_by_data(pipeline: DiffusionPipeline) -> int:
     res = 0
     assert hasattr(pipeline, "components")
@@ -1,5 +1,6 @@
+import threading
 from contextlib import contextmanager
-from typing import Any, Generator
+from typing import Any, Generator, List
 
 import torch
 
@@ -8,6 +9,12 @@ def _no_op(*args: Any, **kwargs: Any) -> None:
     pass
 
 
+# The patch is global, so it is applied by the first of any concurrent callers and restored by the last
+_skip_torch_weight_init_lock = threading.Lock()
+_skip_torch_weight_init_depth = 0
+_saved_functions: List[Any] = []
+
+
 @contextmanager
 def skip_torch_weight_init() -> Generator[None, None, None]:
     """Monkey patch several of the common torch layers (torch.nn.Linear, torch.nn.Conv1d, etc.) to skip weight initialization.
@@ -17,15 +24,23 @@ def skip_torch_weight_init() -> Generator[None, None, None]:
     completely unnecessary if the intent is to load checkpoint weights from disk for the layer. This context manager
     monkey-patches common torch layers to skip the weight initialization step.
     """
+    global _skip_torch_weight_init_depth
     torch_modules = [torch.nn.Linear, torch.nn.modules.conv._ConvNd, torch.nn.Embedding]
-    saved_functions = [hasattr(m, "reset_parameters") and m.reset_parameters for m in torch_modules]
+
+    with _skip_torch_weight_init_lock:
+        if _skip_torch_weight_init_depth == 0:
+            _saved_functions[:] = [hasattr(m, "reset_parameters") and m.reset_parameters for m in torch_modules]
+            for torch_module in torch_modules:
+                assert hasattr(torch_module, "reset_parameters")
+                torch_module.reset_parameters = _no_op
+        _skip_torch_weight_init_depth += 1
 
     try:
-        for torch_module in torch_modules:
-            assert hasattr(torch_module, "reset_parameters")
-            torch_module.reset_parameters = _no_op
         yield None
     finally:
-        for torch_module, saved_function in zip(torch_modules, saved_functions, strict=True):
-            assert hasattr(torch_module, "reset_parameters")
-            torch_module.reset_parameters = saved_function
+        with _skip_torch_weight_init_lock:
+            _skip_torch_weight_init_depth -= 1
+            if _skip_torch_weight_init_depth == 0:
+                for torch_module, saved_function in zip(torch_modules, _saved_functions, strict=True):
+                    assert hasattr(torch_module, "reset_parameters")
+                    torch_module.reset_parameters = saved_function
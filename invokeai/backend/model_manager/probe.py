@@ -19,6 +19,7 @@ from invokeai.backend.lora.conversions.flux_diffusers_lora_conversion_utils impo
     is_state_dict_likely_in_flux_diffusers_format,
 )
 from invokeai.backend.lora.conversions.flux_kohya_lora_conversion_utils import is_state_dict_likely_in_flux_kohya_format
+from invokeai.backend.model_hash.file_hash_cache import FileHashCache
 from invokeai.backend.model_hash.model_hash import HASHING_ALGORITHMS, ModelHash
 from invokeai.backend.model_manager.config import (
     AnyModelConfig,
@@ -132,7 +133,11 @@ class ModelProbe(object):
 
     @classmethod
     def probe(
-        cls, model_path: Path, fields: Optional[Dict[str, Any]] = None, hash_algo: HASHING_ALGORITHMS = "blake3_single"
+        cls,
+        model_path: Path,
+        fields: Optional[Dict[str, Any]] = None,
+        hash_algo: HASHING_ALGORITHMS = "blake3_single",
+        hash_cache: Optional[FileHashCache] = None,
     ) -> AnyModelConfig:
         """
         Probe the model at model_path and return its configuration record.
@@ -140,6 +145,8 @@ class ModelProbe(object):
         :param model_path: Path to the model file (checkpoint) or directory (diffusers).
         :param fields: An optional dictionary that can be used to override probed
         fields. Typically used for fields that don't probe well, such as prediction_type.
+        :param hash_algo: Algorithm used to hash the model files.
+        :param hash_cache: Cache of the hashes of unchanged model files, so that only changed files are hashed.
 
         Returns: The appropriate model configuration derived from ModelConfigBase.
         """
@@ -178,7 +185,7 @@ class ModelProbe(object):
             fields.get("description") or f"{fields['base'].value} {model_type.value} model {fields['name']}"
         )
         fields["format"] = ModelFormat(fields.get("format")) if "format" in fields else probe.get_format()
-        fields["hash"] = fields.get("hash") or ModelHash(algorithm=hash_algo).hash(model_path)
+        fields["hash"] = fields.get("hash") or ModelHash(algorithm=hash_algo, hash_cache=hash_cache).hash(model_path)
 
         fields["default_settings"] = fields.get("default_settings")
 
@@ -1,4 +1,6 @@
-from typing import Dict, Literal, Optional, Union
+import threading
+from contextlib import contextmanager
+from typing import Dict, Generator, Literal, Optional, Union
 
 import torch
 from deprecated import deprecated
@@ -46,9 +48,15 @@ class TorchDevice:
     CUDA_DEVICE = torch.device("cuda")
     MPS_DEVICE = torch.device("mps")
 
+    # Per-thread device overrides, set by `use_device()`
+    _thread_devices = threading.local()
+
     @classmethod
     def choose_torch_device(cls) -> torch.device:
         """Return the torch.device to use for accelerated inference."""
+        thread_device: Optional[torch.device] = getattr(cls._thread_devices, "device", None)
+        if thread_device is not None:
+            return thread_device
         app_config = get_config()
         if app_config.device != "auto":
             device = torch.device(app_config.device)
@@ -101,6 +109,25 @@ class TorchDevice:
             device = torch.device(device.type, torch.cuda.current_device())
         return device
 
+    @classmethod
+    @contextmanager
+    def use_device(cls, device: Union[str, torch.device]) -> Generator[torch.device, None, None]:
+        """Make `choose_torch_device()` return the given device in the calling thread, for the duration of the context.
+
+        This is used to bind a session worker thread to its own device.
+        """
+        device = torch.device(device)
+        if device.type == "cuda" and device.index is not None:
+            # The current CUDA device is per-thread
+            torch.cuda.set_device(device)
+        device = cls.normalize(device)
+        previous_device: Optional[torch.device] = getattr(cls._thread_devices, "device", None)
+        cls._thread_devices.device = device
+        try:
+            yield device
+        finally:
+            cls._thread_devices.device = previous_device
+
     @classmethod
     def empty_cache(cls) -> None:
         """Clear the GPU device cache."""
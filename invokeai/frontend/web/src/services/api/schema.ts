@@ -1795,6 +1795,43 @@ export type components = {
              */
             items?: (string | number)[];
         };
+        /**
+         * BatchEnqueueProgressEvent
+         * @description Event model for batch_enqueue_progress
+         */
+        BatchEnqueueProgressEvent: {
+            /**
+             * Timestamp
+             * @description The timestamp of the event
+             */
+            timestamp: number;
+            /**
+             * Queue Id
+             * @description The ID of the queue
+             */
+            queue_id: string;
+            /**
+             * Batch Id
+             * @description The ID of the batch
+             */
+            batch_id: string;
+            /**
+             * Enqueued
+             * @description The number of invocations enqueued so far
+             */
+            enqueued: number;
+            /**
+             * Total
+             * @description The number of invocations that will be enqueued
+             */
+            total: number;
+            /**
+             * Origin
+             * @description The origin of the batch
+             * @default null
+             */
+            origin: string | null;
+        };
         /**
          * BatchEnqueuedEvent
          * @description Event model for batch_enqueued
@@ -0,0 +1,100 @@
+#!/bin/env python
+
+"""Compare the time taken by the object serializers to save and load latents and conditionings.
+
+Each object is saved and loaded the given number of times by each serializer. The load times are measured with and
+without reading the loaded tensors, since the safetensors serializer only reads the pages of a tensor when it is used.
+The OS page cache is not dropped between iterations, so the load times are those of recently written objects.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import torch
+
+from invokeai.app.services.object_serializer.object_serializer_base import ObjectSerializerBase
+from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
+from invokeai.app.services.object_serializer.object_serializer_safetensors import ObjectSerializerSafetensors
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
+    ConditioningFieldData,
+    FLUXConditioningInfo,
+    SDXLConditioningInfo,
+)
+
+parser = argparse.ArgumentParser(
+    description="Benchmark the object serializers on SDXL and FLUX latents and conditionings"
+)
+parser.add_argument("--iterations", type=int, default=20, help="Number of saves and loads of each object")
+parser.add_argument("--size", type=int, default=1024, help="Width and height of the image of the latents")
+args = parser.parse_args()
+
+
+def make_objects(size: int) -> dict[str, Any]:
+    return {
+        "SDXL latents": torch.randn(1, 4, size // 8, size // 8),
+        "FLUX latents": torch.randn(1, 16, size // 8, size // 8),
+        "SDXL conditioning": ConditioningFieldData(
+            conditionings=[
+                SDXLConditioningInfo(
+                    embeds=torch.randn(1, 77, 2048, dtype=torch.float16),
+                    pooled_embeds=torch.randn(1, 1280, dtype=torch.float16),
+                    add_time_ids=torch.tensor([[size, size, 0, 0, size, size]], dtype=torch.float16),
+                )
+            ]
+        ),
+        "FLUX conditioning": ConditioningFieldData(
+            conditionings=[
+                FLUXConditioningInfo(
+                    clip_embeds=torch.randn(1, 768, dtype=torch.bfloat16),
+                    t5_embeds=torch.randn(1, 512, 4096, dtype=torch.bfloat16),
+                )
+            ]
+        ),
+    }
+
+
+def read_tensors(obj: Any) -> None:
+    """Read every tensor of the object, as a node using it would."""
+    if isinstance(obj, torch.Tensor):
+        obj.sum()
+    else:
+        for conditioning in obj.conditionings:
+            for value in vars(conditioning).values():
+                value.sum()
+
+
+def benchmark(serializer: ObjectSerializerBase[Any], obj: Any, iterations: int) -> tuple[float, float, float]:
+    """Return the mean times taken to save the object, to load it, and to load it and read its tensors."""
+    save_time = load_time = read_time = 0.0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        name = serializer.save(obj)
+        saved = time.perf_counter()
+        loaded = serializer.load(name)
+        loaded_time = time.perf_counter()
+        read_tensors(loaded)
+        end = time.perf_counter()
+        save_time += saved - start
+        load_time += loaded_time - saved
+        read_time += end - loaded_time
+        del loaded
+        serializer.delete(name)
+    return save_time / iterations, load_time / iterations, (load_time + read_time) / iterations
+
+
+serializers = {"pickle": ObjectSerializerDisk, "safetensors": ObjectSerializerSafetensors}
+
+print(f"{'Object':>18} {'Serializer':>12} {'Save':>10} {'Load':>10} {'Load+read':>10}")
+with tempfile.TemporaryDirectory() as output_dir:
+    for object_name, obj in make_objects(args.size).items():
+        obj_type = torch.Tensor if isinstance(obj, torch.Tensor) else ConditioningFieldData
+        for serializer_name, serializer_class in serializers.items():
+            serializer = serializer_class[obj_type](Path(output_dir) / serializer_name)
+            save_time, load_time, total_load_time = benchmark(serializer, obj, args.iterations)
+            print(
+                f"{object_name:>18} {serializer_name:>12} {save_time * 1000:>8.2f}ms"
+                f" {load_time * 1000:>8.2f}ms {total_load_time * 1000:>8.2f}ms"
+            )
@@ -0,0 +1,37 @@
+#!/bin/env python
+
+"""Replay the model cache access traces of dumped graph stats against each eviction policy.
+
+Graph stats are dumped to the profiles directory when `profile_graphs` is enabled. The traces of the given stats files
+are concatenated in the order of the files and replayed against a cache of the given size.
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import get_args
+
+from invokeai.backend.model_manager.load.model_cache.cache_replay import parse_cache_trace, replay_cache_trace
+from invokeai.backend.model_manager.load.model_cache.eviction_policy import (
+    GB,
+    EvictionPolicyName,
+    get_eviction_policy,
+)
+
+parser = argparse.ArgumentParser(description="Compare model cache eviction policies on recorded access traces")
+parser.add_argument("stats_path", type=Path, nargs="+", help="Graph stats JSON files, in the order of their sessions")
+parser.add_argument("--ram", type=float, required=True, help="Size of the simulated model cache (GB)")
+args = parser.parse_args()
+
+accesses = []
+for path in args.stats_path:
+    stats = json.loads(path.read_text())
+    accesses.extend(parse_cache_trace(stats["model_cache_stats"].get("accesses", [])))
+
+print(f"{'Policy':>15} {'Hits':>7} {'Misses':>7} {'Hit rate':>9} {'Loaded':>10} {'Load time':>10}")
+for name in get_args(EvictionPolicyName):
+    result = replay_cache_trace(accesses, get_eviction_policy(name), int(args.ram * GB))
+    print(
+        f"{name:>15} {result.hits:>7} {result.misses:>7} {result.hit_rate:>9.1%}"
+        f" {result.bytes_loaded / GB:>9.2f}G {result.load_time:>9.2f}s"
+    )
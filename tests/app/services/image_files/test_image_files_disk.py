@@ -1,7 +1,9 @@
 import platform
 from pathlib import Path
+from unittest.mock import MagicMock
 
 import pytest
+from PIL import Image
 
 from invokeai.app.services.image_files.image_files_disk import DiskImageFileStorage
 
@@ -49,3 +51,98 @@ def test_image_paths_relative_to_storage_dir(tmp_path: Path):
     image_files_disk = DiskImageFileStorage(tmp_path)
     path = image_files_disk.get_path("foo.png")
     assert path.is_relative_to(tmp_path)
+
+
+def make_storage(tmp_path: Path, max_cache_size: int) -> DiskImageFileStorage:
+    image_files_disk = DiskImageFileStorage(tmp_path, max_cache_size=max_cache_size)
+    invoker = MagicMock()
+    invoker.services.configuration.pil_compress_level = 1
+    image_files_disk.start(invoker)
+    return image_files_disk
+
+
+def write_image(tmp_path: Path, image_name: str, size: int = 16) -> None:
+    # Written directly to disk, so that the image is not cached
+    Image.new("RGB", (size, size), color="red").save(tmp_path / image_name)
+
+
+def test_get_caches_decoded_images(tmp_path: Path):
+    image_files_disk = make_storage(tmp_path, max_cache_size=2**20)
+    write_image(tmp_path, "foo.png")
+
+    image = image_files_disk.get("foo.png")
+    assert image_files_disk.get("foo.png") is image
+
+    stats = image_files_disk.get_stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+    assert stats.cache_size == 16 * 16 * 3
+
+
+def test_get_caches_converted_images(tmp_path: Path):
+    image_files_disk = make_storage(tmp_path, max_cache_size=2**20)
+    write_image(tmp_path, "foo.png")
+
+    image = image_files_disk.get("foo.png", "L")
+    assert image.mode == "L"
+    # Each caller gets its own copy of the conversion, which it may modify
+    image.paste(0, (0, 0, 16, 16))
+    assert image_files_disk.get("foo.png", "L") is not image
+    assert image_files_disk.get("foo.png", "L").getpixel((0, 0)) == 76
+    # The file already has this mode
+    assert image_files_disk.get("foo.png", "RGB") is image_files_disk.get("foo.png")
+
+    stats = image_files_disk.get_stats()
+    assert (stats.hits, stats.misses) == (4, 1)
+    assert stats.cache_size == 16 * 16 * 3 + 16 * 16
+
+
+def test_cache_evicts_least_recently_used_images(tmp_path: Path):
+    # Fits two 16x16 RGB images
+    image_files_disk = make_storage(tmp_path, max_cache_size=2 * 16 * 16 * 3)
+    for name in ["a.png", "b.png", "c.png"]:
+        write_image(tmp_path, name)
+
+    a = image_files_disk.get("a.png")
+    image_files_disk.get("b.png")
+    # Refreshes a, so that b is evicted
+    image_files_disk.get("a.png")
+    image_files_disk.get("c.png")
+
+    assert image_files_disk.get("a.png") is a
+    stats = image_files_disk.get_stats()
+    assert stats.evictions == 1
+    assert stats.cache_size == stats.high_watermark == 2 * 16 * 16 * 3
+    image_files_disk.get("b.png")
+    assert image_files_disk.get_stats().misses == 4
+
+
+def test_cache_skips_images_larger_than_the_cache(tmp_path: Path):
+    image_files_disk = make_storage(tmp_path, max_cache_size=0)
+    write_image(tmp_path, "foo.png")
+
+    assert image_files_disk.get("foo.png") is not image_files_disk.get("foo.png")
+    assert image_files_disk.get_stats().cache_size == 0
+
+
+def test_save_and_delete_invalidate_converted_images(tmp_path: Path):
+    image_files_disk = make_storage(tmp_path, max_cache_size=2**20)
+    image_files_disk.save(Image.new("RGB", (16, 16), color="red"), "foo.png")
+    assert image_files_disk.get("foo.png", "L").getpixel((0, 0)) == 76
+
+    image_files_disk.save(Image.new("RGB", (16, 16), color="white"), "foo.png")
+    assert image_files_disk.get("foo.png", "L").getpixel((0, 0)) == 255
+
+    image_files_disk.delete("foo.png")
+    assert image_files_disk.get_stats().cache_size == 0
+
+
+def test_get_workflow_and_graph_do_not_cache_the_image(tmp_path: Path):
+    make_storage(tmp_path, max_cache_size=0).save(
+        Image.new("RGB", (16, 16)), "foo.png", workflow="workflow", graph="graph"
+    )
+    image_files_disk = make_storage(tmp_path, max_cache_size=2**20)
+
+    assert image_files_disk.get_workflow("foo.png") == "workflow"
+    assert image_files_disk.get_graph("foo.png") == "graph"
+    stats = image_files_disk.get_stats()
+    assert (stats.hits, stats.misses, stats.cache_size) == (0, 0, 0)
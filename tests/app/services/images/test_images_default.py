@@ -0,0 +1,131 @@
+import threading
+from typing import Any, Optional
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from invokeai.app.services.image_files.image_files_common import ImageFileSaveException
+from invokeai.app.services.image_records.image_records_common import ImageCategory, ResourceOrigin
+from invokeai.app.services.images.images_default import ImageService
+
+
+class BlockingImageFileStorage:
+    """Records the saved images, once `release` is set. Saves of the images in `fail` raise."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.saved: dict[str, Image.Image] = {}
+        self.fail: set[str] = set()
+
+    def save(self, image_name: str, image: Image.Image, **kwargs: Any) -> None:
+        assert self.release.wait(timeout=5)
+        if image_name in self.fail:
+            raise ImageFileSaveException("disk full")
+        self.saved[image_name] = image
+
+    def get_path(self, image_name: str, thumbnail: bool = False) -> str:
+        return image_name
+
+    def get(self, image_name: str) -> Image.Image:
+        return self.saved[image_name]
+
+
+@pytest.fixture
+def image_files() -> BlockingImageFileStorage:
+    return BlockingImageFileStorage()
+
+
+@pytest.fixture
+def image_service(image_files: BlockingImageFileStorage):
+    invoker = MagicMock()
+    invoker.services.image_files = image_files
+    invoker.services.names.create_image_name.side_effect = (f"image_{i}.png" for i in range(100))
+    service = ImageService(writer_threads=2)
+    service.start(invoker)
+    service.get_dto = MagicMock()
+    yield service
+    image_files.release.set()
+    service.stop(invoker)
+
+
+def create(service: ImageService, session_id: Optional[str] = "session", node_id: Optional[str] = "node") -> str:
+    service.create(
+        image=Image.new("RGB", (8, 8), color="red"),
+        image_origin=ResourceOrigin.INTERNAL,
+        image_category=ImageCategory.GENERAL,
+        session_id=session_id,
+        node_id=node_id,
+    )
+    return service.get_dto.call_args.args[0]
+
+
+def test_create_returns_before_the_file_is_written(image_service: ImageService, image_files: BlockingImageFileStorage):
+    image_name = create(image_service)
+
+    assert image_name not in image_files.saved
+    assert image_service.get_pil_image(image_name).getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_get_pil_image_returns_a_copy_of_the_pending_image(
+    image_service: ImageService, image_files: BlockingImageFileStorage
+):
+    image_name = create(image_service)
+    image_service.get_pil_image(image_name).paste((0, 0, 255), (0, 0, 8, 8))
+    image_files.release.set()
+
+    assert image_service.wait_for_writes("session") == []
+    assert image_files.saved[image_name].getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_create_writes_a_copy_of_the_image(image_service: ImageService, image_files: BlockingImageFileStorage):
+    image = Image.new("RGB", (8, 8), color="red")
+    image_service.create(image=image, image_origin=ResourceOrigin.INTERNAL, image_category=ImageCategory.GENERAL)
+    image_name = image_service.get_dto.call_args.args[0]
+    image.paste((0, 0, 255), (0, 0, 8, 8))
+    image_files.release.set()
+
+    assert image_service.wait_for_writes("session") == []
+    image_service.get_path(image_name)
+    assert image_files.saved[image_name].getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_get_path_waits_for_the_write(image_service: ImageService, image_files: BlockingImageFileStorage):
+    image_name = create(image_service)
+    threading.Timer(0.1, image_files.release.set).start()
+
+    assert image_service.get_path(image_name) == image_name
+    assert image_name in image_files.saved
+
+
+def test_wait_for_writes_returns_the_errors_of_the_session(
+    image_service: ImageService, image_files: BlockingImageFileStorage
+):
+    image_files.fail.add("image_1.png")
+    create(image_service, session_id="session", node_id="ok")
+    create(image_service, session_id="session", node_id="fails")
+    create(image_service, session_id="other", node_id="other")
+    image_files.release.set()
+
+    errors = image_service.wait_for_writes("session")
+
+    assert [(e.image_name, e.node_id) for e in errors] == [("image_1.png", "fails")]
+    assert isinstance(errors[0].error, ImageFileSaveException)
+    assert image_service.wait_for_writes("session") == []
+    assert image_service.wait_for_writes("other") == []
+    assert set(image_files.saved) == {"image_0.png", "image_2.png"}
+
+
+def test_create_writes_the_file_without_writer_threads(image_files: BlockingImageFileStorage):
+    invoker = MagicMock()
+    invoker.services.image_files = image_files
+    invoker.services.names.create_image_name.return_value = "image.png"
+    image_files.release.set()
+    service = ImageService()
+    service.start(invoker)
+    service.get_dto = MagicMock()
+
+    create(service)
+
+    assert "image.png" in image_files.saved
+    assert service.wait_for_writes("session") == []
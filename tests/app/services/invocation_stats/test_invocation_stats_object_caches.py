@@ -0,0 +1,60 @@
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import torch
+from PIL import Image
+
+from invokeai.app.services.image_files.image_files_disk import DiskImageFileStorage
+from invokeai.app.services.invocation_stats.invocation_stats_default import MB, InvocationStatsService
+from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
+from invokeai.app.services.object_serializer.object_serializer_forward_cache import ObjectSerializerForwardCache
+from tests.test_nodes import PromptTestInvocation
+
+
+def test_invocation_stats_include_object_cache_stats(tmp_path: Path):
+    tensors = ObjectSerializerForwardCache(ObjectSerializerDisk[torch.Tensor](tmp_path), max_memory_size=MB)
+    invoker = MagicMock()
+    invoker.services.tensors = tensors
+    invoker.services.conditioning = None
+    invoker.services.image_files = None
+    stats_service = InvocationStatsService()
+    stats_service.start(invoker)
+
+    # Accesses before the graph started are not counted
+    tensors.load(tensors.save(torch.zeros(1024)))
+    with stats_service.collect_stats(PromptTestInvocation(prompt="foo"), "graph"):
+        name = tensors.save(torch.zeros(1024))
+        tensors.load(name)
+        tensors.load(name)
+
+    stats = stats_service.get_stats("graph")
+    assert stats.conditioning_cache_stats is None
+    assert stats.tensor_cache_stats is not None
+    assert stats.tensor_cache_stats.cache_hits == 2
+    assert stats.tensor_cache_stats.cache_misses == 0
+    assert stats.tensor_cache_stats.cache_size_mb == 2 * 4096 / MB
+    assert stats.tensor_cache_stats.max_cache_size_mb == 1
+    assert "Tensor cache statistics" in str(stats)
+    assert stats.as_dict()["tensor_cache_stats"]["cache_hits"] == 2
+
+
+def test_invocation_stats_include_image_cache_stats(tmp_path: Path):
+    image_files = DiskImageFileStorage(tmp_path, max_cache_size=MB)
+    Image.new("RGB", (16, 16)).save(tmp_path / "foo.png")
+    invoker = MagicMock()
+    invoker.services.tensors = None
+    invoker.services.conditioning = None
+    invoker.services.image_files = image_files
+    stats_service = InvocationStatsService()
+    stats_service.start(invoker)
+
+    with stats_service.collect_stats(PromptTestInvocation(prompt="foo"), "graph"):
+        image_files.get("foo.png")
+        image_files.get("foo.png", "L")
+        image_files.get("foo.png", "L")
+
+    stats = stats_service.get_stats("graph")
+    assert stats.image_cache_stats is not None
+    assert stats.image_cache_stats.cache_hits == 1
+    assert stats.image_cache_stats.cache_misses == 2
+    assert "Image cache statistics" in str(stats)
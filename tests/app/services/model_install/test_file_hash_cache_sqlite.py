@@ -0,0 +1,36 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from invokeai.app.services.config import InvokeAIAppConfig
+from invokeai.app.services.model_install.file_hash_cache_sqlite import SqliteFileHashCache
+from invokeai.backend.model_hash.file_hash_cache import FileHashKey
+from invokeai.backend.util.logging import InvokeAILogger
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+
+
+@pytest.fixture
+def hash_cache() -> SqliteFileHashCache:
+    config = InvokeAIAppConfig(use_memory_db=True)
+    db = create_mock_sqlite_database(config, InvokeAILogger.get_logger(config=config))
+    return SqliteFileHashCache(db)
+
+
+def test_file_hash_cache(tmp_path: Path, hash_cache: SqliteFileHashCache):
+    file = tmp_path / "model.safetensors"
+    file.write_text("model data")
+    key = FileHashKey.from_path(file)
+    assert hash_cache.get_hash(key, "sha256") is None
+
+    hash_cache.set_hash(key, "sha256", "hash1")
+    assert hash_cache.get_hash(key, "sha256") == "hash1"
+    assert hash_cache.get_hash(key, "md5") is None
+
+    # Modified files are hashed again, and their new hash replaces the old one
+    os.utime(file, ns=(0, key.mtime_ns + 1))
+    modified_key = FileHashKey.from_path(file)
+    assert hash_cache.get_hash(modified_key, "sha256") is None
+    hash_cache.set_hash(modified_key, "sha256", "hash2")
+    assert hash_cache.get_hash(modified_key, "sha256") == "hash2"
+    assert hash_cache.get_hash(key, "sha256") is None
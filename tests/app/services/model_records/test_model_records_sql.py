@@ -24,9 +24,11 @@ from invokeai.backend.model_manager.config import (
     ModelFormat,
     ModelSourceType,
     ModelType,
+    SubModelType,
     TextualInversionFileConfig,
     VAEDiffusersConfig,
 )
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelLoadStats
 from invokeai.backend.util.logging import InvokeAILogger
 from tests.backend.model_manager.model_manager_fixtures import *  # noqa F403
 from tests.fixtures.sqlite_database import create_mock_sqlite_database
@@ -299,3 +301,31 @@ def test_model_record_changes():
 
     changes = ModelRecordChanges.model_validate({"default_settings": {"vae": "value"}})
     assert isinstance(changes.default_settings, MainModelDefaultSettings)
+
+
+def test_model_load_stats(store: ModelRecordServiceBase):
+    store.add_model(example_ti_config("key1"))
+    config2 = example_ti_config("key2")
+    config2.path = "/tmp/pokemon2.bin"
+    config2.name = "other name"
+    store.add_model(config2)
+    assert store.get_model_load_stats() == []
+
+    store.set_model_load_stats(ModelLoadStats(key="key1", submodel_type=None, size=100, load_time=1.5))
+    store.set_model_load_stats(ModelLoadStats(key="key2", submodel_type=SubModelType.UNet, size=200, vram_size=250))
+    store.set_model_load_stats(ModelLoadStats(key="key1", submodel_type=None, size=120, vram_size=150, load_time=2))
+
+    assert store.get_model_load_stats() == [
+        ModelLoadStats(key="key1", submodel_type=None, size=120, vram_size=150, load_time=2),
+        ModelLoadStats(key="key2", submodel_type=SubModelType.UNet, size=200, vram_size=250),
+    ]
+    assert store.get_model_load_stats("key2") == [
+        ModelLoadStats(key="key2", submodel_type=SubModelType.UNet, size=200, vram_size=250)
+    ]
+
+    with pytest.raises(UnknownModelException):
+        store.set_model_load_stats(ModelLoadStats(key="unknown_key", submodel_type=None, size=100))
+
+    # The stats are deleted with their model
+    store.del_model("key1")
+    assert store.get_model_load_stats("key1") == []
@@ -0,0 +1,116 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+
+from invokeai.app.invocations.baseinvocation import BaseInvocation, invocation
+from invokeai.app.invocations.fields import InputField
+from invokeai.app.invocations.primitives import StringOutput
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.session_processor.session_processor_default import MultiWorkerSessionProcessor
+from invokeai.app.services.session_queue.session_queue_common import Batch, SessionQueueItem
+from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
+from invokeai.app.services.shared.graph import Graph
+from invokeai.app.services.shared.invocation_context import InvocationContext
+from invokeai.app.services.shared.sqlite.sqlite_util import init_db
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB
+from invokeai.backend.util.devices import TorchDevice
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import wait_until
+
+# Each pair of sessions must run at the same time for either of them to complete
+barrier = threading.Barrier(2, timeout=10)
+
+
+@invocation("test_worker_barrier", version="1.0.0")
+class WorkerBarrierTestInvocation(BaseInvocation):
+    label: str = InputField(default="")
+
+    def invoke(self, context: InvocationContext) -> StringOutput:
+        barrier.wait()
+        return StringOutput(value=f"{threading.get_ident()}:{TorchDevice.choose_torch_device()}")
+
+
+@pytest.fixture
+def session_queue(mock_services: InvocationServices) -> SqliteSessionQueue:
+    db = init_db(config=mock_services.configuration, logger=MagicMock(), image_files=MagicMock())
+    return SqliteSessionQueue(db=db)
+
+
+def make_invoker(mock_services: InvocationServices, session_queue: SqliteSessionQueue, processor: Any) -> Invoker:
+    mock_services.session_queue = session_queue
+    mock_services.session_processor = processor
+    mock_services.model_manager = MagicMock()
+    return Invoker(services=mock_services)
+
+
+def test_session_queue_dequeue_claims_each_item_once(mock_services: InvocationServices, session_queue):
+    invoker = make_invoker(mock_services, session_queue, processor=None)
+    graph = Graph()
+    graph.add_node(WorkerBarrierTestInvocation(id="1"))
+    session_queue.enqueue_batch("default", Batch(graph=graph, runs=20), prepend=False)
+
+    def dequeue_all() -> list[int]:
+        claimed: list[int] = []
+        while (queue_item := session_queue.dequeue()) is not None:
+            claimed.append(queue_item.item_id)
+        return claimed
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        claims = [f.result() for f in [executor.submit(dequeue_all) for _ in range(4)]]
+
+    all_claims = [item_id for claimed in claims for item_id in claimed]
+    assert len(all_claims) == 20
+    assert len(set(all_claims)) == 20
+    assert session_queue.get_queue_status("default").in_progress == 20
+    invoker.stop()
+
+
+def test_multi_worker_processor_runs_sessions_on_each_worker(mock_services: InvocationServices, session_queue):
+    processor = MultiWorkerSessionProcessor(devices=[torch.device("cpu"), torch.device("cpu")])
+    invoker = make_invoker(mock_services, session_queue, processor=processor)
+    try:
+        graph = Graph()
+        graph.add_node(WorkerBarrierTestInvocation(id="1"))
+        session_queue.enqueue_batch("default", Batch(graph=graph, runs=4), prepend=False)
+
+        wait_until(lambda: session_queue.get_queue_status("default").completed == 4, timeout=30)
+        assert session_queue.get_queue_status("default").failed == 0
+
+        queue_items: list[SessionQueueItem] = [session_queue.get_queue_item(i) for i in range(1, 5)]
+        results = [next(iter(q.session.results.values())).value for q in queue_items]
+        thread_ids = {r.split(":")[0] for r in results}
+        devices = {r.split(":", 1)[1] for r in results}
+        # The barrier can only be passed if both workers run a session at the same time
+        assert len(thread_ids) == 2
+        assert devices == {"cpu"}
+
+        # Each worker has its own model cache
+        worker_caches = {id(w.session_runner._services.model_manager.load.ram_cache) for w in processor.workers}  # type: ignore
+        assert len(worker_caches) == 2
+    finally:
+        invoker.stop()
+
+
+def test_multi_worker_processor_splits_memory_between_workers(mock_services: InvocationServices, session_queue):
+    mock_services.configuration.ram = 4
+    mock_services.configuration.prefetch_ram = 2
+    processor = MultiWorkerSessionProcessor(devices=[torch.device("cpu"), torch.device("cpu")])
+    invoker = make_invoker(mock_services, session_queue, processor=processor)
+    try:
+        for worker in processor.workers:
+            assert worker.session_runner._services.model_manager.load.ram_cache.max_cache_size == 2  # type: ignore
+            assert worker._model_prefetcher is not None
+            assert worker._model_prefetcher._ram_budget == GB
+    finally:
+        invoker.stop()
+
+
+def test_multi_worker_processor_requires_devices():
+    with pytest.raises(ValueError):
+        MultiWorkerSessionProcessor(devices=[])
@@ -0,0 +1,161 @@
+# pyright: reportPrivateUsage=false
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+
+from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput, invocation
+from invokeai.app.invocations.fields import InputField
+from invokeai.app.invocations.model import LoRAField, ModelIdentifierField
+from invokeai.app.invocations.primitives import StringOutput
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.model_manager import ModelManagerService, ModelManagerServiceBase
+from invokeai.app.services.session_processor.session_processor_prefetch import ModelPrefetcher, get_model_identifiers
+from invokeai.app.services.session_queue.session_queue_common import Batch
+from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
+from invokeai.app.services.shared.graph import Graph
+from invokeai.app.services.shared.invocation_context import InvocationContext
+from invokeai.app.services.shared.sqlite.sqlite_util import init_db
+from invokeai.backend.model_manager import BaseModelType, ModelType
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB
+from tests.backend.model_manager.model_manager_fixtures import *  # noqa F403
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import wait_until
+
+
+@invocation("test_prefetch_model", version="1.0.0")
+class PrefetchModelTestInvocation(BaseInvocation):
+    model: ModelIdentifierField = InputField()
+    loras: list[LoRAField] = InputField(default=[])
+
+    def invoke(self, context: InvocationContext) -> BaseInvocationOutput:
+        return StringOutput(value=self.model.key)
+
+
+def make_identifier(key: str) -> ModelIdentifierField:
+    return ModelIdentifierField(
+        key=key, hash="hash", name=key, base=BaseModelType.StableDiffusion1, type=ModelType.TextualInversion
+    )
+
+
+@pytest.fixture
+def session_queue(mock_services: InvocationServices) -> SqliteSessionQueue:
+    db = init_db(config=mock_services.configuration, logger=MagicMock(), image_files=MagicMock())
+    return SqliteSessionQueue(db=db)
+
+
+@pytest.fixture
+def invoker(
+    mock_services: InvocationServices, session_queue: SqliteSessionQueue, mm2_model_manager: ModelManagerServiceBase
+):
+    mock_services.session_queue = session_queue
+    mock_services.session_processor = None  # type: ignore
+    # The installer is already running
+    mock_services.model_manager = ModelManagerService(
+        store=mm2_model_manager.store, install=MagicMock(), load=mm2_model_manager.load
+    )
+    invoker = Invoker(services=mock_services)
+    yield invoker
+    invoker.stop()
+
+
+@pytest.fixture
+def embedding_key(mm2_model_manager: ModelManagerServiceBase, embedding_file: Path) -> str:
+    return mm2_model_manager.install.register_path(embedding_file)
+
+
+def enqueue_model(session_queue: SqliteSessionQueue, key: str) -> None:
+    graph = Graph()
+    graph.add_node(PrefetchModelTestInvocation(id="1", model=make_identifier(key)))
+    session_queue.enqueue_batch("default", Batch(graph=graph), prepend=False)
+
+
+def create_prefetcher(invoker: Invoker, ram_budget: int = GB) -> ModelPrefetcher:
+    prefetcher = ModelPrefetcher(ram_budget=ram_budget)
+    prefetcher._invoker = invoker
+    return prefetcher
+
+
+def test_get_model_identifiers_finds_nested_identifiers():
+    graph = Graph()
+    graph.add_node(
+        PrefetchModelTestInvocation(
+            id="1",
+            model=make_identifier("model"),
+            loras=[
+                LoRAField(lora=make_identifier("lora"), weight=0.5),
+                LoRAField(lora=make_identifier("model"), weight=1),
+            ],
+        )
+    )
+    assert [identifier.key for identifier in get_model_identifiers(graph)] == ["model", "lora"]
+
+
+def test_prefetch_loads_models_of_pending_queue_items(invoker, session_queue, embedding_key):
+    ram_cache = invoker.services.model_manager.load.ram_cache
+    enqueue_model(session_queue, embedding_key)
+    enqueue_model(session_queue, "missing_model")
+    prefetcher = create_prefetcher(invoker)
+
+    assert prefetcher.prefetch() == [(embedding_key, None)]
+    assert ram_cache.exists(embedding_key)
+    assert prefetcher.prefetch() == []
+
+
+def test_prefetch_respects_budget(invoker, session_queue, embedding_key):
+    enqueue_model(session_queue, embedding_key)
+    prefetcher = create_prefetcher(invoker, ram_budget=1)
+
+    assert prefetcher.prefetch() == []
+    assert not invoker.services.model_manager.load.ram_cache.exists(embedding_key)
+
+
+def test_prefetch_does_not_evict_cached_models(invoker, session_queue, embedding_key, embedding_file: Path):
+    ram_cache = invoker.services.model_manager.load.ram_cache
+    # The cache has room for the cached model, but not for the queue item's model as well
+    ram_cache.max_cache_size = embedding_file.stat().st_size * 1.5 / GB
+    ram_cache.put("cached_model", torch.nn.Linear(embedding_file.stat().st_size // 4, 1, bias=False))
+    enqueue_model(session_queue, embedding_key)
+    prefetcher = create_prefetcher(invoker)
+
+    assert prefetcher.prefetch() == []
+    assert ram_cache.exists("cached_model")
+    assert not ram_cache.exists(embedding_key)
+
+
+def test_prefetch_does_not_evict_when_the_estimate_is_too_small(
+    invoker, session_queue, embedding_key, embedding_file: Path
+):
+    ram_cache = invoker.services.model_manager.load.ram_cache
+    ram_cache.max_cache_size = embedding_file.stat().st_size * 1.5 / GB
+    ram_cache.put("cached_model", torch.nn.Linear(embedding_file.stat().st_size // 4, 1, bias=False))
+    enqueue_model(session_queue, embedding_key)
+    prefetcher = create_prefetcher(invoker)
+    prefetcher._get_size = MagicMock(return_value=1)
+
+    prefetcher.prefetch()
+    assert ram_cache.exists("cached_model")
+    assert not ram_cache.exists(embedding_key)
+
+
+def test_prefetch_skips_items_that_are_not_pending(invoker, session_queue, embedding_key):
+    enqueue_model(session_queue, embedding_key)
+    session_queue.dequeue()
+    prefetcher = create_prefetcher(invoker)
+
+    assert prefetcher.prefetch() == []
+
+
+def test_prefetcher_prefetches_on_its_thread(invoker, session_queue, embedding_key):
+    ram_cache = invoker.services.model_manager.load.ram_cache
+    prefetcher = ModelPrefetcher(ram_budget=GB, polling_interval=60)
+    prefetcher.start(invoker)
+    try:
+        enqueue_model(session_queue, embedding_key)
+        prefetcher.poll_now()
+        wait_until(lambda: ram_cache.exists(embedding_key), timeout=10)
+    finally:
+        prefetcher.stop()
@@ -0,0 +1,212 @@
+import threading
+import time
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from invokeai.app.invocations.baseinvocation import BaseInvocation, invocation
+from invokeai.app.invocations.collections import RangeInvocation
+from invokeai.app.invocations.fields import InputField
+from invokeai.app.invocations.math import AddInvocation, MultiplyInvocation
+from invokeai.app.invocations.primitives import IntegerOutput, StringOutput
+from invokeai.app.services.images.images_common import ImageWriteError
+from invokeai.app.services.session_processor.session_processor_default import (
+    ConcurrentSessionRunner,
+    DefaultSessionRunner,
+)
+from invokeai.app.services.session_queue.session_queue_common import SessionQueueItem
+from invokeai.app.services.shared.graph import CollectInvocation, Graph, GraphExecutionState, IterateInvocation
+from invokeai.app.services.shared.invocation_context import InvocationContext
+from invokeai.backend.util.devices import TorchDevice
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import ErrorInvocation, create_edge
+
+# Both barrier invocations must be running at the same time for either of them to complete
+barrier = threading.Barrier(2, timeout=5)
+
+
+@invocation("test_barrier", version="1.0.0", cpu_safe=True)
+class BarrierTestInvocation(BaseInvocation):
+    value: int = InputField(default=0)
+
+    def invoke(self, context: InvocationContext) -> IntegerOutput:
+        barrier.wait()
+        return IntegerOutput(value=self.value)
+
+
+# Set once the slow invocation is running
+slow_started = threading.Event()
+
+
+@invocation("test_slow", version="1.0.0", cpu_safe=True)
+class SlowTestInvocation(BaseInvocation):
+    value: int = InputField(default=0)
+
+    def invoke(self, context: InvocationContext) -> IntegerOutput:
+        slow_started.set()
+        time.sleep(0.2)
+        return IntegerOutput(value=self.value)
+
+
+@invocation("test_error_after_slow_started", version="1.0.0", cpu_safe=True)
+class ErrorAfterSlowStartedTestInvocation(BaseInvocation):
+    def invoke(self, context: InvocationContext) -> IntegerOutput:
+        assert slow_started.wait(timeout=5)
+        raise Exception("This invocation is supposed to fail")
+
+
+@invocation("test_device", version="1.0.0", cpu_safe=True)
+class DeviceTestInvocation(BaseInvocation):
+    def invoke(self, context: InvocationContext) -> StringOutput:
+        return StringOutput(value=str(TorchDevice.choose_torch_device()))
+
+
+def make_queue_item(graph: Graph) -> SessionQueueItem:
+    session = GraphExecutionState(graph=graph)
+    return SessionQueueItem(
+        item_id=1,
+        batch_id="batch",
+        queue_id="default",
+        session_id=session.id,
+        session=session,
+        created_at="",
+        updated_at="",
+        started_at=None,
+        completed_at=None,
+    )
+
+
+def make_services() -> Any:
+    services = MagicMock()
+    services.configuration.node_cache_size = 0
+    return services
+
+
+def run_session(runner: DefaultSessionRunner, graph: Graph) -> tuple[SessionQueueItem, Any]:
+    services = make_services()
+    runner.start(services=services, cancel_event=threading.Event())
+    queue_item = make_queue_item(graph)
+    runner.run(queue_item)
+    return queue_item, services
+
+
+def completed(services: Any) -> list[tuple[str, Any]]:
+    return [
+        (c.kwargs["invocation"].get_type(), getattr(c.kwargs["output"], "value", None))
+        for c in services.events.emit_invocation_complete.call_args_list
+    ]
+
+
+@pytest.fixture
+def iteration_graph() -> Graph:
+    graph = Graph()
+    graph.add_node(RangeInvocation(id="range", start=0, stop=8, step=1))
+    graph.add_node(IterateInvocation(id="iterate"))
+    graph.add_node(MultiplyInvocation(id="multiply", b=10))
+    graph.add_node(AddInvocation(id="add", b=1))
+    graph.add_node(CollectInvocation(id="collect"))
+    graph.add_edge(create_edge("range", "collection", "iterate", "collection"))
+    graph.add_edge(create_edge("iterate", "item", "multiply", "a"))
+    graph.add_edge(create_edge("multiply", "value", "add", "a"))
+    graph.add_edge(create_edge("add", "value", "collect", "item"))
+    return graph
+
+
+def test_concurrent_runner_produces_same_results_as_default_runner(iteration_graph: Graph):
+    default_item, default_services = run_session(DefaultSessionRunner(), iteration_graph)
+    concurrent_item, concurrent_services = run_session(ConcurrentSessionRunner(max_workers=4), iteration_graph)
+
+    assert concurrent_item.session.is_complete()
+    assert not concurrent_item.session.has_error()
+    collect_id = next(iter(concurrent_item.session.source_prepared_mapping["collect"]))
+    assert sorted(concurrent_item.session.results[collect_id].collection) == [v * 10 + 1 for v in range(8)]
+    assert sorted(completed(concurrent_services), key=str) == sorted(completed(default_services), key=str)
+
+
+def test_concurrent_runner_is_deterministic(iteration_graph: Graph):
+    runs = [completed(run_session(ConcurrentSessionRunner(max_workers=4), iteration_graph)[1]) for _ in range(5)]
+    assert all(r == runs[0] for r in runs)
+
+
+def test_concurrent_runner_runs_cpu_safe_nodes_concurrently():
+    graph = Graph()
+    graph.add_node(BarrierTestInvocation(id="a", value=1))
+    graph.add_node(BarrierTestInvocation(id="b", value=2))
+    graph.add_node(AddInvocation(id="add"))
+    graph.add_edge(create_edge("a", "value", "add", "a"))
+    graph.add_edge(create_edge("b", "value", "add", "b"))
+
+    queue_item, services = run_session(ConcurrentSessionRunner(max_workers=2), graph)
+
+    assert not queue_item.session.has_error()
+    add_id = next(iter(queue_item.session.source_prepared_mapping["add"]))
+    assert queue_item.session.results[add_id].value == 3
+
+
+def test_concurrent_runner_stops_on_node_error():
+    graph = Graph()
+    graph.add_node(RangeInvocation(id="range", start=0, stop=4, step=1))
+    graph.add_node(IterateInvocation(id="iterate"))
+    graph.add_node(MultiplyInvocation(id="multiply", b=10))
+    graph.add_node(ErrorInvocation(id="error"))
+    graph.add_edge(create_edge("range", "collection", "iterate", "collection"))
+    graph.add_edge(create_edge("iterate", "item", "multiply", "a"))
+
+    queue_item, services = run_session(ConcurrentSessionRunner(max_workers=4), graph)
+
+    assert queue_item.session.has_error()
+    services.events.emit_invocation_error.assert_called_once()
+    services.session_queue.fail_queue_item.assert_called_once()
+
+
+def test_runner_handles_image_write_errors_as_node_errors():
+    graph = Graph()
+    graph.add_node(AddInvocation(id="add", a=1, b=2))
+    services = make_services()
+    runner = DefaultSessionRunner()
+    runner.start(services=services, cancel_event=threading.Event())
+    queue_item = make_queue_item(graph)
+    services.images.wait_for_writes.side_effect = lambda session_id: [
+        ImageWriteError(
+            image_name="image.png",
+            node_id=next(iter(queue_item.session.source_prepared_mapping["add"])),
+            error=OSError("disk full"),
+        )
+    ]
+
+    runner.run(queue_item)
+
+    services.images.wait_for_writes.assert_called_once_with(queue_item.session_id)
+    assert queue_item.session.has_error()
+    services.events.emit_invocation_error.assert_called_once()
+    assert services.events.emit_invocation_error.call_args.kwargs["error_message"] == (
+        "Failed to save image image.png: disk full"
+    )
+    services.session_queue.fail_queue_item.assert_called_once()
+
+
+def test_concurrent_runner_finishes_running_nodes_when_stopped():
+    slow_started.clear()
+    graph = Graph()
+    graph.add_node(ErrorAfterSlowStartedTestInvocation(id="error"))
+    graph.add_node(SlowTestInvocation(id="slow", value=1))
+
+    queue_item, services = run_session(ConcurrentSessionRunner(max_workers=2), graph)
+
+    # The slow node was running when the session stopped, so it completes
+    assert queue_item.session.has_error()
+    assert completed(services) == [("test_slow", 1)]
+    services.events.emit_invocation_error.assert_called_once()
+    services.session_queue.fail_queue_item.assert_called_once()
+
+
+def test_concurrent_runner_runs_nodes_on_the_device_of_the_runner_thread():
+    graph = Graph()
+    graph.add_node(DeviceTestInvocation(id="device"))
+
+    with TorchDevice.use_device("meta"):
+        queue_item, services = run_session(ConcurrentSessionRunner(max_workers=2), graph)
+
+    assert completed(services) == [("test_device", "meta")]
@@ -0,0 +1,319 @@
+import time
+from typing import Any, Iterator
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from invokeai.app.services.events.events_common import BatchEnqueuedEvent, BatchEnqueueProgressEvent
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.session_queue.session_queue_common import (
+    Batch,
+    BatchDatum,
+    SessionQueueItemNotFoundError,
+    create_session_nfv_tuples,
+    iterate_values_to_insert,
+)
+from invokeai.app.services.session_queue.session_queue_sqlite import (
+    ENQUEUE_CHUNK_SIZE,
+    NEXT_PENDING_ITEM_ID_QUERY,
+    SqliteSessionQueue,
+)
+from invokeai.app.services.shared.graph import Graph
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+from invokeai.app.services.shared.sqlite.sqlite_util import init_db
+from invokeai.app.services.workflow_records.workflow_records_common import (
+    WorkflowCategory,
+    WorkflowMeta,
+    WorkflowWithoutID,
+)
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import PromptTestInvocation
+
+
+@pytest.fixture
+def db(mock_services: InvocationServices) -> SqliteDatabase:
+    return init_db(config=mock_services.configuration, logger=MagicMock(), image_files=MagicMock())
+
+
+@pytest.fixture
+def session_queue(mock_services: InvocationServices, db: SqliteDatabase):
+    session_queue = SqliteSessionQueue(db=db)
+    mock_services.session_queue = session_queue
+    mock_services.session_processor = None  # type: ignore
+    mock_services.configuration.max_queue_size = 100_000
+    invoker = Invoker(services=mock_services)
+    yield session_queue
+    invoker.stop()
+
+
+def make_batch(runs: int = 1) -> Batch:
+    graph = Graph()
+    graph.add_node(PromptTestInvocation(id="1", prompt="Chevy"))
+    return Batch(graph=graph, runs=runs)
+
+
+def assert_counts_match_queue(db: SqliteDatabase) -> None:
+    cursor = db.conn.cursor()
+    cursor.execute("SELECT queue_id, status, COUNT(*) FROM session_queue GROUP BY queue_id, status")
+    expected = {(r[0], r[1]): r[2] for r in cursor.fetchall()}
+    cursor.execute("SELECT queue_id, status, count FROM session_queue_status_counts WHERE count != 0")
+    assert {(r[0], r[1]): r[2] for r in cursor.fetchall()} == expected
+
+    cursor.execute("SELECT queue_id, batch_id, status, COUNT(*) FROM session_queue GROUP BY queue_id, batch_id, status")
+    expected_batches = {(r[0], r[1], r[2]): r[3] for r in cursor.fetchall()}
+    cursor.execute("SELECT queue_id, batch_id, status, count FROM session_queue_batch_status_counts")
+    assert {(r[0], r[1], r[2]): r[3] for r in cursor.fetchall()} == expected_batches
+
+
+def test_status_counts_follow_queue_changes(session_queue: SqliteSessionQueue, db: SqliteDatabase):
+    batch_1 = session_queue.enqueue_batch("default", make_batch(runs=5), prepend=False)
+    batch_2 = session_queue.enqueue_batch("other", make_batch(runs=3), prepend=False)
+    assert_counts_match_queue(db)
+
+    first = session_queue.dequeue()
+    assert first is not None
+    second = session_queue.dequeue()
+    assert second is not None
+    assert_counts_match_queue(db)
+
+    session_queue.complete_queue_item(first.item_id)
+    session_queue.fail_queue_item(second.item_id, "TestError", "error", "traceback")
+    assert_counts_match_queue(db)
+
+    session_queue.cancel_by_batch_ids("default", [batch_1.batch.batch_id])
+    assert_counts_match_queue(db)
+
+    queue_status = session_queue.get_queue_status("default")
+    assert (queue_status.pending, queue_status.completed, queue_status.failed, queue_status.canceled) == (0, 1, 1, 3)
+    assert queue_status.total == 5
+    batch_status = session_queue.get_batch_status("other", batch_2.batch.batch_id)
+    assert (batch_status.pending, batch_status.total) == (3, 3)
+
+    session_queue.prune("default")
+    assert_counts_match_queue(db)
+    assert session_queue.is_empty("default").is_empty
+    assert session_queue.get_batch_status("default", batch_1.batch.batch_id).total == 0
+
+    session_queue.clear("other")
+    assert_counts_match_queue(db)
+    assert session_queue.get_queue_status("other").total == 0
+
+
+def test_dequeue_respects_priority_and_order(session_queue: SqliteSessionQueue):
+    session_queue.enqueue_batch("default", make_batch(runs=2), prepend=False)
+    session_queue.enqueue_batch("default", make_batch(runs=2), prepend=True)
+    session_queue.enqueue_batch("other", make_batch(runs=1), prepend=False)
+
+    dequeued = []
+    while (queue_item := session_queue.dequeue()) is not None:
+        dequeued.append((queue_item.queue_id, queue_item.priority, queue_item.item_id))
+        assert queue_item.status == "in_progress"
+        assert queue_item.started_at is not None
+
+    assert dequeued == [("default", 1, 3), ("default", 1, 4), ("default", 0, 1), ("default", 0, 2), ("other", 0, 5)]
+
+
+def test_get_next_items_returns_pending_items_in_dequeue_order(session_queue: SqliteSessionQueue):
+    session_queue.enqueue_batch("default", make_batch(runs=2), prepend=False)
+    session_queue.enqueue_batch("default", make_batch(runs=2), prepend=True)
+    session_queue.enqueue_batch("other", make_batch(runs=1), prepend=False)
+    session_queue.dequeue()
+
+    assert [queue_item.item_id for queue_item in session_queue.get_next_items("default", 2)] == [4, 1]
+    assert [queue_item.item_id for queue_item in session_queue.get_next_items("default", 10)] == [4, 1, 2]
+    assert session_queue.get_queue_status("default").pending == 3
+
+
+def test_dequeue_and_status_changes_return_timestamps(session_queue: SqliteSessionQueue):
+    session_queue.enqueue_batch("default", make_batch(), prepend=False)
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    assert queue_item.started_at == session_queue.get_queue_item(queue_item.item_id).started_at
+
+    completed = session_queue.complete_queue_item(queue_item.item_id)
+    assert completed.status == "completed"
+    assert completed.completed_at is not None
+    assert completed.completed_at == session_queue.get_queue_item(queue_item.item_id).completed_at
+    assert completed.updated_at >= completed.created_at
+
+
+def test_set_status_of_missing_item_raises(session_queue: SqliteSessionQueue):
+    with pytest.raises(SessionQueueItemNotFoundError):
+        session_queue.complete_queue_item(1234)
+
+
+def test_next_pending_item_query_uses_index(session_queue: SqliteSessionQueue, db: SqliteDatabase):
+    cursor = db.conn.cursor()
+    cursor.execute(f"EXPLAIN QUERY PLAN {NEXT_PENDING_ITEM_ID_QUERY}")
+    plan = " ".join(r[3] for r in cursor.fetchall())
+    assert "idx_session_queue_queue_id_status_priority_item_id" in plan
+    assert "SCAN session_queue " not in f"{plan} "
+
+
+def test_enqueue_batch_inserts_in_chunks(session_queue: SqliteSessionQueue, mock_services: InvocationServices):
+    result = session_queue.enqueue_batch("default", make_batch(runs=ENQUEUE_CHUNK_SIZE * 2 + 1), prepend=False)
+    assert result.enqueued == result.requested == ENQUEUE_CHUNK_SIZE * 2 + 1
+    assert session_queue.get_queue_status("default").pending == ENQUEUE_CHUNK_SIZE * 2 + 1
+
+    events = mock_services.events.events  # type: ignore
+    progress = [e for e in events if isinstance(e, BatchEnqueueProgressEvent)]
+    assert [(e.enqueued, e.total) for e in progress] == [
+        (ENQUEUE_CHUNK_SIZE, result.enqueued),
+        (ENQUEUE_CHUNK_SIZE * 2, result.enqueued),
+        (result.enqueued, result.enqueued),
+    ]
+    assert isinstance(events[-1], BatchEnqueuedEvent)
+
+
+def test_enqueue_batch_respects_max_queue_size(session_queue: SqliteSessionQueue, mock_services: InvocationServices):
+    mock_services.configuration.max_queue_size = ENQUEUE_CHUNK_SIZE + 10
+    result = session_queue.enqueue_batch("default", make_batch(runs=ENQUEUE_CHUNK_SIZE * 3), prepend=False)
+    assert (result.requested, result.enqueued) == (ENQUEUE_CHUNK_SIZE * 3, ENQUEUE_CHUNK_SIZE + 10)
+    assert session_queue.is_full("default").is_full
+
+
+def test_concurrent_enqueues_respect_max_queue_size(
+    session_queue: SqliteSessionQueue, mock_services: InvocationServices
+):
+    mock_services.configuration.max_queue_size = ENQUEUE_CHUNK_SIZE * 2
+    emit_batch_enqueue_progress = mock_services.events.emit_batch_enqueue_progress
+    other_batch = make_batch(runs=ENQUEUE_CHUNK_SIZE)
+    other_results = []
+
+    def enqueue_other_batch(**kwargs: Any) -> None:
+        # Another batch fills the queue while the first one is being enqueued
+        emit_batch_enqueue_progress(**kwargs)
+        if kwargs["batch"] is not other_batch and not other_results:
+            other_results.append(session_queue.enqueue_batch("default", other_batch, prepend=False))
+
+    with patch.object(mock_services.events, "emit_batch_enqueue_progress", enqueue_other_batch):
+        result = session_queue.enqueue_batch("default", make_batch(runs=ENQUEUE_CHUNK_SIZE * 2), prepend=False)
+
+    assert other_results[0].enqueued == ENQUEUE_CHUNK_SIZE
+    assert result.enqueued == ENQUEUE_CHUNK_SIZE
+    assert session_queue.get_queue_status("default").pending == ENQUEUE_CHUNK_SIZE * 2
+
+
+def test_enqueue_batch_removes_partial_batch_on_error(session_queue: SqliteSessionQueue):
+    batch = make_batch(runs=ENQUEUE_CHUNK_SIZE * 2)
+    values = list(iterate_values_to_insert("default", batch, 0, ENQUEUE_CHUNK_SIZE * 2))
+
+    def failing_values(*args: Any, **kwargs: Any) -> Iterator[Any]:
+        yield from values[:ENQUEUE_CHUNK_SIZE]
+        raise RuntimeError("Failed to create session")
+
+    with patch("invokeai.app.services.session_queue.session_queue_sqlite.iterate_values_to_insert", failing_values):
+        with pytest.raises(RuntimeError):
+            session_queue.enqueue_batch("default", batch, prepend=False)
+    assert session_queue.is_empty("default").is_empty
+
+
+def test_enqueue_batch_cancels_started_items_of_partial_batch_on_error(session_queue: SqliteSessionQueue):
+    batch = make_batch(runs=ENQUEUE_CHUNK_SIZE * 2)
+    values = list(iterate_values_to_insert("default", batch, 0, ENQUEUE_CHUNK_SIZE * 2))
+    dequeued = []
+
+    def failing_values(*args: Any, **kwargs: Any) -> Iterator[Any]:
+        yield from values[:ENQUEUE_CHUNK_SIZE]
+        # A session worker starts a queue item of the first chunk before the second chunk fails
+        dequeued.append(session_queue.dequeue())
+        raise RuntimeError("Failed to create session")
+
+    with patch("invokeai.app.services.session_queue.session_queue_sqlite.iterate_values_to_insert", failing_values):
+        with pytest.raises(RuntimeError):
+            session_queue.enqueue_batch("default", batch, prepend=False)
+    assert dequeued[0] is not None
+    assert session_queue.get_queue_item(dequeued[0].item_id).status == "canceled"
+    status = session_queue.get_queue_status("default")
+    assert (status.pending, status.in_progress, status.canceled, status.total) == (0, 0, 1, 1)
+
+
+def make_data_batch(runs: int = 1) -> Batch:
+    graph = Graph()
+    graph.add_node(PromptTestInvocation(id="1", prompt="Chevy"))
+    graph.add_node(PromptTestInvocation(id="2", prompt="Toyota"))
+    data = [
+        [BatchDatum(node_path="1", field_name="prompt", items=["Banana sushi", "Grape sushi"])],
+        [BatchDatum(node_path="2", field_name="prompt", items=["Orange sushi", "Apple sushi", "Kiwi sushi"])],
+    ]
+    workflow = WorkflowWithoutID(
+        name="Sushi",
+        author="",
+        description="",
+        version="1.0.0",
+        contact="",
+        tags="",
+        notes="",
+        meta=WorkflowMeta(version="3.0.0", category=WorkflowCategory.User),
+        exposedFields=[],
+        nodes=[],
+        edges=[],
+    )
+    return Batch(graph=graph, data=data, runs=runs, workflow=workflow)
+
+
+def test_lazy_batch_expansion_creates_sessions_when_dequeued(
+    session_queue: SqliteSessionQueue, mock_services: InvocationServices, db: SqliteDatabase
+):
+    batch = make_data_batch(runs=2)
+    expected = [
+        (values, session.graph.model_dump())
+        for session, values, _ in create_session_nfv_tuples(batch=batch, maximum=1000)
+    ]
+
+    mock_services.configuration.lazy_batch_expansion = True
+    result = session_queue.enqueue_batch("default", batch, prepend=False)
+    assert result.enqueued == 12
+
+    cursor = db.conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM session_queue WHERE session IS NULL AND workflow IS NULL")
+    assert cursor.fetchone()[0] == 12
+    cursor.execute("SELECT COUNT(*) FROM session_queue_batches WHERE batch_id = ?", (batch.batch_id,))
+    assert cursor.fetchone()[0] == 1
+
+    dequeued = []
+    while (queue_item := session_queue.dequeue()) is not None:
+        assert queue_item.session.id == queue_item.session_id
+        assert queue_item.workflow == batch.workflow
+        assert (
+            session_queue.get_queue_item(queue_item.item_id).session.graph.model_dump()
+            == queue_item.session.graph.model_dump()
+        )
+        dequeued.append((queue_item.field_values, queue_item.session.graph.model_dump()))
+        session_queue.complete_queue_item(queue_item.item_id)
+    assert dequeued == expected
+
+    session_queue.prune("default")
+    cursor.execute("SELECT COUNT(*) FROM session_queue_batches")
+    assert cursor.fetchone()[0] == 0
+
+
+def test_lazy_and_eager_batches_share_the_queue(session_queue: SqliteSessionQueue, mock_services: InvocationServices):
+    eager = session_queue.enqueue_batch("default", make_data_batch(), prepend=False)
+    mock_services.configuration.lazy_batch_expansion = True
+    lazy = session_queue.enqueue_batch("default", make_data_batch(), prepend=False)
+
+    batch_ids = []
+    while (queue_item := session_queue.dequeue()) is not None:
+        batch_ids.append(queue_item.batch_id)
+        session_queue.set_queue_item_session(queue_item.item_id, queue_item.session)
+        assert session_queue.get_queue_item(queue_item.item_id).session.id == queue_item.session_id
+    assert batch_ids == [eager.batch.batch_id] * 6 + [lazy.batch.batch_id] * 6
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("item_count", [1_000, 10_000])
+def test_session_queue_dequeue_benchmark(session_queue: SqliteSessionQueue, item_count: int):
+    """Benchmarks dequeuing and status reads on a large queue. Run with `pytest -m slow -s` to see timings."""
+    session_queue.enqueue_batch("default", make_batch(runs=item_count), prepend=False)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        queue_item = session_queue.dequeue()
+        assert queue_item is not None
+        session_queue.get_queue_status("default")
+        session_queue.complete_queue_item(queue_item.item_id)
+    elapsed = time.perf_counter() - start
+    print(f"\n{item_count} items: {elapsed / 100 * 1000:.3f}ms per dequeue/complete cycle")
@@ -2,9 +2,18 @@
 Test model loading
 """
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
 
+import torch
+
+from invokeai.app.services.config import InvokeAIAppConfig
 from invokeai.app.services.model_manager import ModelManagerServiceBase
+from invokeai.backend.model_manager import AnyModel, AnyModelConfig, SubModelType
+from invokeai.backend.model_manager.load.load_default import ModelLoader
 from invokeai.backend.textual_inversion import TextualInversionModelRaw
 from tests.backend.model_manager.model_manager_fixtures import *  # noqa F403
 
@@ -24,3 +33,79 @@ def test_loading(mm2_model_manager: ModelManagerServiceBase, embedding_file: Pat
     loaded_model_2 = mm2_model_manager.load.load_model(config)
 
     assert loaded_model.config.key == loaded_model_2.config.key
+
+
+class SlowModelLoader(ModelLoader):
+    """A loader that counts its loads, and takes long enough that concurrent requests overlap."""
+
+    loads = 0
+    loads_lock = threading.Lock()
+
+    def _load_model(self, config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> AnyModel:
+        with self.loads_lock:
+            SlowModelLoader.loads += 1
+        time.sleep(0.2)
+        return torch.nn.Linear(4, 4)
+
+
+def test_concurrent_loads_are_deduplicated(
+    mm2_model_manager: ModelManagerServiceBase, mm2_app_config: InvokeAIAppConfig, embedding_file: Path
+):
+    key = mm2_model_manager.install.register_path(embedding_file)
+    config = mm2_model_manager.store.get_model(key)
+    ram_cache = mm2_model_manager.load.ram_cache
+
+    def load() -> AnyModel:
+        loader = SlowModelLoader(app_config=mm2_app_config, logger=ram_cache.logger, ram_cache=ram_cache)
+        return loader.load_model(config).model
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        models = list(executor.map(lambda _: load(), range(4)))
+
+    assert SlowModelLoader.loads == 1
+    assert all(model is models[0] for model in models)
+
+
+def test_prefetch_does_not_cache_models_that_do_not_fit(
+    mm2_model_manager: ModelManagerServiceBase, embedding_file: Path
+):
+    key = mm2_model_manager.install.register_path(embedding_file)
+    config = mm2_model_manager.store.get_model(key)
+    ram_cache = mm2_model_manager.load.ram_cache
+    ram_cache.max_cache_size = 0
+
+    assert not mm2_model_manager.load.prefetch_model(config)
+    assert not ram_cache.exists(key)
+
+
+class BlockingModelLoader(ModelLoader):
+    """A loader whose loads wait until they are released."""
+
+    loading = threading.Event()
+    release = threading.Event()
+
+    def _load_model(self, config: AnyModelConfig, submodel_type: Optional[SubModelType] = None) -> AnyModel:
+        self.loading.set()
+        assert self.release.wait(timeout=5)
+        return torch.nn.Linear(4, 4)
+
+
+def test_loads_do_not_wait_for_prefetches(
+    mm2_model_manager: ModelManagerServiceBase, mm2_app_config: InvokeAIAppConfig, embedding_file: Path
+):
+    key = mm2_model_manager.install.register_path(embedding_file)
+    config = mm2_model_manager.store.get_model(key)
+    ram_cache = mm2_model_manager.load.ram_cache
+    prefetcher = BlockingModelLoader(app_config=mm2_app_config, logger=ram_cache.logger, ram_cache=ram_cache)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetched = executor.submit(prefetcher.prefetch_model, config)
+        assert BlockingModelLoader.loading.wait(timeout=5)
+        try:
+            # The session loads the model itself, rather than waiting for the prefetch
+            with mm2_model_manager.load.load_model(config) as model:
+                assert isinstance(model, TextualInversionModelRaw)
+        finally:
+            BlockingModelLoader.release.set()
+        # The model was cached by the session's load in the meantime
+        assert prefetched.result(timeout=5)
@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+
+import torch
+
+from invokeai.app.services.config import InvokeAIAppConfig
+from invokeai.backend.model_manager.config import (
+    BaseModelType,
+    ModelFormat,
+    ModelSourceType,
+    ModelType,
+    TextualInversionFileConfig,
+)
+from invokeai.backend.model_manager.load.converted_cache import ConvertedStateDictCache
+from invokeai.backend.model_manager.load.load_default import ModelLoader
+from invokeai.backend.model_manager.load.mmap_safetensors import is_memory_mapped
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB, ModelCache
+from invokeai.backend.util.logging import InvokeAILogger
+
+
+def make_state_dict() -> dict[str, torch.Tensor]:
+    return {"weight": torch.randn(4, 4), "bias": torch.randn(4)}
+
+
+def make_cache(path: Path, max_size: int) -> ConvertedStateDictCache:
+    return ConvertedStateDictCache(path, max_size=max_size, logger=InvokeAILogger.get_logger())
+
+
+def test_converted_cache_loads_saved_state_dicts(tmp_path: Path):
+    cache = make_cache(tmp_path / "cache", max_size=GB)
+    assert cache.get("hash", "converter", 1) is None
+
+    state_dict = make_state_dict()
+    cache.put("hash", "converter", 1, state_dict)
+    cached = cache.get("hash", "converter", 1)
+    assert cached is not None
+    assert cached.keys() == state_dict.keys()
+    assert all(torch.equal(cached[key], state_dict[key]) for key in state_dict)
+    assert all(is_memory_mapped(tensor) for tensor in cached.values())
+
+    # Results of other models and other converters, or of other versions of the converter, are cached separately
+    assert cache.get("other_hash", "converter", 1) is None
+    assert cache.get("hash", "other_converter", 1) is None
+    assert cache.get("hash", "converter", 2) is None
+
+
+def test_converted_cache_evicts_least_recently_used_state_dicts(tmp_path: Path):
+    make_cache(tmp_path, max_size=GB).put("a", "converter", 1, make_state_dict())
+    (file_path,) = tmp_path.iterdir()
+    # Room for two state dicts
+    cache = make_cache(tmp_path, max_size=2 * file_path.stat().st_size)
+    cache.put("b", "converter", 1, make_state_dict())
+    for i, path in enumerate(tmp_path.iterdir()):
+        os.utime(path, (i, i))
+    assert cache.get("a", "converter", 1) is not None
+
+    cache.put("c", "converter", 1, make_state_dict())
+    assert cache.get("a", "converter", 1) is not None
+    assert cache.get("b", "converter", 1) is None
+    assert cache.get("c", "converter", 1) is not None
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # State dicts larger than the cache are not cached
+    cache.put("d", "converter", 1, {"weight": torch.randn(1024)})
+    assert cache.get("d", "converter", 1) is None
+
+
+def test_model_loader_converts_models_once(tmp_path: Path):
+    app_config = InvokeAIAppConfig(converted_cache_dir=tmp_path, converted_cache_size=1)
+    ram_cache = ModelCache(max_cache_size=1, max_vram_cache_size=0, execution_device=torch.device("cpu"))
+    loader = ModelLoader(app_config, InvokeAILogger.get_logger(), ram_cache)
+    config = TextualInversionFileConfig(
+        key="key",
+        source="test/source/",
+        source_type=ModelSourceType.Path,
+        path="/tmp/embedding.bin",
+        name="embedding",
+        base=BaseModelType.StableDiffusion1,
+        type=ModelType.TextualInversion,
+        format=ModelFormat.EmbeddingFile,
+        hash="ABC123",
+    )
+    state_dict = make_state_dict()
+    conversions: list[dict[str, torch.Tensor]] = []
+
+    def convert() -> dict[str, torch.Tensor]:
+        conversions.append(state_dict)
+        return state_dict
+
+    assert loader._load_converted_state_dict(config, "converter", 1, convert) is state_dict
+    cached = loader._load_converted_state_dict(config, "converter", 1, convert)
+    assert len(conversions) == 1
+    assert torch.equal(cached["weight"], state_dict["weight"])
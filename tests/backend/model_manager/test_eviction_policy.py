@@ -0,0 +1,194 @@
+# pyright: reportPrivateUsage=false
+from typing import Optional
+
+import pytest
+import torch
+
+from invokeai.backend.model_manager.load.model_cache import model_cache_base
+from invokeai.backend.model_manager.load.model_cache.cache_replay import (
+    get_requests,
+    parse_cache_trace,
+    replay_cache_trace,
+)
+from invokeai.backend.model_manager.load.model_cache.eviction_policy import (
+    CostAwareEvictionPolicy,
+    LRUEvictionPolicy,
+    SmallestFirstEvictionPolicy,
+    get_eviction_policy,
+)
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import CacheAccess, CacheRecord, CacheStats
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB, ModelCache
+
+
+def make_record(
+    key: str, size: int, last_accessed: int = 0, accesses: int = 1, load_time: Optional[float] = None
+) -> CacheRecord[None]:
+    return CacheRecord(
+        key=key,
+        model=None,
+        device=torch.device("cpu"),
+        state_dict=None,
+        size=size,
+        load_time=load_time,
+        accesses=accesses,
+        last_accessed=last_accessed,
+    )
+
+
+def keys(records: list[CacheRecord[None]]) -> list[str]:
+    return [record.key for record in records]
+
+
+def test_lru_policy_evicts_least_recently_used_first():
+    records = [make_record("a", 1, last_accessed=3), make_record("b", 2, last_accessed=1), make_record("c", 3, 2)]
+    assert keys(LRUEvictionPolicy().order(records, clock=3)) == ["b", "c", "a"]
+
+
+def test_smallest_first_policy_evicts_smallest_first():
+    records = [make_record("a", 3), make_record("b", 1), make_record("c", 2)]
+    assert keys(SmallestFirstEvictionPolicy().order(records, clock=3)) == ["b", "c", "a"]
+
+
+def test_cost_aware_policy_keeps_models_that_are_expensive_to_reload():
+    records = [
+        # Rarely used, but slow to load
+        make_record("slow", GB, last_accessed=1, accesses=1, load_time=20),
+        # Often used, but fast to load
+        make_record("fast", GB, last_accessed=10, accesses=5, load_time=1),
+        # Not timed, assumed to load at the measured bandwidth of 2 GB in 21 s, so in 31.5 s
+        make_record("untimed", 3 * GB, last_accessed=5, accesses=1),
+    ]
+    assert keys(CostAwareEvictionPolicy().order(records, clock=10)) == ["fast", "slow", "untimed"]
+
+
+def test_cost_aware_policy_breaks_ties_by_recency():
+    records = [make_record("a", GB, last_accessed=2), make_record("b", GB, last_accessed=1)]
+    assert keys(CostAwareEvictionPolicy().order(records, clock=2)) == ["b", "a"]
+
+
+def test_get_eviction_policy():
+    assert isinstance(get_eviction_policy("lru"), LRUEvictionPolicy)
+    assert isinstance(get_eviction_policy("smallest_first"), SmallestFirstEvictionPolicy)
+    assert isinstance(get_eviction_policy("cost_aware"), CostAwareEvictionPolicy)
+    with pytest.raises(ValueError):
+        get_eviction_policy("fifo")  # type: ignore
+
+
+def test_model_cache_evicts_with_its_policy():
+    linear_size = 64 * 64 * 4
+    cache = ModelCache(
+        max_cache_size=2 * linear_size / GB,
+        max_vram_cache_size=0,
+        execution_device=torch.device("cpu"),
+        eviction_policy=SmallestFirstEvictionPolicy(),
+    )
+    cache.put("small", torch.nn.Linear(32, 32, bias=False))
+    cache.put("large", torch.nn.Linear(64, 64, bias=False))
+    cache.get("large")
+    cache.put("other", torch.nn.Linear(64, 64, bias=False))
+    assert not cache.exists("small")
+    assert cache.exists("large")
+
+    # With LRU, the model that was just used would be kept instead
+    cache._eviction_policy = LRUEvictionPolicy()
+    cache.get("other")
+    cache.put("last", torch.nn.Linear(32, 32, bias=False))
+    assert not cache.exists("large")
+    assert cache.exists("other")
+
+
+def test_model_cache_does_not_evict_without_eviction():
+    linear_size = 64 * 64 * 4
+    cache = ModelCache(
+        max_cache_size=1.5 * linear_size / GB, max_vram_cache_size=0, execution_device=torch.device("cpu")
+    )
+    cache.put("cached", torch.nn.Linear(64, 64, bias=False))
+    with cache.without_eviction():
+        cache.put("skipped", torch.nn.Linear(64, 64, bias=False))
+        cache.put("fits", torch.nn.Linear(16, 16, bias=False))
+    assert cache.exists("cached")
+    assert not cache.exists("skipped")
+    assert cache.exists("fits")
+
+    # Outside of the context, models are evicted again
+    cache.put("evicting", torch.nn.Linear(64, 64, bias=False))
+    assert not cache.exists("cached")
+    assert cache.exists("evicting")
+
+
+def test_model_cache_records_access_trace():
+    cache = ModelCache(max_cache_size=1, max_vram_cache_size=0, execution_device=torch.device("cpu"))
+    cache.stats = CacheStats()
+    cache.put("model", torch.nn.Linear(4, 4, bias=False), load_time=0.5)
+    cache.get("model")
+    cache.get("model")
+
+    assert list(cache.stats.accesses) == [
+        CacheAccess(key="model", size=64, hit=False, load_time=0.5),
+        CacheAccess(key="model", size=64, hit=True),
+        CacheAccess(key="model", size=64, hit=True),
+    ]
+    assert cache._cached_models["model"].accesses == 2
+    assert cache._cached_models["model"].load_time == 0.5
+
+
+def test_model_cache_access_trace_is_bounded(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(model_cache_base, "MAX_CACHE_ACCESSES", 2)
+    cache = ModelCache(max_cache_size=1, max_vram_cache_size=0, execution_device=torch.device("cpu"))
+    cache.stats = CacheStats()
+    cache.put("model", torch.nn.Linear(4, 4, bias=False), load_time=0.5)
+    cache.get("model")
+    cache.get("model")
+
+    # Only the most recent accesses are kept
+    assert list(cache.stats.accesses) == [
+        CacheAccess(key="model", size=64, hit=True),
+        CacheAccess(key="model", size=64, hit=True),
+    ]
+
+
+def loaded(key: str, size: int, load_time: float) -> list[CacheAccess]:
+    """The accesses recorded when a model is loaded: it is stored in the cache and then retrieved."""
+    return [CacheAccess(key=key, size=size, hit=False, load_time=load_time), CacheAccess(key=key, size=size, hit=True)]
+
+
+def used(key: str, size: int) -> list[CacheAccess]:
+    return [CacheAccess(key=key, size=size, hit=True)]
+
+
+def test_get_requests_merges_loads_with_their_retrieval():
+    trace = loaded("a", 1, 1) + used("a", 1) + loaded("b", 1, 1)
+    assert get_requests(trace) == [trace[0], trace[2], trace[3]]
+
+
+def test_replay_cache_trace():
+    # A large model that is slow to load, used in turn with small models that are fast to load
+    trace = (
+        loaded("large", 2 * GB, 30)
+        + loaded("small1", GB, 1)
+        + loaded("small2", GB, 1)
+        + used("large", 2 * GB)
+        + used("small1", GB)
+        + used("small2", GB)
+    )
+
+    lru = replay_cache_trace(trace, LRUEvictionPolicy(), 3 * GB)
+    assert (lru.hits, lru.misses) == (0, 6)
+    assert lru.bytes_loaded == 8 * GB
+    assert lru.load_time == 64
+
+    cost_aware = replay_cache_trace(trace, CostAwareEvictionPolicy(), 3 * GB)
+    assert (cost_aware.hits, cost_aware.misses) == (1, 5)
+    assert cost_aware.hit_rate == pytest.approx(1 / 6)
+    assert cost_aware.bytes_loaded == 6 * GB
+    assert cost_aware.load_time == 34
+
+
+def test_parse_cache_trace():
+    trace = loaded("a", 1, 0.5)
+    assert (
+        parse_cache_trace(
+            [{"key": "a", "size": 1, "hit": False, "load_time": 0.5}, {"key": "a", "size": 1, "hit": True}]
+        )
+        == trace
+    )
@@ -0,0 +1,129 @@
+# pyright: reportPrivateUsage=false
+import gc
+from pathlib import Path
+
+import pytest
+import torch
+from safetensors.torch import load_file, save_file
+
+from invokeai.backend.model_manager.load import mmap_safetensors
+from invokeai.backend.model_manager.load.mmap_safetensors import (
+    is_memory_mapped,
+    load_mmap_safetensors,
+    read_safetensors_metadata,
+    read_safetensors_tensor_sizes,
+    save_safetensors,
+)
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import ModelCache
+from invokeai.backend.model_manager.load.model_util import calc_model_mapped_size_by_data, calc_model_size_by_data
+from invokeai.backend.textual_inversion import TextualInversionModelRaw
+from invokeai.backend.util.logging import InvokeAILogger
+
+
+@pytest.fixture
+def linear_file(tmp_path: Path) -> Path:
+    path = tmp_path / "linear.safetensors"
+    save_file(torch.nn.Linear(32, 16).state_dict(), path)
+    return path
+
+
+def load_linear(path: Path) -> torch.nn.Module:
+    model = torch.nn.Linear(32, 16, device="meta")
+    model.load_state_dict(load_mmap_safetensors(path), assign=True)
+    return model
+
+
+def test_load_mmap_safetensors_matches_load_file(tmp_path: Path):
+    path = tmp_path / "tensors.safetensors"
+    tensors = {
+        "float32": torch.randn(3, 4),
+        "float16": torch.randn(5, dtype=torch.float16),
+        "bfloat16": torch.randn(2, 3, dtype=torch.bfloat16),
+        "int64": torch.arange(7),
+        "bool": torch.tensor([True, False, True]),
+        "scalar": torch.tensor(1.5),
+    }
+    save_file(tensors, path, metadata={"format": "pt"})
+
+    state_dict = load_mmap_safetensors(path)
+
+    expected = load_file(path)
+    assert state_dict.keys() == expected.keys()
+    for key, tensor in expected.items():
+        assert state_dict[key].dtype == tensor.dtype
+        assert torch.equal(state_dict[key], tensor)
+        assert is_memory_mapped(state_dict[key])
+        assert not is_memory_mapped(tensor)
+
+
+def test_read_safetensors_tensor_sizes(tmp_path: Path):
+    path = tmp_path / "tensors.safetensors"
+    save_file({"a": torch.zeros(3, 4), "b": torch.zeros(5, dtype=torch.float16)}, path, metadata={"format": "pt"})
+
+    assert read_safetensors_tensor_sizes(path) == {"a": 48, "b": 10}
+
+
+def test_save_safetensors_saves_tensors_that_share_memory(tmp_path: Path, linear_file: Path):
+    path = tmp_path / "saved.safetensors"
+    mapped = load_mmap_safetensors(linear_file)
+    buffer = torch.randn(10)
+    tensors = {
+        **mapped,
+        "half": torch.randn(3, dtype=torch.float16),
+        "view": buffer[2:5],
+        "other_view": buffer[4:].view(2, 3),
+        "bool": torch.tensor([True, False, True]),
+        "empty": torch.empty(0, 4),
+    }
+    save_safetensors(path, tensors, metadata={"format": "pt"})
+
+    expected = load_file(path)
+    state_dict = load_mmap_safetensors(path)
+    assert read_safetensors_metadata(path) == {"format": "pt"}
+    assert state_dict.keys() == expected.keys() == tensors.keys()
+    for key, tensor in tensors.items():
+        assert torch.equal(expected[key], tensor)
+        assert torch.equal(state_dict[key], tensor)
+        # All tensors are aligned, so none of them is copied out of the mapping
+        assert is_memory_mapped(state_dict[key]) or state_dict[key].nelement() == 0
+
+
+def test_writes_to_mapped_tensors_do_not_change_the_file(linear_file: Path):
+    state_dict = load_mmap_safetensors(linear_file)
+    state_dict["weight"].zero_()
+    assert load_file(linear_file)["weight"].abs().sum() > 0
+
+
+def test_memory_map_is_released_with_its_tensors(linear_file: Path):
+    gc.collect()
+    mapped_regions = len(mmap_safetensors._mapped_regions)
+    state_dict = load_mmap_safetensors(linear_file)
+    assert len(mmap_safetensors._mapped_regions) == mapped_regions + 1
+    del state_dict
+    gc.collect()
+    assert len(mmap_safetensors._mapped_regions) == mapped_regions
+
+
+def test_calc_model_mapped_size_by_data(linear_file: Path):
+    model = load_linear(linear_file)
+    size = calc_model_size_by_data(InvokeAILogger.get_logger(), model)
+    assert size == (32 * 16 + 16) * 4
+    assert calc_model_mapped_size_by_data(model) == size
+
+    # Converting the weights copies them into RAM
+    model.to(dtype=torch.float16)
+    assert calc_model_mapped_size_by_data(model) == 0
+
+    embedding = TextualInversionModelRaw()
+    embedding.embedding = load_mmap_safetensors(linear_file)["weight"]
+    assert calc_model_mapped_size_by_data(embedding) == 32 * 16 * 4
+
+
+def test_model_cache_does_not_count_mapped_weights(linear_file: Path):
+    cache = ModelCache(max_cache_size=1, max_vram_cache_size=0, execution_device=torch.device("cpu"))
+    cache.put("mapped", load_linear(linear_file))
+    cache.put("resident", torch.nn.Linear(32, 16))
+
+    assert cache.cache_size() == (32 * 16 + 16) * 4
+    assert cache._cached_models["mapped"].mapped_size == cache._cached_models["mapped"].size
+    assert cache._cached_models["resident"].mapped_size == 0
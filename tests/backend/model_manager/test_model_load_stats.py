@@ -0,0 +1,70 @@
+# pyright: reportPrivateUsage=false
+import threading
+
+import torch
+
+from invokeai.backend.model_manager.config import SubModelType
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelLoadStats
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import ModelCache
+
+
+def make_cache() -> ModelCache:
+    return ModelCache(max_cache_size=1, max_vram_cache_size=0, execution_device=torch.device("cpu"))
+
+
+def test_model_cache_measures_cached_models():
+    cache = make_cache()
+    measured: list[ModelLoadStats] = []
+    cache.load_stats_listener = measured.append
+
+    cache.put("model", torch.nn.Linear(4, 4, bias=False), submodel_type=SubModelType.UNet, load_time=0.5)
+    stats = ModelLoadStats(key="model", submodel_type=SubModelType.UNet, size=64, load_time=0.5)
+    assert measured == [stats]
+    assert cache.get_load_stats("model", SubModelType.UNet) == stats
+    assert cache.get_load_stats("model") is None
+
+    # Unchanged measurements are not reported again
+    cache.make_room(2**31)
+    assert not cache.exists("model", SubModelType.UNet)
+    cache.put("model", torch.nn.Linear(4, 4, bias=False), submodel_type=SubModelType.UNet, load_time=0.5)
+    assert len(measured) == 1
+
+
+def test_model_cache_reports_measurements_without_holding_the_lock():
+    cache = make_cache()
+    lock_available: list[bool] = []
+
+    def try_lock() -> None:
+        acquired = cache._lock.acquire(timeout=1)
+        lock_available.append(acquired)
+        if acquired:
+            cache._lock.release()
+
+    def listener(stats: ModelLoadStats) -> None:
+        # The listener may write to the database, so other threads can use the cache meanwhile
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+
+    cache.load_stats_listener = listener
+    cache.put("model", torch.nn.Linear(4, 4, bias=False))
+    assert lock_available == [True]
+
+
+def test_model_cache_uses_known_stats():
+    cache = make_cache()
+    cache.set_load_stats(ModelLoadStats(key="model", submodel_type=None, size=64, vram_size=128, load_time=2))
+
+    cache.put("model", torch.nn.Linear(4, 4, bias=False))
+    assert cache._cached_models["model"].vram_footprint == 128
+    # The load time measured earlier is kept when the model is cached without one
+    assert cache.get_load_stats("model") == ModelLoadStats(
+        key="model", submodel_type=None, size=64, vram_size=128, load_time=2
+    )
+
+
+def test_model_cache_does_not_replace_measurements_with_known_stats():
+    cache = make_cache()
+    cache.put("model", torch.nn.Linear(4, 4, bias=False), load_time=1)
+    cache.set_load_stats(ModelLoadStats(key="model", submodel_type=None, size=1000))
+    assert cache.get_load_stats("model") == ModelLoadStats(key="model", submodel_type=None, size=64, load_time=1)
@@ -0,0 +1,75 @@
+# pyright: reportPrivateUsage=false
+import torch
+
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GB, ModelCache
+from invokeai.backend.model_manager.load.model_cache.partial_load import PartialLoad
+
+# Size of the weights of a linear layer with 64 inputs and outputs and no bias
+LINEAR_SIZE = 64 * 64 * 4
+
+
+def make_model() -> torch.nn.Sequential:
+    return torch.nn.Sequential(torch.nn.Linear(64, 64, bias=False), torch.nn.Linear(64, 64, bias=False))
+
+
+def test_partial_load_streams_modules_that_do_not_fit():
+    model = torch.nn.Sequential(torch.nn.Linear(8, 16), torch.nn.ReLU(), torch.nn.Linear(16, 4))
+    x = torch.randn(2, 8)
+    expected = model(x)
+    originals = dict(model.named_parameters())
+
+    # The first layer fits, the second does not
+    partial_load = PartialLoad(model, torch.device("cpu"), budget=(8 * 16 + 16) * 4)
+    assert partial_load.loaded_size == (8 * 16 + 16) * 4
+    assert partial_load.streamed_size == (16 * 4 + 4) * 4
+    assert model[0].weight is not originals["0.weight"]
+    assert model[2].weight is originals["2.weight"]
+
+    assert len(model[2]._forward_pre_hooks) == 1
+    assert torch.allclose(model(x), expected)
+    assert model[2].weight is originals["2.weight"]
+
+    partial_load.unload()
+    assert all(param is originals[name] for name, param in model.named_parameters())
+    assert len(model[2]._forward_pre_hooks) == 0
+    assert len(model[2]._forward_hooks) == 0
+
+
+def test_model_cache_partially_loads_models_that_exceed_the_budget():
+    # The meta device stands in for a GPU with room for the weights of three layers
+    cache = ModelCache(
+        max_cache_size=1,
+        max_vram_cache_size=1,
+        execution_device=torch.device("meta"),
+        partial_load_vram=3 * LINEAR_SIZE / GB,
+    )
+    cache.put("a", make_model())
+    cache.put("b", make_model())
+
+    model_a = cache.get("a").lock()
+    assert all(param.device.type == "meta" for param in model_a.parameters())
+
+    model_b = cache.get("b").lock()
+    b = cache._cached_models["b"]
+    assert b.partial_load is not None
+    assert b.vram_size == LINEAR_SIZE
+    assert cache._get_vram_weights_size() == 3 * LINEAR_SIZE
+    assert model_b[0].weight.device.type == "meta"
+    assert model_b[1].weight.device.type == "cpu"
+    assert model_b(torch.randn(1, 64, device="meta")).device.type == "meta"
+
+    cache.get("a").unlock()
+    cache.get("b").unlock()
+
+    # Unlocked models are offloaded until the weights of the required model fit in the budget
+    cache.offload_unlocked_models(LINEAR_SIZE)
+    assert not cache._cached_models["a"].loaded
+    assert all(param.device.type == "cpu" for param in model_a.parameters())
+    assert cache._get_vram_weights_size() == LINEAR_SIZE
+
+    cache.offload_unlocked_models(3 * LINEAR_SIZE)
+    assert not b.loaded
+    assert b.partial_load is None
+    assert cache._get_vram_weights_size() == 0
+    assert all(param.device.type == "cpu" for param in model_b.parameters())
+    assert len(model_b[1]._forward_pre_hooks) == 0
@@ -0,0 +1,157 @@
+# pyright: reportPrivateUsage=false
+import threading
+from pathlib import Path
+
+import psutil
+import pytest
+import torch
+
+from invokeai.backend.model_manager.load.mmap_safetensors import is_memory_mapped
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import ModelCache
+from invokeai.backend.model_manager.load.model_cache.shared_state_dicts import SharedStateDictStore
+
+
+def make_model() -> torch.nn.Module:
+    model = torch.nn.Sequential(torch.nn.Embedding(16, 8), torch.nn.Linear(8, 16, bias=False))
+    # Tied weights
+    model[1].weight = model[0].weight
+    return model
+
+
+def get_dead_pid() -> int:
+    pid = 2**22
+    while psutil.pid_exists(pid):
+        pid += 1
+    return pid
+
+
+def test_processes_share_a_segment(tmp_path: Path):
+    # Each store stands in for a process
+    store1 = SharedStateDictStore(tmp_path)
+    store2 = SharedStateDictStore(tmp_path)
+    state_dict = make_model().state_dict()
+
+    assert store2.attach("model") is None
+    shared1 = store1.share("model", state_dict)
+    shared2 = store2.share("model", make_model().state_dict())
+
+    assert store1.get_ref_count("model") == 2
+    for key, tensor in state_dict.items():
+        assert torch.equal(shared1.state_dict[key], tensor)
+        # The second process maps the segment written by the first
+        assert torch.equal(shared2.state_dict[key], tensor)
+        assert is_memory_mapped(shared2.state_dict[key])
+    assert shared2.state_dict["0.weight"] is shared2.state_dict["1.weight"]
+
+    shared1.release()
+    assert store1.get_ref_count("model") == 1
+    assert (tmp_path / "model.safetensors").exists()
+    shared2.release()
+    shared2.release()
+    assert store1.get_ref_count("model") == 0
+    assert not (tmp_path / "model.safetensors").exists()
+
+
+def test_incompatible_segment_is_replaced(tmp_path: Path):
+    store = SharedStateDictStore(tmp_path)
+    shared_float32 = store.share("model", make_model().state_dict())
+    shared_float16 = store.share("model", make_model().to(torch.float16).state_dict())
+
+    assert shared_float16.state_dict["0.weight"].dtype == torch.float16
+    # The state dict mapped from the replaced segment is still valid
+    assert shared_float32.state_dict["0.weight"].dtype == torch.float32
+    assert shared_float32.state_dict["0.weight"].sum().isfinite()
+
+
+def test_segments_of_exited_processes_are_removed(tmp_path: Path):
+    store = SharedStateDictStore(tmp_path)
+    store.share("model", make_model().state_dict())
+    store.share("other", make_model().state_dict())
+    dead_pid = get_dead_pid()
+    for ref_path in (tmp_path / "model.refs").iterdir():
+        ref_path.rename(ref_path.with_name(f"{dead_pid}.ref"))
+    (tmp_path / f"{dead_pid}.0.tmp").touch()
+
+    assert store.get_ref_count("model") == 0
+    SharedStateDictStore(tmp_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["other.refs", "other.safetensors"]
+
+
+@pytest.mark.parametrize("execution_device", ["cpu", "meta"])
+def test_model_cache_maps_shared_weights(tmp_path: Path, execution_device: str):
+    store = SharedStateDictStore(tmp_path)
+    caches = [
+        ModelCache(
+            max_cache_size=1,
+            max_vram_cache_size=1,
+            execution_device=torch.device(execution_device),
+            shared_state_dicts=store,
+        )
+        for _ in range(2)
+    ]
+    models = [make_model(), make_model()]
+    x = torch.arange(4)
+    expected = models[0](x)
+    for cache, model in zip(caches, models, strict=True):
+        cache.put("key", model, shared_key="blake3:hash")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["blake3_hash.refs", "blake3_hash.safetensors"]
+    assert store.get_ref_count("blake3:hash") == 2
+    for cache, model in zip(caches, models, strict=True):
+        assert all(is_memory_mapped(param) for param in model.parameters())
+        assert model[0].weight.data_ptr() == model[1].weight.data_ptr()
+        assert torch.equal(model(x), expected)
+        # Shared weights are not counted against the size of the cache
+        assert cache.cache_size() == 0
+
+    model = caches[0].get("key").lock()
+    assert model[0].weight.device.type == execution_device
+    caches[0].get("key").unlock()
+    caches[0].offload_unlocked_models(2**31)
+    assert all(is_memory_mapped(param) for param in models[0].parameters())
+
+    caches[0].make_room(2**31)
+    assert store.get_ref_count("blake3:hash") == 1
+    caches[1].make_room(2**31)
+    assert not (tmp_path / "blake3_hash.safetensors").exists()
+
+
+def test_model_cache_only_shares_weights_with_shared_key(tmp_path: Path):
+    cache = ModelCache(
+        max_cache_size=1,
+        max_vram_cache_size=0,
+        execution_device=torch.device("cpu"),
+        shared_state_dicts=SharedStateDictStore(tmp_path),
+    )
+    model = make_model()
+    cache.put("key", model)
+    assert not any(is_memory_mapped(param) for param in model.parameters())
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_model_cache_shares_weights_without_holding_the_lock(tmp_path: Path):
+    store = SharedStateDictStore(tmp_path)
+    cache = ModelCache(
+        max_cache_size=1, max_vram_cache_size=0, execution_device=torch.device("cpu"), shared_state_dicts=store
+    )
+    cache.put("other", make_model())
+    publishing, release = threading.Event(), threading.Event()
+    publish = store.publish
+
+    def blocking_publish(*args, **kwargs):
+        publishing.set()
+        assert release.wait(timeout=5)
+        return publish(*args, **kwargs)
+
+    store.publish = blocking_publish
+    putting = threading.Thread(target=cache.put, args=("key", make_model()), kwargs={"shared_key": "blake3:hash"})
+    putting.start()
+    assert publishing.wait(timeout=5)
+
+    # Other threads use the cache while the segment is written
+    assert cache.exists("other")
+    assert cache.get("other").model is not None
+    release.set()
+    putting.join()
+    assert cache.exists("key")
+    assert store.get_ref_count("blake3:hash") == 1
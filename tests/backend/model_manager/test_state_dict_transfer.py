@@ -0,0 +1,161 @@
+import threading
+from typing import Any
+
+import pytest
+import torch
+
+from invokeai.backend.model_manager.load.model_cache import model_cache_default
+from invokeai.backend.model_manager.load.model_cache.model_cache_base import CacheStats
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import ModelCache
+from invokeai.backend.model_manager.load.model_cache.state_dict_transfer import (
+    copy_state_dict_to_device,
+    pack_state_dict,
+)
+
+
+def make_model() -> torch.nn.Module:
+    # The weights of the first layer are large, the others are packed
+    return torch.nn.Sequential(
+        torch.nn.Linear(512, 1024),
+        torch.nn.LayerNorm(1024),
+        torch.nn.Linear(1024, 4),
+        torch.nn.Linear(4, 1024).to(torch.float16),
+    )
+
+
+def storage_ptr(tensor: torch.Tensor) -> int:
+    return tensor.untyped_storage().data_ptr()
+
+
+def test_pack_state_dict_packs_small_tensors_by_dtype():
+    state_dict = make_model().state_dict()
+    packed = pack_state_dict(state_dict, pin_memory=False)
+
+    assert packed.keys() == state_dict.keys()
+    assert all(torch.equal(packed[key], state_dict[key]) for key in state_dict)
+    float32_keys = ["0.bias", "1.weight", "1.bias", "2.weight", "2.bias"]
+    assert len({storage_ptr(packed[key]) for key in float32_keys}) == 1
+    assert storage_ptr(packed["3.weight"]) == storage_ptr(packed["3.bias"]) != storage_ptr(packed["2.weight"])
+    assert storage_ptr(packed["0.weight"]) not in {storage_ptr(packed[key]) for key in float32_keys}
+
+
+def test_pack_state_dict_keeps_tied_weights_tied():
+    weight = torch.randn(8, 8)
+    packed = pack_state_dict({"a": weight, "b": weight.detach(), "c": torch.randn(8)}, pin_memory=False)
+    assert packed["a"] is packed["b"]
+    assert packed["c"].untyped_storage().nbytes() == (64 + 8) * 4
+
+
+def test_copy_state_dict_to_device_copies_packed_tensors_together():
+    state_dict = make_model().state_dict()
+    packed = pack_state_dict(state_dict, pin_memory=False)
+    copies = copy_state_dict_to_device(packed, torch.device("cpu"))
+
+    assert all(torch.equal(copies[key], state_dict[key]) for key in state_dict)
+    assert all(storage_ptr(copies[key]) != storage_ptr(packed[key]) for key in state_dict)
+    assert storage_ptr(copies["0.bias"]) == storage_ptr(copies["2.weight"])
+    assert storage_ptr(copies["0.bias"]) != storage_ptr(copies["3.bias"])
+
+
+def test_copy_state_dict_to_device_copies_partial_views_separately():
+    weight = torch.randn(8, 8)
+    copies = copy_state_dict_to_device({"a": weight[:2], "b": weight[4:]}, torch.device("cpu"))
+    assert torch.equal(copies["a"], weight[:2])
+    assert torch.equal(copies["b"], weight[4:])
+    assert copies["a"].untyped_storage().nbytes() == 2 * 8 * 4
+
+
+def test_model_cache_pins_and_measures_transfers():
+    # The meta device stands in for a GPU
+    cache = ModelCache(max_cache_size=1, max_vram_cache_size=1, execution_device=torch.device("meta"), pin_memory=True)
+    cache.stats = CacheStats()
+    model = make_model()
+    cache.put("model", model)
+
+    assert storage_ptr(model[0].bias) == storage_ptr(model[2].weight)
+
+    cache.get("model").lock()
+    assert all(param.device.type == "meta" for param in model.parameters())
+    assert cache.stats.transferred_size == sum(p.nelement() * p.element_size() for p in model.parameters())
+    assert cache.stats.transfer_time > 0
+
+    cache.get("model").unlock()
+    cache.offload_unlocked_models(2**31)
+    assert storage_ptr(model[0].bias) == storage_ptr(model[2].weight)
+
+
+def test_model_cache_packs_state_dicts_without_holding_the_lock(monkeypatch: pytest.MonkeyPatch):
+    cache = ModelCache(max_cache_size=1, max_vram_cache_size=1, execution_device=torch.device("meta"), pin_memory=True)
+    cache.put("other", make_model())
+    packing, release = threading.Event(), threading.Event()
+
+    def blocking_pack_state_dict(*args: Any, **kwargs: Any):
+        packing.set()
+        assert release.wait(timeout=5)
+        return pack_state_dict(*args, **kwargs)
+
+    monkeypatch.setattr(model_cache_default, "pack_state_dict", blocking_pack_state_dict)
+    putting = threading.Thread(target=cache.put, args=("model", make_model()))
+    putting.start()
+    assert packing.wait(timeout=5)
+
+    # Other threads use the cache while the weights are packed
+    assert cache.exists("other")
+    assert cache.cache_size() > 0
+    release.set()
+    putting.join()
+    assert cache.exists("model")
+
+
+class BlockingLinear(torch.nn.Linear):
+    """Waits for `release` to be set before moving between devices."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.moving = threading.Event()
+        self.release = threading.Event()
+
+    def to(self, *args: Any, **kwargs: Any):
+        self.moving.set()
+        assert self.release.wait(timeout=5)
+        return super().to(*args, **kwargs)
+
+
+def test_model_cache_moves_models_without_holding_the_lock():
+    cache = ModelCache(max_cache_size=1, max_vram_cache_size=1, execution_device=torch.device("meta"))
+    model = BlockingLinear(4, 4)
+    cache.put("model", model)
+    cache.put("other", torch.nn.Linear(4, 4))
+
+    # Other threads use the cache while the model is moved to the execution device
+    locking = threading.Thread(target=cache.get("model").lock)
+    locking.start()
+    assert model.moving.wait(timeout=5)
+    assert cache.exists("other")
+    cache.get("other")
+    model.release.set()
+    locking.join()
+    assert model.weight.device.type == "meta"
+
+    # The model is offloaded without holding the lock as well, and is not evicted meanwhile
+    model.moving.clear()
+    model.release.clear()
+    cache.get("model").unlock()
+    offloading = threading.Thread(target=cache.offload_unlocked_models, args=(2**31,))
+    offloading.start()
+    assert model.moving.wait(timeout=5)
+    cache.make_room(2**31)
+    assert cache.exists("model")
+    model.release.set()
+    offloading.join()
+    assert model.weight.device.type == "cpu"
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="requires CUDA")
+def test_pinned_copies_on_transfer_stream():
+    state_dict = make_model().state_dict()
+    packed = pack_state_dict(state_dict, pin_memory=True)
+    assert all(tensor.is_pinned() for tensor in packed.values())
+
+    copies = copy_state_dict_to_device(packed, torch.device("cuda"), stream=torch.cuda.Stream())
+    assert all(torch.equal(copies[key].cpu(), state_dict[key]) for key in state_dict)
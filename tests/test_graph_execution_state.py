@@ -1,3 +1,4 @@
+import time
 from typing import Optional
 from unittest.mock import Mock
 
@@ -221,3 +222,114 @@ def test_graph_iterate_execution_order(execution_number: int):
     _ = invoke_next(g)
     assert _[1].item == "Dinosaur Sushi"
     _ = invoke_next(g)
+
+
+def test_graph_executes_iterations_in_order_depth_first():
+    """Tests that each iteration's branch is executed to completion, in collection order, before the next one starts"""
+    graph = Graph()
+    graph.add_node(RangeInvocation(id="range", start=0, stop=4, step=1))
+    graph.add_node(IterateInvocation(id="iterate"))
+    graph.add_node(MultiplyInvocation(id="multiply", b=10))
+    graph.add_node(AddInvocation(id="add", b=1))
+    graph.add_node(CollectInvocation(id="collect"))
+    graph.add_edge(create_edge("range", "collection", "iterate", "collection"))
+    graph.add_edge(create_edge("iterate", "item", "multiply", "a"))
+    graph.add_edge(create_edge("multiply", "value", "add", "a"))
+    graph.add_edge(create_edge("add", "value", "collect", "item"))
+
+    g = GraphExecutionState(graph=graph)
+    executed_sources: list[str] = []
+    add_values: list[int] = []
+    while True:
+        n, o = invoke_next(g)
+        if n is None:
+            break
+        executed_sources.append(g.prepared_source_mapping[n.id])
+        if isinstance(n, AddInvocation):
+            add_values.append(o.value)
+
+    # All iterations are expanded before any of them runs, then each iteration's branch runs to completion in order
+    assert executed_sources == ["range"] + ["iterate"] * 4 + ["multiply", "add"] * 4 + ["collect"]
+    assert add_values == [1, 11, 21, 31]
+    collect_id = next(iter(g.source_prepared_mapping["collect"]))
+    assert sorted(g.results[collect_id].collection) == [1, 11, 21, 31]
+    assert g.is_complete()
+
+
+def test_graph_execution_resumes_after_serialization():
+    """Tests that the scheduler state is rebuilt when an execution state is deserialized mid-execution"""
+    graph = Graph()
+    graph.add_node(RangeInvocation(id="range", start=0, stop=3, step=1))
+    graph.add_node(IterateInvocation(id="iterate"))
+    graph.add_node(MultiplyInvocation(id="multiply", b=10))
+    graph.add_node(AddInvocation(id="add", b=1))
+    graph.add_edge(create_edge("range", "collection", "iterate", "collection"))
+    graph.add_edge(create_edge("iterate", "item", "multiply", "a"))
+    graph.add_edge(create_edge("multiply", "value", "add", "a"))
+
+    g = GraphExecutionState(graph=graph)
+    for _ in range(3):
+        invoke_next(g)
+
+    g = GraphExecutionState.model_validate_json(g.model_dump_json())
+    while not g.is_complete():
+        n, _ = invoke_next(g)
+        assert n is not None
+
+    results = {g.results[n].value for n in g.source_prepared_mapping["add"]}
+    assert results == {1, 11, 21}
+
+
+def test_graph_execution_skips_nodes_in_flight():
+    graph = Graph()
+    graph.add_node(RangeInvocation(id="range", start=0, stop=3, step=1))
+    graph.add_node(IterateInvocation(id="iterate"))
+    graph.add_node(MultiplyInvocation(id="multiply", b=10))
+    graph.add_edge(create_edge("range", "collection", "iterate", "collection"))
+    graph.add_edge(create_edge("iterate", "item", "multiply", "a"))
+
+    g = GraphExecutionState(graph=graph)
+    for _ in range(4):
+        invoke_next(g)
+
+    # All three multiply nodes are ready and can be dispatched without waiting for each other
+    in_flight: list[BaseInvocation] = []
+    while (n := g.next()) is not None:
+        g.set_node_in_flight(n.id)
+        in_flight.append(n)
+    assert [n.a for n in in_flight] == [0, 1, 2]
+    assert not g.is_complete()
+
+    for n in reversed(in_flight):
+        g.complete(n.id, n.invoke(Mock(InvocationContext)))
+    assert g.next() is None
+    assert g.is_complete()
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("item_count", [100, 200, 400, 800])
+def test_graph_execution_scheduling_benchmark(item_count: int):
+    """Benchmarks scheduling overhead on a wide iterate/collect graph. Run with `pytest -m slow -s` to see timings."""
+    graph = Graph()
+    graph.add_node(RangeInvocation(id="range", start=0, stop=item_count, step=1))
+    graph.add_node(IterateInvocation(id="iterate"))
+    graph.add_node(MultiplyInvocation(id="multiply", b=10))
+    graph.add_node(AddInvocation(id="add", b=1))
+    graph.add_node(CollectInvocation(id="collect"))
+    graph.add_edge(create_edge("range", "collection", "iterate", "collection"))
+    graph.add_edge(create_edge("iterate", "item", "multiply", "a"))
+    graph.add_edge(create_edge("multiply", "value", "add", "a"))
+    graph.add_edge(create_edge("add", "value", "collect", "item"))
+
+    g = GraphExecutionState(graph=graph)
+    context = Mock(InvocationContext)
+    node_count = 0
+    start = time.perf_counter()
+    while (n := g.next()) is not None:
+        g.complete(n.id, n.invoke(context))
+        node_count += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"{item_count} items: {node_count} nodes in {elapsed:.3f}s ({elapsed / node_count * 1e6:.1f}us/node)")
+    assert node_count == 3 * item_count + 2
+    assert g.is_complete()
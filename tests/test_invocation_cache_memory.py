@@ -1,8 +1,9 @@
 # pyright: reportPrivateUsage=false
 from contextlib import suppress
+from unittest.mock import MagicMock
 
 from invokeai.app.invocations.fields import ImageField
-from invokeai.app.invocations.primitives import ImageOutput
+from invokeai.app.invocations.primitives import ImageCollectionOutput, ImageOutput, StringOutput
 from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
 from tests.test_nodes import PromptTestInvocation
 
@@ -181,3 +182,53 @@ def test_invocation_cache_memory_status():
     assert status.hits == 0
     assert status.misses == 0
     assert status.max_size == 0
+
+
+def test_invocation_cache_memory_deletes_by_references():
+    cache = MemoryInvocationCache(max_cache_size=5)
+    cache.start(MagicMock())
+    cache.save(1, ImageOutput(image=ImageField(image_name="foo"), width=512, height=512))
+    cache.save(2, ImageOutput(image=ImageField(image_name="bar"), width=512, height=512))
+    cache.save(3, ImageCollectionOutput(collection=[ImageField(image_name="foo"), ImageField(image_name="baz")]))
+    # Only referenced objects invalidate outputs, not other occurrences of their names
+    cache.save(4, StringOutput(value="foo"))
+    assert cache._references == {"foo": {1, 3}, "bar": {2}, "baz": {3}}
+
+    cache.delete_by_references(["foo", "qux"])
+    assert list(cache._cache.keys()) == [2, 4]
+    assert cache._references == {"bar": {2}}
+
+
+def test_invocation_cache_memory_removes_references_of_evicted_outputs():
+    cache = MemoryInvocationCache(max_cache_size=1)
+    cache.save(1, ImageOutput(image=ImageField(image_name="foo"), width=512, height=512))
+    cache.save(2, ImageOutput(image=ImageField(image_name="bar"), width=512, height=512))
+    assert cache._references == {"bar": {2}}
+    cache.delete(2)
+    assert cache._references == {}
+
+
+def test_invocation_cache_memory_is_referenced():
+    cache = MemoryInvocationCache(max_cache_size=1)
+    cache.save(1, ImageOutput(image=ImageField(image_name="foo"), width=512, height=512))
+    assert cache.is_referenced("foo")
+    assert not cache.is_referenced("bar")
+    cache.save(2, ImageOutput(image=ImageField(image_name="bar"), width=512, height=512))
+    assert not cache.is_referenced("foo")
+    assert cache.is_referenced("bar")
+
+
+def test_invocation_cache_memory_reports_released_references():
+    released: list[list[str]] = []
+    cache = MemoryInvocationCache(max_cache_size=2)
+    cache.on_references_released(released.append)
+    cache.save(1, ImageOutput(image=ImageField(image_name="foo"), width=512, height=512))
+    cache.save(2, ImageCollectionOutput(collection=[ImageField(image_name="foo"), ImageField(image_name="bar")]))
+    # "foo" is still referenced by the second output
+    cache.save(3, StringOutput(value="baz"))
+    assert released == []
+
+    cache.delete(2)
+    cache.save(4, ImageOutput(image=ImageField(image_name="qux"), width=512, height=512))
+    cache.clear()
+    assert [sorted(names) for names in released] == [["bar", "foo"], ["qux"]]
@@ -0,0 +1,130 @@
+# pyright: reportPrivateUsage=false
+from logging import Logger
+from unittest.mock import MagicMock
+
+import pytest
+
+from invokeai.app.invocations.fields import ImageField
+from invokeai.app.invocations.primitives import ImageOutput, LatentsOutput
+from invokeai.app.services.config.config_default import InvokeAIAppConfig
+from invokeai.app.services.invocation_cache.invocation_cache_sqlite import SqliteInvocationCache
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+from invokeai.app.services.shared.sqlite.sqlite_util import init_db
+from tests.test_nodes import PromptTestInvocation
+
+
+@pytest.fixture
+def db() -> SqliteDatabase:
+    config = InvokeAIAppConfig(use_memory_db=True)
+    return init_db(config=config, logger=Logger("test"), image_files=MagicMock())
+
+
+def create_cache(db: SqliteDatabase, max_cache_size: int = 5, max_disk_size: int = 2**20) -> SqliteInvocationCache:
+    cache = SqliteInvocationCache(db=db, max_cache_size=max_cache_size, max_disk_size=max_disk_size)
+    cache.start(MagicMock())
+    return cache
+
+
+def image_output(image_name: str) -> ImageOutput:
+    return ImageOutput(image=ImageField(image_name=image_name), width=512, height=512)
+
+
+def disk_keys(db: SqliteDatabase) -> set[str]:
+    return {row[0] for row in db.conn.execute("SELECT key FROM invocation_cache")}
+
+
+def test_invocation_cache_sqlite_creates_stable_keys():
+    key_1 = SqliteInvocationCache.create_key(PromptTestInvocation(id="1", prompt="foo"))
+    key_2 = SqliteInvocationCache.create_key(PromptTestInvocation(id="2", prompt="foo"))
+    key_3 = SqliteInvocationCache.create_key(PromptTestInvocation(id="1", prompt="bar"))
+
+    assert key_1 == key_2
+    assert key_1 != key_3
+    assert len(key_1) == 64
+
+
+def test_invocation_cache_sqlite_survives_restart(db: SqliteDatabase):
+    key = SqliteInvocationCache.create_key(PromptTestInvocation(prompt="foo"))
+    create_cache(db).save(key, image_output("foo"))
+
+    restarted_cache = create_cache(db)
+    assert restarted_cache.get(key) == image_output("foo")
+    status = restarted_cache.get_status()
+    assert (status.hits, status.misses, status.size) == (1, 0, 1)
+
+
+def test_invocation_cache_sqlite_reads_outputs_evicted_from_memory(db: SqliteDatabase):
+    cache = create_cache(db, max_cache_size=2)
+    for name in ["foo", "bar", "baz"]:
+        cache.save(name, image_output(name))
+    assert list(cache._cache.keys()) == ["bar", "baz"]
+    assert cache.get("foo") == image_output("foo")
+    assert list(cache._cache.keys()) == ["baz", "foo"]
+
+
+def test_invocation_cache_sqlite_keeps_ephemeral_outputs_in_memory(db: SqliteDatabase):
+    cache = create_cache(db)
+    cache.save("latents", LatentsOutput.build(latents_name="latents", latents=MagicMock(shape=(1, 4, 64, 64))))
+    assert cache.get("latents") is not None
+    assert disk_keys(db) == set()
+
+
+def test_invocation_cache_sqlite_evicts_by_size(db: SqliteDatabase):
+    output_size = len(image_output("foo0").model_dump_json(warnings=False))
+    cache = create_cache(db, max_disk_size=output_size * 3)
+    for i in range(5):
+        cache.save(f"foo{i}", image_output(f"foo{i}"))
+    assert disk_keys(db) == {"foo2", "foo3", "foo4"}
+    assert cache._disk_size == output_size * 3
+
+
+def test_invocation_cache_sqlite_deletes_by_match(db: SqliteDatabase):
+    cache = create_cache(db)
+    cache.save("foo", image_output("foo"))
+    cache.save("bar", image_output("bar"))
+    cache._delete_by_match("foo")
+    assert cache.get("foo") is None
+    assert disk_keys(db) == {"bar"}
+    assert cache._disk_size == len(image_output("bar").model_dump_json(warnings=False))
+
+    restarted_cache = create_cache(db)
+    assert restarted_cache.get("foo") is None
+    assert restarted_cache.get("bar") == image_output("bar")
+
+
+def test_invocation_cache_sqlite_clears_and_disables(db: SqliteDatabase):
+    cache = create_cache(db)
+    cache.save("foo", image_output("foo"))
+    cache.disable()
+    assert cache.get("foo") is None
+    cache.save("bar", image_output("bar"))
+    assert disk_keys(db) == {"foo"}
+    cache.enable()
+    cache.clear()
+    assert disk_keys(db) == set()
+    assert cache.get("foo") is None
+
+
+def test_invocation_cache_sqlite_deletes_by_references(db: SqliteDatabase):
+    cache = create_cache(db)
+    for i in range(1000):
+        cache.save(f"foo{i}", image_output(f"foo{i}"))
+    cache.delete_by_references([f"foo{i}" for i in range(1, 1000)])
+    assert disk_keys(db) == {"foo0"}
+    assert [r[0] for r in db.conn.execute("SELECT name FROM invocation_cache_references")] == ["foo0"]
+    assert cache._disk_size == len(image_output("foo0").model_dump_json(warnings=False))
+
+    # Nothing references the names, so no transaction is left open
+    cache.delete_by_references(["bar"])
+    assert not db.conn.in_transaction
+    assert disk_keys(db) == {"foo0"}
+
+
+def test_invocation_cache_sqlite_is_referenced(db: SqliteDatabase):
+    cache = create_cache(db, max_cache_size=1)
+    cache.save("foo", image_output("foo"))
+    cache.save("bar", image_output("bar"))
+    # The output referencing "foo" was evicted from memory, but is still on disk
+    assert cache.is_referenced("foo")
+    assert cache.is_referenced("bar")
+    assert not cache.is_referenced("baz")
@@ -1,11 +1,12 @@
 # pyright:reportPrivateUsage=false
 
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
 
 import pytest
 from blake3 import blake3
 
+from invokeai.backend.model_hash.file_hash_cache import FileHashCache, FileHashKey
 from invokeai.backend.model_hash.model_hash import HASHING_ALGORITHMS, MODEL_FILE_EXTENSIONS, ModelHash
 
 test_cases: list[tuple[HASHING_ALGORITHMS, str]] = [
@@ -131,3 +132,65 @@ def test_model_hash_uses_custom_filter(tmp_path: Path):
         return file_path.endswith(".pickme")
 
     assert {p.name for p in ModelHash._get_file_paths(tmp_path, file_filter)} == {"file.pickme"}
+
+
+@pytest.mark.parametrize("algorithm", ["md5", "sha256", "blake3_multi", "blake3_single"])
+def test_model_hash_parallel_dir_hash_matches_sequential(tmp_path: Path, algorithm: HASHING_ALGORITHMS):
+    for i in range(12):
+        Path(tmp_path, f"subdir{i % 3}").mkdir(exist_ok=True)
+        Path(tmp_path, f"subdir{i % 3}", f"{i}.safetensors").write_bytes(bytes([i]) * (i * 10_000))
+
+    sequential_hash = ModelHash(algorithm, max_workers=1).hash(tmp_path)
+    assert ModelHash(algorithm, max_workers=4).hash(tmp_path) == sequential_hash
+
+
+class DictFileHashCache(FileHashCache):
+    def __init__(self) -> None:
+        self.hashes: dict[tuple[FileHashKey, str], str] = {}
+
+    def get_hash(self, key: FileHashKey, algorithm: str) -> Optional[str]:
+        return self.hashes.get((key, algorithm))
+
+    def set_hash(self, key: FileHashKey, algorithm: str, hash_: str) -> None:
+        self.hashes[(key, algorithm)] = hash_
+
+
+def test_model_hash_only_hashes_changed_files(tmp_path: Path):
+    files = [Path(tmp_path, f"{i}.bin") for i in range(3)]
+    for f in files:
+        f.write_text(f"data {f.name}")
+
+    hash_cache = DictFileHashCache()
+    model_hash = ModelHash("sha256", hash_cache=hash_cache)
+    hashed: list[str] = []
+    hash_file = model_hash._hash_file
+
+    def counting_hash_file(file_path: Path) -> str:
+        hashed.append(file_path.name)
+        return hash_file(file_path)
+
+    model_hash._hash_file = counting_hash_file
+
+    hash_ = model_hash.hash(tmp_path)
+    assert hash_ == ModelHash("sha256").hash(tmp_path)
+    assert sorted(hashed) == ["0.bin", "1.bin", "2.bin"]
+
+    hashed.clear()
+    assert model_hash.hash(tmp_path) == hash_
+    assert hashed == []
+
+    files[1].write_text("changed data")
+    hashed.clear()
+    assert model_hash.hash(tmp_path) == ModelHash("sha256").hash(tmp_path) != hash_
+    assert hashed == ["1.bin"]
+
+    # Hashes are cached by algorithm
+    assert ModelHash("md5", hash_cache=hash_cache).hash(files[0]) == ModelHash("md5").hash(files[0])
+    assert len(hash_cache.hashes) == 5
+
+
+def test_model_hash_does_not_cache_random_hashes(tmp_path: Path):
+    file = tmp_path / "test.bin"
+    file.write_text("model data")
+    model_hash = ModelHash("random", hash_cache=DictFileHashCache())
+    assert model_hash.hash(file) != model_hash.hash(file)
@@ -1,3 +1,6 @@
+import time
+
+import networkx as nx
 import pytest
 from pydantic import TypeAdapter
 from pydantic.json_schema import models_json_schema
@@ -463,6 +466,128 @@ def test_graph_gets_networkx_graph():
     assert ("1", "2") in nxg.edges
 
 
+def test_graph_caches_networkx_graph_until_mutated():
+    g = Graph()
+    n1 = TextToImageTestInvocation(id="1", prompt="Banana sushi")
+    n2 = ESRGANInvocation(id="2")
+    g.add_node(n1)
+    g.add_node(n2)
+
+    nxg = g.nx_graph_flat()
+    assert g.nx_graph_flat() is nxg
+
+    g.add_edge(create_edge(n1.id, "image", n2.id, "image"))
+    nxg_with_edge = g.nx_graph_flat()
+    assert nxg_with_edge is not nxg
+    assert ("1", "2") in nxg_with_edge.edges
+    assert g._get_ancestors("2") == {"1"}
+
+    g.delete_edge(create_edge(n1.id, "image", n2.id, "image"))
+    assert ("1", "2") not in g.nx_graph_flat().edges
+    assert g._get_ancestors("2") == set()
+
+    n3 = ESRGANInvocation(id="3")
+    g.add_node(n3)
+    assert "3" in g.nx_graph().nodes
+
+    g.delete_node(n3.id)
+    assert "3" not in g.nx_graph().nodes
+
+
+def test_graph_cached_networkx_graph_is_frozen():
+    g = Graph()
+    g.add_node(TextToImageTestInvocation(id="1", prompt="Banana sushi"))
+
+    with pytest.raises(nx.NetworkXError):
+        g.nx_graph().add_node("2")
+
+
+def test_graph_caches_node_iterators():
+    g = Graph()
+    g.add_node(PromptCollectionTestInvocation(id="1", collection=["Banana sushi", "Cat sushi"]))
+    g.add_node(IterateInvocation(id="2"))
+    g.add_node(PromptTestInvocation(id="3"))
+    g.add_node(CollectInvocation(id="4"))
+    g.add_node(PromptTestInvocation(id="5"))
+    g.add_edge(create_edge("1", "collection", "2", "collection"))
+    g.add_edge(create_edge("2", "item", "3", "prompt"))
+    g.add_edge(create_edge("3", "prompt", "4", "item"))
+
+    assert g._get_node_iterators("3") == ["2"]
+    assert g._get_node_iterators("4") == []
+
+    # A new downstream node is visible to the memoized ancestry after the graph is mutated
+    g.add_edge(create_edge("2", "item", "5", "prompt"))
+    assert g._get_node_iterators("5") == ["2"]
+
+
+def test_graph_edge_indexes_track_mutations():
+    g = Graph()
+    g.add_node(PromptTestInvocation(id="1", prompt="Banana sushi"))
+    g.add_node(TextToImageTestInvocation(id="2"))
+    g.add_node(PromptTestInvocation(id="3"))
+    e1 = create_edge("1", "prompt", "2", "prompt")
+    e2 = create_edge("1", "prompt", "2", "prompt2")
+    e3 = create_edge("1", "prompt", "3", "prompt")
+    g.add_edge(e1)
+    g.add_edge(e2)
+    g.add_edge(e3)
+
+    assert g._get_input_edges("2") == [e1, e2]
+    assert g._get_input_edges("2", "prompt2") == [e2]
+    assert g._get_output_edges("1") == [e1, e2, e3]
+    assert g._get_output_edges("1", "missing") == []
+
+    g.delete_edge(e2)
+    assert g._get_input_edges("2") == [e1]
+
+    g.delete_node("3")
+    assert g._get_output_edges("1") == [e1]
+
+    # The indexes are not serialized, but are rebuilt from the edges when needed
+    assert "_input_edges_index" not in g.model_dump_json()
+    g2 = Graph.model_validate_json(g.model_dump_json())
+    assert g2._get_input_edges("2") == [e1]
+    assert g2._get_output_edges("1") == [e1]
+
+
+def test_graph_rejects_duplicate_edge():
+    g = Graph()
+    g.add_node(PromptTestInvocation(id="1", prompt="Banana sushi"))
+    g.add_node(CollectInvocation(id="2"))
+    e = create_edge("1", "prompt", "2", "item")
+    g.add_edge(e)
+
+    with pytest.raises(InvalidEdgeError):
+        g.add_edge(e)
+
+
+@pytest.mark.slow
+def test_graph_edge_lookup_benchmark():
+    """Benchmarks edge lookups as the graph grows. Run with `pytest -m slow -s` to see timings."""
+
+    def per_node_lookup_time(node_count: int) -> float:
+        g = Graph()
+        g.add_node(CollectInvocation(id="collect"))
+        for i in range(node_count):
+            g.add_node(PromptTestInvocation(id=str(i)))
+            if i > 0:
+                g.add_edge(create_edge(str(i - 1), "prompt", str(i), "prompt"), validate=False)
+            g.add_edge(create_edge(str(i), "prompt", "collect", "item"), validate=False)
+
+        start = time.perf_counter()
+        for i in range(node_count):
+            g._get_input_edges(str(i), "prompt")
+            g._get_output_edges(str(i))
+        return (time.perf_counter() - start) / node_count
+
+    small = per_node_lookup_time(1_000)
+    large = per_node_lookup_time(20_000)
+    print(f"per-node lookup: {small * 1e6:.2f}us at 1k nodes, {large * 1e6:.2f}us at 20k nodes")
+    # A linear scan of the edge list would be ~20x slower on the larger graph
+    assert large < small * 5
+
+
 # TODO: Graph serializes and deserializes
 def test_graph_can_serialize():
     g = Graph()
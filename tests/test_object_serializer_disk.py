@@ -26,7 +26,7 @@ def obj_serializer(tmp_path: Path):
 
 @pytest.fixture
 def fwd_cache(tmp_path: Path):
-    return ObjectSerializerForwardCache(ObjectSerializerDisk[MockDataclass](tmp_path), max_cache_size=2)
+    return ObjectSerializerForwardCache(ObjectSerializerDisk[MockDataclass](tmp_path))
 
 
 def test_obj_serializer_disk_initializes(tmp_path: Path):
@@ -158,18 +158,59 @@ def test_obj_serializer_fwd_cache_saves_and_loads(fwd_cache: ObjectSerializerFor
     assert obj_loaded.foo == "bar"
 
 
-def test_obj_serializer_fwd_cache_respects_cache_size(fwd_cache: ObjectSerializerForwardCache[MockDataclass]):
-    obj_1 = MockDataclass(foo="bar")
-    obj_1_name = fwd_cache.save(obj_1)
-    obj_2 = MockDataclass(foo="baz")
-    obj_2_name = fwd_cache.save(obj_2)
-    obj_3 = MockDataclass(foo="qux")
-    obj_3_name = fwd_cache.save(obj_3)
+def test_obj_serializer_fwd_cache_respects_cache_size(tmp_path: Path):
+    # Each tensor takes 4KB
+    fwd_cache = ObjectSerializerForwardCache(ObjectSerializerDisk[torch.Tensor](tmp_path), max_memory_size=8192)
+    obj_1_name = fwd_cache.save(torch.zeros(1024))
+    obj_2_name = fwd_cache.save(torch.zeros(1024))
+    obj_3_name = fwd_cache.save(torch.zeros(1024))
+    assert list(fwd_cache._cache.keys()) == [obj_2_name, obj_3_name]
+    assert fwd_cache.get_stats().cache_size == 8192
+    assert fwd_cache.get_stats().evictions == 1
+
+    # Objects larger than the cache are not cached
+    obj_4_name = fwd_cache.save(torch.zeros(4096))
+    assert obj_4_name not in fwd_cache._cache
+    assert obj_1_name not in fwd_cache._cache
+
+
+def test_obj_serializer_fwd_cache_is_lru(tmp_path: Path):
+    fwd_cache = ObjectSerializerForwardCache(ObjectSerializerDisk[torch.Tensor](tmp_path), max_memory_size=8192)
+    obj_1_name = fwd_cache.save(torch.zeros(1024))
+    obj_2_name = fwd_cache.save(torch.zeros(1024))
+    # A hit refreshes the object, so the second one is evicted
+    fwd_cache.load(obj_1_name)
+    obj_3_name = fwd_cache.save(torch.zeros(1024))
+    assert list(fwd_cache._cache.keys()) == [obj_1_name, obj_3_name]
+
+    # A miss reads the object back into the cache
+    fwd_cache.load(obj_2_name)
+    assert list(fwd_cache._cache.keys()) == [obj_3_name, obj_2_name]
+    stats = fwd_cache.get_stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (1, 1, 2)
+    assert stats.high_watermark == 8192
+
+
+def test_obj_serializer_fwd_cache_refreshes_objects_cached_again(tmp_path: Path):
+    fwd_cache = ObjectSerializerForwardCache(ObjectSerializerDisk[torch.Tensor](tmp_path), max_memory_size=8192)
+    obj_1_name = fwd_cache.save(torch.zeros(1024))
+    obj_2_name = fwd_cache.save(torch.zeros(1024))
+    # As when two threads miss the same object, and the second one caches it after the first one
+    fwd_cache._set_cache(obj_1_name, fwd_cache._underlying_storage.load(obj_1_name))
+    assert list(fwd_cache._cache.keys()) == [obj_2_name, obj_1_name]
+    assert fwd_cache._stats.cache_size == 8192
+
+
+def test_obj_serializer_fwd_cache_deletes_from_cache(tmp_path: Path):
+    fwd_cache = ObjectSerializerForwardCache(ObjectSerializerDisk[torch.Tensor](tmp_path), max_memory_size=8192)
+    obj_1_name = fwd_cache.save(torch.zeros(1024))
+    fwd_cache.delete(obj_1_name)
     assert obj_1_name not in fwd_cache._cache
-    assert obj_2_name in fwd_cache._cache
-    assert obj_3_name in fwd_cache._cache
-    # apparently qsize is "not reliable"?
-    assert fwd_cache._cache_ids.qsize() == 2
+    assert fwd_cache.get_stats().cache_size == 0
+    # The deleted object does not take up room in the cache
+    obj_2_name = fwd_cache.save(torch.zeros(1024))
+    obj_3_name = fwd_cache.save(torch.zeros(1024))
+    assert list(fwd_cache._cache.keys()) == [obj_2_name, obj_3_name]
 
 
 def test_obj_serializer_fwd_cache_calls_delete_callback(fwd_cache: ObjectSerializerForwardCache[MockDataclass]):
@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+import torch
+
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectNotFoundError
+from invokeai.app.services.object_serializer.object_serializer_safetensors import ObjectSerializerSafetensors
+from invokeai.backend.model_manager.load.mmap_safetensors import is_memory_mapped
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
+    BasicConditioningInfo,
+    ConditioningFieldData,
+    FLUXConditioningInfo,
+    SDXLConditioningInfo,
+)
+
+
+@dataclass
+class MockDataclass:
+    foo: str
+
+
+def test_obj_serializer_safetensors_saves_and_loads_tensors(tmp_path: Path):
+    obj_serializer = ObjectSerializerSafetensors[torch.Tensor](tmp_path)
+    tensor = torch.randn(1, 4, 8, 8)
+    name = obj_serializer.save(tensor)
+    assert name.startswith("Tensor_")
+    assert Path(tmp_path, f"{name}.safetensors").exists()
+    assert Path(tmp_path, f"{name}.json").exists()
+
+    loaded = obj_serializer.load(name)
+    assert torch.equal(loaded, tensor)
+    assert is_memory_mapped(loaded)
+
+
+@pytest.mark.parametrize(
+    "conditioning",
+    [
+        BasicConditioningInfo(embeds=torch.randn(1, 77, 768, dtype=torch.float16)),
+        SDXLConditioningInfo(
+            embeds=torch.randn(1, 77, 2048, dtype=torch.float16),
+            pooled_embeds=torch.randn(1, 1280, dtype=torch.float16),
+            add_time_ids=torch.tensor([[1024.0, 1024.0, 0.0, 0.0, 1024.0, 1024.0]]),
+        ),
+        FLUXConditioningInfo(
+            clip_embeds=torch.randn(1, 768, dtype=torch.bfloat16),
+            t5_embeds=torch.randn(1, 16, 4096, dtype=torch.bfloat16),
+        ),
+    ],
+)
+def test_obj_serializer_safetensors_saves_and_loads_conditioning(tmp_path: Path, conditioning):
+    obj_serializer = ObjectSerializerSafetensors[ConditioningFieldData](tmp_path)
+    name = obj_serializer.save(ConditioningFieldData(conditionings=[conditioning]))
+    assert not Path(tmp_path, name).exists()
+
+    loaded = obj_serializer.load(name)
+    assert isinstance(loaded, ConditioningFieldData)
+    assert len(loaded.conditionings) == 1
+    loaded_conditioning = loaded.conditionings[0]
+    assert type(loaded_conditioning) is type(conditioning)
+    for key, tensor in vars(conditioning).items():
+        assert torch.equal(getattr(loaded_conditioning, key), tensor)
+        assert getattr(loaded_conditioning, key).dtype == tensor.dtype
+
+
+def test_obj_serializer_safetensors_saves_shared_tensors_once(tmp_path: Path):
+    obj_serializer = ObjectSerializerSafetensors[ConditioningFieldData](tmp_path)
+    embeds = torch.randn(1, 77, 768)
+    name = obj_serializer.save(
+        ConditioningFieldData(
+            conditionings=[BasicConditioningInfo(embeds=embeds), BasicConditioningInfo(embeds=embeds)]
+        )
+    )
+    loaded = obj_serializer.load(name)
+    assert loaded.conditionings[0].embeds is loaded.conditionings[1].embeds
+    assert Path(tmp_path, f"{name}.safetensors").stat().st_size < 2 * embeds.nelement() * embeds.element_size()
+
+
+def test_obj_serializer_safetensors_pickles_tensors_of_unsupported_dtypes(tmp_path: Path):
+    obj_serializer = ObjectSerializerSafetensors[torch.Tensor](tmp_path)
+    tensor = torch.tensor([1 + 2j, 3 - 4j])
+    name = obj_serializer.save(tensor)
+    assert not Path(tmp_path, f"{name}.safetensors").exists()
+    assert torch.equal(obj_serializer.load(name), tensor)
+
+
+def test_obj_serializer_safetensors_loaded_tensors_are_copy_on_write(tmp_path: Path):
+    obj_serializer = ObjectSerializerSafetensors[torch.Tensor](tmp_path)
+    name = obj_serializer.save(torch.zeros(16))
+    obj_serializer.load(name).add_(1)
+    assert torch.equal(obj_serializer.load(name), torch.zeros(16))
+
+
+def test_obj_serializer_safetensors_pickles_other_objects(tmp_path: Path):
+    obj_serializer = ObjectSerializerSafetensors[MockDataclass](tmp_path)
+    name = obj_serializer.save(MockDataclass(foo="bar"))
+    assert Path(tmp_path, name).exists()
+    assert not Path(tmp_path, f"{name}.json").exists()
+    assert obj_serializer.load(name).foo == "bar"
+
+    obj_serializer.delete(name)
+    assert not Path(tmp_path, name).exists()
+
+
+def test_obj_serializer_safetensors_deletes(tmp_path: Path):
+    obj_serializer = ObjectSerializerSafetensors[torch.Tensor](tmp_path)
+    name_1 = obj_serializer.save(torch.randn(4))
+    name_2 = obj_serializer.save(torch.randn(4))
+
+    obj_serializer.delete(name_1)
+    assert not Path(tmp_path, f"{name_1}.safetensors").exists()
+    assert not Path(tmp_path, f"{name_1}.json").exists()
+    assert Path(tmp_path, f"{name_2}.safetensors").exists()
+
+    with pytest.raises(ObjectNotFoundError):
+        obj_serializer.load(name_1)
+
+
+def test_obj_serializer_safetensors_deletes_objects_whose_tensors_are_in_use(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    obj_serializer = ObjectSerializerSafetensors[torch.Tensor](tmp_path)
+    name = obj_serializer.save(torch.randn(4))
+    unlink = Path.unlink
+
+    def unlink_unless_mapped(path: Path, missing_ok: bool = False) -> None:
+        # Windows does not delete files that are memory-mapped
+        if path.suffix == ".safetensors":
+            raise PermissionError(path)
+        unlink(path, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, "unlink", unlink_unless_mapped)
+    obj_serializer.delete(name)
+
+    with pytest.raises(ObjectNotFoundError):
+        obj_serializer.load(name)
+
+
+def test_obj_serializer_safetensors_ephemeral_deletes_tempdir_on_stop(tmp_path: Path):
+    obj_serializer = ObjectSerializerSafetensors[torch.Tensor](tmp_path, ephemeral=True)
+    name = obj_serializer.save(torch.randn(4))
+    assert Path(obj_serializer._output_dir, f"{name}.safetensors").exists()
+    tempdir_path = obj_serializer._output_dir
+    obj_serializer.stop(None)  # pyright: ignore [reportArgumentType]
+    assert not tempdir_path.exists()
@@ -0,0 +1,200 @@
+# pyright: reportPrivateUsage=false
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+
+from invokeai.app.invocations.primitives import LatentsOutput
+from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectNotFoundError, calc_object_size
+from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
+from invokeai.app.services.object_serializer.object_serializer_write_back_cache import ObjectSerializerWriteBackCache
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
+    BasicConditioningInfo,
+    ConditioningFieldData,
+    SDXLConditioningInfo,
+)
+
+# The size of the tensors used in the tests, in bytes
+TENSOR_SIZE = 1024 * 4
+
+
+def make_tensor() -> torch.Tensor:
+    return torch.randn(1024)
+
+
+def count_files(path: Path) -> int:
+    return len(list(path.iterdir()))
+
+
+@pytest.fixture
+def write_back_cache(tmp_path: Path) -> ObjectSerializerWriteBackCache[torch.Tensor]:
+    return ObjectSerializerWriteBackCache(ObjectSerializerDisk[torch.Tensor](tmp_path), max_memory_size=2 * TENSOR_SIZE)
+
+
+def test_calc_object_size():
+    tensor = make_tensor()
+    assert calc_object_size(tensor) == TENSOR_SIZE
+    assert calc_object_size("foo") == 0
+    conditioning = ConditioningFieldData(
+        conditionings=[
+            SDXLConditioningInfo(
+                embeds=torch.zeros(1, 77, 2048, dtype=torch.float16),
+                pooled_embeds=torch.zeros(1, 1280, dtype=torch.float16),
+                add_time_ids=torch.zeros(1, 6),
+            ),
+            # Tensors that appear several times are counted once
+            BasicConditioningInfo(embeds=tensor),
+            BasicConditioningInfo(embeds=tensor),
+        ]
+    )
+    assert calc_object_size(conditioning) == (77 * 2048 + 1280) * 2 + 6 * 4 + TENSOR_SIZE
+
+
+def test_write_back_cache_keeps_objects_in_memory(tmp_path: Path, write_back_cache):
+    tensor = make_tensor()
+    name = write_back_cache.save(tensor)
+    assert name.startswith("Tensor_")
+    assert write_back_cache.load(name) is tensor
+    assert count_files(tmp_path) == 0
+
+
+def test_write_back_cache_spills_least_recently_used_objects(tmp_path: Path, write_back_cache):
+    tensors = [make_tensor() for _ in range(3)]
+    name_1 = write_back_cache.save(tensors[0])
+    name_2 = write_back_cache.save(tensors[1])
+    # Refresh the first object, so that the second one is spilled to disk
+    write_back_cache.load(name_1)
+    name_3 = write_back_cache.save(tensors[2])
+
+    assert list(write_back_cache._memory.keys()) == [name_1, name_3]
+    assert write_back_cache._stats.cache_size == 2 * TENSOR_SIZE
+    assert list(write_back_cache._stored_names.keys()) == [name_2]
+    assert count_files(tmp_path) == 1
+
+    # The spilled object is read back into memory. Evicting it again does not write it again.
+    assert torch.equal(write_back_cache.load(name_2), tensors[1])
+    assert list(write_back_cache._memory.keys()) == [name_3, name_2]
+    write_back_cache.load(name_3)
+    write_back_cache.load(name_1)
+    assert list(write_back_cache._stored_names.keys()) == [name_2, name_1]
+    assert count_files(tmp_path) == 2
+
+
+def test_write_back_cache_spills_objects_larger_than_memory(tmp_path: Path):
+    write_back_cache = ObjectSerializerWriteBackCache(ObjectSerializerDisk[torch.Tensor](tmp_path), max_memory_size=0)
+    tensor = make_tensor()
+    name = write_back_cache.save(tensor)
+    assert len(write_back_cache._memory) == 0
+    assert torch.equal(write_back_cache.load(name), tensor)
+
+
+def test_write_back_cache_writes_without_holding_the_lock(tmp_path: Path):
+    disk = ObjectSerializerDisk[torch.Tensor](tmp_path)
+    writing, release = threading.Event(), threading.Event()
+
+    def blocking_save(obj: torch.Tensor) -> str:
+        writing.set()
+        assert release.wait(timeout=5)
+        return ObjectSerializerDisk.save(disk, obj)
+
+    disk.save = blocking_save
+    write_back_cache = ObjectSerializerWriteBackCache(disk, max_memory_size=TENSOR_SIZE)
+    tensors = [make_tensor() for _ in range(2)]
+    name_1 = write_back_cache.save(tensors[0])
+    saving = threading.Thread(target=write_back_cache.save, args=(tensors[1],))
+    saving.start()
+    assert writing.wait(timeout=5)
+
+    # The evicted object is still readable while it is written, and other threads are not blocked
+    assert write_back_cache.load(name_1) is tensors[0]
+    assert write_back_cache.get_stats().evictions == 1
+    release.set()
+    saving.join()
+    assert list(write_back_cache._stored_names.keys()) == [name_1]
+    assert write_back_cache._writing == {}
+    assert count_files(tmp_path) == 1
+
+
+def test_write_back_cache_keeps_objects_that_fail_to_be_written(tmp_path: Path):
+    disk = ObjectSerializerDisk[torch.Tensor](tmp_path)
+    failures = [OSError("disk full")]
+
+    def failing_save(obj: torch.Tensor) -> str:
+        if failures:
+            raise failures.pop()
+        return ObjectSerializerDisk.save(disk, obj)
+
+    disk.save = failing_save
+    write_back_cache = ObjectSerializerWriteBackCache(disk, max_memory_size=TENSOR_SIZE)
+    tensors = [make_tensor() for _ in range(3)]
+    name_1 = write_back_cache.save(tensors[0])
+    # The failed write of the evicted object does not fail the save of another object
+    name_2 = write_back_cache.save(tensors[1])
+    assert list(write_back_cache._memory.keys()) == [name_1, name_2]
+    assert write_back_cache.load(name_1) is tensors[0]
+    assert count_files(tmp_path) == 0
+
+    # The object is written again when it is evicted next
+    write_back_cache.save(tensors[2])
+    assert name_1 in write_back_cache._stored_names
+    assert torch.equal(write_back_cache.load(name_1), tensors[0])
+
+
+def test_write_back_cache_deletes(tmp_path: Path, write_back_cache):
+    deleted_names: list[str] = []
+    write_back_cache.on_deleted(deleted_names.append)
+    # The first object is spilled to disk
+    names = [write_back_cache.save(make_tensor()) for _ in range(3)]
+    assert count_files(tmp_path) == 1
+
+    for name in names:
+        write_back_cache.delete(name)
+    assert deleted_names == names
+    assert write_back_cache._stats.cache_size == 0
+    assert count_files(tmp_path) == 0
+    with pytest.raises(ObjectNotFoundError):
+        write_back_cache.load(names[0])
+
+
+def test_write_back_cache_releases_objects_not_referenced_by_cached_outputs(tmp_path: Path, write_back_cache):
+    invocation_cache = MemoryInvocationCache(max_cache_size=5)
+    invoker = MagicMock()
+    invoker.services.invocation_cache = invocation_cache
+    write_back_cache.start(invoker)
+
+    # The second object is spilled to disk
+    name_2 = write_back_cache.save(make_tensor())
+    name_1 = write_back_cache.save(make_tensor())
+    name_3 = write_back_cache.save(make_tensor())
+    invocation_cache.save(1, LatentsOutput.build(latents_name=name_1, latents=MagicMock(shape=(1, 4, 64, 64))))
+
+    write_back_cache.release([name_1, name_2, name_3, "unknown_object_name"])
+    assert torch.equal(write_back_cache.load(name_1), write_back_cache._memory[name_1][0])
+    for name in [name_2, name_3]:
+        with pytest.raises(ObjectNotFoundError):
+            write_back_cache.load(name)
+    assert count_files(tmp_path) == 0
+
+
+def test_write_back_cache_frees_retained_objects_once_no_cached_output_references_them(
+    tmp_path: Path, write_back_cache
+):
+    invocation_cache = MemoryInvocationCache(max_cache_size=1)
+    invoker = MagicMock()
+    invoker.services.invocation_cache = invocation_cache
+    write_back_cache.start(invoker)
+
+    name_1 = write_back_cache.save(make_tensor())
+    name_2 = write_back_cache.save(make_tensor())
+    invocation_cache.save(1, LatentsOutput.build(latents_name=name_1, latents=MagicMock(shape=(1, 4, 64, 64))))
+    write_back_cache.release([name_1])
+    assert name_1 in write_back_cache._memory
+
+    # Objects that were not released are kept, even when no cached output references them
+    invocation_cache.save(2, LatentsOutput.build(latents_name=name_2, latents=MagicMock(shape=(1, 4, 64, 64))))
+    assert name_1 not in write_back_cache._memory
+    invocation_cache.clear()
+    assert name_2 in write_back_cache._memory
@@ -8,6 +8,7 @@ from invokeai.app.services.session_queue.session_queue_common import (
     NodeFieldValue,
     calc_session_count,
     create_session_nfv_tuples,
+    iterate_values_to_insert,
     prepare_values_to_insert,
 )
 from invokeai.app.services.shared.graph import Graph, GraphExecutionState
@@ -120,6 +121,27 @@ def test_calc_session_count(batch_data_collection, batch_graph):
     assert calc_session_count(batch=b) == 8
 
 
+def test_calc_session_count_matches_created_sessions(batch_graph):
+    data = [
+        [BatchDatum(node_path="1", field_name="prompt", items=["a", "b", "c"])],
+        [
+            BatchDatum(node_path="2", field_name="prompt", items=["d", "e"]),
+            BatchDatum(node_path="3", field_name="prompt", items=["f", "g"]),
+        ],
+        [BatchDatum(node_path="4", field_name="prompt", items=["h", "i", "j", "k"])],
+    ]
+    b = Batch(graph=batch_graph, data=data, runs=3)
+    assert calc_session_count(batch=b) == len(list(create_session_nfv_tuples(batch=b, maximum=1000))) == 72
+
+
+def test_iterate_values_to_insert_is_lazy(batch_data_collection, batch_graph):
+    b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
+    values = iterate_values_to_insert(queue_id="default", batch=b, priority=0, max_new_queue_items=1000)
+    first = next(values)
+    assert first.batch_id == b.batch_id
+    assert len(list(values)) == 7
+
+
 def test_prepare_values_to_insert(batch_data_collection, batch_graph):
     b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
     values = prepare_values_to_insert(queue_id="default", batch=b, priority=0, max_new_queue_items=1000)